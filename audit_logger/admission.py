@@ -0,0 +1,380 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterator, Optional
+
+from audit_logger.custom_logger import get_logger
+from audit_logger.metrics import registry
+
+if TYPE_CHECKING:
+    from audit_logger.models import AdmissionPoolSettings, AdmissionSettings
+
+logger = get_logger("audit_logger")
+
+ADMISSION_SHED = registry.counter(
+    "audit_admission_shed_total",
+    "Number of requests rejected by the admission control, per pool and reason.",
+    ("pool", "reason"),
+)
+ADMISSION_QUEUE_SECONDS = registry.histogram(
+    "audit_admission_queue_seconds",
+    "Time the admitted requests waited for a concurrency slot.",
+    ("pool",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+# Reasons of rejected requests.
+RATE_LIMITED = "rate_limited"
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+
+
+class Rejected(Exception):
+    """
+    Raised if a request is not admitted.
+
+    Args:
+    - status_code (int): `429` (rate limited) or `503` (overloaded).
+    - reason (str): The reason, e.g. `queue_full`.
+    - retry_after (float): Seconds after which the client may retry.
+    """
+
+    def __init__(self, status_code: int, reason: str, retry_after: float) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    A token bucket refilled with `rate` tokens per second, holding at most `burst`.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, amount: float = 1.0, now: Optional[float] = None) -> float:
+        """
+        Takes `amount` tokens if available. An amount larger than the burst is
+        taken once the bucket is full, leaving it in debt.
+
+        Returns:
+        - float: 0 if the tokens were taken, otherwise the seconds until they're available.
+        """
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= min(amount, self.burst):
+            self.tokens -= amount
+            return 0.0
+        return (min(amount, self.burst) - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token buckets per key (e.g. per API key). The least recently used buckets
+    beyond `max_keys` are dropped, so unknown keys can't grow the memory.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, amount: float = 1.0) -> float:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(amount)
+
+    def resize(self, rate: float, burst: float, max_keys: int) -> None:
+        """
+        Changes the limits in place. The buckets keep their tokens (at most the
+        new burst), so a reload doesn't refill them.
+        """
+        with self._lock:
+            self.rate = rate
+            self.burst = burst
+            self.max_keys = max_keys
+            for bucket in self._buckets.values():
+                bucket.rate = rate
+                bucket.burst = burst
+                bucket.tokens = min(bucket.tokens, burst)
+            while len(self._buckets) > max_keys:
+                self._buckets.popitem(last=False)
+
+
+class GradientLimit:
+    """
+    An adaptive concurrency limit in the style of Netflix' gradient2 limiter.
+
+    The limit follows the gradient between the long-term and the short-term
+    average latency: it grows (by about `sqrt(limit)` per sample) while the
+    latency is stable and shrinks (by up to half) once the latency rises above
+    `tolerance` times the long-term average, e.g. when Elasticsearch slows down.
+
+    Args:
+    - initial (int): The initial limit.
+    - min_limit (int): The lower bound of the limit.
+    - max_limit (int): The upper bound of the limit.
+    - tolerance (float): The tolerated latency increase before the limit shrinks.
+    - smoothing (float): The weight of a new limit estimate.
+    - long_window (int): The number of samples of the long-term average.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        tolerance: float = 1.5,
+        smoothing: float = 0.2,
+        long_window: int = 600,
+    ) -> None:
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.long_window = long_window
+        self.short_rtt = 0.0
+        self.long_rtt = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, rtt: float, in_flight: int) -> float:
+        """Updates (and returns) the limit with the latency of a single call."""
+        with self._lock:
+            if not self.long_rtt:
+                self.short_rtt = self.long_rtt = rtt
+            self.short_rtt += (rtt - self.short_rtt) * 0.1
+            self.long_rtt += (rtt - self.long_rtt) / self.long_window
+            # After a latency spike, let the long-term average recover quickly.
+            if self.long_rtt > 2 * self.short_rtt:
+                self.long_rtt *= 0.95
+            # Don't grow the limit while it isn't used (application limited).
+            if in_flight < self.limit / 2:
+                return self.limit
+            gradient = max(
+                0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt)
+            )
+            estimate = self.limit * gradient + math.sqrt(self.limit)
+            limit = self.limit * (1 - self.smoothing) + estimate * self.smoothing
+            self.limit = max(self.min_limit, min(self.max_limit, limit))
+            return self.limit
+
+    def resize(self, min_limit: int, max_limit: int, tolerance: float) -> None:
+        """
+        Changes the bounds and tolerance in place, keeping the latency averages
+        and the limit (within the new bounds).
+        """
+        with self._lock:
+            self.min_limit = min_limit
+            self.max_limit = max_limit
+            self.tolerance = tolerance
+            self.limit = max(min_limit, min(max_limit, self.limit))
+
+
+class AdmissionPool:
+    """
+    Limits the number of concurrently processed requests of a route group. Excess
+    requests wait in a FIFO queue, and are rejected (`503`) if the queue is full or
+    they waited longer than `max_queue_time`. All methods but `observe` must be
+    called from the event loop.
+
+    Args:
+    - name (str): The name of the pool (`ingest`, `search`).
+    - settings (AdmissionPoolSettings): The limits.
+    - max_keys (int): The max. number of rate limited keys.
+    """
+
+    def __init__(
+        self, name: str, settings: "AdmissionPoolSettings", max_keys: int = 10000
+    ) -> None:
+        self.name = name
+        self.in_flight = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+        self.rate_limiter: Optional[RateLimiter] = None
+        self.gradient: Optional[GradientLimit] = None
+        self.configure(settings, max_keys)
+
+    def configure(
+        self, settings: "AdmissionPoolSettings", max_keys: int = 10000
+    ) -> None:
+        self.settings = settings
+        self.max_queue = settings.max_queue
+        self.max_queue_time = settings.max_queue_time
+        # Resized in place, so a reload keeps the adaptive limit and the buckets.
+        if not settings.adaptive:
+            self.gradient = None
+        elif self.gradient is None:
+            self.gradient = GradientLimit(
+                settings.max_concurrency,
+                settings.min_concurrency,
+                settings.max_concurrency,
+                tolerance=settings.latency_tolerance,
+            )
+        else:
+            self.gradient.resize(
+                settings.min_concurrency,
+                settings.max_concurrency,
+                settings.latency_tolerance,
+            )
+        if not settings.rate:
+            self.rate_limiter = None
+        elif self.rate_limiter is None:
+            self.rate_limiter = RateLimiter(
+                settings.rate, settings.burst or settings.rate, max_keys
+            )
+        else:
+            self.rate_limiter.resize(
+                settings.rate, settings.burst or settings.rate, max_keys
+            )
+
+    @property
+    def limit(self) -> int:
+        if self.gradient is None:
+            return self.settings.max_concurrency
+        return int(self.gradient.limit)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def check_rate(self, key: str, amount: float = 1.0) -> None:
+        """
+        Raises:
+        - Rejected: `429` if the key exceeded its rate.
+        """
+        if self.rate_limiter is None:
+            return
+        wait = self.rate_limiter.take(key, amount)
+        if wait:
+            ADMISSION_SHED.labels(self.name, RATE_LIMITED).inc()
+            raise Rejected(429, RATE_LIMITED, wait)
+
+    async def acquire(self, retry_after: float) -> None:
+        """
+        Waits for a concurrency slot.
+
+        Raises:
+        - Rejected: `503` if the queue is full or the request waited too long.
+        """
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            ADMISSION_SHED.labels(self.name, QUEUE_FULL).inc()
+            raise Rejected(503, QUEUE_FULL, retry_after)
+
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_queue_time)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over right at the timeout (or disconnect).
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            ADMISSION_SHED.labels(self.name, QUEUE_TIMEOUT).inc()
+            raise Rejected(503, QUEUE_TIMEOUT, retry_after) from None
+        ADMISSION_QUEUE_SECONDS.labels(self.name).observe(time.perf_counter() - start)
+
+    def release(self) -> None:
+        """Frees a slot, handing the free slots over to the waiting requests."""
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def observe(self, latency: float) -> None:
+        """Feeds the latency of an Elasticsearch call to the adaptive limit."""
+        if self.gradient is not None:
+            self.gradient.update(latency, self.in_flight)
+
+
+class AdmissionController:
+    """
+    The admission control in front of the ingest and search routes: per-API-key
+    token buckets (`429`) and adaptive concurrency limits with bounded queues
+    (`503`), both answered with a `Retry-After` header.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.retry_after = 1.0
+        self.pools: Dict[str, AdmissionPool] = {}
+
+    def configure(self, settings: Optional["AdmissionSettings"]) -> None:
+        if not settings or not settings.enabled:
+            self.enabled = False
+            self.pools = {}
+            return
+        self.retry_after = settings.retry_after
+        for name, pool_settings in (
+            ("ingest", settings.ingest),
+            ("search", settings.search),
+        ):
+            if name in self.pools:
+                self.pools[name].configure(pool_settings, settings.max_keys)
+            else:
+                self.pools[name] = AdmissionPool(name, pool_settings, settings.max_keys)
+        self.enabled = True
+
+    def pool(self, name: str) -> Optional[AdmissionPool]:
+        return self.pools.get(name) if self.enabled else None
+
+    def observe(self, name: str, latency: float) -> None:
+        """Feeds the latency of an Elasticsearch call to the pool's adaptive limit."""
+        pool = self.pools.get(name) if self.enabled else None
+        if pool is not None:
+            pool.observe(latency)
+
+    def collect(self) -> Iterator[Any]:
+        pools = list(self.pools.values())
+        yield (
+            "audit_admission_queue_depth",
+            "gauge",
+            "Number of requests waiting for a concurrency slot.",
+            ("pool",),
+            {(pool.name,): float(pool.queue_depth) for pool in pools},
+        )
+        yield (
+            "audit_admission_in_flight",
+            "gauge",
+            "Number of admitted requests in progress.",
+            ("pool",),
+            {(pool.name,): float(pool.in_flight) for pool in pools},
+        )
+        yield (
+            "audit_admission_limit",
+            "gauge",
+            "Current (adaptive) concurrency limit.",
+            ("pool",),
+            {(pool.name,): float(pool.limit) for pool in pools},
+        )
+
+
+admission = AdmissionController()
+registry.register_collector(admission.collect)
@@ -0,0 +1,300 @@
+import json
+import threading
+import time
+import urllib.request
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Tuple
+
+from audit_logger.custom_logger import get_logger
+from audit_logger.metrics import registry
+from audit_logger.predicates import MISSING, compile_predicate, getter
+
+if TYPE_CHECKING:
+    from audit_logger.models import AlertRule, AlertSettings
+
+logger = get_logger("audit_logger")
+
+ALERTS_FIRED = registry.counter(
+    "audit_alerts_total",
+    "Number of alerts fired per rule.",
+    ("rule",),
+)
+ALERTS_DROPPED = registry.counter(
+    "audit_alerts_dropped_total",
+    "Number of alerts dropped because the sink queue was full.",
+)
+ALERT_KEYS_EVICTED = registry.counter(
+    "audit_alert_keys_evicted_total",
+    "Number of counted keys evicted because `max_keys` was reached.",
+    ("rule",),
+)
+
+
+class AlertSink:
+    def send(self, alerts: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+
+class FileAlertSink(AlertSink):
+    """Appends every alert as a JSON line to a file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def send(self, alerts: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(alert) + "\n" for alert in alerts))
+
+
+class WebhookAlertSink(AlertSink):
+    """Posts every batch of alerts as a JSON array to a webhook."""
+
+    def __init__(self, url: str, timeout: float = 5.0) -> None:
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts: List[Dict[str, Any]]) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(alerts).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class AlertDispatcher:
+    """
+    Sends the fired alerts to the sink from a background thread, so the ingest
+    path never waits for the sink.
+    """
+
+    def __init__(
+        self, sink: AlertSink, max_queue_size: int = 10000, max_batch_size: int = 100
+    ) -> None:
+        self.sink = sink
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self._queue: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="alert-dispatcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, alerts: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            room = self.max_queue_size - len(self._queue)
+            if len(alerts) > room:
+                ALERTS_DROPPED.inc(len(alerts) - room)
+                alerts = alerts[:room]
+            self._queue.extend(alerts)
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(1.0)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        while True:
+            with self._lock:
+                batch = self._queue[: self.max_batch_size]
+                del self._queue[: self.max_batch_size]
+            if not batch:
+                return
+            try:
+                self.sink.send(batch)
+            except Exception as e:
+                logger.error("[Alerts] Failed to send %d alert(s): %s", len(batch), e)
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+class _KeyState:
+    __slots__ = ("times", "silenced_until")
+
+    def __init__(self, size: int) -> None:
+        # The last `threshold + 1` event times are enough to know whether more
+        # than `threshold` events happened within the window.
+        self.times: Deque[float] = deque(maxlen=size)
+        self.silenced_until = 0.0
+
+
+def _key_part(value: Any) -> Any:
+    if value is MISSING:
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    return value
+
+
+class RuleCounter:
+    """
+    The sliding-window counters of a single rule, one per `group_by` key. The
+    keys are kept in least recently seen order, so idle keys (nothing counted
+    within the window) are evicted from the front, as are the least recent
+    keys beyond `max_keys`.
+
+    Args:
+    - rule (AlertRule): The rule.
+    - max_keys (int): The max. number of counted keys.
+    """
+
+    def __init__(self, rule: "AlertRule", max_keys: int) -> None:
+        self.rule = rule
+        self.name = rule.name
+        self.max_keys = max_keys
+        self.window = rule.window
+        self.cooldown = rule.window if rule.cooldown is None else rule.cooldown
+        self.size = rule.threshold + 1
+        self.predicate = compile_predicate(rule.filters)
+        self.group_by = list(rule.group_by)
+        self.getters = [getter(path) for path in self.group_by]
+        self.keys: "OrderedDict[Tuple[Any, ...], _KeyState]" = OrderedDict()
+
+    def observe(self, document: Dict[str, Any], now: float) -> Optional[Dict[str, Any]]:
+        """Counts a document and returns an alert if the threshold is crossed."""
+        if not self.predicate(document):
+            return None
+        key = tuple(_key_part(get(document)) for get in self.getters)
+        keys = self.keys
+        state = keys.get(key)
+        if state is None:
+            state = keys[key] = _KeyState(self.size)
+            if len(keys) > self.max_keys:
+                keys.popitem(last=False)
+                ALERT_KEYS_EVICTED.labels(self.name).inc()
+        else:
+            keys.move_to_end(key)
+        times = state.times
+        times.append(now)
+
+        # Evict the keys which counted nothing within the window.
+        horizon = now - self.window
+        while keys:
+            oldest = next(iter(keys.values()))
+            if oldest.times[-1] >= horizon:
+                break
+            keys.popitem(last=False)
+
+        if len(times) < self.size or times[0] < horizon:
+            return None
+        if now < state.silenced_until:
+            return None
+        state.silenced_until = now + self.cooldown
+        return {
+            "rule": self.name,
+            "group": dict(zip(self.group_by, key)),
+            "count": len(times),
+            "threshold": self.rule.threshold,
+            "window": self.window,
+            "triggered_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+
+class AlertEngine:
+    """
+    Evaluates the alert rules against the indexed audit log entries and hands
+    the fired alerts to the sink. Windows are measured in ingest (monotonic) time.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.counters: List[RuleCounter] = []
+        self.dispatcher: Optional[AlertDispatcher] = None
+
+    @staticmethod
+    def compile(settings: Optional["AlertSettings"]) -> List[RuleCounter]:
+        """
+        Compiles the counters of the enabled rules.
+
+        Raises:
+        - ValueError: For invalid filter values.
+        """
+        if not settings or not settings.enabled:
+            return []
+        return [RuleCounter(rule, settings.max_keys) for rule in settings.rules]
+
+    def configure(
+        self,
+        settings: Optional["AlertSettings"],
+        sink: Optional[AlertSink] = None,
+        counters: Optional[List[RuleCounter]] = None,
+    ) -> None:
+        """
+        Replaces the rules (and resets their counters). The rules are compiled
+        first, so invalid rules leave the running ones in place.
+
+        Args:
+        - settings (Optional[AlertSettings]): The rules and sink.
+        - sink (Optional[AlertSink]): Overrides the configured sink.
+        - counters (Optional[List[RuleCounter]]): The counters of `compile`.
+        """
+        if counters is None:
+            counters = self.compile(settings)
+        self.shutdown()
+        if not settings or not counters:
+            return
+        if sink is None:
+            if str(settings.sink.value) == "webhook":
+                sink = WebhookAlertSink(
+                    str(settings.webhook_url), settings.webhook_timeout
+                )
+            else:
+                sink = FileAlertSink(settings.file_path)
+        self.counters = counters
+        self.dispatcher = AlertDispatcher(sink)
+        self.enabled = True
+        logger.info(
+            "[Alerts] %d rule(s) enabled (sink: %s)",
+            len(self.counters),
+            settings.sink.value,
+        )
+
+    def process(
+        self, documents: List[Dict[str, Any]], now: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Counts the documents for every rule and returns (and sends) the fired alerts.
+
+        Args:
+        - documents (List[Dict[str, Any]]): The indexed entries.
+        - now (Optional[float]): The monotonic time of the entries (default: now).
+
+        Returns:
+        - List[Dict[str, Any]]: The fired alerts.
+        """
+        if not self.enabled:
+            return []
+        now = time.monotonic() if now is None else now
+        alerts = []
+        for counter in self.counters:
+            observe = counter.observe
+            for document in documents:
+                alert = observe(document, now)
+                if alert is not None:
+                    alerts.append(alert)
+                    ALERTS_FIRED.labels(counter.name).inc()
+        if alerts and self.dispatcher:
+            self.dispatcher.submit(alerts)
+        return alerts
+
+    def shutdown(self) -> None:
+        self.enabled = False
+        self.counters = []
+        if self.dispatcher:
+            self.dispatcher.shutdown()
+            self.dispatcher = None
+
+
+alert_engine = AlertEngine()
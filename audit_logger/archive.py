@@ -0,0 +1,549 @@
+import argparse
+import fnmatch
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+from elasticsearch import Elasticsearch, helpers
+from elasticsearch.exceptions import ApiError
+
+from audit_logger.config_manager import ConfigManager
+from audit_logger.custom_logger import get_logger
+from audit_logger.elastic import create_client
+from audit_logger.metrics import registry
+from audit_logger.models import AppConfig, ArchiveSettings, SearchParams
+from audit_logger.predicates import (
+    DATE_FIELDS,
+    MISSING,
+    compile_predicate,
+    getter,
+    parse_date_math,
+    timestamp_bounds,
+)
+from audit_logger.utils import load_env_vars
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None  # type: ignore[assignment]
+    pq = None  # type: ignore[assignment]
+
+logger = get_logger("audit_logger")
+
+ARCHIVE_FILES_READ = registry.counter(
+    "audit_archive_files_read_total",
+    "Number of archive files read by searches (after the partition pruning).",
+)
+
+# The columns of the archive files: the fields of the index mapping, `meta` and
+# the fields outside the mapping as JSON.
+STRING_COLUMNS = (
+    "event_name",
+    "application_name",
+    "module",
+    "action",
+    "comment",
+    "context",
+    "operation",
+    "status",
+    "endpoint",
+    "actor.identifier",
+    "actor.type",
+    "actor.ip_address",
+    "actor.user_agent",
+    "resource.type",
+    "resource.id",
+    "server.hostname",
+    "server.vm_name",
+    "server.ip_address",
+)
+COLUMNS = ("timestamp", *STRING_COLUMNS, "meta", "_extra")
+NESTED_FIELDS = frozenset({"actor", "resource", "server"})
+_STRING_COLUMNS = frozenset(STRING_COLUMNS)
+
+# Partition value of the entries without a timestamp or application name.
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+class ArchiveError(Exception):
+    """Raised if an index couldn't be archived completely."""
+
+
+def archive_schema() -> Any:
+    return pa.schema(
+        [("timestamp", pa.timestamp("ms", tz="UTC"))]
+        + [(column, pa.string()) for column in STRING_COLUMNS]
+        + [("meta", pa.string()), ("_extra", pa.string())]
+    )
+
+
+def flatten(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts an audit log entry to a row of the archive files."""
+    row: Dict[str, Any] = {}
+    extra: Dict[str, Any] = {}
+    for key, value in document.items():
+        if key == "timestamp":
+            try:
+                row[key] = parse_date_math(value) if value is not None else None
+            except ValueError:
+                extra[key] = value
+        elif key in NESTED_FIELDS and isinstance(value, dict):
+            for name, nested in value.items():
+                column = f"{key}.{name}"
+                if column in _STRING_COLUMNS:
+                    row[column] = None if nested is None else str(nested)
+                else:
+                    extra.setdefault(key, {})[name] = nested
+        elif key in _STRING_COLUMNS:
+            row[key] = None if value is None else str(value)
+        elif key == "meta":
+            row[key] = None if value is None else json.dumps(value, default=str)
+        else:
+            extra[key] = value
+    if extra:
+        row["_extra"] = json.dumps(extra, default=str)
+    return row
+
+
+def unflatten(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts a row of the archive files back to an audit log entry."""
+    document: Dict[str, Any] = {}
+    extra = None
+    for column, value in row.items():
+        if value is None:
+            continue
+        if column == "timestamp":
+            document[column] = value.isoformat()
+        elif column == "meta":
+            document[column] = json.loads(value)
+        elif column == "_extra":
+            extra = json.loads(value)
+        elif "." in column:
+            parent, name = column.split(".", 1)
+            document.setdefault(parent, {})[name] = value
+        else:
+            document[column] = value
+    for key, value in (extra or {}).items():
+        if isinstance(value, dict) and isinstance(document.get(key), dict):
+            document[key].update(value)
+        else:
+            document[key] = value
+    return document
+
+
+def field_columns(field: str) -> Set[str]:
+    """The columns of a (parent) field, e.g. `actor` for all `actor.*` columns."""
+    return {c for c in COLUMNS if c == field or c.startswith(f"{field}.")}
+
+
+def _value(value: Any) -> Any:
+    # The defaults of `SearchParams` aren't validated, so they aren't enums.
+    return value.value if isinstance(value, Enum) else value
+
+
+def sorting(params: SearchParams) -> Tuple[str, bool]:
+    """Returns the field and whether the order is descending of a search."""
+    return (
+        str(_value(params.sort_by) or "timestamp"),
+        _value(params.sort_order) == "desc",
+    )
+
+
+def sort_hits(
+    documents: List[Dict[str, Any]], field: str, descending: bool
+) -> List[Dict[str, Any]]:
+    """Sorts documents by a field like ES does, those without the field last."""
+    get = getter(field)
+
+    def key(document: Dict[str, Any]) -> Any:
+        value = get(document)
+        if value is MISSING or value is None or isinstance(value, (dict, list)):
+            return None
+        if field in DATE_FIELDS:
+            try:
+                return parse_date_math(value).timestamp()
+            except ValueError:
+                return None
+        return str(value)
+
+    keyed = [(key(document), document) for document in documents]
+    present = [item for item in keyed if item[0] is not None]
+    present.sort(key=lambda item: item[0], reverse=descending)
+    return [document for _, document in present] + [
+        document for value, document in keyed if value is None
+    ]
+
+
+class Archiver:
+    """
+    Exports the rolled over indices whose newest entry is older than
+    `older_than_days` to Parquet files and deletes them from Elasticsearch. The
+    files are partitioned by day and application name, per alias (tenant index):
+
+    `<location>/<alias>/day=<YYYY-MM-DD>/application_name=<name>/<index>.parquet`
+
+    The files are written aside and only renamed into place (and the index
+    deleted) once the number of written entries matches the index. The write
+    index of an alias is never archived.
+
+    Args:
+    - client (Elasticsearch): The client.
+    - settings (ArchiveSettings): The location, age and file settings.
+    - aliases (List[str]): The aliases (or index prefixes) whose indices are archived.
+    """
+
+    def __init__(
+        self, client: Elasticsearch, settings: ArchiveSettings, aliases: List[str]
+    ) -> None:
+        if pq is None:
+            raise ArchiveError("Archiving requires pyarrow (the 'archive' extra)")
+        self.client = client
+        self.settings = settings
+        self.aliases = aliases
+        self.schema = archive_schema()
+
+    def candidates(self, alias: str, now: Optional[float] = None) -> List[str]:
+        """Returns the indices of an alias which are due to be archived."""
+        cutoff = ((now or time.time()) - self.settings.older_than_days * 86400) * 1000
+        indices = self.client.indices.get(
+            index=f"{alias}-*", expand_wildcards="open"
+        ).body
+        due = []
+        for name, info in sorted(indices.items()):
+            if any(fnmatch.fnmatchcase(name, p) for p in self.settings.exclude):
+                continue
+            if any(a.get("is_write_index") for a in info.get("aliases", {}).values()):
+                continue
+            newest = self.newest_entry(name)
+            if newest is not None and newest < cutoff:
+                due.append(name)
+        return due
+
+    def newest_entry(self, index: str) -> Optional[float]:
+        """Returns the timestamp (epoch milliseconds) of the newest entry."""
+        body = self.client.search(
+            index=index, size=0, aggs={"newest": {"max": {"field": "timestamp"}}}
+        ).body
+        return body["aggregations"]["newest"]["value"]
+
+    def partition(self, root: str, row: Dict[str, Any]) -> str:
+        timestamp = row.get("timestamp")
+        day = (
+            timestamp.astimezone(timezone.utc).strftime("%Y-%m-%d")
+            if timestamp
+            else NULL_PARTITION
+        )
+        application = row.get("application_name")
+        return os.path.join(
+            root,
+            f"day={day}",
+            "application_name="
+            + (quote(application, safe="") if application else NULL_PARTITION),
+        )
+
+    def archive_index(self, alias: str, index: str) -> int:
+        """
+        Exports an index to the archive and deletes it.
+
+        Returns:
+        - int: The number of archived entries.
+
+        Raises:
+        - ArchiveError: If not all entries of the index were exported.
+        """
+        root = os.path.join(self.settings.location, alias)
+        compression = (
+            None if self.settings.compression == "none" else self.settings.compression
+        )
+        writers: Dict[str, Any] = {}
+        buffers: Dict[str, List[Dict[str, Any]]] = {}
+
+        def write(directory: str) -> None:
+            writer = writers.get(directory)
+            if writer is None:
+                os.makedirs(directory, exist_ok=True)
+                writer = writers[directory] = pq.ParquetWriter(
+                    os.path.join(directory, f"{index}.parquet.tmp"),
+                    self.schema,
+                    compression=compression,
+                )
+            writer.write_table(
+                pa.Table.from_pylist(buffers.pop(directory), schema=self.schema)
+            )
+
+        start = time.perf_counter()
+        count = 0
+        try:
+            for hit in helpers.scan(
+                self.client,
+                index=index,
+                query={"sort": ["_doc"]},
+                size=self.settings.batch_size,
+            ):
+                row = flatten(hit["_source"])
+                directory = self.partition(root, row)
+                buffer = buffers.setdefault(directory, [])
+                buffer.append(row)
+                count += 1
+                if len(buffer) >= self.settings.batch_size:
+                    write(directory)
+            for directory in list(buffers):
+                write(directory)
+            expected = self.client.count(index=index)["count"]
+            if count != expected:
+                raise ArchiveError(
+                    f"Exported {count} of {expected} entries of '{index}'"
+                )
+        except BaseException:
+            for directory, writer in writers.items():
+                writer.close()
+                os.remove(os.path.join(directory, f"{index}.parquet.tmp"))
+            raise
+        for directory, writer in writers.items():
+            writer.close()
+            path = os.path.join(directory, f"{index}.parquet")
+            os.replace(f"{path}.tmp", path)
+
+        self.client.indices.delete(index=index)
+        logger.info(
+            "[Archive] Archived %d entries of '%s' into %d file(s) in %.1fs",
+            count,
+            index,
+            len(writers),
+            time.perf_counter() - start,
+        )
+        return count
+
+    def archive(self, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Archives all due indices.
+
+        Returns:
+        - Dict[str, int]: The number of archived entries per index (0 with `dry_run`).
+        """
+        archived = {}
+        for alias in self.aliases:
+            for index in self.candidates(alias):
+                archived[index] = 0 if dry_run else self.archive_index(alias, index)
+        return archived
+
+    def run(self, stopped: threading.Event) -> None:
+        """Archives every `interval` seconds (the first right away) until stopped."""
+        while not stopped.is_set():
+            try:
+                self.archive()
+            except Exception as e:
+                logger.error("[Archive] Archiving failed: %s", e)
+            stopped.wait(self.settings.interval)
+
+
+class ArchiveStore:
+    """
+    Searches the archives for the entries of time ranges which were archived.
+    Only searches with a `range` filter on the `timestamp` are answered from the
+    archives. The files are pruned by their day partition and, for `exact`
+    filters on the `application_name`, by their application partition; only the
+    columns of the requested fields (and those filtered and sorted by) are read.
+    Aggregations aren't computed over the archives.
+    """
+
+    def __init__(self) -> None:
+        self.settings: Optional[ArchiveSettings] = None
+
+    def configure(self, settings: Optional[ArchiveSettings]) -> None:
+        if settings and settings.enabled and pq is None:
+            logger.warning(
+                "[Archive] Searching the archives requires pyarrow (the 'archive' extra)"
+            )
+        self.settings = settings
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.settings and self.settings.enabled and pq is not None)
+
+    @staticmethod
+    def days(root: str, low: float, high: float) -> List[Tuple[str, str]]:
+        """Returns the day partitions (day, directory) within the window, in order."""
+        try:
+            names = os.listdir(root)
+        except FileNotFoundError:
+            return []
+        days = []
+        for name in names:
+            if not name.startswith("day="):
+                continue
+            try:
+                day = datetime.strptime(name[4:], "%Y-%m-%d").replace(
+                    tzinfo=timezone.utc
+                )
+            except ValueError:
+                continue
+            start = day.timestamp() * 1000
+            end = (day + timedelta(days=1)).timestamp() * 1000
+            if end > low and start <= high:
+                days.append((name[4:], os.path.join(root, name)))
+        return sorted(days)
+
+    @staticmethod
+    def columns(params: SearchParams) -> Tuple[Set[str], Set[str]]:
+        """Returns the columns to read and those to return."""
+        output = set(COLUMNS)
+        if params.fields:
+            selected = set().union(
+                *(field_columns(str(f.value)) for f in params.fields)
+            )
+            if _value(params.fields_mode) == "exclude":
+                output -= selected
+            else:
+                output = selected
+        read = set(output) | {"timestamp"}
+        for f in params.filters or []:
+            for field in [f.field, *(f.fields or [])]:
+                if field:
+                    read |= field_columns(str(field.value))
+        read |= field_columns(sorting(params)[0])
+        return read, output
+
+    def search(self, alias: str, params: SearchParams) -> List[Dict[str, Any]]:
+        """
+        Returns the archived entries of an alias matching the search, sorted and
+        limited like the search results.
+        """
+        filters = params.filters or []
+        window = timestamp_bounds(filters) if self.enabled else None
+        if window is None or self.settings is None:
+            return []
+        days = self.days(os.path.join(self.settings.location, alias), *window)
+        if not days:
+            return []
+
+        applications = {
+            quote(str(f.value), safe="")
+            for f in filters
+            if str(f.type.value) == "exact"
+            and f.field
+            and str(f.field.value) == "application_name"
+            and f.value is not None
+        }
+        read, output = self.columns(params)
+        row_filters = [
+            ("timestamp", op, datetime.fromtimestamp(bound / 1000, timezone.utc))
+            for op, bound in ((">=", window[0]), ("<=", window[1]))
+            if abs(bound) != float("inf")
+        ]
+        predicate = compile_predicate(filters)
+        sort_by, descending = sorting(params)
+        limit = params.max_results or 500
+        if descending:
+            days.reverse()
+
+        hits: List[Dict[str, Any]] = []
+        for _, directory in days:
+            for name in sorted(os.listdir(directory)):
+                if applications and name.partition("=")[2] not in applications:
+                    continue
+                partition = os.path.join(directory, name)
+                for file in sorted(os.listdir(partition)):
+                    if not file.endswith(".parquet"):
+                        continue
+                    ARCHIVE_FILES_READ.inc()
+                    table = pq.read_table(
+                        os.path.join(partition, file),
+                        columns=sorted(read),
+                        filters=row_filters or None,
+                    )
+                    for row in table.to_pylist():
+                        if predicate(unflatten(row)):
+                            hits.append(
+                                unflatten({c: row[c] for c in output if c in row})
+                            )
+            # The days are read in the sort order, later days can't sort before.
+            if sort_by == "timestamp" and len(hits) >= limit:
+                break
+        return sort_hits(hits, sort_by, descending)[:limit]
+
+
+def merge_hits(
+    documents: List[Dict[str, Any]],
+    archived: List[Dict[str, Any]],
+    params: SearchParams,
+) -> List[Dict[str, Any]]:
+    """Merges the archived entries into the search results, in the sort order."""
+    if not archived:
+        return documents
+    sort_by, descending = sorting(params)
+    return sort_hits(documents + archived, sort_by, descending)[
+        : params.max_results or 500
+    ]
+
+
+archives = ArchiveStore()
+
+
+def archive_aliases(config: AppConfig, index_name: str) -> List[str]:
+    """Returns the aliases (or index prefixes) of all tenants."""
+    return sorted(
+        {index_name}
+        | {tenant.index for tenant in config.authentication.tenants if tenant.index}
+    )
+
+
+def create_archiver() -> Archiver:
+    """Creates the archiver from the environment variables and the config file."""
+    env_vars = load_env_vars()
+    config = ConfigManager.load_config(env_vars.config_file_path)
+    client = create_client(
+        env_vars.hosts,
+        config.elastic,
+        basic_auth=(
+            (env_vars.elastic_username, env_vars.elastic_password)
+            if env_vars.elastic_username and env_vars.elastic_password
+            else None
+        ),
+    )
+    return Archiver(
+        client,
+        config.archive or ArchiveSettings(),
+        archive_aliases(config, env_vars.elastic_index_name),
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m audit_logger.archive",
+        description="Archives old audit log indices to Parquet files.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    archive = commands.add_parser("archive", help="Archive the due indices once.")
+    archive.add_argument(
+        "--dry-run", action="store_true", help="Only list the due indices."
+    )
+    commands.add_parser("run", help="Archive every `archive.interval` seconds.")
+    args = parser.parse_args(argv)
+
+    try:
+        archiver = create_archiver()
+        if args.command == "run":
+            stopped = threading.Event()
+            signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+            signal.signal(signal.SIGINT, lambda *_: stopped.set())
+            archiver.run(stopped)
+            return 0
+        result = archiver.archive(dry_run=args.dry_run)
+    except (ArchiveError, ApiError) as e:
+        logger.error("[Archive] %s", e)
+        return 1
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,427 @@
+import argparse
+import fnmatch
+import json
+import signal
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import ApiError, NotFoundError
+
+from audit_logger.config_manager import ConfigManager
+from audit_logger.custom_logger import get_logger
+from audit_logger.elastic import create_client
+from audit_logger.models import AppConfig, BackupSettings
+from audit_logger.utils import load_env_vars
+
+logger = get_logger("audit_logger")
+
+# The newest successful snapshot, accepted by `restore` and `verify`.
+LATEST = "latest"
+
+
+class BackupError(Exception):
+    """Raised if a snapshot or restore failed or didn't pass the verification."""
+
+
+class SnapshotBackup:
+    """
+    Backs up the audit log indices with the Elasticsearch snapshot API into a
+    filesystem repository. Snapshots are incremental: only the segments which
+    aren't in the repository yet are copied, and every snapshot is a consistent,
+    point-in-time copy of its indices, also while they're written to.
+
+    Args:
+    - client (Elasticsearch): The client.
+    - settings (BackupSettings): The repository, schedule and retention.
+    - indices (List[str]): The index patterns to snapshot.
+    """
+
+    def __init__(
+        self, client: Elasticsearch, settings: BackupSettings, indices: List[str]
+    ) -> None:
+        self.client = client.options(request_timeout=settings.timeout)
+        self.settings = settings
+        self.indices = indices
+
+    def register_repository(self) -> None:
+        """Registers (or updates) the filesystem snapshot repository."""
+        repository_settings: Dict[str, Any] = {
+            "location": self.settings.location,
+            "compress": self.settings.compress,
+        }
+        if self.settings.max_snapshot_bytes_per_sec:
+            repository_settings["max_snapshot_bytes_per_sec"] = (
+                self.settings.max_snapshot_bytes_per_sec
+            )
+        if self.settings.max_restore_bytes_per_sec:
+            repository_settings["max_restore_bytes_per_sec"] = (
+                self.settings.max_restore_bytes_per_sec
+            )
+        # Passed as body, its keyword arguments differ between the client versions.
+        self.client.snapshot.create_repository(
+            name=self.settings.repository,
+            body={"type": "fs", "settings": repository_settings},
+            verify=False,
+        )
+        logger.info(
+            "[Backup] Registered the repository '%s' (%s)",
+            self.settings.repository,
+            self.settings.location,
+        )
+
+    def verify_repository(self) -> List[str]:
+        """
+        Checks that all nodes can write to (and read from) the repository.
+
+        Returns:
+        - List[str]: The names of the nodes which verified the repository.
+        """
+        try:
+            response = self.client.snapshot.verify_repository(
+                name=self.settings.repository
+            )
+        except ApiError as e:
+            raise BackupError(f"Repository verification failed: {e}")
+        return sorted(node["name"] for node in response["nodes"].values())
+
+    def snapshot_name(self, now: Optional[datetime] = None) -> str:
+        now = now or datetime.now(timezone.utc)
+        return f"{self.settings.snapshot_prefix}{now.strftime('%Y.%m.%d-%H%M%S')}"
+
+    def take_snapshot(self, name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Takes a snapshot of the indices and waits for its completion.
+
+        Returns:
+        - Dict[str, Any]: The snapshot info (name, indices, state, shards).
+
+        Raises:
+        - BackupError: If the snapshot failed or isn't complete (with `verify`).
+        """
+        name = name or self.snapshot_name()
+        start = time.perf_counter()
+        response = self.client.snapshot.create(
+            repository=self.settings.repository,
+            snapshot=name,
+            indices=",".join(self.indices),
+            ignore_unavailable=True,
+            include_global_state=False,
+            metadata={"taken_by": "audit_logger"},
+            wait_for_completion=True,
+        )
+        snapshot = response["snapshot"]
+        logger.info(
+            "[Backup] Snapshot '%s' of %d indices: %s in %.1fs",
+            name,
+            len(snapshot.get("indices", [])),
+            snapshot.get("state"),
+            time.perf_counter() - start,
+        )
+        if self.settings.verify:
+            self.verify_repository()
+            self.verify_snapshot(snapshot)
+        return snapshot
+
+    @staticmethod
+    def verify_snapshot(snapshot: Dict[str, Any]) -> None:
+        """
+        Raises:
+        - BackupError: If the snapshot isn't successful, has failed shards or no indices.
+        """
+        name = snapshot.get("snapshot")
+        if snapshot.get("state") != "SUCCESS":
+            raise BackupError(f"Snapshot '{name}' is {snapshot.get('state')}")
+        failed = snapshot.get("shards", {}).get("failed", 0)
+        if failed:
+            raise BackupError(f"Snapshot '{name}' has {failed} failed shard(s)")
+        if not snapshot.get("indices"):
+            raise BackupError(f"Snapshot '{name}' contains no indices")
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """Returns the snapshots taken by the backups, the oldest first."""
+        response = self.client.snapshot.get(
+            repository=self.settings.repository,
+            snapshot=f"{self.settings.snapshot_prefix}*",
+        )
+        return sorted(
+            response["snapshots"], key=lambda s: s.get("start_time_in_millis", 0)
+        )
+
+    def get_snapshot(self, name: str) -> Dict[str, Any]:
+        """
+        Returns a snapshot by name (`latest` for the newest successful one).
+
+        Raises:
+        - BackupError: If the snapshot doesn't exist.
+        """
+        if name == LATEST:
+            successful = [s for s in self.list_snapshots() if s["state"] == "SUCCESS"]
+            if not successful:
+                raise BackupError("No successful snapshot found")
+            return successful[-1]
+        try:
+            response = self.client.snapshot.get(
+                repository=self.settings.repository, snapshot=name
+            )
+        except NotFoundError:
+            raise BackupError(f"Snapshot '{name}' not found")
+        return dict(response["snapshots"][0])
+
+    def expired(
+        self, snapshots: List[Dict[str, Any]], now: Optional[float] = None
+    ) -> List[str]:
+        """
+        Selects the snapshots to delete by the retention policy: successful ones
+        older than `max_age_days` or beyond `max_count`, but never the newest
+        `min_count`; unsuccessful ones once there's a newer successful snapshot.
+
+        Args:
+        - snapshots (List[Dict[str, Any]]): The snapshots, the oldest first.
+        - now (Optional[float]): The current time in seconds since the epoch.
+
+        Returns:
+        - List[str]: The names of the expired snapshots.
+        """
+        retention = self.settings.retention
+        now_ms = (time.time() if now is None else now) * 1000
+        successful = [s for s in snapshots if s["state"] == "SUCCESS"]
+        newest = successful[-1]["start_time_in_millis"] if successful else None
+        expired = []
+        for i, snapshot in enumerate(successful[: -retention.min_count]):
+            newer = len(successful) - i - 1
+            age_days = (now_ms - snapshot["start_time_in_millis"]) / 86400000
+            if (retention.max_count and newer >= retention.max_count) or (
+                retention.max_age_days and age_days > retention.max_age_days
+            ):
+                expired.append(snapshot["snapshot"])
+        expired.extend(
+            snapshot["snapshot"]
+            for snapshot in snapshots
+            if snapshot["state"] not in ("SUCCESS", "IN_PROGRESS")
+            and newest is not None
+            and snapshot["start_time_in_millis"] < newest
+        )
+        return expired
+
+    def prune(self, dry_run: bool = False) -> List[str]:
+        """Deletes the expired snapshots, returns their names."""
+        expired = self.expired(self.list_snapshots())
+        if expired and not dry_run:
+            self.client.snapshot.delete(
+                repository=self.settings.repository, snapshot=",".join(expired)
+            )
+            logger.info(
+                "[Backup] Deleted %d expired snapshot(s): %s",
+                len(expired),
+                ", ".join(expired),
+            )
+        return expired
+
+    def restore(
+        self,
+        name: str,
+        patterns: List[str],
+        rename_suffix: str = "-restored",
+        replicas: Optional[int] = 0,
+    ) -> Dict[str, Any]:
+        """
+        Restores only the indices of a snapshot matching the patterns, e.g. a
+        single rolled over (time partitioned) index. The restored indices are
+        renamed with `rename_suffix` (without their aliases), so they don't
+        collide with the live indices, and restored with `replicas` replicas.
+
+        Args:
+        - name (str): The snapshot (`latest` for the newest successful one).
+        - patterns (List[str]): Index names or wildcard patterns.
+        - rename_suffix (str): Appended to the restored index names (none if empty).
+        - replicas (Optional[int]): Replicas of the restored indices (as snapshotted if None).
+
+        Returns:
+        - Dict[str, Any]: The restored snapshot, indices and shards.
+
+        Raises:
+        - BackupError: If no index of the snapshot matches or the restore failed.
+        """
+        snapshot = self.get_snapshot(name)
+        indices = [
+            index
+            for index in snapshot["indices"]
+            if any(fnmatch.fnmatchcase(index, pattern) for pattern in patterns)
+        ]
+        if not indices:
+            raise BackupError(
+                f"No index of snapshot '{snapshot['snapshot']}' matches "
+                f"{', '.join(patterns)}"
+            )
+        options: Dict[str, Any] = {"include_aliases": not rename_suffix}
+        if rename_suffix:
+            options["rename_pattern"] = "(.+)"
+            options["rename_replacement"] = f"$1{rename_suffix}"
+        if replicas is not None:
+            options["index_settings"] = {"index.number_of_replicas": replicas}
+        start = time.perf_counter()
+        try:
+            response = self.client.snapshot.restore(
+                repository=self.settings.repository,
+                snapshot=snapshot["snapshot"],
+                indices=",".join(indices),
+                include_global_state=False,
+                wait_for_completion=True,
+                **options,
+            )
+        except ApiError as e:
+            raise BackupError(f"Restore of '{snapshot['snapshot']}' failed: {e}")
+        restored = dict(response["snapshot"])
+        if restored.get("shards", {}).get("failed"):
+            raise BackupError(
+                f"Restore of '{snapshot['snapshot']}' has "
+                f"{restored['shards']['failed']} failed shard(s)"
+            )
+        logger.info(
+            "[Backup] Restored %s from '%s' in %.1fs",
+            ", ".join(restored.get("indices", [])),
+            snapshot["snapshot"],
+            time.perf_counter() - start,
+        )
+        return restored
+
+    def backup(self) -> Dict[str, Any]:
+        """Takes (and verifies) a snapshot and prunes the expired ones."""
+        snapshot = self.take_snapshot()
+        pruned = self.prune()
+        return {"snapshot": snapshot, "pruned": pruned}
+
+    def run(self, stopped: threading.Event) -> None:
+        """Backs up every `interval` seconds (the first right away) until stopped."""
+        self.register_repository()
+        while not stopped.is_set():
+            try:
+                self.backup()
+            except Exception as e:
+                logger.error("[Backup] Backup failed: %s", e)
+            stopped.wait(self.settings.interval)
+
+
+def backup_indices(config: AppConfig, index_name: str) -> List[str]:
+    """
+    Returns the index patterns to back up: the configured ones, or the indices
+    (or aliases) of all tenants with their rolled over, cold and aggregate indices.
+    """
+    settings = config.backup or BackupSettings()
+    if settings.indices:
+        return settings.indices
+    indices = {index_name} | {
+        tenant.index for tenant in config.authentication.tenants if tenant.index
+    }
+    return sorted(f"{index}*" for index in indices)
+
+
+def create_backup() -> SnapshotBackup:
+    """Creates the backup from the environment variables and the config file."""
+    env_vars = load_env_vars()
+    config = ConfigManager.load_config(env_vars.config_file_path)
+    client = create_client(
+        env_vars.hosts,
+        config.elastic,
+        basic_auth=(
+            (env_vars.elastic_username, env_vars.elastic_password)
+            if env_vars.elastic_username and env_vars.elastic_password
+            else None
+        ),
+    )
+    return SnapshotBackup(
+        client,
+        config.backup or BackupSettings(),
+        backup_indices(config, env_vars.elastic_index_name),
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m audit_logger.backup",
+        description="Snapshot backups of the audit log indices.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("register", help="Register and verify the repository.")
+    commands.add_parser("snapshot", help="Take a snapshot and prune expired ones.")
+    commands.add_parser("run", help="Take snapshots every `backup.interval` seconds.")
+    commands.add_parser("list", help="List the snapshots.")
+    prune = commands.add_parser("prune", help="Delete the expired snapshots.")
+    prune.add_argument("--dry-run", action="store_true")
+    verify = commands.add_parser("verify", help="Verify the repository and a snapshot.")
+    verify.add_argument("snapshot", nargs="?", default=LATEST)
+    restore = commands.add_parser("restore", help="Restore indices of a snapshot.")
+    restore.add_argument("snapshot", help="The snapshot name or 'latest'.")
+    restore.add_argument(
+        "--indices", nargs="+", required=True, help="Index names or patterns."
+    )
+    restore.add_argument(
+        "--rename-suffix",
+        default="-restored",
+        help="Suffix of the restored indices ('' restores them under their names).",
+    )
+    restore.add_argument(
+        "--replicas",
+        type=int,
+        default=0,
+        help="Replicas of the restored indices (-1 keeps the snapshotted setting).",
+    )
+    args = parser.parse_args(argv)
+
+    backup = create_backup()
+    result: Any
+    try:
+        if args.command == "register":
+            backup.register_repository()
+            result = {"nodes": backup.verify_repository()}
+        elif args.command == "snapshot":
+            backup.register_repository()
+            result = backup.backup()
+        elif args.command == "run":
+            stopped = threading.Event()
+            signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+            signal.signal(signal.SIGINT, lambda *_: stopped.set())
+            backup.run(stopped)
+            return 0
+        elif args.command == "list":
+            result = [
+                {
+                    "snapshot": s["snapshot"],
+                    "state": s["state"],
+                    "start_time": datetime.fromtimestamp(
+                        s["start_time_in_millis"] / 1000, timezone.utc
+                    ).isoformat(),
+                    "indices": s["indices"],
+                }
+                for s in backup.list_snapshots()
+            ]
+        elif args.command == "prune":
+            result = {"pruned": backup.prune(dry_run=args.dry_run)}
+        elif args.command == "verify":
+            snapshot = backup.get_snapshot(args.snapshot)
+            backup.verify_snapshot(snapshot)
+            result = {
+                "nodes": backup.verify_repository(),
+                "snapshot": snapshot["snapshot"],
+                "state": snapshot["state"],
+            }
+        else:
+            result = backup.restore(
+                args.snapshot,
+                args.indices,
+                rename_suffix=args.rename_suffix,
+                replicas=None if args.replicas < 0 else args.replicas,
+            )
+    except (BackupError, ApiError) as e:
+        logger.error("[Backup] %s", e)
+        return 1
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,41 +1,222 @@
+import asyncio
+import hashlib
 import os
-from typing import Optional
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
 
 import yaml
 from pydantic import ValidationError
 
 from audit_logger.custom_logger import get_logger
+from audit_logger.metrics import registry
 from audit_logger.models import AppConfig
 
 logger = get_logger("audit_logger")
 
+CONFIG_RELOADS = registry.counter(
+    "audit_config_reloads_total",
+    "Number of configuration reloads, per result (`success`, `failure`).",
+    ("result",),
+)
+
+# Called with the previous and the new configuration after a reload.
+ConfigListener = Callable[[AppConfig, AppConfig], None]
+
+
+class ConfigSnapshot(NamedTuple):
+    version: int
+    config: AppConfig
+    digest: str
+
 
 class ConfigManager:
-    _config: Optional[AppConfig] = None
+    """
+    Holds the validated configuration as an immutable, versioned snapshot. A reload
+    validates the new configuration first and then swaps the snapshot in with a
+    single assignment, so readers never need a lock and never see a partially
+    applied configuration. An invalid configuration is rejected and the running
+    one is kept.
+    """
+
+    _snapshot: Optional[ConfigSnapshot] = None
+    _listeners: List[ConfigListener] = []
 
     @classmethod
-    def load_config(cls, config_file_path: str) -> AppConfig:
+    def read_config(cls, config_file_path: str) -> Tuple[AppConfig, str]:
         """
-        Load and validate configuration from a YAML file.
+        Reads and validates the configuration file.
+
+        Returns:
+        - Tuple[AppConfig, str]: The configuration and the SHA-256 digest of the file.
+
+        Raises:
+        - FileNotFoundError: If the file doesn't exist.
+        - ValueError: If the file isn't valid YAML or not a valid configuration.
         """
         if not os.path.exists(config_file_path):
-            raise FileNotFoundError("Config file not found: %s", config_file_path)
+            raise FileNotFoundError(f"Config file not found: {config_file_path}")
 
-        with open(config_file_path, "r") as f:
-            raw_config = yaml.safe_load(f)
+        with open(config_file_path, "rb") as f:
+            content = f.read()
 
         try:
-            cls._config = AppConfig(**raw_config)
-            logger.info("App configuration loaded.")
-            return cls._config
+            raw_config = yaml.safe_load(content)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid app configuration YAML: {e}")
+        if not isinstance(raw_config, dict):
+            raise ValueError("Invalid app configuration format: not a mapping")
+        try:
+            config = AppConfig(**raw_config)
         except ValidationError as e:
-            raise ValueError("Invalid app configuration format: %s", e)
+            raise ValueError(f"Invalid app configuration format: {e}")
+        return config, hashlib.sha256(content).hexdigest()
+
+    @classmethod
+    def load_config(cls, config_file_path: str) -> AppConfig:
+        """
+        Load and validate configuration from a YAML file.
+        """
+        config, digest = cls.read_config(config_file_path)
+        cls._snapshot = ConfigSnapshot(
+            (cls._snapshot.version + 1) if cls._snapshot else 1, config, digest
+        )
+        logger.info("App configuration loaded.")
+        return config
+
+    @classmethod
+    def reload(cls, config_file_path: str) -> bool:
+        """
+        Reloads the configuration file and notifies the listeners, if the file
+        changed and is valid. The new snapshot is only swapped in once all
+        listeners applied it; if one raises, the listeners which already applied
+        it are called with the previous configuration again and the reload is
+        rejected. Errors are logged, not raised.
+
+        Returns:
+        - bool: Whether a new configuration was swapped in.
+        """
+        try:
+            config, digest = cls.read_config(config_file_path)
+        except (OSError, ValueError) as e:
+            CONFIG_RELOADS.labels("failure").inc()
+            logger.error("[Config] Reload rejected, keeping the running config: %s", e)
+            return False
+        previous = cls._snapshot
+        if previous and previous.digest == digest:
+            return False
+
+        if previous:
+            applied: List[ConfigListener] = []
+            for listener in list(cls._listeners):
+                try:
+                    listener(previous.config, config)
+                except Exception as e:
+                    # A listener raises before changing anything, so only the
+                    # listeners which already applied it are rolled back.
+                    for applied_listener in reversed(applied):
+                        try:
+                            applied_listener(config, previous.config)
+                        except Exception as rollback_error:
+                            logger.error(
+                                "[Config] Failed to restore the configuration: %s",
+                                rollback_error,
+                            )
+                    CONFIG_RELOADS.labels("failure").inc()
+                    logger.error(
+                        "[Config] Reload rejected, keeping the running config: %s", e
+                    )
+                    return False
+                applied.append(listener)
+
+        snapshot = ConfigSnapshot(
+            (previous.version + 1) if previous else 1, config, digest
+        )
+        cls._snapshot = snapshot
+        CONFIG_RELOADS.labels("success").inc()
+        logger.info("[Config] Reloaded configuration (version %d)", snapshot.version)
+        return True
+
+    @classmethod
+    def subscribe(cls, listener: ConfigListener) -> None:
+        """
+        Registers a listener called with the previous and new config on reloads.
+        A listener which can't apply the new config must raise before changing
+        anything, the reload is then rejected.
+        """
+        cls._listeners.append(listener)
+
+    @classmethod
+    def snapshot(cls) -> Optional[ConfigSnapshot]:
+        """Returns the current snapshot (`None` before the config was loaded)."""
+        return cls._snapshot
 
     @classmethod
     def get_config(cls) -> AppConfig:
         """
         Access the loaded configuration. Ensures configuration is loaded.
         """
-        if cls._config is None:
+        if cls._snapshot is None:
             raise ValueError("Configuration has not been loaded.")
-        return cls._config
+        return cls._snapshot.config
+
+
+def collect_config_version() -> Any:
+    snapshot = ConfigManager.snapshot()
+    yield (
+        "audit_config_version",
+        "gauge",
+        "Version of the applied configuration, incremented by every reload.",
+        (),
+        {(): float(snapshot.version if snapshot else 0)},
+    )
+
+
+registry.register_collector(collect_config_version)
+
+
+class ConfigWatcher:
+    """
+    Polls the modification time and size of the configuration file and reloads it
+    when they change. It runs as a task on the event loop of the worker, so the
+    listeners are notified on the loop, never concurrently with async handlers.
+
+    Args:
+    - config_file_path (str): The configuration file.
+    - interval (float): Seconds between two checks.
+    """
+
+    def __init__(self, config_file_path: str, interval: float = 5.0) -> None:
+        self.config_file_path = config_file_path
+        self.interval = interval
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.config_file_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self.run())
+        logger.info(
+            "[Config] Watching %s every %.1fs", self.config_file_path, self.interval
+        )
+
+    async def run(self) -> None:
+        last = self.stat()
+        while True:
+            await asyncio.sleep(self.interval)
+            current = self.stat()
+            if current != last:
+                last = current
+                ConfigManager.reload(self.config_file_path)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,149 @@
+from typing import Any, Callable, Coroutine, Dict
+
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None  # type: ignore[assignment]
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None  # type: ignore[assignment]
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# Media types (and their aliases) of the supported ingest formats.
+MEDIA_TYPES = {
+    JSON: JSON,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    MSGPACK: MSGPACK,
+    CBOR: CBOR,
+}
+
+
+def media_type(request: Request) -> str:
+    """Returns the canonical media type of the request body (JSON by default)."""
+    content_type = request.headers.get("content-type")
+    if not content_type:
+        return JSON
+    value = content_type.split(";", 1)[0].strip().lower()
+    if value.endswith("+json"):
+        return JSON
+    if value not in MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported Content-Type '{value}'",
+        )
+    return MEDIA_TYPES[value]
+
+
+def decode_binary(media: str, body: bytes) -> Any:
+    """
+    Decodes a MessagePack or CBOR body into Python objects. MessagePack timestamps
+    and CBOR datetimes are decoded to `datetime` instances.
+    """
+    if media == MSGPACK:
+        if msgpack is None:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="MessagePack is not supported (install the 'msgpack' extra)",
+            )
+        try:
+            return msgpack.unpackb(body, raw=False, timestamp=3)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError) as e:
+            raise _decode_error("Invalid MessagePack body", e) from e
+    if cbor2 is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="CBOR is not supported (install the 'cbor' extra)",
+        )
+    try:
+        return cbor2.loads(body)
+    except (ValueError, cbor2.CBORDecodeError) as e:
+        raise _decode_error("Invalid CBOR body", e) from e
+
+
+def _decode_error(message: str, error: Exception) -> RequestValidationError:
+    # Reported like a malformed JSON body.
+    msg = f"{message}: {str(error) or type(error).__name__}"
+    return RequestValidationError(
+        [{"type": "value_error", "loc": ("body",), "msg": msg, "input": None}]
+    )
+
+
+def validated_body(
+    adapter: TypeAdapter,
+) -> Callable[[Request], Coroutine[Any, Any, Any]]:
+    """
+    Returns a dependency validating the request body with `adapter`, for JSON,
+    MessagePack and CBOR bodies. JSON is validated straight from the raw bytes.
+    Validation errors are raised as `RequestValidationError` (with the locations
+    prefixed by `body`), like for regular FastAPI body parameters.
+
+    Args:
+    - adapter (TypeAdapter): The adapter of the body type, e.g. `List[AuditLogEntry]`.
+    """
+
+    async def dependency(request: Request) -> Any:
+        media = media_type(request)
+        body = await request.body()
+        try:
+            if media == JSON:
+                return adapter.validate_json(body)
+            return adapter.validate_python(decode_binary(media, body))
+        except ValidationError as e:
+            raise RequestValidationError(
+                [
+                    {**error, "loc": ("body", *error["loc"])}
+                    for error in e.errors(include_url=False)
+                ],
+                body=body,
+            ) from e
+
+    return dependency
+
+
+REF_TEMPLATE = "#/components/schemas/{model}"
+
+
+def openapi_request_body(adapter: TypeAdapter) -> Dict[str, Any]:
+    """
+    Returns the OpenAPI `requestBody` (for the `openapi_extra` of a route) of an
+    endpoint validating its body with `adapter`, for all ingest formats.
+    """
+    schema = adapter.json_schema(ref_template=REF_TEMPLATE)
+    schema.pop("$defs", None)
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {media: {"schema": schema} for media in (JSON, MSGPACK, CBOR)},
+        }
+    }
+
+
+def add_openapi_schemas(app: FastAPI, *adapters: TypeAdapter) -> None:
+    """
+    Adds the models referenced by the `openapi_request_body` schemas to the
+    OpenAPI components, as these bodies aren't FastAPI body parameters.
+    """
+    generate = app.openapi
+
+    def openapi() -> Dict[str, Any]:
+        if app.openapi_schema:
+            return app.openapi_schema
+        schema = generate()
+        components = schema.setdefault("components", {}).setdefault("schemas", {})
+        for adapter in adapters:
+            definitions = adapter.json_schema(ref_template=REF_TEMPLATE)
+            for name, definition in definitions.get("$defs", {}).items():
+                components.setdefault(name, definition)
+        return schema
+
+    app.openapi = openapi  # type: ignore[method-assign]
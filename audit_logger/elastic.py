@@ -1,15 +1,28 @@
 import traceback
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
+from elastic_transport import NodeConfig, RandomSelector, RoundRobinSelector
 from elasticsearch import Elasticsearch
 from elasticsearch.exceptions import (
     AuthenticationException,
     AuthorizationException,
+    BadRequestError,
     ConnectionError,
     NotFoundError,
     TransportError,
 )
 
 from audit_logger.custom_logger import get_logger
+from audit_logger.mappings import INDEX_MAPPINGS
+
+try:
+    # Only defined if orjson is installed.
+    from elasticsearch.serializer import OrjsonSerializer
+except ImportError:
+    OrjsonSerializer = None  # type: ignore[assignment,misc]
+
+if TYPE_CHECKING:
+    from audit_logger.models.config import ElasticNodeSet, ElasticSettings
 
 logger = get_logger("audit_logger")
 
@@ -67,9 +80,109 @@ class CustomElasticsearch(Elasticsearch):
         except AuthenticationException as e:
             raise ValueError(f"[Elastic] Authentication error: {e}")
 
+    def ensure_index(self, index_name: str, alias: bool = False) -> None:
+        """
+        Creates the index with the mapping of `index_mappings.json`, unless it
+        exists. An alias isn't created, it must exist.
+
+        Raises:
+        - ValueError: If the alias doesn't exist.
+        """
+        if alias:
+            if not self.indices.exists_alias(name=index_name):
+                raise ValueError(f"[Elastic] alias '{index_name}' does not exist")
+            return
+        try:
+            if not self.indices.exists(index=index_name):
+                self.indices.create(index=index_name, mappings=INDEX_MAPPINGS)
+                logger.info("[Elastic] Created the index '%s'", index_name)
+        except BadRequestError as e:
+            # Created concurrently (by another worker).
+            if e.error != "resource_already_exists_exception":
+                raise
+
     def ensure_ready(self, index_name: str) -> None:
         """
         Ensures Elasticsearch service is reachable and the specified index exists.
         """
         self.check_health()
         self.check_index_exists(index_name)
+
+
+def role_filter(roles: Optional[List[str]]) -> Any:
+    """
+    Returns a `sniffed_node_callback` that only keeps the sniffed nodes having
+    one of the given roles (e.g. `ingest` or `data_hot`).
+    """
+
+    def callback(
+        node_info: Dict[str, Any], node_config: NodeConfig
+    ) -> Optional[NodeConfig]:
+        if roles and not set(roles) & set(node_info.get("roles", [])):
+            return None
+        return node_config
+
+    return callback
+
+
+def create_client(
+    hosts: List[str],
+    settings: Optional["ElasticSettings"] = None,
+    node_set: Optional["ElasticNodeSet"] = None,
+    basic_auth: Optional[Tuple[str, str]] = None,
+    **kwargs: Any,
+) -> CustomElasticsearch:
+    """
+    Creates a client balancing the requests across all hosts (or the hosts of
+    the node set), with the pooling, retry, dead node and sniffing settings.
+    The JSON bodies are (de)serialized with orjson, if installed.
+
+    Args:
+    - hosts (List[str]): All configured hosts.
+    - settings (Optional[ElasticSettings]): The client settings.
+    - node_set (Optional[ElasticNodeSet]): A dedicated node set (ingest/search).
+    - basic_auth (Optional[Tuple[str, str]]): Username and password.
+
+    Returns:
+    - CustomElasticsearch
+    """
+    if node_set and node_set.hosts:
+        hosts = node_set.hosts
+    options: Dict[str, Any] = {"basic_auth": basic_auth}
+    if OrjsonSerializer is not None:
+        # Requests and responses (e.g. the search hits) are (de)serialized with orjson.
+        options["serializer"] = OrjsonSerializer()
+    if settings:
+        # A node set with fixed hosts (and no roles to select sniffed nodes by)
+        # is never extended by sniffing. Seed hosts always stay in the pool.
+        sniffing = bool(
+            settings.sniff_on_start
+            or settings.sniff_on_node_failure
+            or settings.sniff_interval
+        ) and not (node_set and node_set.hosts and not node_set.roles)
+        options.update(
+            connections_per_node=settings.connections_per_node,
+            http_compress=settings.http_compress,
+            request_timeout=settings.request_timeout,
+            max_retries=settings.max_retries,
+            retry_on_timeout=settings.retry_on_timeout,
+            node_selector_class=(
+                RandomSelector
+                if str(settings.node_selector.value) == "random"
+                else RoundRobinSelector
+            ),
+            dead_node_backoff_factor=settings.dead_node_backoff_factor,
+            max_dead_node_backoff=settings.max_dead_node_backoff,
+        )
+        if sniffing:
+            options.update(
+                sniff_on_start=settings.sniff_on_start,
+                sniff_on_node_failure=settings.sniff_on_node_failure,
+                sniff_before_requests=bool(settings.sniff_interval),
+                min_delay_between_sniffing=settings.sniff_interval or 10.0,
+                sniff_timeout=settings.sniff_timeout,
+                sniffed_node_callback=role_filter(node_set.roles if node_set else None),
+            )
+    options.update(kwargs)
+    logger.info("[Elastic] Client for %s", ", ".join(hosts))
+    return CustomElasticsearch(hosts=hosts, **options)
@@ -1,162 +1,588 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import timedelta
-from typing import Any, Dict, List, Tuple
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union, cast
 
 from elasticsearch import Elasticsearch
-from elasticsearch_dsl import A, Q, Search
+from elasticsearch_dsl import Search
 from fastapi import HTTPException, status
 
+from audit_logger.admission import admission
 from audit_logger.custom_logger import get_logger
+from audit_logger.metrics import ES_SEARCH_DURATION, ES_SEARCH_TOOK, QUERY_CACHE_LOOKUPS
 from audit_logger.models import (
     AggregationTypeEnum,
-    FieldIdentifierEnum,
     FilterTypeEnum,
     SearchFilterParams,
     SearchParams,
     current_time,
 )
+from audit_logger.predicates import NESTED_FIELDS, RELATIVE_BOUNDS_TTL
+from audit_logger.tracing import SPAN_KIND_CLIENT, tracer
 
 logger = get_logger("audit_logger")
 
 
+# Key path of a value in a compiled search request, e.g. `("query", "range", "timestamp")`.
+KeyPath = Tuple[Union[str, int], ...]
+
+
+def nested_path(field: str) -> Optional[str]:
+    """Returns the path of the `nested` object of a field (`None` if not nested)."""
+    parent = field.split(".")[0]
+    return parent if parent in NESTED_FIELDS else None
+
+
+def nested(clause: Dict[str, Any], field: str) -> Dict[str, Any]:
+    """Wraps the clause on a field of a `nested` object into a `nested` query."""
+    path = nested_path(field)
+    return {"nested": {"path": path, "query": clause}} if path else clause
+
+
+def exists_clause(field: str) -> Dict[str, Any]:
+    if field in NESTED_FIELDS:
+        # A nested object exists if the entry has at least one of them.
+        return {"nested": {"path": field, "query": {"match_all": {}}}}
+    return nested({"exists": {"field": field}}, field)
+
+
+def text_search_clause(query: Any, fields: List[str]) -> Dict[str, Any]:
+    """
+    A `multi_match` per `nested` object (and one over the root level fields),
+    matching if any of them matches. Lenient, so the fields which can't parse the
+    query (e.g. an `ip` field) don't match instead of failing the search.
+    """
+    groups: Dict[Optional[str], List[str]] = {}
+    for field in fields:
+        groups.setdefault(nested_path(field), []).append(field)
+    clauses = [
+        nested(
+            {"multi_match": {"query": query, "fields": names, "lenient": True}},
+            names[0],
+        )
+        for names in groups.values()
+    ]
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"bool": {"should": clauses, "minimum_should_match": 1}}
+
+
+class CompiledQuery:
+    """
+    A compiled ES search request, with the key paths of the relative date ranges
+    (`today`, `this-week`, ...) which are resolved whenever the request is used.
+    """
+
+    __slots__ = ("body", "relative")
+
+    def __init__(
+        self, body: Dict[str, Any], relative: List[Tuple[KeyPath, str]]
+    ) -> None:
+        self.body = body
+        self.relative = relative
+
+    def render(self) -> Dict[str, Any]:
+        """
+        Returns the request body, with the relative date ranges resolved. The body
+        is shared (only the containers of the resolved ranges are copied), so it
+        must not be modified.
+        """
+        body = self.body
+        for path, value in self.relative:
+            body = _replace(body, path, relative_bounds(value))
+        return body
+
+
+# The resolved relative date ranges by value, as `(expires, bounds)`.
+_relative_bounds: Dict[str, Tuple[float, Dict[str, str]]] = {}
+
+
+def relative_bounds(value: str) -> Dict[str, str]:
+    """
+    Returns the `gte`/`lte` bounds of a relative date range (`today`, ...), resolved
+    at most every `RELATIVE_BOUNDS_TTL` seconds.
+    """
+    now = time.monotonic()
+    cached = _relative_bounds.get(value)
+    if cached is None or cached[0] <= now:
+        gte, lte = ElasticSearchQueryBuilder.calculate_date_range(value)
+        cached = _relative_bounds[value] = (
+            now + RELATIVE_BOUNDS_TTL,
+            {"gte": gte, "lte": lte},
+        )
+    return cached[1]
+
+
+def _replace(node: Any, path: KeyPath, value: Any) -> Any:
+    # Copies the containers along `path` only.
+    key, rest = path[0], path[1:]
+    if isinstance(node, list):
+        items = list(node)
+        items[cast(int, key)] = (
+            _replace(node[cast(int, key)], rest, value) if rest else value
+        )
+        return items
+    return {**node, key: _replace(node[key], rest, value) if rest else value}
+
+
+class QueryCache:
+    """
+    A thread-safe LRU cache of the compiled search requests, keyed on the canonical
+    JSON of the search parameters.
+
+    Args:
+    - maxsize (int): The max. number of cached requests (0 disables the cache).
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, CompiledQuery]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CompiledQuery]:
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+        QUERY_CACHE_LOOKUPS.labels("miss" if compiled is None else "hit").inc()
+        return compiled
+
+    def put(self, key: str, compiled: CompiledQuery) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def resize(self, maxsize: int) -> None:
+        """Changes the max. size in place, dropping the least recently used entries."""
+        with self._lock:
+            self.maxsize = maxsize
+            while self._entries and len(self._entries) > max(maxsize, 0):
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 class ElasticSearchQueryBuilder:
     elastic_index_name: str
-    s: Search
+    s: Optional[Search]
+    timings: Dict[str, float]
 
-    def __init__(self, using: Elasticsearch, index: str) -> None:
+    def __init__(
+        self,
+        using: Elasticsearch,
+        index: str,
+        slow_query_threshold_ms: Optional[float] = None,
+        query_cache: Optional[QueryCache] = None,
+        routing: Optional[str] = None,
+    ) -> None:
         self.elastic_index_name = index
-        self.s = Search(using=using, index=index)
+        # The indices of a list (e.g. the cold index) may not exist (yet).
+        self.ignore_unavailable: Optional[bool] = True if "," in index else None
+        self.routing = routing
+        self.using = using
+        # The DSL search object, only created by `build` and the non-raw search path.
+        self.s = None
+        self.slow_query_threshold_ms = slow_query_threshold_ms
+        self.query_cache = query_cache
+        self.timings = {}
 
-    def process_parameters(self, params: SearchParams) -> Dict[str, Any]:
-        # Set the number of documents to be returned.
-        self.s = self.s.extra(from_=0, size=params.max_results, track_total_hits=True)
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Measures the duration (in milliseconds) of a single search phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = (time.perf_counter() - start) * 1000
 
-        # Sort the documents based on the `sort_by` (field) and sort_order (asc/desc).
-        self.s = self.sort_order(params)
+    def compile(self, params: SearchParams) -> Dict[str, Any]:
+        """
+        Compiles the search parameters into the ES search request body, taken from
+        the query cache if the same parameters were compiled before.
 
-        # Select the fields to be returned.
-        if params.fields:
-            self.s = self.select_fields(params)
+        Returns:
+        - Dict[str, Any]: The request body (shared with the cache, don't modify it).
+        """
+        if self.query_cache is None:
+            return self.compile_query(params).render()
+        key = params.model_dump_json(warnings=False)
+        compiled = self.query_cache.get(key)
+        if compiled is None:
+            compiled = self.compile_query(params)
+            self.query_cache.put(key, compiled)
+        return compiled.render()
+
+    def compile_query(self, params: SearchParams) -> CompiledQuery:
+        """Compiles the search parameters into the ES search request in one pass."""
+        body: Dict[str, Any] = {}
+        relative: List[Tuple[KeyPath, str]] = []
 
-        # Process all given filters.
-        if params.filters:
-            self.s = self.process_filters(params.filters)
+        # Process all given filters, combined like `Search.query()` does. The
+        # relative date ranges are resolved by `CompiledQuery.render`.
+        clauses: List[Dict[str, Any]] = []
+        relative_at: List[Tuple[int, KeyPath, str]] = []
+        for f in params.filters or []:
+            clause = self.filter_clause(f)
+            if clause is None:
+                continue
+            if f.type == FilterTypeEnum.RANGE and f.value:
+                field = self.field_name(f)
+                path: KeyPath = ("range", field)
+                if nested_path(field):
+                    path = ("nested", "query") + path
+                relative_at.append((len(clauses), path, str(f.value)))
+            clauses.append(clause)
+        if clauses:
+            prefix: KeyPath = ("query",)
+            if len(clauses) == 1:
+                body["query"] = clauses[0]
+            else:
+                body["query"] = {"bool": {"must": clauses}}
+                prefix = ("query", "bool", "must")
+            for position, path, value in relative_at:
+                index: KeyPath = () if len(clauses) == 1 else (position,)
+                relative.append((prefix + index + path, value))
 
         # Process all given experimental filters.
         if params.filters_exp:
-            self.s = self.process_experimental_filters(params.filters_exp)
+            self.process_experimental_filters(params.filters_exp)
 
         # Process all given aggregations.
         if params.aggs:
-            self.s = self.process_aggregations(params.aggs)
+            body["aggs"] = self.aggregations(params.aggs)
+
+        # Sort the documents based on the `sort_by` (field) and sort_order (asc/desc).
+        body["sort"] = [{_value(params.sort_by): {"order": _value(params.sort_order)}}]
+
+        # Select the fields to be returned.
+        if params.fields:
+            mode = _value(params.fields_mode)
+            body["_source"] = {f"{mode}s": [_value(f) for f in params.fields]}
+
+        # Set the number of documents to be returned.
+        body.update({"from": 0, "size": params.max_results, "track_total_hits": True})
+
+        if params.profile:
+            body["profile"] = True
+
+        return CompiledQuery(body, relative)
+
+    def build(self, params: SearchParams) -> Search:
+        """Compiles the search parameters into the ES search request (DSL object)."""
+        self.s = self.search(self.compile(params))
+        return self.s
+
+    def search(self, request: Dict[str, Any]) -> Search:
+        """Returns the DSL search object of a compiled request."""
+        search = Search(using=self.using, index=self.elastic_index_name)
+        if self.routing:
+            search = search.params(routing=self.routing)
+        if self.ignore_unavailable:
+            search = search.params(ignore_unavailable=True)
+        return search.update_from_dict(copy.deepcopy(request))
+
+    def process_parameters(
+        self, params: SearchParams, raw: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Builds and executes the search and returns its documents, aggregations and
+        total hits (and the profile report with `params.profile`).
+
+        Args:
+        - params (SearchParams): The search parameters.
+        - raw (bool): Take the documents and aggregations straight from the ES
+          response body, instead of wrapping it (and every hit) in DSL objects.
+
+        Returns:
+        - Dict[str, Any]: The JSON compatible search result.
+        """
+        with self.phase("build"):
+            request = self.compile(params)
 
         # Execute the search query.
-        response = self.s.execute()
+        with (
+            self.phase("execute"),
+            tracer.span(
+                "elasticsearch.search",
+                {"db.system": "elasticsearch", "db.name": self.elastic_index_name},
+                kind=SPAN_KIND_CLIENT,
+            ) as span,
+        ):
+            if raw:
+                body = (
+                    self.traced_client()
+                    .search(
+                        index=self.elastic_index_name,
+                        body=dict(request),
+                        routing=self.routing,
+                        ignore_unavailable=self.ignore_unavailable,
+                    )
+                    .body
+                )
+                took = body["took"]
+            else:
+                search = self.search(request)
+                headers = tracer.propagation_headers()
+                if headers:
+                    search = search.using(self.using.options(headers=headers))
+                self.s = search
+                response = search.execute()
+                took = response.took
+            span.set_attribute("elasticsearch.took_ms", took)
+        ES_SEARCH_DURATION.observe(self.timings["execute"] / 1000)
+        admission.observe("search", self.timings["execute"] / 1000)
+        ES_SEARCH_TOOK.observe(took / 1000)
 
-        if not response.success():
+        if raw:
+            shards = body["_shards"]
+            success = shards["total"] == shards["successful"] and not body["timed_out"]
+        else:
+            success = response.success()
+        if not success:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Search failed."
             )
 
+        with self.phase("serialize"):
+            if raw:
+                # In the order of the requested aggregations, like `response.aggs`.
+                result = self.raw_result(body, list(request.get("aggs", {})))
+            else:
+                result = {
+                    "docs": [hit.to_dict() for hit in response.hits],
+                    "aggs": [agg.to_dict() for agg in response.aggs],
+                    "index_size": response.hits.total.value,
+                }
+
+        total_ms = sum(v for k, v in self.timings.items() if "." not in k)
+        is_slow = (
+            self.slow_query_threshold_ms is not None
+            and total_ms >= self.slow_query_threshold_ms
+        )
+        if is_slow or params.profile:
+            query = {k: v for k, v in request.items() if k != "profile"}
+            report = {
+                "query_hash": self.query_hash(query),
+                "took_ms": took,
+                "hits": len(result["docs"]),
+                "total_hits": result["index_size"],
+                "total_ms": round(total_ms, 3),
+                "phases_ms": {k: round(v, 3) for k, v in self.timings.items()},
+            }
+            if is_slow:
+                logger.warning(
+                    "[SlowQuery] %s",
+                    json.dumps(
+                        {**report, "index": self.elastic_index_name, "query": query}
+                    ),
+                )
+            if params.profile:
+                result["profile"] = {
+                    **report,
+                    "es": (body if raw else response.to_dict()).get("profile", {}),
+                }
+
+        return result
+
+    def traced_client(self) -> Elasticsearch:
+        """Returns the client, sending the trace context headers of the current span."""
+        headers = tracer.propagation_headers()
+        return self.using.options(headers=headers) if headers else self.using
+
+    @staticmethod
+    def raw_result(
+        body: Dict[str, Any], agg_names: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Takes the documents, aggregations and total hits from an ES search response body.
+
+        Args:
+        - body (Dict[str, Any]): The search response body.
+        - agg_names (Optional[List[str]]): The order of the aggregations (default:
+          the order of the response).
+
+        Returns:
+        - Dict[str, Any]: The JSON compatible search result.
+        """
+        hits = body["hits"]
+        aggregations = body.get("aggregations", {})
         return {
-            "docs": [hit.to_dict() for hit in response.hits],
-            "aggs": [agg.to_dict() for agg in response.aggs],
-            "index_size": response.hits.total.value,
+            "docs": [hit.get("_source", {}) for hit in hits["hits"]],
+            "aggs": [
+                aggregations[name]
+                for name in (aggregations if agg_names is None else agg_names)
+                if name in aggregations
+            ],
+            "index_size": hits["total"]["value"],
+        }
+
+    def submit_async(
+        self, params: SearchParams, wait_for_completion_timeout: float, keep_alive: str
+    ) -> Dict[str, Any]:
+        """
+        Submits the search as an ES async search (`_async_search`), which keeps
+        running (and its result stored) after the request returned.
+
+        Args:
+        - params (SearchParams): The search parameters (`profile` is ignored).
+        - wait_for_completion_timeout (float): Seconds to wait for the result before
+          returning the ID of the running search.
+        - keep_alive (str): How long ES keeps the search and its result (e.g. `1h`).
+
+        Returns:
+        - Dict[str, Any]: The search ID and status, and the (partial) result.
+        """
+        with self.phase("build"):
+            request = self.compile(params)
+        query = {k: v for k, v in request.items() if k != "profile"}
+        with tracer.span(
+            "elasticsearch.async_search.submit",
+            {"db.system": "elasticsearch", "db.name": self.elastic_index_name},
+            kind=SPAN_KIND_CLIENT,
+        ):
+            body = (
+                self.traced_client()
+                .async_search.submit(
+                    index=self.elastic_index_name,
+                    body=query,
+                    wait_for_completion_timeout=f"{int(wait_for_completion_timeout * 1000)}ms",
+                    keep_alive=keep_alive,
+                    keep_on_completion=True,
+                    routing=self.routing,
+                    ignore_unavailable=self.ignore_unavailable,
+                )
+                .body
+            )
+        return self.async_result(body, list(query.get("aggs", {})))
+
+    def get_async(
+        self, search_id: str, wait_for_completion_timeout: float = 0
+    ) -> Dict[str, Any]:
+        """
+        Returns the status and the (partial) result of an async search.
+
+        Raises:
+        - NotFoundError: If the search doesn't exist (anymore).
+        """
+        with tracer.span(
+            "elasticsearch.async_search.get",
+            {"db.system": "elasticsearch", "db.name": self.elastic_index_name},
+            kind=SPAN_KIND_CLIENT,
+        ):
+            body = (
+                self.traced_client()
+                .async_search.get(
+                    id=search_id,
+                    wait_for_completion_timeout=f"{int(wait_for_completion_timeout * 1000)}ms",
+                )
+                .body
+            )
+        return self.async_result(body)
+
+    def delete_async(self, search_id: str) -> None:
+        """
+        Cancels an async search (if still running) and deletes its result.
+
+        Raises:
+        - NotFoundError: If the search doesn't exist (anymore).
+        """
+        self.traced_client().async_search.delete(id=search_id)
+
+    @classmethod
+    def async_result(
+        cls, body: Dict[str, Any], agg_names: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Takes the status and the (partial) result from an async search response body."""
+        result: Dict[str, Any] = {
+            "id": body.get("id"),
+            "is_running": body.get("is_running", False),
+            "is_partial": body.get("is_partial", False),
+            "expiration_time_in_millis": body.get("expiration_time_in_millis"),
+            "docs": [],
+            "aggs": [],
+            "index_size": 0,
         }
+        response = body.get("response")
+        if response and "hits" in response:
+            result.update(cls.raw_result(response, agg_names))
+        return result
+
+    @staticmethod
+    def query_hash(query: Dict[str, Any]) -> str:
+        """Returns a stable identity hash of the compiled ES query."""
+        canonical = json.dumps(query, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
 
-    def sort_order(self, params: SearchParams) -> Search:
-        """Sort ES documents based on the `sort_by` (field) and sort_order (asc/desc)."""
-        return self.s.sort({params.sort_by: {"order": params.sort_order}})
+    @staticmethod
+    def field_name(f: SearchFilterParams) -> str:
+        return _value(f.field)
 
-    def select_fields(self, params: SearchParams) -> Search:
-        """Select the fields to be returned."""
-        return self.s.source(**{f"{params.fields_mode.value}s": params.fields})
+    def filter_clause(self, f: SearchFilterParams) -> Optional[Dict[str, Any]]:
+        """
+        Compiles a single filter into its ES query clause (`None` if unsupported).
+        The clauses on the fields of the `nested` objects (e.g. `actor.identifier`)
+        are wrapped into `nested` queries, they don't match at the root level.
+        """
+        field = self.field_name(f)
+        if f.type == FilterTypeEnum.RANGE:
+            if f.value:
+                return nested({"range": {field: relative_bounds(str(f.value))}}, field)
+            return nested({"range": {field: {"gte": f.gte, "lte": f.lte}}}, field)
+        if f.type == FilterTypeEnum.EXACT:
+            return nested({"term": {field: f.value}}, field)
+        if f.type == FilterTypeEnum.NESTED and "." in field:
+            parent = field.split(".")[0]
+            return {"nested": {"path": parent, "query": {"match": {field: f.value}}}}
+        if f.type == FilterTypeEnum.TEXT_SEARCH:
+            fields = [_value(name) for name in f.fields] if f.fields else [field]
+            return text_search_clause(f.value, fields)
+        if f.type == FilterTypeEnum.WILDCARD:
+            return nested({"wildcard": {field: f"{f.value}"}}, field)
+        if f.type == FilterTypeEnum.EXISTS:
+            return exists_clause(field)
+        if f.type == FilterTypeEnum.MISSING:
+            return {"bool": {"must_not": [exists_clause(field)]}}
+        return None
 
-    def process_aggregations(self, aggs: Dict[str, Any]) -> Search:
+    def aggregations(self, aggs: Dict[str, Any]) -> Dict[str, Any]:
+        """Compiles the aggregations into the `aggs` of the ES search request."""
+        result: Dict[str, Any] = {}
         for agg_name, values in aggs.items():
             field = values.get("field")
             agg_type = values.get("type")
             if agg_type in (AggregationTypeEnum.TERMS, AggregationTypeEnum.VALUE_COUNT):
                 # Simple bucket aggregation for type `terms` and `value_count`.
-                self.s.aggs.bucket(agg_name, A(agg_type, field=field))
+                result[agg_name] = {_value(agg_type): {"field": field}}
             if agg_type == AggregationTypeEnum.NESTED:
                 # Nested bucket aggregation.
                 for value in values.get("sub_aggregations"):
-                    path = values.get("path")
-                    nested_agg = A(AggregationTypeEnum.NESTED, path=path)
-                    terms_agg = A(
-                        value.get("type"),
-                        field=value.get("field"),
-                        size=value.get("max_result"),
-                    )
-                    if "aggs" not in nested_agg:
-                        nested_agg.aggs = {}
-                    nested_agg.aggs[terms_agg.name] = terms_agg
-
-                    self.s.aggs[nested_agg.name] = nested_agg
-            return self.s
-
-    def process_filters(self, filters: List[SearchFilterParams]) -> Search:
-        for f in filters:
-            if f.type == FilterTypeEnum.RANGE:
-                self.s = self.process_filter_type_range(f)
-            elif f.type == FilterTypeEnum.EXACT:
-                self.s = self.process_filter_type_exact(f)
-            elif f.type == FilterTypeEnum.NESTED and ("." in f.field.value):
-                self.s = self.process_filter_type_nested(f)
-            elif f.type == FilterTypeEnum.TEXT_SEARCH:
-                self.s = self.process_filter_type_text_search(f)
-            elif f.type == FilterTypeEnum.WILDCARD:
-                self.s = self.process_filter_type_wildcard(f)
-            elif f.type == FilterTypeEnum.EXISTS:
-                self.s = self.process_filter_type_exists(f)
-        return self.s
-
-    def process_filter_type_exact(self, f: SearchFilterParams) -> Search:
-        field = (
-            "timestamp" if f.field == FieldIdentifierEnum.TIMESTAMP else f.field.value
-        )
-        return self.s.query("term", **{field: f.value})
-
-    def process_filter_type_nested(self, f: SearchFilterParams) -> Search:
-        parent, field = f.field.value.split(".")
-        return self.s.query(
-            "nested", path=parent, query=Q("match", **{f"{parent}__{field}": f.value})
-        )
-
-    def process_filter_type_range(self, f: SearchFilterParams) -> Search:
-        field = (
-            "timestamp" if f.field == FieldIdentifierEnum.TIMESTAMP else f.field.value
-        )
-        if f.value:
-            gte, lte = self.calculate_date_range(f.value)
-            query_range = {"gte": gte, "lte": lte}
-        else:
-            query_range = {"gte": f.gte, "lte": f.lte}
-
-        return self.s.query("range", **{field: query_range})
-
-    def process_filter_type_text_search(self, f: SearchFilterParams) -> Search:
-        fields = f.fields or [f.field.value]
-        return self.s.query("multi_match", query=f.value, fields=fields)
-
-    def process_filter_type_wildcard(self, f: SearchFilterParams) -> Search:
-        if "." in f.field.value:
-            parent, field = f.field.value.split(".")
-            self.s = self.s.query(
-                "nested",
-                path=parent,
-                query=Q("wildcard", **{f"{parent}__{field}": f"{f.value}"}),
-            )
-        else:
-            self.s = self.s.query("wildcard", **{f.field.value: f.value})
-        return self.s
-
-    def process_filter_type_exists(self, f: SearchFilterParams) -> Search:
-        return self.s.query("exists", field=f.field.value)
+                    sub_type = _value(value.get("type"))
+                    sub_agg = {"field": value.get("field")}
+                    if value.get("max_result") is not None:
+                        sub_agg["size"] = value.get("max_result")
+                    result[AggregationTypeEnum.NESTED.value] = {
+                        "nested": {"path": values.get("path")},
+                        "aggs": {sub_type: {sub_type: sub_agg}},
+                    }
+        return result
 
-    def process_experimental_filters(self, filters: List[Any]) -> Search:
-        print("[process_experimental_filters] filters:", filters)
-        return self.s
+    def process_experimental_filters(self, filters: List[Any]) -> None:
+        logger.debug("[process_experimental_filters] filters: %s", filters)
 
     @staticmethod
     def calculate_date_range(value: str) -> Tuple[str, str]:
@@ -184,3 +610,7 @@ class ElasticSearchQueryBuilder:
             raise ValueError("Unsupported value for date range")
 
         return gte, lte
+
+
+def _value(value: Any) -> Any:
+    return value.value if isinstance(value, Enum) else value
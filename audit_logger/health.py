@@ -0,0 +1,270 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from elasticsearch import Elasticsearch
+
+from audit_logger.custom_logger import get_logger
+from audit_logger.metrics import registry
+
+if TYPE_CHECKING:
+    from audit_logger.models import HealthSettings
+
+logger = get_logger("audit_logger")
+
+CLUSTER_STATUS_RANK = {"red": 0, "yellow": 1, "green": 2}
+WRITE_BLOCKS = ("write", "read_only", "read_only_allow_delete")
+
+
+class HealthMonitor:
+    """
+    Checks whether the instance can serve (and write) audit logs. The checks which
+    need Elasticsearch run in a background thread every `refresh_interval` seconds
+    and their result is cached, so the readiness probes never call Elasticsearch:
+
+    - `elasticsearch`: the ingest (and search) nodes are reachable.
+    - `indices`: the indices (or aliases) of all tenants exist.
+    - `write_blocks`: the existing indices have no write block.
+    - `cluster`: the cluster health is at least `min_cluster_status`.
+    - `bulk_rejections`: the rate of rejected write thread pool tasks.
+
+    The local `buffer` check (bulk requests in flight and queued ingest requests)
+    and the age of the cached state are evaluated per probe.
+    """
+
+    def __init__(self) -> None:
+        self.settings: Optional["HealthSettings"] = None
+        self.clients: Dict[str, Elasticsearch] = {}
+        self.indices: Callable[[], List[str]] = list
+        self.buffer_depth: Callable[[], int] = int
+        self.checks: Dict[str, Dict[str, Any]] = {}
+        self.checked_at: Optional[float] = None
+        self._rejections: Optional[Tuple[float, int]] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def configure(self, settings: "HealthSettings") -> None:
+        """Applies new settings, used by the refresher from its next refresh on."""
+        self.settings = settings
+
+    def start(
+        self,
+        settings: "HealthSettings",
+        clients: Dict[str, Elasticsearch],
+        indices: Callable[[], List[str]],
+        buffer_depth: Callable[[], int],
+    ) -> None:
+        """
+        Starts the refresher thread.
+
+        Args:
+        - settings (HealthSettings): The thresholds and refresh interval.
+        - clients (Dict[str, Elasticsearch]): The clients to check, by name.
+        - indices (Callable[[], List[str]]): Returns the indices (or aliases) written to.
+        - buffer_depth (Callable[[], int]): Returns the number of pending ingest requests.
+        """
+        self.shutdown()
+        self.settings = settings
+        self.clients = clients
+        self.indices = indices
+        self.buffer_depth = buffer_depth
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="health-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("[Health] Failed to refresh the cluster state: %s", e)
+            interval = self.settings.refresh_interval if self.settings else 5.0
+            self._stopped.wait(interval)
+
+    def refresh(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Runs the Elasticsearch checks and caches their result. Without clients
+        (the `sqlite` storage), only the local checks are evaluated.
+        """
+        if self.settings is None:
+            return self.checks
+        if not self.clients:
+            self.checks, self.checked_at = {}, time.monotonic()
+            return self.checks
+        timeout = self.settings.request_timeout
+        clients = {
+            name: client.options(request_timeout=timeout)
+            for name, client in self.clients.items()
+        }
+        checks: Dict[str, Dict[str, Any]] = {}
+        reachable = {
+            name: self.check_reachable(client) for name, client in clients.items()
+        }
+        checks["elasticsearch"] = {
+            "ok": all(ok for ok, _ in reachable.values()),
+            "nodes": {
+                name: error or "reachable" for name, (_, error) in reachable.items()
+            },
+        }
+        # The indices and the cluster are checked through the first (ingest) client.
+        name, client = next(iter(clients.items()))
+        if reachable[name][0]:
+            indices = self.indices()
+            checks["indices"] = self.check_indices(client, indices)
+            checks["write_blocks"] = self.check_write_blocks(client, indices)
+            checks["cluster"] = self.check_cluster(client)
+            checks["bulk_rejections"] = self.check_bulk_rejections(client)
+        else:
+            for check in ("indices", "write_blocks", "cluster", "bulk_rejections"):
+                checks[check] = {"ok": False, "error": "Elasticsearch is not reachable"}
+
+        failed = [name for name, check in checks.items() if not check["ok"]]
+        if failed != [n for n, c in self.checks.items() if not c["ok"]]:
+            if failed:
+                logger.warning(
+                    "[Health] Failing readiness checks: %s", ", ".join(failed)
+                )
+            else:
+                logger.info("[Health] All readiness checks pass")
+        self.checks, self.checked_at = checks, time.monotonic()
+        return checks
+
+    @staticmethod
+    def check_reachable(client: Elasticsearch) -> Tuple[bool, Optional[str]]:
+        try:
+            if client.ping():
+                return True, None
+            return False, "not reachable"
+        except Exception as e:
+            return False, str(e)
+
+    @staticmethod
+    def check_indices(client: Elasticsearch, indices: List[str]) -> Dict[str, Any]:
+        # One by one, a comma-separated list is not found if any index is missing.
+        try:
+            missing = [
+                index for index in indices if not client.indices.exists(index=index)
+            ]
+        except Exception as e:
+            return {"ok": False, "indices": indices, "error": str(e)}
+        result: Dict[str, Any] = {"ok": not missing, "indices": indices}
+        if missing:
+            result["missing"] = missing
+        return result
+
+    @staticmethod
+    def check_write_blocks(client: Elasticsearch, indices: List[str]) -> Dict[str, Any]:
+        try:
+            # Aliases are resolved to their indices, only blocked indices are
+            # returned. The missing indices are reported by `check_indices`.
+            body = client.indices.get_settings(
+                index=",".join(indices),
+                filter_path="*.settings.index.blocks",
+                ignore_unavailable=True,
+                allow_no_indices=True,
+            ).body
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+        blocked = sorted(
+            name
+            for name, index in (body or {}).items()
+            if any(
+                str(value).lower() == "true"
+                for block, value in index["settings"]["index"]["blocks"].items()
+                if block in WRITE_BLOCKS
+            )
+        )
+        result: Dict[str, Any] = {"ok": not blocked}
+        if blocked:
+            result["write_blocked"] = blocked
+        return result
+
+    def check_cluster(self, client: Elasticsearch) -> Dict[str, Any]:
+        try:
+            status = client.cluster.health().body["status"]
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+        minimum = self.settings.min_cluster_status if self.settings else "yellow"
+        return {
+            "ok": CLUSTER_STATUS_RANK.get(status, 0) >= CLUSTER_STATUS_RANK[minimum],
+            "status": status,
+        }
+
+    def check_bulk_rejections(self, client: Elasticsearch) -> Dict[str, Any]:
+        try:
+            body = client.nodes.stats(
+                metric="thread_pool", filter_path="nodes.*.thread_pool.write.rejected"
+            ).body
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+        rejected = sum(
+            node["thread_pool"]["write"]["rejected"]
+            for node in (body or {}).get("nodes", {}).values()
+        )
+        now = time.monotonic()
+        rate = 0.0
+        if self._rejections is not None:
+            since, previous = self._rejections
+            # The counters are reset by node restarts.
+            rate = max(0, rejected - previous) / max(now - since, 1e-3)
+        self._rejections = (now, rejected)
+        limit = self.settings.max_bulk_rejections_per_second if self.settings else 1.0
+        return {"ok": rate <= limit, "rejected": rejected, "per_second": round(rate, 3)}
+
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Returns whether the instance is ready, from the cached checks and the
+        local buffer depth (no Elasticsearch calls).
+        """
+        checks = dict(self.checks)
+        settings = self.settings
+        depth = self.buffer_depth()
+        max_depth = settings.max_buffer_depth if settings else 1000
+        checks["buffer"] = {"ok": depth <= max_depth, "depth": depth}
+        age = None if self.checked_at is None else time.monotonic() - self.checked_at
+        max_age = settings.max_age if settings else 30.0
+        if age is None or age > max_age:
+            checks["state"] = {
+                "ok": False,
+                "error": "Cluster state not checked yet" if age is None else "Stale",
+            }
+        ready = all(check["ok"] for check in checks.values())
+        return ready, {
+            "status": "ready" if ready else "not_ready",
+            "checked_at": (
+                None
+                if age is None
+                else datetime.fromtimestamp(time.time() - age, timezone.utc).isoformat()
+            ),
+            "checks": checks,
+        }
+
+    def collect(self) -> Iterator[Any]:
+        ready, state = self.readiness()
+        yield (
+            "audit_ready",
+            "gauge",
+            "Whether the instance is ready (all readiness checks pass).",
+            (),
+            {(): float(ready)},
+        )
+        yield (
+            "audit_readiness_check",
+            "gauge",
+            "Result of the readiness checks (1 passing, 0 failing).",
+            ("check",),
+            {(name,): float(check["ok"]) for name, check in state["checks"].items()},
+        )
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+health_monitor = HealthMonitor()
+registry.register_collector(health_monitor.collect)
@@ -1,33 +1,71 @@
+import math
+import os
 import traceback
 from contextlib import asynccontextmanager
-from typing import Any, AsyncGenerator, Dict, List, Optional, cast
+from typing import Any, AsyncGenerator, Dict, List, Optional, Set, cast
 
-from fastapi import Body, Depends, FastAPI, HTTPException, status
+from elasticsearch import NotFoundError
+from fastapi import Body, Depends, FastAPI, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import APIKeyHeader
+from pydantic import TypeAdapter
 
-from audit_logger.config_manager import ConfigManager
+from audit_logger.admission import Rejected, admission
+from audit_logger.alerts import alert_engine
+from audit_logger.archive import archives, merge_hits
+from audit_logger.config_manager import ConfigManager, ConfigWatcher
 from audit_logger.custom_logger import get_logger
-from audit_logger.elastic import CustomElasticsearch
-from audit_logger.elastic_filters import ElasticSearchQueryBuilder
+from audit_logger.decoding import (
+    add_openapi_schemas,
+    openapi_request_body,
+    validated_body,
+)
+from audit_logger.elastic import CustomElasticsearch, create_client
+from audit_logger.elastic_filters import QueryCache
 from audit_logger.exceptions import (
     BulkLimitExceededError,
     validation_exception_handler,
     value_error_handler,
 )
+from audit_logger.health import health_monitor
+from audit_logger.metrics import registry
 from audit_logger.middlewares import add_middleware
 from audit_logger.models import (
+    AlertSettings,
+    AppConfig,
+    AsyncSearchResults,
     AuditLogEntry,
+    Authentication,
     BulkAuditLogOptions,
+    ElasticNodeSet,
+    HealthSettings,
     SearchParams,
     SearchResults,
+    SearchSettings,
+    StorageBackendEnum,
+    StorageSettings,
+    TailParams,
+    TailSettings,
+    TimelineResults,
 )
+from audit_logger.policies import ingest_policies
+from audit_logger.redaction import RedactionEngine
+from audit_logger.responses import RawJSONResponse
+from audit_logger.server import worker_count
+from audit_logger.storage import ElasticStorage, SQLiteStorage, StorageBackend
+from audit_logger.tail import TailHub
+from audit_logger.tenants import Tenant, tenants
+from audit_logger.timeline import actor_timeline
+from audit_logger.tracing import tracer
 from audit_logger.utils import (
+    bulk_in_flight,
     find_duplicates,
     generate_audit_log_entries_with_fake_data,
     load_env_vars,
     process_audit_logs,
+    validate_date,
 )
 
 logger = get_logger("audit_logger")
@@ -35,26 +73,282 @@ logger = get_logger("audit_logger")
 
 env_vars = load_env_vars()
 app_config = ConfigManager.load_config(env_vars.config_file_path)
+redactor = RedactionEngine(app_config.redaction)
+tenants.configure(app_config.authentication, env_vars.elastic_index_name)
+search_settings = app_config.search or SearchSettings()
+query_cache = QueryCache(search_settings.query_cache_size)
+tail_settings = app_config.tail or TailSettings()
+tail_hub = TailHub(
+    queue_size=tail_settings.queue_size, max_subscribers=tail_settings.max_subscribers
+)
 
-elastic = CustomElasticsearch(
-    hosts=[f"{env_vars.elastic_url}"],
-    http_auth=(
-        (env_vars.elastic_username, env_vars.elastic_password)
-        if env_vars.elastic_username and env_vars.elastic_password
-        else None
-    ),
+
+def collect_redaction_stats() -> Any:
+    stats = redactor.stats()
+    yield (
+        "audit_redaction_rule_calls_total",
+        "counter",
+        "Number of values processed per redaction rule.",
+        ("rule",),
+        {(rule,): float(value["calls"]) for rule, value in stats.items()},
+    )
+    yield (
+        "audit_redaction_rule_seconds_total",
+        "counter",
+        "Time spent per redaction rule.",
+        ("rule",),
+        {(rule,): value["total_ns"] / 1e9 for rule, value in stats.items()},
+    )
+
+
+registry.register_collector(collect_redaction_stats)
+
+# The settings which are only applied on startup.
+RESTART_REQUIRED = (
+    "elastic",
+    "server",
+    "metrics",
+    "reload",
+    "middlewares.compression",
+    "storage",
 )
 
 
+def setting(config: AppConfig, path: str) -> Any:
+    value: Any = config
+    for name in path.split("."):
+        value = getattr(value, name, None)
+    return value
+
+
+def alert_settings(config: AppConfig) -> Optional[AlertSettings]:
+    """
+    Returns the alert settings to apply, none with multiple workers: the alert
+    windows are counted per worker process (`audit_logger.server` refuses to start).
+    """
+    if config.alerts and config.alerts.enabled and worker_count() > 1:
+        logger.error(
+            "[Alerts] Disabled, the alerts need a single worker (running %d)",
+            worker_count(),
+        )
+        return None
+    return config.alerts
+
+
+def apply_config(previous: AppConfig, config: AppConfig) -> None:
+    """
+    Applies a reloaded configuration (called by `ConfigManager` on the event loop).
+    Everything which can fail (the redaction rules, the tenants and their indices,
+    the alert rules) is built first, so an invalid configuration raises before anything is swapped.
+    Then the module level settings are swapped, the caches, queues and limiters
+    are resized in place, and subsystems whose settings changed are reconfigured.
+
+    Raises:
+    - ValueError: If the configuration can't be applied (nothing was changed).
+    """
+    global app_config, redactor, search_settings, tail_settings
+    new_redactor = (
+        RedactionEngine(config.redaction)
+        if config.redaction != previous.redaction
+        else redactor
+    )
+    tenants.check(config.authentication, env_vars.elastic_index_name)
+    ensure_tenant_indices(config.authentication)
+    alerts_changed = config.alerts != previous.alerts
+    alerts = alert_settings(config) if alerts_changed else None
+    alert_counters = alert_engine.compile(alerts)
+
+    app_config = config
+    redactor = new_redactor
+    tenants.configure(config.authentication, env_vars.elastic_index_name)
+    search_settings = config.search or SearchSettings()
+    query_cache.resize(search_settings.query_cache_size)
+    tail_settings = config.tail or TailSettings()
+    tail_hub.resize(tail_settings.queue_size, tail_settings.max_subscribers)
+    if config.tracing != previous.tracing:
+        tracer.configure(config.tracing)
+    if alerts_changed:
+        alert_engine.configure(alerts, counters=alert_counters)
+    if config.admission != previous.admission:
+        admission.configure(config.admission)
+    if config.ingest_policies != previous.ingest_policies:
+        ingest_policies.configure(config.ingest_policies)
+    if config.archive != previous.archive:
+        archives.configure(config.archive)
+    if config.timeline != previous.timeline:
+        actor_timeline.configure(config.timeline)
+    health_monitor.configure(config.health or HealthSettings())
+    changed = [
+        path
+        for path in RESTART_REQUIRED
+        if setting(config, path) != setting(previous, path)
+    ]
+    if changed:
+        logger.warning(
+            "[Config] Changes of %s are applied on the next restart", ", ".join(changed)
+        )
+
+
+ConfigManager.subscribe(apply_config)
+
+# The Elasticsearch clients are created per worker process in `lifespan`,
+# so importing the app doesn't open any connections. The search client is the
+# ingest client, unless a dedicated search node set is configured.
+elastic: CustomElasticsearch = cast(CustomElasticsearch, None)
+search_elastic: CustomElasticsearch = cast(CustomElasticsearch, None)
+# The entries are stored and searched through the storage backend.
+storage: StorageBackend = cast(StorageBackend, None)
+
+
+def create_elastic_client(
+    node_set: Optional[ElasticNodeSet] = None,
+) -> CustomElasticsearch:
+    return create_client(
+        env_vars.hosts,
+        app_config.elastic,
+        node_set,
+        basic_auth=(
+            (env_vars.elastic_username, env_vars.elastic_password)
+            if env_vars.elastic_username and env_vars.elastic_password
+            else None
+        ),
+    )
+
+
+def written_indices() -> List[str]:
+    """Returns the indices (or aliases) written to, those of all tenants."""
+    return sorted(
+        {env_vars.elastic_index_name}
+        | {tenant.index for tenant in tenants.tenants.values()}
+    )
+
+
+# The tenant indices (or aliases) created or found by this worker.
+ensured_indices: Set[str] = set()
+
+
+def ensure_tenant_indices(authentication: Authentication) -> None:
+    """
+    Creates the indices of the tenants which don't exist yet with the index
+    mapping, and checks that the aliases exist (with the Elasticsearch storage).
+
+    Raises:
+    - ValueError: If the alias of a tenant doesn't exist.
+    """
+    if not isinstance(storage, ElasticStorage):
+        return
+    for settings in authentication.tenants:
+        if settings.index not in ensured_indices:
+            elastic.ensure_index(settings.index, alias=settings.alias)
+            ensured_indices.add(settings.index)
+
+
+def buffer_depth() -> int:
+    """Returns the number of bulk requests in flight and queued ingest requests."""
+    pool = admission.pool("ingest")
+    return bulk_in_flight.count + (pool.queue_depth if pool else 0)
+
+
+def create_storage(settings: StorageSettings) -> StorageBackend:
+    """
+    Creates the configured storage backend. The `sqlite` backend doesn't need
+    Elasticsearch, its client is only created to forward the entries.
+    """
+    global elastic, search_elastic
+    elastic_settings = app_config.elastic
+    if settings.backend == StorageBackendEnum.SQLITE:
+        sqlite = SQLiteStorage(settings)
+        logger.info("Storing the audit logs in %s", settings.path)
+        if settings.forward.enabled:
+            sqlite.start_forwarding(
+                elastic
+                or create_elastic_client(
+                    elastic_settings.ingest if elastic_settings else None
+                ),
+                settings.forward,
+            )
+        return sqlite
+    if elastic is None:
+        elastic = create_elastic_client(
+            elastic_settings.ingest if elastic_settings else None
+        )
+    if search_elastic is None:
+        search_elastic = (
+            create_elastic_client(elastic_settings.search)
+            if elastic_settings and elastic_settings.search
+            else elastic
+        )
+    elastic.ensure_ready(env_vars.elastic_index_name)
+    if search_elastic is not elastic:
+        search_elastic.ensure_ready(env_vars.elastic_index_name)
+    return ElasticStorage(elastic, search_elastic, query_cache)
+
+
 @asynccontextmanager
 async def lifespan(_: Any) -> AsyncGenerator[None, None]:
     """
     An asynchronous context manager for managing the lifecycle of the audit log API.
     """
-    logger.info("Audit log API starting up")
-    elastic.ensure_ready(env_vars.elastic_index_name)
+    global storage
+    logger.info("Audit log API starting up (pid %d)", os.getpid())
+    storage = create_storage(app_config.storage or StorageSettings())
+    ensure_tenant_indices(app_config.authentication)
+    if app_config.metrics and app_config.metrics.enabled:
+        registry.configure_multiprocess(
+            app_config.metrics.multiprocess_dir,
+            app_config.metrics.flush_interval or 5.0,
+        )
+    tracer.configure(app_config.tracing)
+    alert_engine.configure(alert_settings(app_config))
+    admission.configure(app_config.admission)
+    ingest_policies.configure(app_config.ingest_policies)
+    ingest_policies.start(storage)
+    archives.configure(app_config.archive)
+    actor_timeline.configure(app_config.timeline)
+    if isinstance(storage, ElasticStorage):
+        actor_timeline.start(storage.ingest, storage.search_client)
+    health_monitor.start(
+        app_config.health or HealthSettings(),
+        (
+            {}
+            if not isinstance(storage, ElasticStorage)
+            else (
+                {"ingest": elastic, "search": search_elastic}
+                if search_elastic is not elastic
+                else {"ingest": elastic}
+            )
+        ),
+        indices=written_indices,
+        buffer_depth=buffer_depth,
+    )
+    watcher = (
+        ConfigWatcher(env_vars.config_file_path, app_config.reload.interval)
+        if app_config.reload and app_config.reload.enabled
+        else None
+    )
+    if watcher:
+        watcher.start()
     yield
-    logger.info("Audit log API shutting down")
+    if watcher:
+        await watcher.stop()
+    drain_timeout = app_config.server.drain_timeout if app_config.server else 30.0
+    if bulk_in_flight.count:
+        logger.info(
+            "Waiting for %d in-flight bulk request(s) to finish", bulk_in_flight.count
+        )
+    if not await run_in_threadpool(bulk_in_flight.wait_idle, drain_timeout):
+        logger.warning(
+            "%d bulk request(s) still in flight after %.1fs",
+            bulk_in_flight.count,
+            drain_timeout,
+        )
+    health_monitor.shutdown()
+    ingest_policies.shutdown()
+    storage.close()
+    tracer.shutdown()
+    alert_engine.shutdown()
+    registry.shutdown()
+    logger.info("Audit log API shutting down (pid %d)", os.getpid())
 
 
 app = FastAPI(
@@ -80,23 +374,45 @@ def dev_only():
         )
 
 
-async def verify_api_key(api_key: str = Depends(api_key_header)) -> str:
-    if api_key != app_config.authentication.api_key:
+async def verify_api_key(api_key: str = Depends(api_key_header)) -> Tenant:
+    tenant = tenants.lookup(api_key)
+    if tenant is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API-Key"
         )
-    return api_key
+    return tenant
+
+
+def quota_exceeded(e: Rejected) -> HTTPException:
+    return HTTPException(
+        status_code=e.status_code,
+        detail=f"Tenant quota exceeded ({e.reason})",
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+    )
+
+
+# The ingest bodies are decoded and validated by `validated_body`, so they can be
+# sent as JSON, MessagePack or CBOR.
+audit_log_adapter = TypeAdapter(AuditLogEntry)
+audit_logs_adapter = TypeAdapter(List[AuditLogEntry])
+add_openapi_schemas(app, audit_log_adapter, audit_logs_adapter)
 
 
 @app.post(
-    "/create", dependencies=[Depends(verify_api_key)], response_class=JSONResponse
+    "/create",
+    response_class=JSONResponse,
+    openapi_extra=openapi_request_body(audit_log_adapter),
 )
-async def create_audit_log_entry(audit_log: AuditLogEntry = Body(...)) -> Any:
+async def create_audit_log_entry(
+    tenant: Tenant = Depends(verify_api_key),
+    audit_log: AuditLogEntry = Depends(validated_body(audit_log_adapter)),
+) -> Any:
     """
     Receives an audit log entry, validates it, and processes
     it to be stored in Elasticsearch.
 
     Args:
+        tenant (Tenant): The tenant of the API key.
         audit_log AuditLogEntry: The audit log entry to be created.
 
     Returns:
@@ -105,24 +421,38 @@ async def create_audit_log_entry(audit_log: AuditLogEntry = Body(...)) -> Any:
     Raises:
         HTTPException
     """
+    try:
+        tenant.take_documents(1)
+    except Rejected as e:
+        raise quota_exceeded(e) from e
     return await process_audit_logs(
-        elastic,
-        cast(str, env_vars.elastic_index_name),
+        storage,
+        tenant.index,
         audit_log,
+        redactor=redactor,
+        tail=tail_hub,
+        alerts=alert_engine,
+        routing=tenant.routing,
+        policies=ingest_policies,
+        timeline=actor_timeline,
     )
 
 
 @app.post(
-    "/create-bulk", dependencies=[Depends(verify_api_key)], response_class=JSONResponse
+    "/create-bulk",
+    response_class=JSONResponse,
+    openapi_extra=openapi_request_body(audit_logs_adapter),
 )
 async def create_bulk_audit_log_entries(
-    audit_logs: List[AuditLogEntry] = Body(...),
+    tenant: Tenant = Depends(verify_api_key),
+    audit_logs: List[AuditLogEntry] = Depends(validated_body(audit_logs_adapter)),
 ) -> Any:
     """
     Receives one or multiple audit log entries, validates them, and processes
     them to be stored in Elasticsearch.
 
     Args:
+        tenant (Tenant): The tenant of the API key.
         audit_logs List[AuditLogEntry]: The audit log entries to be created.
 
     Returns:
@@ -131,13 +461,23 @@ async def create_bulk_audit_log_entries(
     bulk_limit = 500
     if len(audit_logs) > bulk_limit:
         raise BulkLimitExceededError(limit=bulk_limit)
+    try:
+        tenant.take_documents(len(audit_logs))
+    except Rejected as e:
+        raise quota_exceeded(e) from e
 
     try:
         return await process_audit_logs(
-            elastic,
-            cast(str, env_vars.elastic_index_name),
-            [dict(entry.dict()) for entry in find_duplicates(audit_logs)],
+            storage,
+            tenant.index,
+            [entry.model_dump(mode="json") for entry in find_duplicates(audit_logs)],
             len(audit_logs),
+            redactor=redactor,
+            tail=tail_hub,
+            alerts=alert_engine,
+            routing=tenant.routing,
+            policies=ingest_policies,
+            timeline=actor_timeline,
         )
     except HTTPException as e:
         raise e
@@ -151,11 +491,12 @@ async def create_bulk_audit_log_entries(
 
 @app.post(
     "/create/create-bulk-auto",
-    dependencies=[Depends(dev_only), Depends(verify_api_key)],
+    dependencies=[Depends(dev_only)],
     response_class=JSONResponse,
 )
 async def create_random_audit_log_entries(
     options: BulkAuditLogOptions,
+    tenant: Tenant = Depends(verify_api_key),
 ) -> Any:
     """
     Generates and stores a single random audit log entry.
@@ -163,11 +504,22 @@ async def create_random_audit_log_entries(
     Returns:
         CreateResponse
     """
+    try:
+        tenant.take_documents(cast(int, options.bulk_count))
+    except Rejected as e:
+        raise quota_exceeded(e) from e
+
     try:
         return await process_audit_logs(
-            elastic,
-            cast(str, env_vars.elastic_index_name),
+            storage,
+            tenant.index,
             generate_audit_log_entries_with_fake_data(options),
+            redactor=redactor,
+            tail=tail_hub,
+            alerts=alert_engine,
+            routing=tenant.routing,
+            policies=ingest_policies,
+            timeline=actor_timeline,
         )
     except HTTPException as e:
         raise e
@@ -179,18 +531,38 @@ async def create_random_audit_log_entries(
         ) from e
 
 
-@app.post("/search", dependencies=[Depends(verify_api_key)])
+@app.post(
+    "/search",
+    response_model=SearchResults,
+    response_class=RawJSONResponse,
+)
 def search_audit_log_entries(
+    tenant: Tenant = Depends(verify_api_key),
     params: Optional[SearchParams] = Body(default=None),
-) -> SearchResults:
+    async_search: bool = Query(default=False, alias="async"),
+) -> RawJSONResponse:
     """
     Performs a search query against audit log entries stored in Elasticsearch based on
     a set of search parameters.
 
+    The documents and aggregations are taken from the ES response body as they are
+    and written out directly, without revalidating them against `SearchResults`.
+    With the `sqlite` storage, the search parameters are translated into SQL and
+    the results have the same format.
+    With `archive.enabled`, the archived entries within the `timestamp` range are
+    merged into the documents (not into the aggregations).
+
+    With `?async=true`, the search is submitted as an ES async search. The response
+    (`AsyncSearchResults`) has the search ID, and the results if the search finished
+    within `search.async_wait_for_completion_timeout`, otherwise they are polled
+    with `/search/{search_id}`. Async searches need the `elasticsearch` storage.
+
     Args:
+        tenant (Tenant): The tenant of the API key, whose index is searched.
         params (Optional[SearchParams], optional): The search parameters used to filter
             audit log entries. Defaults to an empty instance of `SearchParams` if not
             provided, resulting in a search that returns all entries.
+        async_search (bool): Submit the search as an async search.
 
     Returns:
         SearchResponse
@@ -199,13 +571,47 @@ def search_audit_log_entries(
         HTTPException
     """
     try:
-        elastic_filters = ElasticSearchQueryBuilder(
-            using=elastic, index=env_vars.elastic_index_name
-        )
-        result = elastic_filters.process_parameters(params or SearchParams())
-        return SearchResults(
-            hits=len(result["docs"]), docs=result["docs"], aggs=result["aggs"]
+        slow_query_threshold_ms = (
+            app_config.search.slow_query_threshold_ms if app_config.search else None
         )
+        # The entries written to the cold index are searched as well.
+        indices = ingest_policies.search_indices(tenant.index)
+        with tenant.search_slot():
+            if async_search:
+                if not isinstance(storage, ElasticStorage):
+                    raise ValueError(
+                        f"async searches aren't supported by the {storage.name} storage"
+                    )
+                return async_search_response(
+                    tenant,
+                    storage.query_builder(
+                        indices, tenant.routing, slow_query_threshold_ms
+                    ).submit_async(
+                        params or SearchParams(),
+                        search_settings.async_wait_for_completion_timeout,
+                        search_settings.async_keep_alive,
+                    ),
+                )
+            params = params or SearchParams()
+            result = storage.search(
+                params,
+                indices,
+                routing=tenant.routing,
+                slow_query_threshold_ms=slow_query_threshold_ms,
+            )
+            docs = merge_hits(
+                result["docs"], archives.search(tenant.index, params), params
+            )
+        content = {
+            "hits": len(docs),
+            "docs": docs,
+            "aggs": result["aggs"],
+        }
+        if "profile" in result:
+            content["profile"] = result["profile"]
+        return RawJSONResponse(content)
+    except Rejected as e:
+        raise quota_exceeded(e) from e
     except ValueError as ve:
         detail_message = f"Invalid parameter value: {ve}"
         raise HTTPException(
@@ -219,6 +625,264 @@ def search_audit_log_entries(
         )
 
 
+def async_search_response(tenant: Tenant, result: Dict[str, Any]) -> RawJSONResponse:
+    """The search ID is signed for the tenant, only the tenant can poll or cancel it."""
+    return RawJSONResponse(
+        {
+            "id": tenant.sign(result["id"]),
+            "is_running": result["is_running"],
+            "is_partial": result["is_partial"],
+            "expiration_time_in_millis": result["expiration_time_in_millis"],
+            "hits": len(result["docs"]),
+            "docs": result["docs"],
+            "aggs": result["aggs"],
+        }
+    )
+
+
+@app.get(
+    "/search/{search_id}",
+    response_model=AsyncSearchResults,
+    response_class=RawJSONResponse,
+)
+def get_async_search(
+    search_id: str,
+    tenant: Tenant = Depends(verify_api_key),
+    wait_for_completion_timeout: float = Query(default=0, ge=0, le=60),
+) -> RawJSONResponse:
+    """
+    Returns the status and the (partial) results of an async search.
+
+    Args:
+        search_id (str): The ID returned by `/search?async=true`.
+        tenant (Tenant): The tenant of the API key, which submitted the search.
+        wait_for_completion_timeout (float): Seconds to wait for the search to finish.
+
+    Returns:
+        AsyncSearchResults
+
+    Raises:
+        HTTPException: 404 if the search doesn't exist, its results expired or it
+            was submitted by another tenant.
+    """
+    elastic_search_id = tenant.unsign(search_id)
+    if not isinstance(storage, ElasticStorage) or elastic_search_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Async search not found"
+        )
+    elastic_filters = storage.query_builder(tenant.index, tenant.routing)
+    try:
+        return async_search_response(
+            tenant,
+            elastic_filters.get_async(elastic_search_id, wait_for_completion_timeout),
+        )
+    except NotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Async search not found"
+        )
+    except Exception as e:
+        logger.error("Error: %s\nFull stack trace:\n%s", e, traceback.format_exc())
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get the async search",
+        )
+
+
+@app.delete("/search/{search_id}")
+def delete_async_search(
+    search_id: str, tenant: Tenant = Depends(verify_api_key)
+) -> Dict[str, str]:
+    """
+    Cancels an async search (if still running) and deletes its results.
+
+    Raises:
+        HTTPException: 404 if the search doesn't exist, its results expired or it
+            was submitted by another tenant.
+    """
+    elastic_search_id = tenant.unsign(search_id)
+    if not isinstance(storage, ElasticStorage) or elastic_search_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Async search not found"
+        )
+    elastic_filters = storage.query_builder(tenant.index, tenant.routing)
+    try:
+        elastic_filters.delete_async(elastic_search_id)
+    except NotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Async search not found"
+        )
+    return {"status": "deleted"}
+
+
+@app.get(
+    "/actors/{actor_id}/timeline",
+    response_model=TimelineResults,
+    response_class=RawJSONResponse,
+)
+def actor_timeline_entries(
+    actor_id: str,
+    tenant: Tenant = Depends(verify_api_key),
+    size: Optional[int] = Query(default=None, ge=1),
+    cursor: Optional[str] = Query(default=None),
+    gte: Optional[str] = Query(default=None),
+    lte: Optional[str] = Query(default=None),
+) -> RawJSONResponse:
+    """
+    Returns the entries of an actor (`actor.identifier`), the newest first, from
+    the actor timeline index. Only the shard holding the actor's entries is
+    searched. The next page is requested with the `next_cursor` of the response.
+
+    Args:
+        actor_id (str): The `actor.identifier`.
+        tenant (Tenant): The tenant of the API key, whose timeline is searched.
+        size (Optional[int]): The number of entries per page (default:
+            `timeline.page_size`, at most `timeline.max_page_size`).
+        cursor (Optional[str]): The `next_cursor` of the previous page.
+        gte (Optional[str]): The oldest `timestamp` (a date or date math, e.g. `now-90d`).
+        lte (Optional[str]): The newest `timestamp` (a date or date math).
+
+    Returns:
+        TimelineResults
+
+    Raises:
+        HTTPException: 404 if the actor timeline is disabled.
+    """
+    settings = actor_timeline.settings
+    if settings is None or not actor_timeline.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The actor timeline is disabled",
+        )
+    size = size or settings.page_size
+    if size > settings.max_page_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"size must be at most {settings.max_page_size}",
+        )
+    for name, value in (("gte", gte), ("lte", lte)):
+        if value is not None and not validate_date(value):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"'{name}' must be a valid date or date math (now-90d)",
+            )
+    try:
+        with tenant.search_slot():
+            return RawJSONResponse(
+                actor_timeline.search(tenant.index, actor_id, size, cursor, gte, lte)
+            )
+    except Rejected as e:
+        raise quota_exceeded(e) from e
+    except ValueError as ve:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid parameter value: {ve}",
+        ) from ve
+    except Exception as e:
+        logger.error("Error: %s\nFull stack trace:\n%s", e, traceback.format_exc())
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to query the actor timeline",
+        )
+
+
+@app.post("/tail", response_class=StreamingResponse)
+async def tail_audit_log_entries(
+    tenant: Tenant = Depends(verify_api_key),
+    params: Optional[TailParams] = Body(default=None),
+) -> StreamingResponse:
+    """
+    Streams the newly indexed audit log entries matching the filters as
+    Server-Sent Events. The entries are matched in-process on the ingest path,
+    without querying Elasticsearch, so the tail is only available with a single worker.
+
+    Args:
+        tenant (Tenant): The tenant of the API key, whose index is tailed.
+        params (Optional[TailParams], optional): The filters the entries must match.
+            Without filters, all entries are streamed.
+
+    Returns:
+        StreamingResponse (`text/event-stream`)
+
+    Raises:
+        HTTPException
+    """
+    if not tail_settings.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="The tail is disabled"
+        )
+    if worker_count() > 1:
+        # The subscribers are tracked per worker process, they would only see
+        # the entries ingested by their own worker.
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The tail is disabled with multiple workers",
+        )
+    try:
+        subscription = tail_hub.subscribe(
+            (params or TailParams()).filters, index=tenant.index
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except OverflowError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e)
+        )
+    return StreamingResponse(
+        tail_hub.stream(subscription, tail_settings.heartbeat_interval),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/redaction/stats", dependencies=[Depends(verify_api_key)])
+async def redaction_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Returns the number of calls and the time spent (in nanoseconds) per redaction rule.
+    """
+    return redactor.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    """
+    Exposes the metrics (of all workers) in the Prometheus text format.
+    """
+    if not (app_config.metrics and app_config.metrics.enabled):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/livez", response_class=JSONResponse)
+async def liveness() -> Dict[str, str]:
+    """
+    Liveness probe: the worker's event loop is responsive. Doesn't depend on
+    Elasticsearch, so an unavailable cluster doesn't get the instance restarted.
+    """
+    return {"status": "alive"}
+
+
+@app.get("/readyz", response_class=JSONResponse)
+async def readiness() -> JSONResponse:
+    """
+    Readiness probe: Elasticsearch is reachable, the indices exist and are
+    writable, the cluster health and the bulk rejection rate are acceptable and
+    the local ingest backlog is bounded. The cluster state is refreshed in the background,
+    so probes never call Elasticsearch.
+
+    Returns:
+        JSONResponse: `200` if ready, otherwise `503`, with the result per check.
+    """
+    ready, state = health_monitor.readiness()
+    return JSONResponse(
+        state,
+        status_code=(
+            status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+    )
+
+
 @app.get("/health", response_class=JSONResponse)
 async def health_check() -> Dict[str, str]:
     """
@@ -0,0 +1,18 @@
+import json
+from pathlib import Path
+from typing import Any, Dict
+
+# The mapping of the audit log indices, also read by the Docker entrypoint
+# (`docker/audit-logger/entrypoint.sh`) which creates the index.
+INDEX_MAPPINGS_FILE = Path(__file__).with_name("index_mappings.json")
+INDEX_MAPPINGS: Dict[str, Any] = json.loads(INDEX_MAPPINGS_FILE.read_text("utf-8"))
+
+
+def field_types(mappings: Dict[str, Any], prefix: str = "") -> Dict[str, str]:
+    """Returns the type of every (dotted) field of a mapping, objects included."""
+    types: Dict[str, str] = {}
+    for name, field in mappings.get("properties", {}).items():
+        path = prefix + name
+        types[path] = field.get("type", "object")
+        types.update(field_types(field, path + "."))
+    return types
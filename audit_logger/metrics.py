@@ -0,0 +1,434 @@
+import glob
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from audit_logger.custom_logger import get_logger
+
+logger = get_logger("audit_logger")
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class _ThreadCells:
+    """
+    A set of per-thread value cells.
+
+    Every thread only ever writes to its own cell, so updates don't need a lock
+    and can't get lost. Readers sum up all cells.
+    """
+
+    __slots__ = ("_size", "_cells")
+
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._cells: Dict[int, List[float]] = {}
+
+    def cell(self) -> List[float]:
+        ident = threading.get_ident()
+        cell = self._cells.get(ident)
+        if cell is None:
+            cell = self._cells[ident] = [0.0] * self._size
+        return cell
+
+    def totals(self) -> List[float]:
+        result = [0.0] * self._size
+        for cell in list(self._cells.values()):
+            for i, value in enumerate(cell):
+                result[i] += value
+        return result
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        """Returns the child metric for the given label values."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            # Children are only created once per label set, so the lock is
+            # never taken on the hot path.
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self) -> Dict[LabelValues, List[float]]:
+        return {key: child.totals() for key, child in list(self._children.items())}
+
+
+class _CounterChild:
+    __slots__ = ("_cells",)
+
+    def __init__(self) -> None:
+        self._cells = _ThreadCells(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._cells.cell()[0] += amount
+
+    def totals(self) -> List[float]:
+        return self._cells.totals()
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().inc(-amount)
+
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_cells")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self._buckets = buckets
+        # One cell per bucket (incl. +Inf), followed by the sum and the count.
+        self._cells = _ThreadCells(len(buckets) + 3)
+
+    def observe(self, value: float) -> None:
+        cell = self._cells.cell()
+        cell[bisect_left(self._buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def totals(self) -> List[float]:
+        return self._cells.totals()
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self) -> "_Timer":
+        """Context manager observing the elapsed time in seconds."""
+        return _Timer(self.labels())
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: _HistogramChild) -> None:
+        self._child = child
+        self._start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self._child.observe(time.perf_counter() - self._start)
+
+
+Collector = Callable[
+    [], Iterable[Tuple[str, str, str, Sequence[str], Dict[LabelValues, float]]]
+]
+
+
+class MetricsRegistry:
+    """
+    Holds all metrics of the process and renders them in the Prometheus text format.
+
+    When a multiprocess directory is configured, every worker writes a snapshot of
+    its metrics into that directory and the rendered output merges the snapshots
+    of all workers, so that any worker can answer a scrape.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+        self._multiprocess_dir: Optional[str] = None
+        self._flush_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def register(self, metric: Any) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Collector) -> None:
+        """
+        Registers a callback returning `(name, type, help, labelnames, {labels: value})`
+        tuples
+        for values that are owned by other components (e.g. the redaction engine).
+        """
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Returns a JSON serializable snapshot of all metrics of this process."""
+        result: Dict[str, Dict[str, Any]] = {}
+        for metric in list(self._metrics.values()):
+            result[metric.name] = {
+                "type": metric.type_name,
+                "help": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(getattr(metric, "buckets", [])),
+                "samples": [
+                    [list(key), values] for key, values in metric.samples().items()
+                ],
+            }
+        for collector in self._collectors:
+            try:
+                collected = list(collector())
+            except Exception as e:
+                logger.error("Metrics collector failed: %s", e)
+                continue
+            for name, type_name, documentation, labelnames, values in collected:
+                result[name] = {
+                    "type": type_name,
+                    "help": documentation,
+                    "labelnames": list(labelnames),
+                    "buckets": [],
+                    "samples": [[list(key), [value]] for key, value in values.items()],
+                }
+        return result
+
+    def configure_multiprocess(
+        self, directory: Optional[str], flush_interval: float = 5.0
+    ) -> None:
+        """
+        Enables the multiprocess mode and starts a background thread that
+        periodically writes the snapshot of this worker into `directory`.
+        """
+        if not directory or self._multiprocess_dir:
+            return
+        os.makedirs(directory, exist_ok=True)
+        self._multiprocess_dir = directory
+        self._stop.clear()
+
+        def flush_loop() -> None:
+            while not self._stop.wait(flush_interval):
+                self.flush()
+
+        self._flush_thread = threading.Thread(
+            target=flush_loop, name="metrics-flush", daemon=True
+        )
+        self._flush_thread.start()
+
+    def shutdown(self) -> None:
+        """Stops the flush thread and writes a final snapshot."""
+        self._stop.set()
+        self.flush()
+
+    def flush(self) -> None:
+        if not self._multiprocess_dir:
+            return
+        path = os.path.join(self._multiprocess_dir, f"metrics_{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"pid": os.getpid(), "metrics": self.snapshot()}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error("Failed to write metrics snapshot %s: %s", path, e)
+
+    def _snapshots(self) -> List[Dict[str, Any]]:
+        if not self._multiprocess_dir:
+            return [{"pid": os.getpid(), "metrics": self.snapshot()}]
+
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self._multiprocess_dir, "metrics_*.json")):
+            try:
+                with open(path, "r") as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self) -> str:
+        """Renders the (merged) metrics in the Prometheus text exposition format."""
+        merged: Dict[str, Dict[str, Any]] = {}
+        for snapshot in self._snapshots():
+            alive = _pid_alive(snapshot.get("pid", 0))
+            for name, metric in snapshot["metrics"].items():
+                # Gauges describe the current state, so dead workers are ignored.
+                if metric["type"] == "gauge" and not alive:
+                    continue
+                target = merged.setdefault(name, {**metric, "samples": {}})
+                for key, values in metric["samples"]:
+                    current = target["samples"].get(tuple(key))
+                    target["samples"][tuple(key)] = (
+                        [a + b for a, b in zip(current, values)] if current else values
+                    )
+
+        lines: List[str] = []
+        for name, metric in merged.items():
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            labelnames = metric["labelnames"]
+            for key, values in metric["samples"].items():
+                labels = dict(zip(labelnames, key))
+                if metric["type"] == "histogram":
+                    cumulative = 0.0
+                    for bound, count in zip(
+                        metric["buckets"] + [math.inf], values[:-2]
+                    ):
+                        cumulative += count
+                        le = "+Inf" if bound == math.inf else _format_value(bound)
+                        lines.append(
+                            f"{name}_bucket{_format_labels({**labels, 'le': le})} "
+                            f"{_format_value(cumulative)}"
+                        )
+                    lines.append(
+                        f"{name}_sum{_format_labels(labels)} {_format_value(values[-2])}"
+                    )
+                    lines.append(
+                        f"{name}_count{_format_labels(labels)} {_format_value(values[-1])}"
+                    )
+                else:
+                    lines.append(
+                        f"{name}{_format_labels(labels)} {_format_value(values[0])}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    "audit_http_request_duration_seconds",
+    "HTTP request latency per route.",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = registry.gauge(
+    "audit_http_requests_in_flight",
+    "Number of HTTP requests currently being processed.",
+)
+VALIDATION_DURATION = registry.histogram(
+    "audit_validation_duration_seconds",
+    "Time spent validating request models.",
+    ("model",),
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005),
+)
+BULK_OPERATIONS_DURATION = registry.histogram(
+    "audit_bulk_operations_build_seconds",
+    "Time spent preparing (redacting) the bulk operations.",
+)
+ES_BULK_DURATION = registry.histogram(
+    "audit_es_bulk_duration_seconds",
+    "Elasticsearch bulk request round-trip time.",
+)
+ES_BULK_DOCUMENTS = registry.histogram(
+    "audit_es_bulk_documents",
+    "Number of documents per Elasticsearch bulk request.",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+DEDUP_SKIPPED = registry.counter(
+    "audit_dedup_skipped_total",
+    "Number of duplicated audit log entries skipped by the bulk endpoint.",
+)
+ES_SEARCH_TOOK = registry.histogram(
+    "audit_es_search_took_seconds",
+    "Search execution time reported by Elasticsearch (`took`).",
+)
+ES_SEARCH_DURATION = registry.histogram(
+    "audit_es_search_duration_seconds",
+    "Search wall time measured by the API, incl. transport and deserialization.",
+)
+QUERY_CACHE_LOOKUPS = registry.counter(
+    "audit_query_cache_lookups_total",
+    "Lookups of compiled search requests in the query cache (`hit` or `miss`).",
+    ("result",),
+)
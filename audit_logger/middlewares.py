@@ -1,11 +1,439 @@
-from fastapi import FastAPI
+import json
+import math
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, MutableMapping, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 
+from audit_logger.admission import AdmissionController, Rejected, admission
+from audit_logger.config_manager import ConfigManager
 from audit_logger.custom_logger import get_logger
-from audit_logger.models.config import AppConfig
+from audit_logger.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT
+from audit_logger.models.config import AppConfig, CompressionSettings, CORSSettings
+from audit_logger.tracing import NOOP_SPAN, tracer
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment]
 
 logger = get_logger("audit_logger")
 
+# The max. zstd window (memory) a compressed request body may use: 8 MiB, the
+# limit decoders are recommended to support (RFC 8878).
+ZSTD_MAX_WINDOW_SIZE = 1 << 23
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+
+class MetricsMiddleware:
+    """
+    Records the latency per route and the number of in-flight HTTP requests.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response: Dict[str, int] = {"status": 500}
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            await send(message)
+
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels()
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.inc(-1)
+            # Use the route template to keep the label cardinality bounded.
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                response["status"],
+            ).observe(time.perf_counter() - start)
+
+
+class TracingMiddleware:
+    """
+    Starts the root span of every HTTP request, continuing the trace of the
+    caller if the request carries a W3C `traceparent` header.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        span = tracer.start_trace(
+            f"{scope['method']} {scope['path']}",
+            traceparent,
+            {"http.method": scope["method"], "http.target": scope["path"]},
+        )
+        if span is NOOP_SPAN:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+            await send(message)
+
+        with span:
+            await self.app(scope, receive, send_wrapper)
+            route = scope.get("route")
+            if route is not None:
+                # Name the span after the route template, like OpenTelemetry does.
+                span.name = f"{scope['method']} {route.path}"
+                span.set_attribute("http.route", route.path)
+
+
+class _Decompressor:
+    """
+    Incremental decoder of a gzip (or zlib deflate) or zstd stream, producing at
+    most `limit` + 1 bytes, so a decompression bomb is rejected before it's
+    inflated. The zstd decoder can't bound its output per input chunk: the
+    compressed body (at most the zstd bound of `limit`) is collected and
+    decoded through a bounded `stream_reader` once it's complete.
+    """
+
+    def __init__(self, encoding: str) -> None:
+        self._zstd = encoding == "zstd"
+        self._input = bytearray()
+        if not self._zstd:
+            # 32 + MAX_WBITS detects the gzip and zlib headers automatically.
+            self._obj = zlib.decompressobj(32 + zlib.MAX_WBITS)
+
+    def decompress(self, data: bytes, limit: int) -> bytes:
+        """Decompresses `data`, the zstd output is only returned by `flush`."""
+        if self._zstd:
+            self._input += data
+            if len(self._input) > zstd_bound(limit):
+                # More than the compressed size of `limit` bytes of any content.
+                raise OverflowError("Request body too large")
+            return b""
+        return self._obj.decompress(data, limit + 1)
+
+    def flush(self, limit: int) -> bytes:
+        """Decompresses the rest of the stream, at most `limit` + 1 bytes."""
+        if self._zstd:
+            reader = zstandard.ZstdDecompressor(
+                max_window_size=ZSTD_MAX_WINDOW_SIZE
+            ).stream_reader(bytes(self._input), read_across_frames=True)
+            output = bytearray()
+            while len(output) <= limit:
+                chunk = reader.read(limit + 1 - len(output))
+                if not chunk:
+                    break
+                output += chunk
+            return bytes(output)
+        if self._obj.unconsumed_tail:
+            return self._obj.decompress(self._obj.unconsumed_tail, limit + 1)
+        return self._obj.flush()
+
+
+def zstd_bound(size: int) -> int:
+    """The max. compressed size of `size` bytes (`ZSTD_COMPRESSBOUND`)."""
+    return size + (size >> 8) + 512
+
+
+def supported_encodings() -> List[str]:
+    return ["zstd", "gzip", "deflate"] if zstandard else ["gzip", "deflate"]
+
+
+async def _send_error(
+    send: Send,
+    status_code: int,
+    detail: str,
+    headers: Optional[List[Tuple[bytes, bytes]]] = None,
+) -> None:
+    body = json.dumps({"detail": detail}, separators=(",", ":")).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                *(headers or []),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class DecompressionMiddleware:
+    """
+    Decodes gzip/zstd compressed request bodies of the ingest endpoints. gzip
+    bodies are decoded chunk by chunk, while they're received, zstd bodies once
+    they're complete (the compressed body is buffered, up to its max. size).
+    Oversized (decompressed) bodies are rejected before they're inflated.
+    """
+
+    def __init__(self, app: ASGIApp, settings: CompressionSettings) -> None:
+        self.app = app
+        self.paths = set(settings.request_paths)
+        self.max_size = settings.max_request_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = None
+        headers = []
+        for name, value in scope["headers"]:
+            if name == b"content-encoding":
+                encoding = value.decode("latin-1").strip().lower()
+            elif name != b"content-length":
+                headers.append((name, value))
+        if encoding in (None, "identity"):
+            await self.app(scope, receive, send)
+            return
+        if encoding not in supported_encodings():
+            await _send_error(send, 415, f"Unsupported Content-Encoding '{encoding}'")
+            return
+
+        decompressor = _Decompressor(encoding)
+        received = 0
+
+        # Raised as HTTPException, so FastAPI responds with the status code
+        # instead of a generic body parsing error.
+        async def receive_wrapper() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            try:
+                body = decompressor.decompress(
+                    message.get("body", b""), self.max_size - received
+                )
+                if not message.get("more_body", False) and len(body) <= (
+                    self.max_size - received
+                ):
+                    body += decompressor.flush(self.max_size - received - len(body))
+            except OverflowError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=str(e),
+                ) from e
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid {encoding} request body: {e}",
+                ) from e
+            received += len(body)
+            if received > self.max_size:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="Request body too large",
+                )
+            return {**message, "body": body}
+
+        await self.app(dict(scope, headers=headers), receive_wrapper, send)
+
+
+class CompressionMiddleware:
+    """
+    Compresses the responses of the configured endpoints with zstd or gzip,
+    negotiated via `Accept-Encoding`. Streaming responses are compressed chunk
+    by chunk; small responses are sent uncompressed.
+    """
+
+    def __init__(self, app: ASGIApp, settings: CompressionSettings) -> None:
+        self.app = app
+        self.paths = set(settings.response_paths)
+        self.minimum_size = settings.minimum_size
+        self.gzip_level = settings.gzip_level
+        self.zstd_level = settings.zstd_level
+
+    def negotiate(self, scope: Scope) -> Optional[str]:
+        accepted = set()
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                for part in value.decode("latin-1").split(","):
+                    coding, _, params = part.strip().lower().partition(";")
+                    if params.replace(" ", "") not in ("q=0", "q=0.0"):
+                        accepted.add(coding.strip())
+        if zstandard and "zstd" in accepted:
+            return "zstd"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def compressor(self, encoding: str) -> Any:
+        if encoding == "zstd":
+            return zstandard.ZstdCompressor(level=self.zstd_level).compressobj()
+        return zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        encoding = self.negotiate(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        compressor: Any = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = [
+                    (k, v)
+                    for k, v in start_message.get("headers", [])
+                    if k.lower() != b"content-length"
+                ]
+                already_encoded = any(
+                    k.lower() == b"content-encoding" for k, _ in headers
+                )
+                if already_encoded or (not more_body and len(body) < self.minimum_size):
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+
+                compressor = self.compressor(encoding)
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+                headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body:
+                    data = compressor.compress(body) + compressor.flush()
+                    headers.append(
+                        (b"content-length", str(len(data)).encode("latin-1"))
+                    )
+                    await send({**start_message, "headers": headers})
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                await send({**start_message, "headers": headers})
+
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.flush()
+            await send(
+                {"type": "http.response.body", "body": data, "more_body": more_body}
+            )
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def admission_pool_name(path: str) -> Optional[str]:
+    """Returns the admission pool of a request path (`ingest`, `search` or `None`)."""
+    if path == "/create" or path.startswith(("/create/", "/create-")):
+        return "ingest"
+    if path == "/search" or path.startswith("/search/"):
+        return "search"
+    return None
+
+
+class AdmissionMiddleware:
+    """
+    Admits the ingest and search requests through the admission control: requests
+    over the rate of their API key get a `429`, requests which can't get a
+    concurrency slot in time a `503`, both with a `Retry-After` header.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController) -> None:
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.controller.enabled:
+            await self.app(scope, receive, send)
+            return
+        name = admission_pool_name(scope["path"])
+        pool = self.controller.pool(name) if name else None
+        if pool is None:
+            await self.app(scope, receive, send)
+            return
+
+        api_key = ""
+        for header, value in scope["headers"]:
+            if header == b"x-api-key":
+                api_key = value.decode("latin-1")
+                break
+        try:
+            pool.check_rate(api_key)
+            await pool.acquire(self.controller.retry_after)
+        except Rejected as e:
+            retry_after = str(max(1, math.ceil(e.retry_after))).encode("latin-1")
+            detail = (
+                "Rate limit exceeded"
+                if e.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+                else "Service overloaded"
+            )
+            await _send_error(
+                send, e.status_code, detail, [(b"retry-after", retry_after)]
+            )
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            pool.release()
+
+
+class ReloadableCORSMiddleware:
+    """
+    The CORS middleware of the current config snapshot: it's rebuilt whenever a new
+    config version is swapped in, so changed CORS rules apply without a restart.
+    """
+
+    def __init__(self, app: ASGIApp, config: AppConfig) -> None:
+        self.app = app
+        snapshot = ConfigManager.snapshot()
+        self.version = snapshot.version if snapshot else 0
+        self.cors = self.build(config)
+
+    def build(self, config: AppConfig) -> ASGIApp:
+        cors = config.middlewares.cors if config.middlewares else CORSSettings()
+        return CORSMiddleware(
+            self.app,
+            allow_origins=cors.allow_origins or (),
+            allow_credentials=bool(cors.allow_credentials),
+            allow_methods=cors.allow_methods or ("GET",),
+            allow_headers=cors.allow_headers or (),
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        snapshot = ConfigManager.snapshot()
+        if snapshot is not None and snapshot.version != self.version:
+            self.cors = self.build(snapshot.config)
+            self.version = snapshot.version
+        await self.cors(scope, receive, send)
+
 
 def add_middleware(app: FastAPI, config: AppConfig) -> None:
     """
@@ -14,10 +442,14 @@ def add_middleware(app: FastAPI, config: AppConfig) -> None:
     Args:
     - app: The FastAPI application instance to which the middleware will be added.
     """
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=config.middlewares.cors.allow_origins,
-        allow_credentials=config.middlewares.cors.allow_credentials,
-        allow_methods=config.middlewares.cors.allow_methods,
-        allow_headers=config.middlewares.cors.allow_headers,
-    )
+    app.add_middleware(ReloadableCORSMiddleware, config=config)
+    compression = config.middlewares.compression if config.middlewares else None
+    if compression and compression.enabled:
+        app.add_middleware(DecompressionMiddleware, settings=compression)
+        app.add_middleware(CompressionMiddleware, settings=compression)
+    # Always added, as the admission control is configured per worker on startup.
+    app.add_middleware(AdmissionMiddleware, controller=admission)
+    if config.metrics and config.metrics.enabled:
+        app.add_middleware(MetricsMiddleware)
+    # Always added, it checks whether the (reloadable) tracing is enabled per request.
+    app.add_middleware(TracingMiddleware)
@@ -1,13 +1,52 @@
 from .actor_details import ActorDetails
 from .audit_log_entry import AuditLogEntry, current_time
-from .config import APIMiddlewares, AppConfig, CORSSettings
+from .config import (
+    AdmissionPoolSettings,
+    AdmissionSettings,
+    AlertRule,
+    AlertSettings,
+    AlertSinkEnum,
+    APIMiddlewares,
+    AppConfig,
+    ArchiveSettings,
+    Authentication,
+    BackupRetention,
+    BackupSettings,
+    CompressionSettings,
+    CORSSettings,
+    ElasticNodeSet,
+    ElasticSettings,
+    HealthSettings,
+    IngestPolicy,
+    IngestPolicyActionEnum,
+    IngestPolicySettings,
+    MetricsSettings,
+    NodeSelectorEnum,
+    RedactionDetector,
+    RedactionModeEnum,
+    RedactionRule,
+    RedactionSettings,
+    ReloadSettings,
+    SearchSettings,
+    ServerSettings,
+    StorageBackendEnum,
+    StorageForwardSettings,
+    StorageSettings,
+    TailSettings,
+    TenantSettings,
+    TimelineSettings,
+    TracingExporterEnum,
+    TracingSettings,
+)
 from .request import BulkAuditLogOptions
 from .resource import ResourceDetails
 from .response_models import (
     ActorDetails,
+    AsyncSearchResults,
     GenericResponse,
     LogEntryDetails,
     SearchResults,
+    TimelineResults,
 )
 from .search_params import (
     AggregationSetup,
@@ -18,5 +57,10 @@ from .search_params import (
     SearchFilterParams,
     SearchParams,
     SortOrderEnum,
+    TailParams,
 )
 from .server_details import ServerDetails
+
+# The alert rules reference the search filters (see `config`).
+for model in (AlertRule, AlertSettings, AppConfig):
+    model.model_rebuild(_types_namespace={"SearchFilterParams": SearchFilterParams})
@@ -1,14 +1,17 @@
 import hashlib
+import time
 from datetime import datetime
 from typing import Any, Dict, Optional, Union
 from zoneinfo import ZoneInfo
 
-from pydantic import Field, field_validator
+from pydantic import Field, ModelWrapValidatorHandler, field_validator, model_validator
 
+from audit_logger.metrics import VALIDATION_DURATION
 from audit_logger.models.actor_details import ActorDetails
 from audit_logger.models.custom_base import CustomBaseModel
 from audit_logger.models.resource import ResourceDetails
 from audit_logger.models.server_details import ServerDetails
+from audit_logger.tracing import tracer
 
 
 def current_time(timezone: str = "Europe/Amsterdam") -> datetime:
@@ -55,13 +58,27 @@ class AuditLogEntry(CustomBaseModel):
         default={}, description="Optional metadata about the event."
     )
 
+    @model_validator(mode="wrap")
+    @classmethod
+    def observe_validation(
+        cls, data: Any, handler: ModelWrapValidatorHandler["AuditLogEntry"]
+    ) -> "AuditLogEntry":
+        start = time.perf_counter()
+        try:
+            with tracer.span("validate AuditLogEntry"):
+                return handler(data)
+        finally:
+            VALIDATION_DURATION.labels("AuditLogEntry").observe(
+                time.perf_counter() - start
+            )
+
     @field_validator("timestamp")
     def format_timestamp(cls, v: Any) -> Union[datetime, str]:
         if isinstance(v, datetime):
             return v.isoformat()
         return v
 
-    def to_hashable_tuple(self):
+    def to_hashable_tuple(self) -> str:
         # Create a hashable representation based on relevant log entry fields.
         hash_string = "_".join(
             [
@@ -1,6 +1,12 @@
-from typing import List, Optional
+from enum import Enum
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+if TYPE_CHECKING:
+    # Resolved in `audit_logger.models`, the search models import the utils,
+    # which import the models.
+    from audit_logger.models.search_params import SearchFilterParams
 
 
 class CORSSettings(BaseModel):
@@ -22,12 +28,774 @@ class CORSSettings(BaseModel):
     )
 
 
+class CompressionSettings(BaseModel):
+    enabled: bool = Field(
+        default=True, description="Enable the request and response compression."
+    )
+    request_paths: List[str] = Field(
+        default=["/create", "/create-bulk"],
+        description="Endpoints accepting gzip/zstd compressed request bodies.",
+    )
+    response_paths: List[str] = Field(
+        default=["/search"],
+        description="Endpoints compressing their responses (negotiated).",
+    )
+    minimum_size: int = Field(
+        default=1024,
+        ge=0,
+        description="Responses smaller than this (in bytes) are not compressed.",
+    )
+    gzip_level: int = Field(default=5, ge=1, le=9, description="gzip level.")
+    zstd_level: int = Field(default=3, ge=1, le=22, description="zstd level.")
+    max_request_size: int = Field(
+        default=100 * 1024 * 1024,
+        ge=1,
+        description="Max. size of a decompressed request body in bytes.",
+    )
+
+
 class APIMiddlewares(BaseModel):
     cors: CORSSettings = Field(description="CORS middleware settings")
+    compression: Optional[CompressionSettings] = Field(
+        default=CompressionSettings(),
+        description="Request decompression and response compression settings.",
+    )
+
+
+class TenantSettings(BaseModel):
+    name: str = Field(description="Name of the tenant (metrics label).")
+    api_keys: List[str] = Field(default=[], description="API keys of the tenant.")
+    api_key_hashes: List[str] = Field(
+        default=[],
+        description="SHA-256 hex digests of further API keys (not stored in plain).",
+    )
+    index: str = Field(
+        description="Index or alias the entries are written to and searched in, not shared with other tenants.",  # noqa: E501
+    )
+    alias: bool = Field(
+        default=False,
+        description="The `index` is an alias, which must exist (a missing index is created).",  # noqa: E501
+    )
+    routing: Optional[str] = Field(
+        default=None,
+        description="Custom routing key of the indexed entries and the searches (selects the shards, doesn't filter).",  # noqa: E501
+    )
+    docs_per_second: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Max. number of ingested entries per second (per worker).",
+    )
+    burst: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Max. burst of ingested entries (default: `docs_per_second`).",
+    )
+    max_concurrent_searches: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Max. number of concurrent searches (per worker).",
+    )
+
+    @model_validator(mode="after")
+    def check_api_keys(self) -> "TenantSettings":
+        if not self.api_keys and not self.api_key_hashes:
+            raise ValueError(
+                f"Tenant '{self.name}' has no 'api_keys' or 'api_key_hashes'."
+            )
+        if any(len(h) != 64 for h in self.api_key_hashes):
+            raise ValueError("'api_key_hashes' must be SHA-256 hex digests.")
+        return self
 
 
 class Authentication(BaseModel):
-    api_key: str = Field(description="X-API Key")
+    api_key: Optional[str] = Field(
+        default=None, description="X-API Key (of the `default` tenant)"
+    )
+    tenants: List[TenantSettings] = Field(
+        default=[],
+        description="Tenants with their own API keys, index, routing and quotas.",
+    )
+
+    @model_validator(mode="after")
+    def check_tenant_indices(self) -> "Authentication":
+        # The index is the only isolation of the tenants' entries: the routing
+        # key selects the shards, but doesn't filter the entries.
+        names: Dict[str, str] = {}
+        for tenant in self.tenants:
+            other = names.setdefault(tenant.index, tenant.name)
+            if other != tenant.name:
+                raise ValueError(
+                    f"Tenants '{other}' and '{tenant.name}' share the index "
+                    f"'{tenant.index}'."
+                )
+        return self
+
+    @model_validator(mode="after")
+    def check_tenants(self) -> "Authentication":
+        if not self.api_key and not self.tenants:
+            raise ValueError("Configure an 'api_key' or 'tenants'.")
+        names = [tenant.name for tenant in self.tenants]
+        if len(names) != len(set(names)):
+            raise ValueError("The tenant names must be unique.")
+        keys = [key for tenant in self.tenants for key in tenant.api_keys]
+        if self.api_key:
+            keys.append(self.api_key)
+        if len(keys) != len(set(keys)):
+            raise ValueError("An API key must only be used once.")
+        return self
+
+
+class RedactionModeEnum(str, Enum):
+    HASH = "hash"
+    MASK = "mask"
+    DROP = "drop"
+    TRUNCATE = "truncate"
+
+
+class RedactionRule(BaseModel):
+    field: str = Field(
+        description="Dotted path of the field to redact, e.g. 'actor.identifier' or "
+        "'meta.token'. A '*' segment matches every key on that level.",
+    )
+    mode: RedactionModeEnum = Field(description="How the field value is redacted.")
+    length: Optional[int] = Field(
+        default=4,
+        ge=0,
+        description="Characters kept by 'truncate' (prefix) and 'mask' (suffix).",
+    )
+    mask_char: Optional[str] = Field(
+        default="*",
+        min_length=1,
+        max_length=1,
+        description="Character used by the 'mask' mode.",
+    )
+
+
+class RedactionDetector(BaseModel):
+    name: str = Field(description="Name of the detector, used for the timing counters.")
+    pattern: str = Field(description="Regular expression matching the sensitive text.")
+    fields: List[str] = Field(
+        default=["comment"],
+        description="Dotted paths of the free text fields to scan.",
+    )
+    mode: RedactionModeEnum = Field(
+        default=RedactionModeEnum.MASK,
+        description="How matches are redacted ('hash' or 'mask').",
+    )
+
+    @model_validator(mode="after")
+    def check_mode(self) -> "RedactionDetector":
+        if self.mode not in (RedactionModeEnum.HASH, RedactionModeEnum.MASK):
+            raise ValueError("Redaction detectors only support 'hash' or 'mask'.")
+        return self
+
+
+class RedactionSettings(BaseModel):
+    hash_key: Optional[str] = Field(
+        default=None,
+        description="Secret key for the keyed (HMAC-SHA256) hash mode.",
+    )
+    rules: List[RedactionRule] = Field(default=[], description="Field redaction rules.")
+    detectors: List[RedactionDetector] = Field(
+        default=[], description="Regular expression detectors for free text fields."
+    )
+
+    @model_validator(mode="after")
+    def check_hash_key(self) -> "RedactionSettings":
+        modes = [r.mode for r in self.rules] + [d.mode for d in self.detectors]
+        if RedactionModeEnum.HASH in modes and not self.hash_key:
+            raise ValueError("The 'hash' redaction mode requires a 'hash_key'.")
+        return self
+
+
+class MetricsSettings(BaseModel):
+    enabled: Optional[bool] = Field(
+        default=True,
+        description="Expose the Prometheus metrics endpoint `/metrics`.",
+    )
+    multiprocess_dir: Optional[str] = Field(
+        default=None,
+        description="Shared directory for the metric snapshots of multiple workers.",
+    )
+    flush_interval: Optional[float] = Field(
+        default=5.0,
+        gt=0,
+        description="Seconds between two metric snapshots in the multiprocess mode.",
+    )
+
+
+class SearchSettings(BaseModel):
+    slow_query_threshold_ms: Optional[float] = Field(
+        default=1000,
+        ge=0,
+        description="Log searches taking longer than this (in ms). Null disables the log.",
+    )
+    query_cache_size: int = Field(
+        default=1024,
+        ge=0,
+        description="Max. number of compiled search requests cached (0 disables the cache).",
+    )
+    async_wait_for_completion_timeout: float = Field(
+        default=1.0,
+        ge=0,
+        description="Seconds an async search waits for its result before returning its ID.",
+    )
+    async_keep_alive: str = Field(
+        default="1h",
+        pattern=r"^\d+(d|h|m|s|ms)$",
+        description="How long ES keeps the async searches and their results, e.g. `1h`.",
+    )
+
+
+class TracingExporterEnum(str, Enum):
+    FILE = "file"
+    OTLP = "otlp"
+
+
+class TracingSettings(BaseModel):
+    enabled: Optional[bool] = Field(default=False, description="Enable tracing.")
+    sample_ratio: float = Field(
+        default=0.01,
+        ge=0,
+        le=1,
+        description="Share of the traces started by the API that are sampled.",
+    )
+    exporter: TracingExporterEnum = Field(
+        default=TracingExporterEnum.FILE,
+        description="Span exporter, 'file' (OTLP/JSON lines) or 'otlp' (OTLP/HTTP).",
+    )
+    file_path: str = Field(
+        default="spans.jsonl", description="Output file of the 'file' exporter."
+    )
+    otlp_endpoint: str = Field(
+        default="http://127.0.0.1:4318/v1/traces",
+        description="Collector endpoint of the 'otlp' exporter.",
+    )
+    service_name: str = Field(
+        default="audit-logger", description="Service name attached to all spans."
+    )
+
+
+class NodeSelectorEnum(str, Enum):
+    ROUND_ROBIN = "round_robin"
+    RANDOM = "random"
+
+
+class ElasticNodeSet(BaseModel):
+    hosts: List[str] = Field(
+        default=[],
+        description="Hosts of the node set. Defaults to all configured hosts.",
+    )
+    roles: Optional[List[str]] = Field(
+        default=None,
+        description="Only sniffed nodes with one of these roles join the node set.",
+    )
+
+
+class ElasticSettings(BaseModel):
+    connections_per_node: int = Field(
+        default=10,
+        ge=1,
+        description="Size of the (keep-alive) connection pool of every node.",
+    )
+    request_timeout: float = Field(
+        default=10.0, gt=0, description="Timeout of a single request in seconds."
+    )
+    max_retries: int = Field(
+        default=3, ge=0, description="Retries of a request on other nodes."
+    )
+    retry_on_timeout: bool = Field(
+        default=False, description="Retry requests that timed out on another node."
+    )
+    node_selector: NodeSelectorEnum = Field(
+        default=NodeSelectorEnum.ROUND_ROBIN,
+        description="How requests are balanced across the alive nodes.",
+    )
+    dead_node_backoff_factor: float = Field(
+        default=1.0,
+        ge=0,
+        description="Base of the exponential backoff (in seconds) for dead nodes.",
+    )
+    max_dead_node_backoff: float = Field(
+        default=30.0,
+        ge=0,
+        description="Max. seconds a dead node is skipped before it's retried.",
+    )
+    http_compress: bool = Field(
+        default=True, description="gzip compress the request bodies sent to ES."
+    )
+    sniff_on_start: bool = Field(
+        default=False, description="Discover the cluster nodes on startup."
+    )
+    sniff_on_node_failure: bool = Field(
+        default=False, description="Discover the cluster nodes when a node fails."
+    )
+    sniff_interval: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Seconds between two node discoveries. Null disables it.",
+    )
+    sniff_timeout: float = Field(
+        default=0.5, gt=0, description="Timeout of a node discovery in seconds."
+    )
+    ingest: Optional[ElasticNodeSet] = Field(
+        default=None,
+        description="Dedicated nodes for the bulk indexing.",
+    )
+    search: Optional[ElasticNodeSet] = Field(
+        default=None,
+        description="Dedicated nodes for searches and aggregations.",
+    )
+
+
+class ServerSettings(BaseModel):
+    host: str = Field(default="0.0.0.0", description="Bind address of the server.")
+    port: int = Field(default=8000, ge=1, le=65535, description="Bind port.")
+    workers: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Number of worker processes. Defaults to the number of usable CPUs.",
+    )
+    graceful_timeout: float = Field(
+        default=30.0,
+        ge=0,
+        description="Seconds a worker waits for in-flight requests on shutdown.",
+    )
+    drain_timeout: float = Field(
+        default=30.0,
+        ge=0,
+        description="Seconds the shutdown waits for in-flight bulk requests to finish.",
+    )
+
+
+class TailSettings(BaseModel):
+    enabled: bool = Field(default=True, description="Enable the `/tail` endpoint.")
+    max_subscribers: int = Field(
+        default=1000, ge=1, description="Max. number of concurrent subscribers."
+    )
+    queue_size: int = Field(
+        default=1000,
+        ge=1,
+        description="Max. number of queued entries per subscriber, the oldest are dropped.",
+    )
+    heartbeat_interval: float = Field(
+        default=15.0,
+        gt=0,
+        description="Seconds between heartbeats sent to idle subscribers.",
+    )
+
+
+class IngestPolicyActionEnum(str, Enum):
+    STORE = "store"
+    SAMPLE = "sample"
+    COLD = "cold"
+    AGGREGATE = "aggregate"
+
+
+class IngestPolicy(BaseModel):
+    name: str = Field(description="Name of the policy (metrics label).")
+    event_name: Optional[str] = Field(
+        default=None, description="Event name to match (any if not given)."
+    )
+    application_name: Optional[str] = Field(
+        default=None, description="Application name to match (any if not given)."
+    )
+    status: Optional[str] = Field(
+        default=None, description="Status to match (any if not given)."
+    )
+    action: IngestPolicyActionEnum = Field(
+        description="`store`, `sample` (keep `sample_rate`), `cold` (cold index) or `aggregate` (counters only).",  # noqa: E501
+    )
+    sample_rate: float = Field(
+        default=0.1, ge=0, le=1, description="Share of the entries kept by `sample`."
+    )
+    sample_by: List[str] = Field(
+        default=["timestamp", "event_name", "actor.identifier"],
+        min_length=1,
+        description="Fields hashed to decide (deterministically) whether an entry is kept.",
+    )
+
+
+class IngestPolicySettings(BaseModel):
+    enabled: bool = Field(default=True, description="Apply the ingest policies.")
+    rules: List[IngestPolicy] = Field(
+        default=[], description="Policies, the first matching policy applies."
+    )
+    cold_index_suffix: str = Field(
+        default="-cold",
+        min_length=1,
+        description="Suffix of the cold index, appended to the (tenant's) index.",
+    )
+    cold_number_of_replicas: int = Field(
+        default=0, ge=0, description="Replicas of the cold indices created on demand."
+    )
+    cold_refresh_interval: str = Field(
+        default="30s",
+        pattern=r"^(-1|\d+(ms|s|m|h))$",
+        description="Refresh interval of the cold indices created on demand.",
+    )
+    aggregate_index_suffix: str = Field(
+        default="-aggregates",
+        min_length=1,
+        description="Suffix of the index of the `aggregate` counters.",
+    )
+    aggregate_interval: float = Field(
+        default=60.0,
+        gt=0,
+        description="Seconds between two writes of the `aggregate` counters.",
+    )
+    max_lookup_entries: int = Field(
+        default=10000,
+        ge=1,
+        description="Max. number of (event, application, status) keys in the lookup table.",
+    )
+
+
+class HealthSettings(BaseModel):
+    refresh_interval: float = Field(
+        default=5.0,
+        gt=0,
+        description="Seconds between two refreshes of the cluster state checked by `/readyz`.",  # noqa: E501
+    )
+    max_age: float = Field(
+        default=30.0,
+        gt=0,
+        description="Max. age of the cluster state before the instance isn't ready anymore.",
+    )
+    request_timeout: float = Field(
+        default=2.0, gt=0, description="Timeout of the Elasticsearch requests."
+    )
+    min_cluster_status: str = Field(
+        default="yellow",
+        pattern=r"^(green|yellow|red)$",
+        description="Lowest cluster health status the instance is ready with.",
+    )
+    max_bulk_rejections_per_second: float = Field(
+        default=1.0,
+        ge=0,
+        description="Max. rate of rejected write (bulk) thread pool tasks in the cluster.",
+    )
+    max_buffer_depth: int = Field(
+        default=1000,
+        ge=1,
+        description="Max. number of bulk requests in flight and queued ingest requests.",
+    )
+
+
+class ReloadSettings(BaseModel):
+    enabled: bool = Field(
+        default=True,
+        description="Watch the config file and apply its changes without a restart.",
+    )
+    interval: float = Field(
+        default=5.0, gt=0, description="Seconds between two checks of the config file."
+    )
+
+
+class BackupRetention(BaseModel):
+    max_age_days: Optional[int] = Field(
+        default=30,
+        ge=1,
+        description="Snapshots older than this are deleted (none if not given).",
+    )
+    max_count: Optional[int] = Field(
+        default=50,
+        ge=1,
+        description="Max. number of kept snapshots, the oldest are deleted first.",
+    )
+    min_count: int = Field(
+        default=5,
+        ge=1,
+        description="Number of the newest successful snapshots which are always kept.",
+    )
+
+
+class BackupSettings(BaseModel):
+    repository: str = Field(
+        default="audit_logs_backup",
+        description="Name of the snapshot repository.",
+    )
+    location: str = Field(
+        default="/usr/share/elasticsearch/repository",
+        description="Location of the filesystem repository, must be listed in `path.repo`.",
+    )
+    compress: bool = Field(
+        default=True, description="Compress the metadata files of the snapshots."
+    )
+    max_snapshot_bytes_per_sec: Optional[str] = Field(
+        default=None,
+        description="Snapshot throttle per node, e.g. `40mb` (Elasticsearch default if not given).",  # noqa: E501
+    )
+    max_restore_bytes_per_sec: Optional[str] = Field(
+        default=None,
+        description="Restore throttle per node (Elasticsearch default if not given).",
+    )
+    indices: Optional[List[str]] = Field(
+        default=None,
+        description="Index patterns to snapshot (all indices of the tenants if not given).",
+    )
+    snapshot_prefix: str = Field(
+        default="audit-",
+        pattern=r"^[a-z0-9_.-]+$",
+        description="Prefix of the snapshot names, only these snapshots are pruned.",
+    )
+    interval: float = Field(
+        default=86400.0,
+        gt=0,
+        description="Seconds between two snapshots taken by `python -m audit_logger.backup run`.",  # noqa: E501
+    )
+    timeout: float = Field(
+        default=3600.0,
+        gt=0,
+        description="Timeout of the snapshot and restore requests in seconds.",
+    )
+    verify: bool = Field(
+        default=True,
+        description="Verify the repository and the snapshot after every snapshot.",
+    )
+    retention: BackupRetention = Field(
+        default=BackupRetention(), description="Which snapshots are pruned."
+    )
+
+
+class ArchiveSettings(BaseModel):
+    enabled: bool = Field(
+        default=False,
+        description="Search the archives for time ranges which aren't in Elasticsearch anymore.",  # noqa: E501
+    )
+    location: str = Field(
+        default="/archive",
+        description="Directory (local or mounted storage) of the Parquet archives.",
+    )
+    older_than_days: int = Field(
+        default=365,
+        ge=1,
+        description="Rolled over indices whose newest entry is older are archived.",
+    )
+    exclude: List[str] = Field(
+        default=["*-aggregates", "*-actors"],
+        description="Patterns of the indices which are never archived.",
+    )
+    compression: str = Field(
+        default="zstd",
+        pattern=r"^(zstd|snappy|gzip|none)$",
+        description="Compression codec of the Parquet files.",
+    )
+    batch_size: int = Field(
+        default=10000,
+        ge=100,
+        description="Number of entries read per scroll page and written per row group.",
+    )
+    interval: float = Field(
+        default=86400.0,
+        gt=0,
+        description="Seconds between two runs of `python -m audit_logger.archive run`.",
+    )
+
+
+class StorageBackendEnum(str, Enum):
+    ELASTICSEARCH = "elasticsearch"
+    SQLITE = "sqlite"
+
+
+class StorageForwardSettings(BaseModel):
+    enabled: bool = Field(
+        default=False,
+        description="Forward the locally stored entries to Elasticsearch once it's reachable.",  # noqa: E501
+    )
+    interval: float = Field(
+        default=30.0,
+        gt=0,
+        description="Seconds between two checks for Elasticsearch and unforwarded entries.",
+    )
+    batch_size: int = Field(
+        default=500,
+        ge=1,
+        le=10000,
+        description="Number of entries sent per bulk request.",
+    )
+
+
+class StorageSettings(BaseModel):
+    backend: StorageBackendEnum = Field(
+        default=StorageBackendEnum.ELASTICSEARCH,
+        description="Where the audit logs are stored and searched.",
+    )
+    path: str = Field(
+        default="/data/audit_logs.sqlite3",
+        description="Database file of the `sqlite` backend.",
+    )
+    batch_size: int = Field(
+        default=1000,
+        ge=1,
+        description="Max. number of entries inserted per transaction (`sqlite`).",
+    )
+    busy_timeout: float = Field(
+        default=5.0,
+        gt=0,
+        description="Seconds to wait for a lock held by another worker (`sqlite`).",
+    )
+    forward: StorageForwardSettings = Field(
+        default=StorageForwardSettings(),
+        description="Forwarding of the `sqlite` entries to Elasticsearch.",
+    )
+
+
+class TimelineSettings(BaseModel):
+    enabled: bool = Field(
+        default=False,
+        description="Also write the entries to the actor timeline index (`/actors/{id}/timeline`).",  # noqa: E501
+    )
+    index_suffix: str = Field(
+        default="-actors",
+        min_length=1,
+        description="Suffix of the timeline index, appended to the (tenant's) index.",
+    )
+    number_of_shards: int = Field(
+        default=3,
+        ge=1,
+        description="Shards of the timeline indices, an actor's entries are on one of them.",
+    )
+    number_of_replicas: int = Field(
+        default=1, ge=0, description="Replicas of the timeline indices."
+    )
+    refresh_interval: str = Field(
+        default="5s",
+        pattern=r"^(-1|\d+(ms|s|m|h))$",
+        description="Refresh interval of the timeline indices.",
+    )
+    page_size: int = Field(
+        default=100, ge=1, description="Default number of entries per timeline page."
+    )
+    max_page_size: int = Field(
+        default=1000, ge=1, description="Max. number of entries per timeline page."
+    )
+
+
+class AlertSinkEnum(str, Enum):
+    FILE = "file"
+    WEBHOOK = "webhook"
+
+
+class AlertRule(BaseModel):
+    name: str = Field(description="Name of the rule, sent with its alerts.")
+    filters: List["SearchFilterParams"] = Field(
+        default=[],
+        description="Search filters (like the `/search` filters) the counted entries must match.",
+    )
+    group_by: List[str] = Field(
+        default=[],
+        description="Dotted fields the entries are counted by, e.g. `actor.identifier`.",
+    )
+    threshold: int = Field(
+        ge=1,
+        description="Alert once more than `threshold` entries are counted within the window.",
+    )
+    window: float = Field(
+        default=300, gt=0, description="Length of the sliding window in seconds."
+    )
+    cooldown: Optional[float] = Field(
+        default=None,
+        ge=0,
+        description="Seconds before the same key alerts again. Defaults to the window.",
+    )
+
+
+class AlertSettings(BaseModel):
+    enabled: bool = Field(default=False, description="Evaluate the alert rules.")
+    rules: List[AlertRule] = Field(default=[], description="The alert rules.")
+    max_keys: int = Field(
+        default=100000,
+        ge=1,
+        description="Max. number of counted keys per rule, the least recent are evicted.",
+    )
+    sink: AlertSinkEnum = Field(
+        default=AlertSinkEnum.FILE,
+        description="Alert sink, 'file' (JSON lines) or 'webhook' (HTTP POST).",
+    )
+    file_path: str = Field(
+        default="alerts.jsonl", description="Output file of the 'file' sink."
+    )
+    webhook_url: Optional[str] = Field(
+        default=None, description="URL the 'webhook' sink posts the alerts to."
+    )
+    webhook_timeout: float = Field(
+        default=5.0, gt=0, description="Timeout of the webhook requests in seconds."
+    )
+
+    @model_validator(mode="after")
+    def check_sink(self) -> "AlertSettings":
+        if self.sink == AlertSinkEnum.WEBHOOK and not self.webhook_url:
+            raise ValueError("The 'webhook' alert sink requires a 'webhook_url'.")
+        return self
+
+
+class AdmissionPoolSettings(BaseModel):
+    max_concurrency: int = Field(
+        default=64,
+        ge=1,
+        description="Max. number of concurrently processed requests (the adaptive upper bound).",
+    )
+    min_concurrency: int = Field(
+        default=4, ge=1, description="Lower bound of the adaptive concurrency limit."
+    )
+    adaptive: bool = Field(
+        default=True,
+        description="Adapt the concurrency limit to the observed Elasticsearch latency.",
+    )
+    latency_tolerance: float = Field(
+        default=1.5,
+        ge=1,
+        description="Tolerated ES latency increase (vs. the long-term average) before the limit shrinks.",  # noqa
+    )
+    max_queue: int = Field(
+        default=256,
+        ge=0,
+        description="Max. number of requests waiting for a slot, excess requests get a 503.",
+    )
+    max_queue_time: float = Field(
+        default=2.0,
+        gt=0,
+        description="Max. seconds a request waits for a slot before it gets a 503.",
+    )
+    rate: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Requests per second per API key, excess requests get a 429.",
+    )
+    burst: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Token bucket size per API key. Defaults to the rate.",
+    )
+
+    @model_validator(mode="after")
+    def check_concurrency(self) -> "AdmissionPoolSettings":
+        if self.min_concurrency > self.max_concurrency:
+            raise ValueError("'min_concurrency' must not exceed 'max_concurrency'.")
+        return self
+
+
+class AdmissionSettings(BaseModel):
+    enabled: bool = Field(default=False, description="Enable the admission control.")
+    ingest: AdmissionPoolSettings = Field(
+        default=AdmissionPoolSettings(),
+        description="Limits of the ingest endpoints (`/create*`).",
+    )
+    search: AdmissionPoolSettings = Field(
+        default=AdmissionPoolSettings(max_concurrency=16, max_queue=64),
+        description="Limits of the search endpoints (`/search*`).",
+    )
+    retry_after: float = Field(
+        default=1.0,
+        gt=0,
+        description="`Retry-After` seconds of the 503 responses of overloaded pools.",
+    )
+    max_keys: int = Field(
+        default=10000,
+        ge=1,
+        description="Max. number of API keys with a token bucket, the least recent are dropped.",
+    )
 
 
 class AppConfig(BaseModel):
@@ -45,3 +813,67 @@ class AppConfig(BaseModel):
         default=None,
         description="",
     )
+    redaction: Optional[RedactionSettings] = Field(
+        default=None,
+        description="PII redaction applied to audit log entries before indexing.",
+    )
+    metrics: Optional[MetricsSettings] = Field(
+        default=MetricsSettings(),
+        description="Prometheus metrics settings.",
+    )
+    search: Optional[SearchSettings] = Field(
+        default=SearchSettings(),
+        description="Search settings.",
+    )
+    tracing: Optional[TracingSettings] = Field(
+        default=None,
+        description="OpenTelemetry compatible tracing settings.",
+    )
+    elastic: Optional[ElasticSettings] = Field(
+        default=ElasticSettings(),
+        description="Elasticsearch client (connection pool, sniffing) settings.",
+    )
+    server: Optional[ServerSettings] = Field(
+        default=ServerSettings(),
+        description="Production server (`python -m audit_logger.server`) settings.",
+    )
+    tail: Optional[TailSettings] = Field(
+        default=TailSettings(),
+        description="Live tail (`/tail`) settings.",
+    )
+    admission: Optional[AdmissionSettings] = Field(
+        default=None,
+        description="Admission control (concurrency and rate limits) settings.",
+    )
+    alerts: Optional[AlertSettings] = Field(
+        default=None,
+        description="Alert rules evaluated on the ingest path.",
+    )
+    ingest_policies: Optional[IngestPolicySettings] = Field(
+        default=None,
+        description="Sampling, cold index and aggregate-only policies of the ingest.",
+    )
+    health: Optional[HealthSettings] = Field(
+        default=HealthSettings(),
+        description="Readiness (`/readyz`) checks.",
+    )
+    archive: Optional[ArchiveSettings] = Field(
+        default=None,
+        description="Archival of old indices to Parquet files (`python -m audit_logger.archive`).",  # noqa: E501
+    )
+    backup: Optional[BackupSettings] = Field(
+        default=BackupSettings(),
+        description="Snapshot backups (`python -m audit_logger.backup`) settings.",
+    )
+    storage: Optional[StorageSettings] = Field(
+        default=None,
+        description="Storage backend (Elasticsearch or an embedded SQLite database).",
+    )
+    timeline: Optional[TimelineSettings] = Field(
+        default=None,
+        description="Actor timeline index, routed by `actor.identifier`.",
+    )
+    reload: Optional[ReloadSettings] = Field(
+        default=None,
+        description="Hot reload of the config file.",
+    )
@@ -1,6 +1,6 @@
-from typing import List, Optional
+from typing import Any, List, Optional
 
-from pydantic import Field, HttpUrl, field_validator
+from pydantic import Field, field_validator
 
 from audit_logger.models.custom_base import CustomBaseModel
 
@@ -10,11 +10,23 @@ class EnvVars(CustomBaseModel):
     elastic_url: str = Field(...)
     elastic_username: Optional[str] = Field(None)
     elastic_password: Optional[str] = Field(None)
-    elastic_hosts: Optional[str] = Field(default_factory=str)
+    elastic_hosts: Optional[List[str]] = Field(default_factory=list)
     config_file_path: str = Field(...)
 
-    @field_validator("elastic_hosts")
-    def split_hosts(cls, v: str) -> List[HttpUrl]:
+    @field_validator("elastic_hosts", mode="before")
+    def split_hosts(cls, v: Any) -> List[str]:
+        if isinstance(v, list):
+            return v
         if not isinstance(v, str):
             raise ValueError("ELASTIC_HOSTS must be a comma-separated string")
-        return [HttpUrl.build(scheme="http", host=h.strip()) for h in v.split(",") if h]
+        # Hosts without a scheme (e.g. `es01:9200`) default to http.
+        return [
+            h if "://" in h else f"http://{h}"
+            for h in (h.strip() for h in v.split(","))
+            if h
+        ]
+
+    @property
+    def hosts(self) -> List[str]:
+        """All configured hosts, falling back to `ELASTIC_URL`."""
+        return self.elastic_hosts or [self.elastic_url]
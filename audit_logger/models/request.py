@@ -13,3 +13,24 @@ class BulkAuditLogOptions(CustomBaseModel):
         description="Specifies the number of fake audit log entries to generate.",
         alias="bulk_limit",
     )
+    seed: Optional[int] = Field(
+        default=None,
+        description="Seed of the generator, for reproducible entries.",
+    )
+    actor_skew: float = Field(
+        default=1.1,
+        ge=0,
+        description="Zipf exponent of the actor distribution (0 = uniform).",
+    )
+    error_rate: float = Field(
+        default=0.05,
+        ge=0,
+        le=1,
+        description="Share of entries with the status 'failure'.",
+    )
+    burst_ratio: float = Field(
+        default=0.3,
+        ge=0,
+        le=1,
+        description="Share of entries with timestamps clustered in bursts.",
+    )
@@ -53,6 +53,24 @@ class SearchResults(CustomBaseModel):
     aggs: List[Any] = Field(
         default=[], description="A list of aggregations for the search query."
     )
+    profile: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="ES profile output and search phase timings (`profile: true` only).",
+    )
+
+
+class AsyncSearchResults(SearchResults):
+    id: Optional[str] = Field(default=None, description="The ID of the async search.")
+    is_running: bool = Field(
+        default=False, description="Whether the search is still running."
+    )
+    is_partial: bool = Field(
+        default=False,
+        description="Whether the results are partial (still running or failed shards).",
+    )
+    expiration_time_in_millis: Optional[int] = Field(
+        default=None, description="When the search and its results are deleted."
+    )
 
 
 class GenericResponse(CustomBaseModel):
@@ -66,3 +84,13 @@ class GenericResponse(CustomBaseModel):
     failed_items: Optional[List[Dict]] = Field(
         default=[], description="A list of items that failed."
     )
+
+
+class TimelineResults(CustomBaseModel):
+    docs: List[Any] = Field(
+        default=[], description="The entries of the actor, the newest first."
+    )
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="The cursor of the next page (none on the last page).",
+    )
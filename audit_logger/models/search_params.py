@@ -1,11 +1,14 @@
 import logging
+import time
 from decimal import Decimal
 from enum import Enum
 from typing import Any, Dict, List, Optional, Union
 
-from pydantic import Field, field_validator, model_validator
+from pydantic import Field, ModelWrapValidatorHandler, field_validator, model_validator
 
+from audit_logger.metrics import VALIDATION_DURATION
 from audit_logger.models.custom_base import CustomBaseModel
+from audit_logger.tracing import tracer
 from audit_logger.utils import is_valid_ip_v4_address, validate_date
 
 logger = logging.getLogger("audit_logger")
@@ -109,11 +112,10 @@ class SearchFilterParams(CustomBaseModel):
         if v.type == FilterTypeEnum.RANGE:
             # Check if the field is a date and validate the 'gte' and 'lte' values.
             if v.field == FieldIdentifierEnum.TIMESTAMP:
-                if v.gte and v.lte:
-                    if not all((validate_date(v.gte), validate_date(v.lte))):
-                        raise ValueError(
-                            f"For a date 'range' filter, 'gte' and 'lte' must be valid dates (YYYY-MM-DDTHH:MM:SSZ)."  # noqa
-                        )
+                if not all(validate_date(d) for d in (v.gte, v.lte) if d is not None):
+                    raise ValueError(
+                        f"For a date 'range' filter, 'gte' and 'lte' must be valid dates (YYYY-MM-DDTHH:MM:SSZ) or date math (now-1d/d)."  # noqa
+                    )
             # Check if the field is an IP address and validate the 'gte' and 'lte' values.
             if v.field in [
                 FieldIdentifierEnum.ACTOR_IP_ADDRESS,
@@ -198,9 +200,34 @@ class SearchParams(MaxResultsMixin, CustomBaseModel):
         default=None,
         description="Experimental filters to apply for refined search results.",
     )
+    profile: Optional[bool] = Field(
+        default=False,
+        description="Return the ES `_profile` output and the timings of each search phase.",
+    )
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def observe_validation(
+        cls, data: Any, handler: ModelWrapValidatorHandler["SearchParams"]
+    ) -> "SearchParams":
+        start = time.perf_counter()
+        try:
+            with tracer.span("validate SearchParams"):
+                return handler(data)
+        finally:
+            VALIDATION_DURATION.labels("SearchParams").observe(
+                time.perf_counter() - start
+            )
 
     @field_validator("sort_order")
     def sort_order_valid(cls, v: Optional[SortOrderEnum]) -> Optional[SortOrderEnum]:
         if v and v not in SortOrderEnum:
             raise ValueError("sort_order must be 'asc' or 'desc'")
         return v
+
+
+class TailParams(CustomBaseModel):
+    filters: List[SearchFilterParams] = Field(
+        default=[],
+        description="Filters the tailed entries must match (all of them).",
+    )
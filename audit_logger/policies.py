@@ -0,0 +1,295 @@
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import BadRequestError
+
+from audit_logger.custom_logger import get_logger
+from audit_logger.mappings import INDEX_MAPPINGS
+from audit_logger.metrics import registry
+from audit_logger.predicates import getter
+
+if TYPE_CHECKING:
+    from audit_logger.models import IngestPolicy, IngestPolicySettings
+    from audit_logger.storage import StorageBackend
+
+logger = get_logger("audit_logger")
+
+POLICY_ENTRIES = registry.counter(
+    "audit_ingest_policy_entries_total",
+    "Number of entries handled per ingest policy and outcome.",
+    ("policy", "outcome"),
+)
+
+STORE = "store"
+SAMPLE = "sample"
+COLD = "cold"
+AGGREGATE = "aggregate"
+
+# (event_name, application_name, status)
+PolicyKey = Tuple[Any, Any, Any]
+
+
+class CompiledPolicy:
+    """
+    A single ingest policy, with its sampling threshold and key getters.
+
+    Args:
+    - rule (IngestPolicy): The policy.
+    """
+
+    def __init__(self, rule: "IngestPolicy") -> None:
+        self.name = rule.name
+        self.action = str(rule.action.value)
+        self.match = (rule.event_name, rule.application_name, rule.status)
+        # Entries whose 64-bit key hash is below the threshold are kept.
+        self.threshold = int(rule.sample_rate * 2**64)
+        self.getters = [getter(path) for path in rule.sample_by]
+
+    def matches(self, key: PolicyKey) -> bool:
+        return all(
+            expected is None or expected == value
+            for expected, value in zip(self.match, key)
+        )
+
+    def keep(self, entry: Dict[str, Any]) -> bool:
+        """Decides deterministically (by the hash of `sample_by`) whether to keep it."""
+        key = "\x1f".join(str(get(entry)) for get in self.getters)
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") < self.threshold
+
+
+class PolicyPlan:
+    """The entries to index per target index, and the counts per outcome."""
+
+    __slots__ = ("targets", "stored", "sampled", "aggregated")
+
+    def __init__(self) -> None:
+        self.targets: Dict[str, List[Dict[str, Any]]] = {}
+        self.stored = 0
+        self.sampled = 0
+        self.aggregated = 0
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "stored_count": self.stored,
+            "sampled_count": self.sampled,
+            "aggregated_count": self.aggregated,
+        }
+
+
+class IngestPolicyEngine:
+    """
+    Applies the ingest policies: entries are stored as is, sampled, routed to a
+    cold index or only counted (aggregate). The first matching policy (on
+    `event_name`, `application_name` and `status`) wins; the policy of every
+    distinct key is resolved once and kept in a lookup table, so the ingest path
+    does a single dict lookup per entry.
+
+    The counters of the `aggregate` policies are written to the aggregate index
+    by a background thread every `aggregate_interval` seconds, as one document per
+    policy, key and interval.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.settings: Optional["IngestPolicySettings"] = None
+        self.policies: List[CompiledPolicy] = []
+        self.table: Dict[PolicyKey, Optional[CompiledPolicy]] = {}
+        self.storage: Optional["StorageBackend"] = None
+        self._counters: Dict[Tuple[str, str, PolicyKey], int] = {}
+        self._created: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def configure(self, settings: Optional["IngestPolicySettings"]) -> None:
+        """(Re)compiles the policies, the lookup table is rebuilt on demand."""
+        if not settings or not settings.enabled or not settings.rules:
+            self.enabled = False
+            self.policies, self.table = [], {}
+            self.settings = settings
+            return
+        self.settings = settings
+        self.policies, self.table = [CompiledPolicy(r) for r in settings.rules], {}
+        self.enabled = True
+        logger.info("[Policies] %d ingest polic(ies) enabled", len(self.policies))
+
+    def lookup(self, key: PolicyKey) -> Optional[CompiledPolicy]:
+        table = self.table
+        try:
+            return table[key]
+        except KeyError:
+            pass
+        policy = next((p for p in self.policies if p.matches(key)), None)
+        if self.settings and len(table) < self.settings.max_lookup_entries:
+            table[key] = policy
+        return policy
+
+    def apply(self, entries: List[Dict[str, Any]], index: str) -> PolicyPlan:
+        """
+        Decides the outcome of every entry.
+
+        Args:
+        - entries (List[Dict[str, Any]]): The (JSON compatible) entries.
+        - index (str): The index (or alias) of the entries, the cold and aggregate
+          indices are named after it.
+
+        Returns:
+        - PolicyPlan: The entries to index per target index and the counts.
+        """
+        plan = PolicyPlan()
+        hot: List[Dict[str, Any]] = []
+        if not self.enabled or self.settings is None:
+            plan.targets[index] = entries
+            plan.stored = len(entries)
+            return plan
+        cold_index = index + self.settings.cold_index_suffix
+        cold: List[Dict[str, Any]] = []
+        outcomes: Dict[Tuple[str, str], int] = {}
+        lookup = self.lookup
+        for entry in entries:
+            key = (
+                entry.get("event_name"),
+                entry.get("application_name"),
+                entry.get("status"),
+            )
+            policy = lookup(key)
+            if policy is None or policy.action == STORE:
+                hot.append(entry)
+                continue
+            action = policy.action
+            if action == SAMPLE:
+                if policy.keep(entry):
+                    hot.append(entry)
+                    outcome = "stored"
+                else:
+                    plan.sampled += 1
+                    outcome = "sampled"
+            elif action == COLD:
+                cold.append(entry)
+                outcome = "cold"
+            else:
+                self.count(policy.name, index, key)
+                plan.aggregated += 1
+                outcome = "aggregated"
+            outcomes[policy.name, outcome] = outcomes.get((policy.name, outcome), 0) + 1
+        for (name, outcome), count in outcomes.items():
+            POLICY_ENTRIES.labels(name, outcome).inc(count)
+        if hot:
+            plan.targets[index] = hot
+        if cold:
+            plan.targets[cold_index] = cold
+        plan.stored = len(hot) + len(cold)
+        return plan
+
+    def search_indices(self, index: str) -> str:
+        """
+        Returns the indices the entries of an index are searched in: the index and
+        its cold index, if a policy writes to it.
+        """
+        if self.settings is None or not any(p.action == COLD for p in self.policies):
+            return index
+        return f"{index},{index}{self.settings.cold_index_suffix}"
+
+    def count(self, policy: str, index: str, key: PolicyKey) -> None:
+        counter = (policy, index, key)
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + 1
+
+    def ensure_indices(self, client: Elasticsearch, indices: List[str]) -> None:
+        """
+        Creates the cold indices which don't exist yet, with the mapping of the
+        hot index, but fewer replicas and a slower refresh. Blocking, run it from
+        the thread pool.
+        """
+        if self.settings is None:
+            return
+        cold = [
+            index
+            for index in indices
+            if index not in self._created
+            and index.endswith(self.settings.cold_index_suffix)
+        ]
+        for index in cold:
+            try:
+                if not client.indices.exists(index=index):
+                    client.indices.create(
+                        index=index,
+                        settings={
+                            "number_of_replicas": self.settings.cold_number_of_replicas,
+                            "refresh_interval": self.settings.cold_refresh_interval,
+                        },
+                        mappings=INDEX_MAPPINGS,
+                    )
+                    logger.info("[Policies] Created the cold index '%s'", index)
+            except BadRequestError as e:
+                # Created concurrently (by another worker).
+                if e.error != "resource_already_exists_exception":
+                    raise
+            self._created.add(index)
+
+    def start(self, storage: "StorageBackend") -> None:
+        """Starts the thread writing the aggregate counters to the storage."""
+        self.storage = storage
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="policy-aggregates", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            interval = self.settings.aggregate_interval if self.settings else 60.0
+            self._stopped.wait(interval)
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes the aggregate counters, returns the number of written documents."""
+        with self._lock:
+            counters, self._counters = self._counters, {}
+        if not counters or self.storage is None or self.settings is None:
+            return 0
+        suffix = self.settings.aggregate_index_suffix
+        now = datetime.now(timezone.utc).isoformat()
+        operations = [
+            {
+                "_index": index + suffix,
+                "_op_type": "index",
+                "_source": {
+                    "timestamp": now,
+                    "policy": policy,
+                    "event_name": key[0],
+                    "application_name": key[1],
+                    "status": key[2],
+                    "count": count,
+                },
+            }
+            for (policy, index, key), count in counters.items()
+        ]
+        try:
+            _, failed = self.storage.bulk(operations)
+            if failed:
+                raise RuntimeError(f"{len(failed)} counter(s) not written: {failed[0]}")
+        except Exception as e:
+            logger.error("[Policies] Failed to write the aggregate counters: %s", e)
+            # Counted again with the next flush.
+            with self._lock:
+                for counter, count in counters.items():
+                    self._counters[counter] = self._counters.get(counter, 0) + count
+            return 0
+        return len(operations)
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+
+ingest_policies = IngestPolicyEngine()
@@ -0,0 +1,508 @@
+import ipaddress
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from audit_logger.mappings import INDEX_MAPPINGS, field_types
+
+if TYPE_CHECKING:
+    from audit_logger.models import SearchFilterParams
+
+Predicate = Callable[[Dict[str, Any]], bool]
+Getter = Callable[[Dict[str, Any]], Any]
+
+# Field types of the index mapping (`audit_logger/index_mappings.json`), all
+# other fields are keywords.
+_FIELD_TYPES = field_types(INDEX_MAPPINGS)
+DATE_FIELDS = frozenset(f for f, t in _FIELD_TYPES.items() if t == "date")
+IP_FIELDS = frozenset(f for f, t in _FIELD_TYPES.items() if t == "ip")
+TEXT_FIELDS = frozenset(f for f, t in _FIELD_TYPES.items() if t == "text")
+# The objects mapped as `nested`: ES only matches their fields within `nested`
+# queries, which `ElasticSearchQueryBuilder` wraps the clauses on them into.
+NESTED_FIELDS = frozenset(f for f, t in _FIELD_TYPES.items() if t == "nested")
+
+# The evaluation order of the filter types, by the cost of their check: cheap
+# checks first, so the expensive ones run on fewer entries. It's a fixed order,
+# not a selectivity estimate (there are no statistics of the entries): an
+# `exact` filter matching every entry still runs before a rare `wildcard` one.
+FILTER_COST = {
+    "exact": 0,
+    "nested": 0,
+    "exists": 1,
+    "missing": 1,
+    "range": 2,
+    "wildcard": 3,
+    "text_search": 4,
+}
+
+# Relative range bounds (`now-1h`, `today`) are re-evaluated at most this often.
+RELATIVE_BOUNDS_TTL = 1.0
+
+MISSING = object()
+_TOKEN = re.compile(r"\w+")
+_DATE = re.compile(
+    r"^(?P<year>\d{4})(?:-(?P<month>\d{2})(?:-(?P<day>\d{2})"
+    r"(?:[T ](?P<hour>\d{2})(?::(?P<minute>\d{2})(?::(?P<second>\d{2})"
+    r"(?:\.(?P<fraction>\d+))?)?)?)?)?)?(?P<tz>Z|[+-]\d{2}:?\d{2})?$"
+)
+_DATE_MATH = re.compile(r"([+-])(\d+)([yMwdhHms])|/([yMwdhHms])")
+_UNITS = {
+    "w": timedelta(weeks=1),
+    "d": timedelta(days=1),
+    "h": timedelta(hours=1),
+    "H": timedelta(hours=1),
+    "m": timedelta(minutes=1),
+    "s": timedelta(seconds=1),
+}
+_MS = timedelta(milliseconds=1)
+
+
+def getter(path: str) -> Getter:
+    """Returns a function reading a (dotted) field of a document, or `MISSING`."""
+    keys = path.split(".")
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda document: document.get(key, MISSING)
+
+    def get(document: Dict[str, Any]) -> Any:
+        value: Any = document
+        for key in keys:
+            if not isinstance(value, dict):
+                return MISSING
+            value = value.get(key, MISSING)
+            if value is MISSING:
+                return MISSING
+        return value
+
+    return get
+
+
+def _values(value: Any) -> List[Any]:
+    # The indexed values of a field: arrays are flattened, nulls aren't indexed.
+    if value is MISSING or value is None:
+        return []
+    if isinstance(value, list):
+        return [v for v in value if v is not None]
+    return [value]
+
+
+def _keyword(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _tokens(value: Any) -> List[str]:
+    # A rough equivalent of the `standard` analyzer.
+    return _TOKEN.findall(str(value).lower())
+
+
+def _ip(value: Any) -> Any:
+    try:
+        return ipaddress.ip_address(str(value))
+    except ValueError:
+        return None
+
+
+def _epoch_ms(value: Any) -> Optional[float]:
+    """Returns the epoch milliseconds of an indexed date (naive dates are UTC)."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        try:
+            moment = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp() * 1000
+
+
+def _add_months(moment: datetime, months: int) -> datetime:
+    month = moment.month - 1 + months
+    year, month = moment.year + month // 12, month % 12 + 1
+    days = [31, 29 if year % 4 == 0 and (year % 100 or year % 400 == 0) else 28]
+    days += [31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    return moment.replace(year=year, month=month, day=min(moment.day, days[month - 1]))
+
+
+def _add(moment: datetime, amount: int, unit: str) -> datetime:
+    if unit == "y":
+        return _add_months(moment, 12 * amount)
+    if unit == "M":
+        return _add_months(moment, amount)
+    return moment + amount * _UNITS[unit]
+
+
+def _round(moment: datetime, unit: str, up: bool) -> datetime:
+    """Rounds down to the start of the unit, or up to its last millisecond."""
+    if unit == "y":
+        start = moment.replace(
+            month=1, day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+    elif unit == "M":
+        start = moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif unit in ("w", "d"):
+        start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        if unit == "w":
+            start -= timedelta(days=start.weekday())
+    elif unit in ("h", "H"):
+        start = moment.replace(minute=0, second=0, microsecond=0)
+    elif unit == "m":
+        start = moment.replace(second=0, microsecond=0)
+    else:
+        start = moment.replace(microsecond=0)
+    return _add(start, 1, unit) - _MS if up else start
+
+
+def _parse_absolute(text: str, round_up: bool) -> datetime:
+    match = _DATE.match(text)
+    if not match:
+        raise ValueError(f"Invalid date '{text}'")
+    parts = match.groupdict()
+    tz = parts["tz"]
+    tzinfo = timezone.utc
+    if tz and tz != "Z":
+        sign = -1 if tz[0] == "-" else 1
+        digits = tz[1:].replace(":", "")
+        offset = timedelta(hours=int(digits[:2]), minutes=int(digits[2:]))
+        tzinfo = timezone(sign * offset)
+    fraction = parts["fraction"] or ""
+    moment = datetime(
+        int(parts["year"]),
+        int(parts["month"] or 1),
+        int(parts["day"] or 1),
+        int(parts["hour"] or 0),
+        int(parts["minute"] or 0),
+        int(parts["second"] or 0),
+        int(fraction[:6].ljust(6, "0")) if fraction else 0,
+        tzinfo=tzinfo,
+    )
+    if round_up and not fraction:
+        # Missing components round up like ES does for `lte`/`gt`: `2024-05` -> end of May.
+        for name, unit in (
+            ("month", "y"),
+            ("day", "M"),
+            ("hour", "d"),
+            ("minute", "h"),
+            ("second", "m"),
+        ):
+            if parts[name] is None:
+                return _round(moment, unit, up=True)
+        return moment + timedelta(seconds=1) - _MS
+    return moment
+
+
+def parse_date_math(
+    value: Any, now: Optional[datetime] = None, round_up: bool = False
+) -> datetime:
+    """
+    Parses an ES date (math) expression: `now-1h`, `now/d`, `2024-05-01||+1M`,
+    partial dates (`2024-05`) or epoch milliseconds. With `round_up` (`lte`/`gt`
+    bounds), rounding and missing components resolve to the end of the unit.
+
+    Args:
+    - value (Any): The expression.
+    - now (Optional[datetime]): The current time (default: now, UTC).
+    - round_up (bool): Round up instead of down.
+
+    Returns:
+    - datetime: The timezone aware date.
+
+    Raises:
+    - ValueError: For invalid expressions.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value / 1000, timezone.utc)
+    text = str(value).strip()
+    if text.startswith("now"):
+        moment, math = now or datetime.now(timezone.utc), text[3:]
+    elif "||" in text:
+        anchor, math = text.split("||", 1)
+        moment = _parse_absolute(anchor, round_up=False)
+    else:
+        return _parse_absolute(text, round_up)
+
+    position = 0
+    for match in _DATE_MATH.finditer(math):
+        if match.start() != position:
+            break
+        position = match.end()
+        sign, amount, unit, rounding = match.groups()
+        if rounding:
+            moment = _round(moment, rounding, round_up)
+        else:
+            moment = _add(moment, int(amount) * (-1 if sign == "-" else 1), unit)
+    if position != len(math):
+        raise ValueError(f"Invalid date math '{text}'")
+    return moment
+
+
+def _is_relative(value: Any) -> bool:
+    return isinstance(value, str) and value.strip().startswith("now")
+
+
+def compile_exact(path: str, value: Any) -> Predicate:
+    """ES `term` semantics for the field type of `path`."""
+    get = getter(path)
+    if path in DATE_FIELDS:
+        expected_ms = parse_date_math(value).timestamp() * 1000
+        return lambda doc: any(_epoch_ms(v) == expected_ms for v in _values(get(doc)))
+    if path in IP_FIELDS:
+        text = str(value)
+        network = ipaddress.ip_network(text, strict=False)
+        if "/" in text:
+            return lambda doc: any(
+                (ip := _ip(v)) is not None and ip in network for v in _values(get(doc))
+            )
+        address = network.network_address
+        return lambda doc: any(_ip(v) == address for v in _values(get(doc)))
+    expected = _keyword(value)
+    if path in TEXT_FIELDS:
+        # The term isn't analyzed, so it only matches a (lowercase) token as is.
+        return lambda doc: any(expected in _tokens(v) for v in _values(get(doc)))
+
+    def check(document: Dict[str, Any]) -> bool:
+        indexed = get(document)
+        if indexed.__class__ is str:
+            return indexed == expected
+        return any(_keyword(v) == expected for v in _values(indexed))
+
+    return check
+
+
+def compile_exists(path: str, exists: bool) -> Predicate:
+    get = getter(path)
+    return lambda doc: bool(_values(get(doc))) == exists
+
+
+def date_bounds(gte: Any, lte: Any, relative: Any = None) -> Tuple[float, float]:
+    """
+    Resolves the bounds of a date range (dates, date math or a relative range like
+    `today`) to epoch milliseconds, missing bounds are infinite.
+    """
+    low, high = gte, lte
+    if relative is not None:
+        from audit_logger.elastic_filters import ElasticSearchQueryBuilder
+
+        low, high = ElasticSearchQueryBuilder.calculate_date_range(relative)
+    return (
+        -float("inf") if low is None else parse_date_math(low).timestamp() * 1000,
+        (
+            float("inf")
+            if high is None
+            else parse_date_math(high, round_up=True).timestamp() * 1000
+        ),
+    )
+
+
+def timestamp_bounds(
+    filters: List["SearchFilterParams"],
+) -> Optional[Tuple[float, float]]:
+    """
+    Returns the time window (in epoch milliseconds) the `range` filters on the
+    `timestamp` restrict a search to, or None if they don't restrict it.
+    """
+    window: Optional[Tuple[float, float]] = None
+    for f in filters:
+        if str(f.type.value) != "range" or not f.field:
+            continue
+        if str(f.field.value) not in DATE_FIELDS:
+            continue
+        if f.value is None and f.gte is None and f.lte is None:
+            continue
+        low, high = date_bounds(
+            None if f.value else f.gte, None if f.value else f.lte, f.value or None
+        )
+        window = (
+            (low, high)
+            if window is None
+            else (max(window[0], low), min(window[1], high))
+        )
+    return window
+
+
+def compile_range(path: str, gte: Any, lte: Any, relative: Any = None) -> Predicate:
+    """
+    ES `range` semantics. Absolute bounds are parsed once, relative bounds
+    (`now-15m`, `today`, ...) at most every `RELATIVE_BOUNDS_TTL` seconds.
+    """
+    get = getter(path)
+    if gte is None and lte is None and relative is None:
+        return compile_exists(path, True)
+
+    if path in IP_FIELDS:
+        low, high = _ip(gte) if gte else None, _ip(lte) if lte else None
+
+        def check_ip(document: Dict[str, Any]) -> bool:
+            for v in _values(get(document)):
+                ip = _ip(v)
+                try:
+                    if (
+                        ip is not None
+                        and (low is None or ip >= low)
+                        and (high is None or ip <= high)
+                    ):
+                        return True
+                except TypeError:  # IPv4 vs. IPv6
+                    continue
+            return False
+
+        return check_ip
+
+    if path not in DATE_FIELDS:
+        low_key = None if gte is None else _keyword(gte)
+        high_key = None if lte is None else _keyword(lte)
+        to_keys = _tokens if path in TEXT_FIELDS else lambda v: [_keyword(v)]
+        return lambda doc: any(
+            (low_key is None or key >= low_key)
+            and (high_key is None or key <= high_key)
+            for v in _values(get(doc))
+            for key in to_keys(v)
+        )
+
+    def resolve() -> Tuple[float, float]:
+        return date_bounds(gte, lte, relative)
+
+    bounds = [0.0, *resolve()]
+    is_relative = relative is not None or _is_relative(gte) or _is_relative(lte)
+
+    def check_date(document: Dict[str, Any]) -> bool:
+        if is_relative and time.monotonic() >= bounds[0]:
+            bounds[:] = [time.monotonic() + RELATIVE_BOUNDS_TTL, *resolve()]
+        low_ms, high_ms = bounds[1], bounds[2]
+        for v in _values(get(document)):
+            ms = _epoch_ms(v)
+            if ms is not None and low_ms <= ms <= high_ms:
+                return True
+        return False
+
+    return check_date
+
+
+def wildcard_regex(pattern: str) -> "re.Pattern[str]":
+    """Translates an ES wildcard pattern (`*`, `?`, `\\` escapes) to a regex."""
+    parts = []
+    escaped = False
+    for char in pattern:
+        if escaped:
+            parts.append(re.escape(char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == "*":
+            parts.append(".*")
+        elif char == "?":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts), re.DOTALL)
+
+
+def compile_wildcard(path: str, pattern: Any) -> Predicate:
+    get = getter(path)
+    match = wildcard_regex(str(pattern)).fullmatch
+    if path in TEXT_FIELDS:
+        return lambda doc: any(
+            match(token) for v in _values(get(doc)) for token in _tokens(v)
+        )
+    return lambda doc: any(match(_keyword(v)) for v in _values(get(doc)))
+
+
+def _any_value(get: Getter, test: Callable[[Any], bool]) -> Predicate:
+    return lambda document: any(test(v) for v in _values(get(document)))
+
+
+def compile_text_search(paths: List[str], query: Any) -> Predicate:
+    """ES `multi_match` (`best_fields`, `or`) semantics over the given fields."""
+    query_tokens = set(_tokens(query))
+    keyword = _keyword(query)
+    query_ip = _ip(query)
+    checks: List[Predicate] = []
+    for path in paths:
+        get = getter(path)
+        if path in TEXT_FIELDS:
+            checks.append(
+                _any_value(get, lambda v: not query_tokens.isdisjoint(_tokens(v)))
+            )
+        elif path in IP_FIELDS:
+            if query_ip is not None:
+                checks.append(_any_value(get, lambda v: _ip(v) == query_ip))
+        elif path not in DATE_FIELDS:
+            checks.append(_any_value(get, lambda v: _keyword(v) == keyword))
+    return lambda doc: any(check(doc) for check in checks)
+
+
+def compile_filter(f: "SearchFilterParams") -> Optional[Predicate]:
+    """
+    Compiles a single filter with the semantics of the ES query clause that
+    `ElasticSearchQueryBuilder.filter_clause` translates it into (the
+    `tests/test_filter_parity.py` corpus checks both, and the SQL translation,
+    agree). Filters the query builder ignores return None.
+    """
+    filter_type = str(f.type.value)
+    path = str(f.field.value) if f.field else ""
+    if filter_type == "exact":
+        return compile_exact(path, f.value)
+    if filter_type == "nested" and "." in path:
+        return compile_exact(path, f.value)
+    if filter_type == "exists":
+        return compile_exists(path, True)
+    if filter_type == "missing":
+        return compile_exists(path, False)
+    if filter_type == "range":
+        if f.value:
+            return compile_range(path, None, None, relative=f.value)
+        return compile_range(path, f.gte, f.lte)
+    if filter_type == "wildcard":
+        return compile_wildcard(path, f.value)
+    if filter_type == "text_search":
+        paths = [str(field.value) for field in f.fields] if f.fields else [path]
+        return compile_text_search(paths, f.value)
+    return None
+
+
+def compile_predicate(filters: List["SearchFilterParams"]) -> Predicate:
+    """
+    Compiles search filters into a predicate over JSON compatible audit log
+    entries (e.g. `AuditLogEntry.model_dump(mode="json")`), which matches if all
+    filters match, with the ES semantics of the index mapping. Wildcards are
+    compiled to regular expressions and absolute ranges parsed once. The checks
+    run in the order of `FILTER_COST`, stopping at the first mismatch. This is
+    a fixed order by filter type (the cost of the check), not by selectivity;
+    filters of the same type keep their given order.
+
+    Args:
+    - filters (List[SearchFilterParams]): The filters.
+
+    Returns:
+    - Predicate: The compiled predicate.
+
+    Raises:
+    - ValueError: For invalid filter values (e.g. dates).
+    """
+    compiled = [
+        (FILTER_COST.get(str(f.type.value), len(FILTER_COST)), check)
+        for f in filters
+        if (check := compile_filter(f)) is not None
+    ]
+    checks = [check for _, check in sorted(compiled, key=lambda item: item[0])]
+
+    if not checks:
+        return lambda document: True
+    if len(checks) == 1:
+        return checks[0]
+    if len(checks) == 2:
+        first, second = checks
+        return lambda document: first(document) and second(document)
+
+    def predicate(document: Dict[str, Any]) -> bool:
+        for check in checks:
+            if not check(document):
+                return False
+        return True
+
+    return predicate
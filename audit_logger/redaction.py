@@ -0,0 +1,228 @@
+import hashlib
+import hmac
+import ipaddress
+import re
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    # Only imported for type checking, as the models import this module indirectly.
+    from audit_logger.models.config import (
+        RedactionModeEnum,
+        RedactionRule,
+        RedactionSettings,
+    )
+
+# Fields that are always anonymized, regardless of the redaction settings.
+IP_ADDRESS_FIELDS = ["ip_address", "actor.ip_address", "server.ip_address"]
+
+# Marker returned by an action to remove the field from the document.
+_DROP = object()
+
+
+def anonymize_ip_address(ip_address: str) -> str:
+    """
+    Anonymizes an IP address by replacing the last segments with zeros.
+    For IPv4 addresses, the last two octets are set to zero.
+    For IPv6 addresses, the last four hextets are replaced with zeros,
+    and the address is then compressed to its shortest form.
+    If the input is not a valid IP address, it is returned unchanged.
+
+    Args:
+    - ip_address (str): The IP address to anonymize.
+
+    Returns:
+    - str: The anonymized IP address.
+    """
+    try:
+        ip_address = str(ip_address)
+        ip_obj = ipaddress.ip_address(ip_address)
+        if ip_obj.version == 4:
+            octets = ip_address.split(".")
+            return str(".".join(octets[:2] + ["0", "0"]))
+        elif ip_obj.version == 6:
+            hextets = ip_obj.exploded.split(":")
+            anonymized_ip = ":".join(hextets[:4] + ["0", "0", "0", "0"])
+            return str(ipaddress.ip_address(anonymized_ip).compressed)
+    except ValueError:
+        pass
+    return str(ip_address)
+
+
+def each_scalar(func: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """
+    Applies a redaction function to every scalar of a value, walking into the
+    objects and arrays (e.g. a `meta.*` rule), so containers keep their shape.
+    """
+
+    def apply(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {key: apply(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [apply(item) for item in value]
+        if value is None:
+            return value
+        return func(value)
+
+    return apply
+
+
+class RuleStats:
+    """Counters for a single redaction rule."""
+
+    __slots__ = ("calls", "total_ns")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total_ns = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return {"calls": self.calls, "total_ns": self.total_ns}
+
+
+class _Action:
+    __slots__ = ("name", "func", "stats")
+
+    def __init__(self, name: str, func: Callable[[Any], Any]) -> None:
+        self.name = name
+        self.func = func
+        self.stats = RuleStats()
+
+
+class _Node:
+    __slots__ = ("children", "actions")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        self.actions: List[_Action] = []
+
+
+class RedactionEngine:
+    """
+    Redacts audit log documents in a single pass before they are indexed.
+
+    All rules are compiled once into a tree of field path segments, so that every
+    document is walked only along the configured paths and no regular expression
+    is compiled on the hot path. IP addresses are always anonymized.
+    """
+
+    def __init__(self, settings: Optional["RedactionSettings"] = None) -> None:
+        self._root = _Node()
+        self._actions: List[_Action] = []
+        self._hash_key = (
+            settings.hash_key.encode("utf-8") if settings and settings.hash_key else b""
+        )
+
+        for field in IP_ADDRESS_FIELDS:
+            self._add(field, f"anonymize_ip:{field}", anonymize_ip_address)
+
+        if settings:
+            # Detectors run first, so field rules see the already scrubbed text.
+            for detector in settings.detectors:
+                pattern = re.compile(detector.pattern)
+                for field in detector.fields:
+                    self._add(
+                        field,
+                        f"detector:{detector.name}:{field}",
+                        self._detector_func(pattern, detector.mode),
+                    )
+            for rule in settings.rules:
+                self._add(
+                    rule.field, f"{rule.mode.value}:{rule.field}", self._rule_func(rule)
+                )
+
+    def _add(self, field: str, name: str, func: Callable[[Any], Any]) -> None:
+        node = self._root
+        for part in field.split("."):
+            node = node.children.setdefault(part, _Node())
+        action = _Action(name, func)
+        node.actions.append(action)
+        self._actions.append(action)
+
+    def _keyed_hash(self, value: str) -> str:
+        return hmac.new(
+            self._hash_key, value.encode("utf-8"), hashlib.sha256
+        ).hexdigest()
+
+    def _rule_func(self, rule: "RedactionRule") -> Callable[[Any], Any]:
+        length = rule.length or 0
+        mask_char = rule.mask_char or "*"
+
+        if rule.mode == "drop":
+            return lambda value: _DROP
+        if rule.mode == "hash":
+            return each_scalar(lambda value: self._keyed_hash(str(value)))
+        if rule.mode == "truncate":
+            return each_scalar(lambda value: str(value)[:length])
+
+        def mask(value: Any) -> str:
+            text = str(value)
+            visible = min(length, len(text) // 2)
+            return mask_char * (len(text) - visible) + (
+                text[-visible:] if visible else ""
+            )
+
+        return each_scalar(mask)
+
+    def _detector_func(
+        self, pattern: "re.Pattern[str]", mode: "RedactionModeEnum"
+    ) -> Callable[[Any], Any]:
+        if mode == "hash":
+
+            def replace(match: "re.Match[str]") -> str:
+                return self._keyed_hash(match.group(0))
+
+        else:
+
+            def replace(match: "re.Match[str]") -> str:
+                return "*" * len(match.group(0))
+
+        def scrub(value: Any) -> Any:
+            if not isinstance(value, str):
+                return value
+            return pattern.sub(replace, value)
+
+        return each_scalar(scrub)
+
+    def redact(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Redacts the given document in place and returns it.
+
+        Args:
+        - document (Dict[str, Any]): The JSON compatible audit log document.
+
+        Returns:
+        - Dict[str, Any]: The redacted document.
+        """
+        self._walk(document, self._root)
+        return document
+
+    def _walk(self, container: Dict[str, Any], node: _Node) -> None:
+        for key, child in node.children.items():
+            if key == "*":
+                keys = list(container)
+            elif key in container:
+                keys = [key]
+            else:
+                continue
+
+            for field_key in keys:
+                value = container[field_key]
+                if child.children and isinstance(value, dict):
+                    self._walk(value, child)
+                if not child.actions or value is None:
+                    continue
+                for action in child.actions:
+                    start = time.perf_counter_ns()
+                    value = action.func(value)
+                    action.stats.total_ns += time.perf_counter_ns() - start
+                    action.stats.calls += 1
+                    if value is _DROP:
+                        del container[field_key]
+                        break
+                else:
+                    container[field_key] = value
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Returns the number of calls and the time spent per redaction rule."""
+        return {action.name: action.stats.to_dict() for action in self._actions}
@@ -0,0 +1,29 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+
+def dumps(content: Any) -> bytes:
+    """Serializes JSON compatible content to compact UTF-8 JSON (orjson if available)."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+class RawJSONResponse(JSONResponse):
+    """
+    A JSON response for content that is already JSON compatible (e.g. taken from
+    an Elasticsearch response body), serialized as is: without `jsonable_encoder`
+    and without validating it against the response model.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,113 @@
+import argparse
+import os
+import sys
+from typing import List, Optional
+
+import uvicorn
+
+from audit_logger.config_manager import ConfigManager
+from audit_logger.custom_logger import get_logger
+from audit_logger.models import ServerSettings
+
+logger = get_logger("audit_logger")
+
+APP = "audit_logger.main:app"
+
+
+def usable_cpus() -> int:
+    """Returns the number of CPUs this process may run on (affinity aware)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def resolve_workers(
+    requested: Optional[int], settings: Optional[ServerSettings]
+) -> int:
+    """
+    Resolves the number of workers: the CLI argument, `WEB_CONCURRENCY`,
+    the `server.workers` setting and finally the number of usable CPUs.
+    """
+    if requested:
+        return requested
+    if os.environ.get("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    if settings and settings.workers:
+        return settings.workers
+    return usable_cpus()
+
+
+def worker_count() -> int:
+    """
+    Returns the number of workers the server was started with (`WEB_CONCURRENCY`,
+    exported to the workers by `main`), 1 for a plain Uvicorn process.
+    """
+    return int(os.environ.get("WEB_CONCURRENCY") or 1)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Runs the audit log API with multiple worker processes."
+    )
+    parser.add_argument("--host", help="Bind address (default: server.host).")
+    parser.add_argument("--port", type=int, help="Bind port (default: server.port).")
+    parser.add_argument(
+        "--workers", type=int, help="Number of workers (default: usable CPUs)."
+    )
+    parser.add_argument("--log-level", default=os.environ.get("LOG_LEVEL", "info"))
+    args = parser.parse_args(argv)
+
+    # Only the configuration is loaded here, the app itself is imported by the
+    # workers, so the supervisor process stays small and starts fast.
+    config_file_path = os.environ.get("CONFIG_FILE_PATH")
+    if not config_file_path:
+        sys.exit("CONFIG_FILE_PATH is not set")
+    app_config = ConfigManager.load_config(config_file_path)
+    settings = app_config.server or ServerSettings()
+
+    workers = resolve_workers(args.workers, settings)
+    if workers > 1 and app_config.alerts and app_config.alerts.enabled:
+        # The alert windows are counted in memory, every worker would only
+        # count the entries it ingested itself.
+        sys.exit(
+            f"[Server] `alerts` are counted per worker process and need a single "
+            f"worker, got {workers} workers"
+        )
+    if workers > 1 and app_config.metrics and app_config.metrics.enabled:
+        if not app_config.metrics.multiprocess_dir:
+            logger.warning(
+                "[Server] %d workers without `metrics.multiprocess_dir`, "
+                "/metrics only reports the worker answering the scrape",
+                workers,
+            )
+
+    if workers > 1 and (app_config.tail is None or app_config.tail.enabled):
+        logger.warning(
+            "[Server] /tail is disabled with %d workers, the subscribers are "
+            "tracked per worker process",
+            workers,
+        )
+    # Lets the workers know how many of them there are.
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+
+    logger.info(
+        "[Server] Starting %d worker(s) on %s:%d",
+        workers,
+        args.host or settings.host,
+        args.port or settings.port,
+    )
+    uvicorn.run(
+        APP,
+        host=args.host or settings.host,
+        port=args.port or settings.port,
+        workers=workers,
+        log_level=args.log_level,
+        timeout_graceful_shutdown=int(settings.graceful_timeout),
+        proxy_headers=True,
+        server_header=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+from .base import StorageBackend
+from .elastic import ElasticStorage
+from .sqlite import Forwarder, SQLiteStorage
@@ -0,0 +1,58 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from audit_logger.models import SearchParams
+    from audit_logger.policies import IngestPolicyEngine
+
+
+class StorageBackend:
+    """
+    Stores and searches the audit log entries. The ingest path hands the bulk
+    operations (see `create_bulk_operations`) to `bulk`, and `/search` hands the
+    search parameters to `search`. Both are blocking and called from the thread
+    pool.
+    """
+
+    name = "storage"
+    # Whether the backend runs ES async searches (`/search?async=true`).
+    async_search = False
+
+    def bulk(self, operations: List[Dict[str, Any]]) -> Tuple[int, List[Dict]]:
+        """
+        Stores the operations.
+
+        Args:
+        - operations (List[Dict[str, Any]]): The bulk operations (`_index`,
+          `_routing` and `_source`).
+
+        Returns:
+        - Tuple[int, List[Dict]]: The number of stored entries and the failed items.
+        """
+        raise NotImplementedError
+
+    def search(
+        self,
+        params: "SearchParams",
+        index: str,
+        routing: Optional[str] = None,
+        slow_query_threshold_ms: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Searches the entries of an index (or alias).
+
+        Returns:
+        - Dict[str, Any]: The JSON compatible `docs`, `aggs` and `index_size` (and
+          the `profile` report with `params.profile`).
+
+        Raises:
+        - ValueError: For invalid or unsupported search parameters.
+        """
+        raise NotImplementedError
+
+    def prepare(
+        self, indices: List[str], policies: Optional["IngestPolicyEngine"] = None
+    ) -> None:
+        """Creates the (cold) indices the next operations are written to."""
+
+    def close(self) -> None:
+        """Releases the connections (and stops the background threads)."""
@@ -0,0 +1,73 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from elasticsearch import Elasticsearch
+
+from audit_logger.elastic_filters import ElasticSearchQueryBuilder, QueryCache
+from audit_logger.models import SearchParams
+from audit_logger.policies import IngestPolicyEngine
+from audit_logger.storage.base import StorageBackend
+from audit_logger.utils import bulk_index
+
+
+class ElasticStorage(StorageBackend):
+    """
+    Stores the entries in Elasticsearch (the default backend).
+
+    Args:
+    - ingest (Elasticsearch): The client of the ingest nodes.
+    - search (Optional[Elasticsearch]): The client of the search nodes (default:
+      the ingest client).
+    - query_cache (Optional[QueryCache]): The cache of the compiled search requests.
+    """
+
+    name = "elasticsearch"
+    async_search = True
+
+    def __init__(
+        self,
+        ingest: Elasticsearch,
+        search: Optional[Elasticsearch] = None,
+        query_cache: Optional[QueryCache] = None,
+    ) -> None:
+        self.ingest = ingest
+        self.search_client = search or ingest
+        self.query_cache = query_cache
+
+    def bulk(self, operations: List[Dict[str, Any]]) -> Tuple[int, List[Dict]]:
+        return bulk_index(self.ingest, operations)
+
+    def query_builder(
+        self,
+        index: str,
+        routing: Optional[str] = None,
+        slow_query_threshold_ms: Optional[float] = None,
+    ) -> ElasticSearchQueryBuilder:
+        return ElasticSearchQueryBuilder(
+            using=self.search_client,
+            index=index,
+            slow_query_threshold_ms=slow_query_threshold_ms,
+            query_cache=self.query_cache,
+            routing=routing,
+        )
+
+    def search(
+        self,
+        params: SearchParams,
+        index: str,
+        routing: Optional[str] = None,
+        slow_query_threshold_ms: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        return self.query_builder(
+            index, routing, slow_query_threshold_ms
+        ).process_parameters(params, raw=True)
+
+    def prepare(
+        self, indices: List[str], policies: Optional[IngestPolicyEngine] = None
+    ) -> None:
+        if policies:
+            policies.ensure_indices(self.ingest, indices)
+
+    def close(self) -> None:
+        if self.search_client is not self.ingest:
+            self.search_client.close()
+        self.ingest.close()
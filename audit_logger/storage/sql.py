@@ -0,0 +1,344 @@
+import ipaddress
+import re
+from datetime import datetime, timezone
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from audit_logger.archive import STRING_COLUMNS, field_columns
+from audit_logger.models import SearchFilterParams
+from audit_logger.predicates import (
+    DATE_FIELDS,
+    IP_FIELDS,
+    MISSING,
+    TEXT_FIELDS,
+    Predicate,
+    compile_filter,
+    date_bounds,
+    getter,
+    parse_date_math,
+)
+
+# The SQLite column of every field of the index mapping, e.g. `actor_identifier`.
+COLUMNS: Dict[str, str] = {
+    "timestamp": "timestamp",
+    **{field: field.replace(".", "_") for field in STRING_COLUMNS},
+}
+# The keyword columns get an index, the text fields are searched through FTS5.
+INDEXED_COLUMNS = [
+    column for field, column in COLUMNS.items() if field not in TEXT_FIELDS
+]
+FTS_COLUMNS = [COLUMNS[field] for field in sorted(TEXT_FIELDS)]
+
+# The terms aggregations return the 10 largest buckets by default, like ES.
+DEFAULT_TERMS_SIZE = 10
+
+_TOKEN = re.compile(r"\w+")
+
+# A clause of the WHERE condition with its parameters.
+Clause = Tuple[str, List[Any]]
+
+
+def _value(value: Any) -> Any:
+    return value.value if isinstance(value, Enum) else value
+
+
+def keyword(value: Any) -> str:
+    """The indexed value of a keyword, like `predicates.compile_exact` compares it."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def epoch_ms(value: Any) -> Optional[float]:
+    try:
+        return parse_date_math(value).timestamp() * 1000
+    except (TypeError, ValueError):
+        return None
+
+
+def row_values(document: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns the column values of an entry: the first indexed value of every field
+    (`None` if the field is missing or null) and the epoch ms of the timestamp.
+    """
+    row: Dict[str, Any] = {}
+    for field, column in COLUMNS.items():
+        value = getter(field)(document)
+        if isinstance(value, list):
+            value = next((v for v in value if v is not None), None)
+        if value is MISSING or value is None or isinstance(value, dict):
+            row[column] = None
+        else:
+            row[column] = keyword(value)
+    timestamp = document.get("timestamp")
+    row["timestamp_ms"] = None if timestamp is None else epoch_ms(timestamp)
+    return row
+
+
+def glob_pattern(pattern: str) -> str:
+    """Translates an ES wildcard pattern (`*`, `?`, `\\` escapes) to a GLOB pattern."""
+    parts = []
+    escaped = False
+    for char in pattern:
+        if escaped or char not in "*?\\":
+            parts.append(f"[{char}]" if char in "*?[" else char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        else:
+            parts.append(char)
+    return "".join(parts)
+
+
+def fts_match(fields: List[str], tokens: List[str]) -> str:
+    """An FTS5 query matching any of the tokens in any of the (text) fields."""
+    columns = " ".join(COLUMNS[field] for field in fields)
+    terms = " OR ".join(f'"{token}"' for token in tokens)
+    return f"{{{columns}}} : ({terms})"
+
+
+@lru_cache(maxsize=256)
+def fallback_predicate(key: str) -> Predicate:
+    """The compiled predicate of a filter (by its JSON) evaluated by `audit_filter`."""
+    compiled = compile_filter(SearchFilterParams.model_validate_json(key))
+    return compiled or (lambda document: True)
+
+
+class SQLQueryBuilder:
+    """
+    Translates the search parameters into SQL over the `audit_logs` table, with
+    the semantics of the ES index mapping (see `predicates`): keyword fields are
+    compared as is, the `timestamp` by its epoch milliseconds and the text fields
+    (`comment`, `endpoint`) by their tokens through the FTS5 index. The filters
+    without an equivalent SQL expression (IP ranges and CIDR blocks, wildcards
+    and ranges on text fields, filters on object fields) call the compiled
+    predicate of the filter through the `audit_filter` SQL function.
+
+    Args:
+    - table (str): The table of the entries.
+    """
+
+    def __init__(self, table: str = "audit_logs") -> None:
+        self.table = table
+        self.fts_table = f"{table}_fts"
+
+    def where(self, index: str, filters: List[SearchFilterParams]) -> Clause:
+        """Returns the WHERE condition of the filters within an index (or pattern)."""
+        clauses: List[Clause] = [self.index_clause(index)]
+        for f in filters:
+            clause = self.filter_clause(f)
+            if clause is not None:
+                clauses.append(clause)
+        return (
+            " AND ".join(f"({sql})" for sql, _ in clauses),
+            [param for _, params in clauses for param in params],
+        )
+
+    @staticmethod
+    def index_clause(index: str) -> Clause:
+        patterns = [name.strip() for name in index.split(",") if name.strip()]
+        return (
+            " OR ".join(
+                "index_name GLOB ?" if "*" in name else "index_name = ?"
+                for name in patterns
+            ),
+            patterns,
+        )
+
+    def filter_clause(self, f: SearchFilterParams) -> Optional[Clause]:
+        """Translates a single filter, the filters ES ignores return None."""
+        filter_type = str(_value(f.type))
+        path = str(_value(f.field)) if f.field else ""
+        if filter_type == "exact" or (filter_type == "nested" and "." in path):
+            return self.exact(f, path, f.value)
+        if filter_type in ("exists", "missing"):
+            return self.exists(path, filter_type == "exists")
+        if filter_type == "range":
+            return self.range(f, path)
+        if filter_type == "wildcard":
+            if path in TEXT_FIELDS or path not in COLUMNS:
+                return self.fallback(f)
+            return f"{COLUMNS[path]} GLOB ?", [glob_pattern(str(f.value))]
+        if filter_type == "text_search":
+            paths = [str(_value(name)) for name in f.fields] if f.fields else [path]
+            return self.text_search(f, paths, f.value)
+        return None
+
+    @staticmethod
+    def fallback(f: SearchFilterParams) -> Clause:
+        return "audit_filter(?, document)", [f.model_dump_json()]
+
+    def exact(self, f: SearchFilterParams, path: str, value: Any) -> Clause:
+        if path in DATE_FIELDS:
+            return "timestamp_ms = ?", [parse_date_math(value).timestamp() * 1000]
+        if path in IP_FIELDS:
+            if "/" in str(value):
+                return self.fallback(f)
+            return f"{COLUMNS[path]} = ?", [str(ipaddress.ip_address(str(value)))]
+        if path in TEXT_FIELDS:
+            # The term isn't analyzed, so it only matches a (lowercase) token as is.
+            expected = keyword(value)
+            if not _TOKEN.fullmatch(expected) or expected != expected.lower():
+                return "0", []
+            return self.fts([path], [expected])
+        if path not in COLUMNS:
+            return self.fallback(f)
+        return f"{COLUMNS[path]} = ?", [keyword(value)]
+
+    @staticmethod
+    def exists(path: str, exists: bool) -> Clause:
+        columns = sorted(COLUMNS[c] for c in field_columns(path) if c in COLUMNS)
+        if not columns:
+            return ("0" if exists else "1"), []
+        sql = " OR ".join(f"{column} IS NOT NULL" for column in columns)
+        return (sql if exists else f"NOT ({sql})"), []
+
+    def range(self, f: SearchFilterParams, path: str) -> Clause:
+        if f.value is None and f.gte is None and f.lte is None:
+            return self.exists(path, True)
+        if path in DATE_FIELDS:
+            low, high = date_bounds(
+                None if f.value else f.gte,
+                None if f.value else f.lte,
+                f.value or None,
+            )
+            bounds = [("timestamp_ms >= ?", low), ("timestamp_ms <= ?", high)]
+            finite = [
+                (sql, bound) for sql, bound in bounds if abs(bound) != float("inf")
+            ]
+            if not finite:
+                return "timestamp_ms IS NOT NULL", []
+            return " AND ".join(sql for sql, _ in finite), [b for _, b in finite]
+        if path in IP_FIELDS or path in TEXT_FIELDS or path not in COLUMNS:
+            return self.fallback(f)
+        column = COLUMNS[path]
+        keys = [(f"{column} >= ?", f.gte), (f"{column} <= ?", f.lte)]
+        return (
+            " AND ".join(sql for sql, key in keys if key is not None),
+            [keyword(key) for _, key in keys if key is not None],
+        )
+
+    def text_search(
+        self, f: SearchFilterParams, paths: List[str], query: Any
+    ) -> Clause:
+        """ES `multi_match` (`best_fields`, `or`) semantics over the given fields."""
+        clauses: List[Clause] = []
+        text_fields = [path for path in paths if path in TEXT_FIELDS]
+        tokens = _TOKEN.findall(str(query).lower())
+        if text_fields and tokens:
+            clauses.append(self.fts(text_fields, tokens))
+        try:
+            address: Optional[str] = str(ipaddress.ip_address(str(query)))
+        except ValueError:
+            address = None
+        for path in paths:
+            if path in IP_FIELDS:
+                if address is not None:
+                    clauses.append((f"{COLUMNS[path]} = ?", [address]))
+            elif path in COLUMNS and path not in TEXT_FIELDS | DATE_FIELDS:
+                clauses.append((f"{COLUMNS[path]} = ?", [keyword(query)]))
+        if not clauses:
+            return "0", []
+        return (
+            " OR ".join(f"({sql})" for sql, _ in clauses),
+            [param for _, params in clauses for param in params],
+        )
+
+    def fts(self, fields: List[str], tokens: List[str]) -> Clause:
+        return (
+            f"id IN (SELECT rowid FROM {self.fts_table} WHERE {self.fts_table} MATCH ?)",
+            [fts_match(fields, tokens)],
+        )
+
+    @staticmethod
+    def sort_column(field: str) -> str:
+        """The column a search is sorted by (text and object fields can't be sorted)."""
+        if field in DATE_FIELDS:
+            return "timestamp_ms"
+        if field in TEXT_FIELDS or field not in COLUMNS:
+            raise ValueError(f"Can't sort by the field '{field}'")
+        return COLUMNS[field]
+
+    @staticmethod
+    def aggregations(aggs: Any) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Returns the supported aggregations by name, like
+        `ElasticSearchQueryBuilder.aggregations` compiles them: `terms` and
+        `value_count`, and `nested` (with its last sub-aggregation).
+        """
+        if not isinstance(aggs, dict):
+            raise ValueError("The aggregations must be given by name")
+        result: List[Tuple[str, Dict[str, Any]]] = []
+        for name, values in aggs.items():
+            agg_type = str(_value(values.get("type")))
+            if agg_type in ("terms", "value_count"):
+                result.append(
+                    (name, {"type": agg_type, "field": str(values.get("field"))})
+                )
+            elif agg_type == "nested" and values.get("sub_aggregations"):
+                # ES keeps the last sub-aggregation, under the name `nested`.
+                value = values["sub_aggregations"][-1]
+                result = [(n, a) for n, a in result if n != "nested"]
+                result.append(
+                    (
+                        "nested",
+                        {
+                            "type": "nested",
+                            "path": str(values.get("path")),
+                            "sub_type": str(_value(value.get("type"))),
+                            "field": str(value.get("field")),
+                            "size": value.get("max_result"),
+                        },
+                    )
+                )
+        return result
+
+    @staticmethod
+    def agg_column(agg_type: str, field: str) -> str:
+        if field in DATE_FIELDS:
+            return "timestamp_ms"
+        if field in TEXT_FIELDS or field not in COLUMNS:
+            raise ValueError(f"Can't aggregate ({agg_type}) on the field '{field}'")
+        return COLUMNS[field]
+
+
+def bucket_key(field: str, key: Any) -> Dict[str, Any]:
+    if field in DATE_FIELDS:
+        moment = datetime.fromtimestamp(key / 1000, timezone.utc)
+        return {
+            "key": int(key),
+            "key_as_string": moment.strftime("%Y-%m-%dT%H:%M:%S.")
+            + f"{moment.microsecond // 1000:03d}Z",
+        }
+    return {"key": key}
+
+
+def project(
+    document: Dict[str, Any], fields: List[str], include: bool
+) -> Dict[str, Any]:
+    """Includes (or excludes) the (dotted) fields of a document, like `_source`."""
+    if include:
+        selected: Dict[str, Any] = {}
+        for field in fields:
+            value = getter(field)(document)
+            if value is MISSING:
+                continue
+            *parents, leaf = field.split(".")
+            target = selected
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[leaf] = value
+        return selected
+    result = dict(document)
+    for field in fields:
+        *parents, leaf = field.split(".")
+        target = result
+        for parent in parents:
+            if not isinstance(target.get(parent), dict):
+                break
+            target[parent] = dict(target[parent])
+            target = target[parent]
+        else:
+            target.pop(leaf, None)
+    return result
@@ -0,0 +1,467 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple, cast
+
+from elasticsearch import Elasticsearch, helpers
+
+from audit_logger.archive import sorting
+from audit_logger.custom_logger import get_logger
+from audit_logger.metrics import registry
+from audit_logger.models import SearchParams, StorageForwardSettings, StorageSettings
+from audit_logger.storage.base import StorageBackend
+from audit_logger.storage.sql import (
+    COLUMNS,
+    DEFAULT_TERMS_SIZE,
+    FTS_COLUMNS,
+    INDEXED_COLUMNS,
+    Clause,
+    SQLQueryBuilder,
+    _value,
+    bucket_key,
+    fallback_predicate,
+    project,
+    row_values,
+)
+from audit_logger.utils import bulk_in_flight
+
+logger = get_logger("audit_logger")
+
+STORAGE_FORWARDED = registry.counter(
+    "audit_storage_forwarded_total",
+    "Number of locally stored entries forwarded to Elasticsearch.",
+)
+
+TABLE = "audit_logs"
+# The columns written per entry, in the order of the INSERT statement.
+ROW_COLUMNS = ["doc_id", "index_name", "routing", "timestamp_ms", *COLUMNS.values()]
+
+
+def schema(table: str = TABLE) -> List[str]:
+    """The statements creating the table, its indices and the FTS5 index."""
+    fts = f"{table}_fts"
+    columns = ", ".join(FTS_COLUMNS)
+    new_columns = ", ".join(f"new.{column}" for column in FTS_COLUMNS)
+    old_columns = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+    return [
+        f"""CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY,
+            doc_id TEXT NOT NULL UNIQUE,
+            index_name TEXT NOT NULL,
+            routing TEXT,
+            timestamp_ms REAL,
+            {", ".join(f"{column} TEXT" for column in COLUMNS.values())},
+            document TEXT NOT NULL,
+            forwarded INTEGER NOT NULL DEFAULT 0
+        )""",
+        f"CREATE INDEX IF NOT EXISTS {table}_timestamp_ms "
+        f"ON {table} (index_name, timestamp_ms)",
+        *(
+            f"CREATE INDEX IF NOT EXISTS {table}_{column} "
+            f"ON {table} (index_name, {column})"
+            for column in INDEXED_COLUMNS
+            if column != "timestamp"
+        ),
+        f"CREATE INDEX IF NOT EXISTS {table}_unforwarded "
+        f"ON {table} (id) WHERE forwarded = 0",
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {columns}, content='{table}', content_rowid='id',
+            tokenize="unicode61 tokenchars '_'"
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO {fts} (rowid, {columns}) VALUES (new.id, {new_columns});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {columns})
+            VALUES ('delete', old.id, {old_columns});
+        END""",
+    ]
+
+
+def audit_filter(key: str, document: str) -> bool:
+    """The `audit_filter(filter, document)` SQL function, see `SQLQueryBuilder`."""
+    return fallback_predicate(key)(json.loads(document))
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Stores the entries in an embedded SQLite database, for the sites without an
+    Elasticsearch cluster. Every field of the index mapping has its own (indexed)
+    column next to the JSON document, the text fields are indexed by FTS5. The
+    entries of a bulk are inserted in transactions of `batch_size` entries.
+
+    The database is opened in WAL mode, with a connection per thread, so the
+    searches don't block on the inserts and the workers share the same file.
+
+    Args:
+    - settings (StorageSettings): The database file and batch settings.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, settings: StorageSettings) -> None:
+        self.settings = settings
+        self.path = settings.path
+        self.builder = SQLQueryBuilder(TABLE)
+        self.forwarder: Optional[Forwarder] = None
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._insert = (
+            f"INSERT INTO {TABLE} ({', '.join(ROW_COLUMNS)}, document) "
+            f"VALUES ({', '.join('?' for _ in ROW_COLUMNS)}, ?)"
+        )
+        connection = self.connection()
+        try:
+            for statement in schema(TABLE):
+                connection.execute(statement)
+        except sqlite3.OperationalError as e:
+            if "fts5" in str(e):
+                raise RuntimeError(
+                    "The sqlite storage requires SQLite with the FTS5 extension"
+                ) from e
+            raise
+
+    def connection(self) -> sqlite3.Connection:
+        """Returns the connection of the current thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Only used by its thread, `close` closes the connections of all threads.
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.settings.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.create_function(
+                "audit_filter", 2, audit_filter, deterministic=True
+            )
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def bulk(self, operations: List[Dict[str, Any]]) -> Tuple[int, List[Dict]]:
+        with bulk_in_flight:
+            return self.insert(operations)
+
+    def insert(self, operations: List[Dict[str, Any]]) -> Tuple[int, List[Dict]]:
+        connection = self.connection()
+        success_count = 0
+        failed_items: List[Dict] = []
+        batch_size = self.settings.batch_size
+        for offset in range(0, len(operations), batch_size):
+            chunk = operations[offset : offset + batch_size]  # noqa: E203
+            rows = []
+            for operation in chunk:
+                document = operation["_source"]
+                values = row_values(document)
+                values.update(
+                    doc_id=uuid.uuid4().hex,
+                    index_name=operation["_index"],
+                    routing=operation.get("_routing"),
+                )
+                rows.append(
+                    [values[column] for column in ROW_COLUMNS]
+                    + [json.dumps(document, default=str)]
+                )
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany(self._insert, rows)
+                connection.execute("COMMIT")
+            except sqlite3.Error as e:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                logger.error("[Storage] Failed to insert %d entries: %s", len(rows), e)
+                failed_items.extend(
+                    {"index": {"_index": operation["_index"], "error": str(e)}}
+                    for operation in chunk
+                )
+                continue
+            success_count += len(rows)
+        return success_count, failed_items
+
+    def search(
+        self,
+        params: SearchParams,
+        index: str,
+        routing: Optional[str] = None,
+        slow_query_threshold_ms: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        where, where_params = self.builder.where(index, params.filters or [])
+        sort_by, descending = sorting(params)
+        column = self.builder.sort_column(sort_by)
+        aggs = self.builder.aggregations(params.aggs) if params.aggs else []
+        limit = params.max_results or 500
+        query = (
+            f"SELECT document FROM {TABLE} WHERE {where} ORDER BY {column} "
+            f"{'DESC' if descending else 'ASC'} NULLS LAST, id LIMIT ?"
+        )
+        timings["build"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        connection = self.connection()
+        # A single read transaction, so the hits and aggregations are consistent.
+        connection.execute("BEGIN")
+        try:
+            rows = connection.execute(query, [*where_params, limit]).fetchall()
+            (total,) = connection.execute(
+                f"SELECT COUNT(*) FROM {TABLE} WHERE {where}", where_params
+            ).fetchone()
+            results = [
+                self.aggregate(connection, agg, (where, where_params))
+                for _, agg in aggs
+            ]
+        finally:
+            connection.execute("COMMIT")
+        timings["execute"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        fields = [str(_value(f)) for f in params.fields or []]
+        include = _value(params.fields_mode) != "exclude"
+        docs = [json.loads(document) for (document,) in rows]
+        if fields:
+            docs = [project(document, fields, include) for document in docs]
+        result: Dict[str, Any] = {"docs": docs, "aggs": results, "index_size": total}
+        timings["serialize"] = (time.perf_counter() - start) * 1000
+
+        total_ms = sum(timings.values())
+        is_slow = (
+            slow_query_threshold_ms is not None and total_ms >= slow_query_threshold_ms
+        )
+        if is_slow or params.profile:
+            report = {
+                "query_hash": hashlib.sha1(
+                    json.dumps([query, where_params], default=str).encode("utf-8")
+                ).hexdigest(),
+                "took_ms": round(timings["execute"]),
+                "hits": len(docs),
+                "total_hits": total,
+                "total_ms": round(total_ms, 3),
+                "phases_ms": {k: round(v, 3) for k, v in timings.items()},
+            }
+            if is_slow:
+                logger.warning(
+                    "[SlowQuery] %s",
+                    json.dumps({**report, "index": index, "query": query}, default=str),
+                )
+            if params.profile:
+                plan = connection.execute(
+                    f"EXPLAIN QUERY PLAN {query}", [*where_params, limit]
+                ).fetchall()
+                result["profile"] = {**report, "sqlite": [row[-1] for row in plan]}
+        return result
+
+    def aggregate(
+        self, connection: sqlite3.Connection, agg: Dict[str, Any], where: Clause
+    ) -> Dict[str, Any]:
+        """Runs a single aggregation over the matching entries (ES response format)."""
+        condition, condition_params = where
+        if agg["type"] == "nested":
+            parent, _ = self.builder.exists(agg["path"], True)
+            nested = (f"{condition} AND ({parent})", condition_params)
+            (count,) = connection.execute(
+                f"SELECT COUNT(*) FROM {TABLE} WHERE {nested[0]}", nested[1]
+            ).fetchone()
+            sub_agg = {
+                "type": agg["sub_type"],
+                "field": agg["field"],
+                "size": agg["size"],
+            }
+            return {
+                "doc_count": count,
+                agg["sub_type"]: self.aggregate(connection, sub_agg, nested),
+            }
+        field = agg["field"]
+        column = self.builder.agg_column(agg["type"], field)
+        (count,) = connection.execute(
+            f"SELECT COUNT({column}) FROM {TABLE} WHERE {condition}", condition_params
+        ).fetchone()
+        if agg["type"] == "value_count":
+            return {"value": count}
+        buckets = connection.execute(
+            f"SELECT {column}, COUNT(*) AS doc_count FROM {TABLE} "
+            f"WHERE {condition} AND {column} IS NOT NULL "
+            f"GROUP BY {column} ORDER BY doc_count DESC, {column} LIMIT ?",
+            [*condition_params, agg.get("size") or DEFAULT_TERMS_SIZE],
+        ).fetchall()
+        return {
+            "doc_count_error_upper_bound": 0,
+            "sum_other_doc_count": count - sum(doc_count for _, doc_count in buckets),
+            "buckets": [
+                {**bucket_key(field, key), "doc_count": doc_count}
+                for key, doc_count in buckets
+            ],
+        }
+
+    def unforwarded(self, limit: int) -> List[Tuple[int, str, str, Optional[str], str]]:
+        """Returns the oldest entries not forwarded to Elasticsearch yet."""
+        return (
+            self.connection()
+            .execute(
+                f"SELECT id, doc_id, index_name, routing, document FROM {TABLE} "
+                "WHERE forwarded = 0 ORDER BY id LIMIT ?",
+                [limit],
+            )
+            .fetchall()
+        )
+
+    def mark_forwarded(self, ids: List[int]) -> None:
+        connection = self.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                f"UPDATE {TABLE} SET forwarded = 1 WHERE id = ?", [(i,) for i in ids]
+            )
+        finally:
+            connection.execute("COMMIT")
+
+    def pending(self) -> int:
+        """Returns the number of entries not forwarded to Elasticsearch yet."""
+        (count,) = (
+            self.connection()
+            .execute(f"SELECT COUNT(*) FROM {TABLE} WHERE forwarded = 0")
+            .fetchone()
+        )
+        return int(count)
+
+    def collect(self) -> Iterator[Any]:
+        if self.forwarder is None:
+            return
+        yield (
+            "audit_storage_unforwarded_entries",
+            "gauge",
+            "Number of locally stored entries not forwarded to Elasticsearch yet.",
+            (),
+            {(): float(self.pending())},
+        )
+
+    def start_forwarding(
+        self, client: Elasticsearch, settings: StorageForwardSettings
+    ) -> None:
+        """Starts forwarding the entries to Elasticsearch in the background."""
+        self.forwarder = Forwarder(self, client, settings)
+        self.forwarder.start()
+        registry.register_collector(self.collect)
+
+    def close(self) -> None:
+        if self.forwarder:
+            self.forwarder.shutdown()
+            self.forwarder.client.close()
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+
+class Forwarder:
+    """
+    Forwards the entries of the SQLite storage to Elasticsearch, once it's
+    reachable. Every `interval` seconds, the unforwarded entries are sent in bulk
+    requests of `batch_size` entries, with their storage ID as document `_id`, so
+    sending an entry again (after a failure, or by another worker) overwrites it
+    instead of duplicating it. The entries are kept locally (and searchable).
+
+    Args:
+    - storage (SQLiteStorage): The storage.
+    - client (Elasticsearch): The client the entries are forwarded with.
+    - settings (StorageForwardSettings): The interval and batch size.
+    """
+
+    def __init__(
+        self,
+        storage: SQLiteStorage,
+        client: Elasticsearch,
+        settings: StorageForwardSettings,
+    ) -> None:
+        self.storage = storage
+        self.client = client
+        self.settings = settings
+        self.reachable: Optional[bool] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="storage-forwarder", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.settings.interval):
+            try:
+                self.forward()
+            except Exception as e:
+                logger.error("[Storage] Failed to forward the entries: %s", e)
+
+    def ping(self) -> bool:
+        try:
+            reachable = bool(self.client.ping())
+        except Exception:
+            reachable = False
+        if reachable != self.reachable:
+            logger.info(
+                "[Storage] Elasticsearch is %s",
+                "reachable, forwarding" if reachable else "not reachable",
+            )
+            self.reachable = reachable
+        return reachable
+
+    def forward(self) -> int:
+        """Forwards the unforwarded entries, returns the number of forwarded entries."""
+        if not self.ping():
+            return 0
+        forwarded = 0
+        while not self._stopped.is_set():
+            rows = self.storage.unforwarded(self.settings.batch_size)
+            if not rows:
+                break
+            ids = {doc_id: row_id for row_id, doc_id, *_ in rows}
+            operations = [
+                {
+                    "_op_type": "index",
+                    "_index": index_name,
+                    "_id": doc_id,
+                    "_source": json.loads(document),
+                    **({"_routing": routing} if routing else {}),
+                }
+                for _, doc_id, index_name, routing, document in rows
+            ]
+            _, errors = helpers.bulk(
+                self.client, operations, raise_on_error=False, stats_only=False
+            )
+            failed = {
+                item.get(op, {}).get("_id")
+                for item in cast(List[Dict[str, Any]], errors)
+                for op in item
+            }
+            done = [row_id for doc_id, row_id in ids.items() if doc_id not in failed]
+            if done:
+                self.storage.mark_forwarded(done)
+                STORAGE_FORWARDED.inc(len(done))
+                forwarded += len(done)
+            if failed:
+                logger.error(
+                    "[Storage] %d entries were rejected by Elasticsearch", len(failed)
+                )
+                break
+        if forwarded:
+            logger.info("[Storage] Forwarded %d entries to Elasticsearch", forwarded)
+        return forwarded
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,345 @@
+import argparse
+import gzip
+import itertools
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import IO, Any, Dict, Iterator, List, Optional, Sequence
+
+from audit_logger.custom_logger import get_logger
+
+logger = get_logger("audit_logger")
+
+EVENT_NAMES = ["user_login", "user_logout", "data_backup", "file_access", "role_update"]
+ACTIONS = ["create", "update", "delete", "login"]
+APPLICATION_NAMES = [
+    "user-management-service",
+    "login-frontend",
+    "payment-gateway",
+    "logging-service",
+    "data-backup-service",
+]
+MODULES = [
+    "authentication",
+    "authorization",
+    "database-client",
+    "ui-notifications",
+    "cronjob",
+]
+CONTEXTS = ["user_management", "system_backup", "content_delivery", "security"]
+RESOURCE_TYPES = ["user_account", "database", "cronjob", "system_file"]
+OPERATIONS = ["create", "read", "update", "delete"]
+
+# Share of the actors that are of type `system` (service accounts).
+SYSTEM_ACTOR_RATIO = 0.1
+
+
+class ValuePools:
+    """
+    Pre-generated value pools the synthetic entries are sampled from.
+
+    Faker is only used (and imported) here, once per pool set, so generating
+    entries doesn't call Faker at all.
+    """
+
+    def __init__(self, size: int = 1000, actors: int = 500, seed: int = 0) -> None:
+        from faker import Faker
+
+        fake = Faker()
+        fake.seed_instance(seed)
+        rng = random.Random(seed)
+
+        self.sentences = [fake.sentence() for _ in range(size)]
+        self.endpoints = [fake.uri_path() for _ in range(size)]
+        self.user_agents = [fake.user_agent() for _ in range(max(1, size // 10))]
+        self.hostnames = [fake.hostname() for _ in range(max(1, size // 20))]
+        self.vm_names = [fake.word() for _ in range(len(self.hostnames))]
+        self.server_ips = [fake.ipv4_private() for _ in range(len(self.hostnames))]
+
+        # Every actor keeps its type, IP address and user agent, so the
+        # generated corpus has stable, realistic per-actor behaviour.
+        self.actors: List[Dict[str, Any]] = []
+        for i in range(actors):
+            is_system = rng.random() < SYSTEM_ACTOR_RATIO
+            self.actors.append(
+                {
+                    "identifier": (
+                        f"svc-{fake.word()}-{i}" if is_system else f"{fake.user_name()}"
+                    ),
+                    "type": "system" if is_system else "user",
+                    "ip_address": fake.ipv4(),
+                    "user_agent": rng.choice(self.user_agents),
+                }
+            )
+
+
+@lru_cache(maxsize=4)
+def value_pools(size: int = 1000, actors: int = 500, seed: int = 0) -> ValuePools:
+    """Returns the (cached) value pools for the given size, actors and seed."""
+    return ValuePools(size=size, actors=actors, seed=seed)
+
+
+def zipf_cum_weights(count: int, skew: float) -> List[float]:
+    """Returns the cumulative weights of a Zipf distribution over `count` ranks."""
+    return list(
+        itertools.accumulate(1.0 / (rank**skew) for rank in range(1, count + 1))
+    )
+
+
+class SyntheticGenerator:
+    """
+    Generates synthetic audit log entries column by column: every field of a
+    batch is sampled with a single `random.choices` call from the value pools,
+    and the columns are zipped into JSON compatible (ready-to-index) dicts.
+
+    Args:
+    - pools (Optional[ValuePools]): The value pools (default: the cached pools).
+    - seed (Optional[int]): Seed of the sampling, for reproducible corpora.
+    - actor_skew (float): Zipf exponent of the actor distribution (0 = uniform).
+    - error_rate (float): Share of entries with the status `failure`.
+    - burst_ratio (float): Share of entries placed inside bursts.
+    - bursts (int): The number of bursts within the time window.
+    - burst_width (float): Standard deviation of a burst, in seconds.
+    - start (Optional[datetime]): Start of the time window (default: 7 days ago).
+    - end (Optional[datetime]): End of the time window (default: now).
+    """
+
+    def __init__(
+        self,
+        pools: Optional[ValuePools] = None,
+        seed: Optional[int] = None,
+        actor_skew: float = 1.1,
+        error_rate: float = 0.05,
+        burst_ratio: float = 0.3,
+        bursts: int = 24,
+        burst_width: float = 120.0,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> None:
+        self.pools = pools or value_pools()
+        self.rng = random.Random(seed)
+        self.error_rate = error_rate
+        self.burst_ratio = burst_ratio
+        self.burst_width = burst_width
+
+        self.end = (end or datetime.now(timezone.utc)).timestamp()
+        self.start = (
+            start or datetime.now(timezone.utc) - timedelta(days=7)
+        ).timestamp()
+        if self.start >= self.end:
+            raise ValueError("The start of the time window must be before its end.")
+        self.burst_centers = sorted(
+            self.rng.uniform(self.start, self.end) for _ in range(max(1, bursts))
+        )
+        self.actor_cum_weights = zipf_cum_weights(len(self.pools.actors), actor_skew)
+        # Actors are shuffled once, so the heavy hitters aren't the first pool entries.
+        self.actors = list(self.pools.actors)
+        self.rng.shuffle(self.actors)
+
+    def timestamps(self, count: int) -> List[str]:
+        """Returns `count` sorted ISO 8601 timestamps (uniform background + bursts)."""
+        rng = self.rng
+        in_bursts = sum(1 for _ in range(count) if rng.random() < self.burst_ratio)
+        values = [rng.uniform(self.start, self.end) for _ in range(count - in_bursts)]
+        centers = rng.choices(self.burst_centers, k=in_bursts)
+        values.extend(
+            min(self.end, max(self.start, c + rng.gauss(0, self.burst_width)))
+            for c in centers
+        )
+        values.sort()
+        return [
+            datetime.fromtimestamp(v, timezone.utc).isoformat(timespec="milliseconds")
+            for v in values
+        ]
+
+    def entries(self, count: int) -> List[Dict[str, Any]]:
+        """
+        Generates a batch of synthetic audit log entries.
+
+        Args:
+        - count (int): The number of entries.
+
+        Returns:
+        - List[Dict[str, Any]]: The entries, sorted by timestamp.
+        """
+        rng, pools = self.rng, self.pools
+        choices = rng.choices
+
+        actors = choices(self.actors, cum_weights=self.actor_cum_weights, k=count)
+        servers = choices(range(len(pools.hostnames)), k=count)
+        failures = [rng.random() < self.error_rate for _ in range(count)]
+
+        return [
+            {
+                "timestamp": timestamp,
+                "event_name": event_name,
+                "actor": dict(actor),
+                "application_name": application_name,
+                "module": module,
+                "action": action,
+                "comment": comment,
+                "context": context,
+                "resource": {
+                    "type": resource_type,
+                    "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                },
+                "operation": operation,
+                "status": "failure" if failed else "success",
+                "endpoint": endpoint,
+                "server": {
+                    "hostname": pools.hostnames[server],
+                    "vm_name": pools.vm_names[server],
+                    "ip_address": pools.server_ips[server],
+                },
+                "meta": {
+                    "request_size": rng.randrange(100, 100000),
+                    # Failures are slower and the latencies are long-tailed.
+                    "response_time_ms": min(
+                        30000, int(rng.lognormvariate(5.5 if failed else 4.0, 0.8))
+                    ),
+                },
+            }
+            for (
+                timestamp,
+                event_name,
+                actor,
+                application_name,
+                module,
+                action,
+                comment,
+                context,
+                resource_type,
+                operation,
+                failed,
+                endpoint,
+                server,
+            ) in zip(
+                self.timestamps(count),
+                choices(EVENT_NAMES, k=count),
+                actors,
+                choices(APPLICATION_NAMES, k=count),
+                choices(MODULES, k=count),
+                choices(ACTIONS, k=count),
+                choices(pools.sentences, k=count),
+                choices(CONTEXTS, k=count),
+                choices(RESOURCE_TYPES, k=count),
+                choices(OPERATIONS, k=count),
+                failures,
+                choices(pools.endpoints, k=count),
+                servers,
+            )
+        ]
+
+    def batches(self, total: int, batch_size: int = 500) -> Iterator[List[Dict]]:
+        """Yields batches of entries until `total` entries have been generated."""
+        for offset in range(0, total, batch_size):
+            yield self.entries(min(batch_size, total - offset))
+
+
+def to_bulk_ndjson(index_name: str, entries: Sequence[Dict[str, Any]]) -> bytes:
+    """
+    Serializes entries to the NDJSON body of an Elasticsearch `_bulk` request.
+
+    Args:
+    - index_name (str): The target index.
+    - entries (Sequence[Dict[str, Any]]): The JSON compatible entries.
+
+    Returns:
+    - bytes: The action/source line pairs, newline terminated.
+    """
+    action = json.dumps({"index": {"_index": index_name}}, separators=(",", ":"))
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    return "".join(f"{action}\n{dumps(entry)}\n" for entry in entries).encode("utf-8")
+
+
+def write_corpus(
+    output: IO[bytes],
+    generator: SyntheticGenerator,
+    total: int,
+    index_name: Optional[str] = None,
+    batch_size: int = 500,
+) -> int:
+    """
+    Streams `total` entries to `output`, either as `_bulk` bodies (one per batch,
+    when `index_name` is given) or as plain NDJSON documents.
+
+    Returns:
+    - int: The number of bytes written.
+    """
+    written = 0
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    for batch in generator.batches(total, batch_size):
+        if index_name:
+            data = to_bulk_ndjson(index_name, batch)
+        else:
+            data = "".join(f"{dumps(entry)}\n" for entry in batch).encode("utf-8")
+        output.write(data)
+        written += len(data)
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Writes a synthetic audit log corpus (NDJSON) for load tests."
+    )
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument(
+        "--output", default="-", help="Output file, '-' for stdout, '.gz' to compress."
+    )
+    parser.add_argument(
+        "--index",
+        help="Write `_bulk` request bodies for this index instead of plain documents.",
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--actors", type=int, default=500)
+    parser.add_argument("--actor-skew", type=float, default=1.1)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--burst-ratio", type=float, default=0.3)
+    parser.add_argument("--days", type=float, default=7.0)
+    parser.add_argument(
+        "--end",
+        type=datetime.fromisoformat,
+        help="End of the time window (ISO 8601, default: now).",
+    )
+    args = parser.parse_args(argv)
+
+    end = args.end or datetime.now(timezone.utc)
+    generator = SyntheticGenerator(
+        pools=value_pools(actors=args.actors, seed=args.seed or 0),
+        seed=args.seed,
+        actor_skew=args.actor_skew,
+        error_rate=args.error_rate,
+        burst_ratio=args.burst_ratio,
+        start=end - timedelta(days=args.days),
+        end=end,
+    )
+
+    start = time.perf_counter()
+    if args.output == "-":
+        written = write_corpus(
+            sys.stdout.buffer, generator, args.count, args.index, args.batch_size
+        )
+    else:
+        opener: Any = gzip.open if args.output.endswith(".gz") else open
+        with opener(args.output, "wb") as f:
+            written = write_corpus(
+                f, generator, args.count, args.index, args.batch_size
+            )
+    elapsed = time.perf_counter() - start
+
+    logger.info(
+        "[Synthetic] %d entries (%.1f MB) written in %.2fs (%.0f entries/s)",
+        args.count,
+        written / 1e6,
+        elapsed,
+        args.count / elapsed if elapsed else 0,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import asyncio
+import json
+from collections import deque
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from audit_logger.custom_logger import get_logger
+from audit_logger.metrics import registry
+from audit_logger.predicates import Predicate, compile_predicate
+from audit_logger.responses import dumps
+
+if TYPE_CHECKING:
+    from audit_logger.models import SearchFilterParams
+
+logger = get_logger("audit_logger")
+
+TAIL_SUBSCRIBERS = registry.gauge(
+    "audit_tail_subscribers",
+    "Number of connected `/tail` subscribers.",
+)
+TAIL_EVENTS = registry.counter(
+    "audit_tail_events_total",
+    "Number of audit log entries pushed to `/tail` subscribers.",
+)
+TAIL_DROPPED = registry.counter(
+    "audit_tail_dropped_total",
+    "Number of audit log entries dropped from full `/tail` subscriber queues.",
+)
+
+
+def filters_key(filters: List["SearchFilterParams"]) -> str:
+    """Returns a canonical key of the filters, shared by identical subscriptions."""
+    return json.dumps(
+        [f.model_dump(mode="json", exclude_none=True) for f in filters], sort_keys=True
+    )
+
+
+class TailSubscription:
+    """
+    The bounded queue of a single subscriber. Once full, the oldest entries are
+    dropped (and counted), so a slow consumer never slows down the ingest path.
+    """
+
+    def __init__(self, queue_size: int) -> None:
+        self.queue: Deque[Dict[str, Any]] = deque(maxlen=queue_size)
+        self.dropped = 0
+        self.event = asyncio.Event()
+
+    def push(self, document: Dict[str, Any]) -> None:
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+            TAIL_DROPPED.inc()
+        self.queue.append(document)
+        self.event.set()
+
+    async def get(self, timeout: float) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Waits up to `timeout` seconds for entries and returns all queued entries
+        and the number of entries dropped since the last call.
+        """
+        if not self.queue:
+            self.event.clear()
+            try:
+                await asyncio.wait_for(self.event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        documents = list(self.queue)
+        self.queue.clear()
+        dropped, self.dropped = self.dropped, 0
+        return documents, dropped
+
+
+class TailHub:
+    """
+    Fans the indexed audit log entries out to the `/tail` subscribers. The
+    subscriptions with identical filters (and index) share a single compiled
+    predicate, so every entry is matched once per distinct filter set.
+
+    Args:
+    - queue_size (int): The max. number of queued entries per subscriber.
+    - max_subscribers (int): The max. number of concurrent subscribers.
+    """
+
+    def __init__(self, queue_size: int = 1000, max_subscribers: int = 1000) -> None:
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.subscribers = 0
+        self._groups: Dict[
+            Tuple[Optional[str], str], Tuple[Predicate, Set[TailSubscription]]
+        ] = {}
+
+    def resize(self, queue_size: int, max_subscribers: int) -> None:
+        """
+        Changes the limits in place. The queues of the connected subscribers are
+        resized as well (dropping their oldest entries if shrunk).
+        """
+        self.max_subscribers = max_subscribers
+        if queue_size == self.queue_size:
+            return
+        self.queue_size = queue_size
+        for _, subscriptions in self._groups.values():
+            for subscription in subscriptions:
+                subscription.queue = deque(subscription.queue, maxlen=queue_size)
+
+    def subscribe(
+        self, filters: List["SearchFilterParams"], index: Optional[str] = None
+    ) -> TailSubscription:
+        """
+        Registers a subscriber for the entries matching all `filters`, only those
+        written to `index` if given (e.g. the index of the subscriber's tenant).
+
+        Raises:
+        - ValueError: For invalid filter values.
+        - OverflowError: If the max. number of subscribers is reached.
+        """
+        if self.subscribers >= self.max_subscribers:
+            raise OverflowError("Too many tail subscribers")
+        key = (index, filters_key(filters))
+        if key not in self._groups:
+            self._groups[key] = (compile_predicate(filters), set())
+        subscription = TailSubscription(self.queue_size)
+        self._groups[key][1].add(subscription)
+        self.subscribers += 1
+        TAIL_SUBSCRIBERS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: TailSubscription) -> None:
+        for key, (_, subscriptions) in list(self._groups.items()):
+            if subscription in subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._groups[key]
+                self.subscribers -= 1
+                TAIL_SUBSCRIBERS.dec()
+                return
+
+    def publish(
+        self, documents: List[Dict[str, Any]], index: Optional[str] = None
+    ) -> None:
+        """Pushes the documents indexed into `index` to the matching subscribers."""
+        pushed = 0
+        for (group_index, _), (predicate, subscriptions) in list(self._groups.items()):
+            if group_index is not None and group_index != index:
+                continue
+            for document in documents:
+                if predicate(document):
+                    for subscription in subscriptions:
+                        subscription.push(document)
+                    pushed += len(subscriptions)
+        if pushed:
+            TAIL_EVENTS.inc(pushed)
+
+    async def stream(
+        self, subscription: TailSubscription, heartbeat_interval: float = 15.0
+    ) -> AsyncIterator[str]:
+        """
+        Yields the Server-Sent Events of a subscription: an `audit_log` event per
+        entry, a `dropped` event after entries were dropped and a comment line as
+        heartbeat. The subscription is removed once the client disconnects.
+        """
+        try:
+            yield ": connected\n\n"
+            while True:
+                documents, dropped = await subscription.get(heartbeat_interval)
+                if dropped:
+                    yield f"event: dropped\ndata: {json.dumps({'dropped': dropped})}\n\n"
+                if not documents:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield "".join(
+                    f"event: audit_log\ndata: {dumps(document).decode('utf-8')}\n\n"
+                    for document in documents
+                )
+        finally:
+            self.unsubscribe(subscription)
+
+
+def publish_to(
+    hub: Optional[TailHub], documents: List[Dict[str, Any]], index: Optional[str] = None
+) -> None:
+    """Publishes the documents if a hub has subscribers, logging (not raising) errors."""
+    if hub is None or not hub.subscribers:
+        return
+    try:
+        hub.publish(documents, index)
+    except Exception as e:
+        logger.error("[Tail] Failed to publish entries: %s", e)
@@ -0,0 +1,206 @@
+import hashlib
+import hmac
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+from audit_logger.admission import Rejected, TokenBucket
+from audit_logger.custom_logger import get_logger
+from audit_logger.metrics import registry
+
+if TYPE_CHECKING:
+    from audit_logger.models import Authentication, TenantSettings
+
+logger = get_logger("audit_logger")
+
+TENANT_DOCUMENTS = registry.counter(
+    "audit_tenant_documents_total",
+    "Number of audit log entries accepted per tenant.",
+    ("tenant",),
+)
+TENANT_THROTTLED = registry.counter(
+    "audit_tenant_throttled_total",
+    "Number of requests rejected because a tenant quota was exceeded.",
+    ("tenant", "quota"),
+)
+
+# The tenant of the legacy `authentication.api_key`.
+DEFAULT_TENANT = "default"
+
+
+def hash_api_key(api_key: str) -> str:
+    """Returns the SHA-256 hex digest of an API key, as used for the key lookup."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class Tenant:
+    """
+    A producer of audit logs: the index (or alias) and routing key its entries are
+    written to and searched in, and its quotas. The index isn't shared with other
+    tenants, it's what isolates their entries (the routing key only selects the
+    shards). The quota state is kept across
+    reloads of the tenant's settings.
+
+    Args:
+    - name (str): The name of the tenant.
+    - index (str): The index or alias of the tenant.
+    - settings (Optional[TenantSettings]): The routing and quotas (none if not given).
+    """
+
+    def __init__(
+        self, name: str, index: str, settings: Optional["TenantSettings"] = None
+    ) -> None:
+        self.name = name
+        # Key of the signatures of the IDs handed out to the tenant.
+        self.secret = b""
+        self.searches = 0
+        self.quota: Optional[TokenBucket] = None
+        self._lock = threading.Lock()
+        self.configure(index, settings)
+
+    def configure(self, index: str, settings: Optional["TenantSettings"]) -> None:
+        self.index = index
+        self.routing = settings.routing if settings else None
+        self.max_concurrent_searches = (
+            settings.max_concurrent_searches if settings else None
+        )
+        rate = settings.docs_per_second if settings else None
+        if not rate or not settings:
+            self.quota = None
+            return
+        burst = settings.burst or rate
+        if self.quota is not None:
+            # Resized in place, so a reload doesn't refill the bucket.
+            self.quota.rate = rate
+            self.quota.burst = burst
+            self.quota.tokens = min(self.quota.tokens, burst)
+        else:
+            self.quota = TokenBucket(rate, burst)
+
+    def sign(self, value: str) -> str:
+        """Returns `value` with the tenant's signature appended (`<value>.<signature>`)."""
+        signature = hmac.new(self.secret, value.encode("utf-8"), hashlib.sha256)
+        return f"{value}.{signature.hexdigest()[:32]}"
+
+    def unsign(self, signed: str) -> Optional[str]:
+        """Returns the value of `sign`, `None` if it wasn't signed for this tenant."""
+        value, _, signature = signed.rpartition(".")
+        if not value or not hmac.compare_digest(self.sign(value), signed):
+            return None
+        return value
+
+    def take_documents(self, count: int, retry_after: float = 1.0) -> None:
+        """
+        Counts `count` entries against the document quota. A bulk larger than the
+        burst is admitted once the bucket is full, and paid off afterwards.
+
+        Raises:
+        - Rejected: `429` if the tenant exceeded its documents per second.
+        """
+        if self.quota is not None:
+            wait = self.quota.take(count)
+            if wait:
+                TENANT_THROTTLED.labels(self.name, "documents").inc()
+                raise Rejected(429, "documents_quota", max(wait, retry_after))
+        TENANT_DOCUMENTS.labels(self.name).inc(count)
+
+    @contextmanager
+    def search_slot(self, retry_after: float = 1.0) -> Iterator[None]:
+        """
+        Holds one of the tenant's concurrent search slots.
+
+        Raises:
+        - Rejected: `429` if the tenant already runs `max_concurrent_searches`.
+        """
+        with self._lock:
+            limit = self.max_concurrent_searches
+            if limit is not None and self.searches >= limit:
+                TENANT_THROTTLED.labels(self.name, "searches").inc()
+                raise Rejected(429, "searches_quota", retry_after)
+            self.searches += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.searches -= 1
+
+
+class TenantRegistry:
+    """
+    Maps the API keys to their tenants. The keys are looked up by their SHA-256
+    digest in a dict, so the lookup takes the same time for every key, and the
+    configured keys can be given as digests (`api_key_hashes`) instead of in plain.
+
+    `configure` builds the new key map aside and swaps it in with a single
+    assignment, so it can be called again (e.g. on a config reload) while requests
+    are served. Tenants which are kept (by name) keep their quota state.
+    """
+
+    def __init__(self) -> None:
+        self.tenants: Dict[str, Tenant] = {}
+        self._keys: Dict[str, Tenant] = {}
+
+    @staticmethod
+    def check(authentication: "Authentication", default_index: str) -> None:
+        """
+        Raises:
+        - ValueError: If a tenant shares the index of the `default` tenant.
+        """
+        for settings in authentication.tenants:
+            if authentication.api_key and settings.index == default_index:
+                raise ValueError(
+                    f"Tenant '{settings.name}' shares the index '{default_index}' "
+                    f"of the '{DEFAULT_TENANT}' tenant."
+                )
+
+    def configure(self, authentication: "Authentication", default_index: str) -> None:
+        """
+        Raises:
+        - ValueError: If a tenant shares the index of the `default` tenant.
+        """
+        self.check(authentication, default_index)
+        tenants: Dict[str, Tenant] = {}
+        keys: Dict[str, Tenant] = {}
+
+        def add(name: str, index: str, settings: Optional["TenantSettings"]) -> Tenant:
+            tenant = self.tenants.get(name)
+            if tenant is None:
+                tenant = Tenant(name, index, settings)
+            else:
+                tenant.configure(index, settings)
+            tenants[name] = tenant
+            return tenant
+
+        if authentication.api_key:
+            keys[hash_api_key(authentication.api_key)] = add(
+                DEFAULT_TENANT, default_index, None
+            )
+        for settings in authentication.tenants:
+            tenant = add(settings.name, settings.index, settings)
+            for digest in [hash_api_key(key) for key in settings.api_keys] + [
+                digest.lower() for digest in settings.api_key_hashes
+            ]:
+                keys[digest] = tenant
+
+        # The secret is derived from the tenant's keys, so it's the same in every
+        # worker, and the signed IDs expire with a key change.
+        digests: Dict[str, List[str]] = {}
+        for digest, tenant in keys.items():
+            digests.setdefault(tenant.name, []).append(digest)
+        for tenant in tenants.values():
+            material = "\n".join([tenant.name, *sorted(digests.get(tenant.name, []))])
+            tenant.secret = hashlib.sha256(material.encode("utf-8")).digest()
+
+        self.tenants, self._keys = tenants, keys
+        logger.info(
+            "[Tenants] %d tenant(s) with %d API key(s) configured",
+            len(tenants),
+            len(keys),
+        )
+
+    def lookup(self, api_key: str) -> Optional[Tenant]:
+        """Returns the tenant of an API key (`None` for unknown keys)."""
+        return self._keys.get(hash_api_key(api_key))
+
+
+tenants = TenantRegistry()
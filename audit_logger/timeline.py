@@ -0,0 +1,296 @@
+import base64
+import json
+import threading
+import uuid
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+
+from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import BadRequestError
+
+from audit_logger.custom_logger import get_logger
+from audit_logger.metrics import registry
+from audit_logger.utils import bulk_index
+
+if TYPE_CHECKING:
+    from audit_logger.models import TimelineSettings
+
+logger = get_logger("audit_logger")
+
+TIMELINE_ENTRIES = registry.counter(
+    "audit_timeline_entries_total",
+    "Number of entries written to the actor timeline indices per outcome.",
+    ("outcome",),
+)
+
+# The unique tiebreaker of the entries with the same timestamp.
+TIEBREAKER = "timeline_id"
+SORT = [{"timestamp": "desc"}, {TIEBREAKER: "desc"}]
+
+# Like the mapping of the audit log index, but `actor`, `resource` and `server`
+# are plain objects: a timeline is filtered by a single `term` query, without
+# the nested (block join) queries.
+TIMELINE_MAPPINGS: Dict[str, Any] = {
+    "_routing": {"required": True},
+    "properties": {
+        TIEBREAKER: {"type": "keyword"},
+        "timestamp": {"type": "date"},
+        "event_name": {"type": "keyword"},
+        "actor": {
+            "properties": {
+                "identifier": {"type": "keyword"},
+                "type": {"type": "keyword"},
+                "ip_address": {"type": "ip"},
+                "user_agent": {"type": "keyword"},
+            }
+        },
+        "application_name": {"type": "keyword"},
+        "module": {"type": "keyword"},
+        "action": {"type": "keyword"},
+        "comment": {"type": "text"},
+        "context": {"type": "keyword"},
+        "resource": {
+            "properties": {"type": {"type": "keyword"}, "id": {"type": "keyword"}}
+        },
+        "operation": {"type": "keyword"},
+        "status": {"type": "keyword"},
+        "endpoint": {
+            "type": "text",
+            "fields": {"keyword": {"type": "keyword", "ignore_above": 256}},
+        },
+        "server": {
+            "properties": {
+                "hostname": {"type": "keyword"},
+                "vm_name": {"type": "keyword"},
+                "ip_address": {"type": "ip"},
+            }
+        },
+        "meta": {"type": "object", "enabled": False},
+    },
+}
+
+
+def encode_cursor(sort: List[Any]) -> str:
+    """Returns the (URL safe) cursor of the sort values of the last entry of a page."""
+    data = json.dumps(sort, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    Returns the sort values (`search_after`) of a cursor.
+
+    Raises:
+    - ValueError: If the cursor wasn't returned by `encode_cursor`.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort = json.loads(data)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor '{cursor}'") from e
+    if not isinstance(sort, list) or len(sort) != len(SORT):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return sort
+
+
+def actor_identifier(document: Dict[str, Any]) -> Optional[str]:
+    actor = document.get("actor")
+    identifier = actor.get("identifier") if isinstance(actor, dict) else None
+    return str(identifier) if identifier not in (None, "") else None
+
+
+class ActorTimeline:
+    """
+    Writes the stored entries a second time, to the actor timeline index of
+    their (tenant's) index, and reads an actor's entries back page by page.
+
+    The timeline index is routed by `actor.identifier`, so all entries of an
+    actor are on a single shard and a timeline query only hits that shard. The
+    index is sorted by `timestamp` (newest first), the order the pages are read
+    in, so a page is collected without scoring or sorting all matching entries.
+    The pages are read with `search_after`, the cursor holds the sort values of
+    the last entry of the previous page.
+
+    The timeline is a secondary copy: it's written after the entries were
+    stored, and a failed write is logged and counted but doesn't fail the ingest.
+    """
+
+    def __init__(self) -> None:
+        self.settings: Optional["TimelineSettings"] = None
+        self.client: Optional[Elasticsearch] = None
+        self.search_client: Optional[Elasticsearch] = None
+        self._created: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def configure(self, settings: Optional["TimelineSettings"]) -> None:
+        self.settings = settings if settings and settings.enabled else None
+        if self.settings:
+            logger.info(
+                "[Timeline] Writing the actor timelines to '*%s'",
+                self.settings.index_suffix,
+            )
+
+    def start(
+        self, client: Elasticsearch, search_client: Optional[Elasticsearch] = None
+    ) -> None:
+        """Sets the clients, the timeline needs the `elasticsearch` storage."""
+        self.client = client
+        self.search_client = search_client or client
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings is not None and self.client is not None
+
+    def index(self, index: str) -> str:
+        """Returns the timeline index of an index (or alias)."""
+        if self.settings is None:
+            raise ValueError("The actor timeline is disabled")
+        return index + self.settings.index_suffix
+
+    def operations(
+        self, index: str, documents: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the bulk operations of the timeline index, routed by the actor
+        (the entries without an actor identifier are skipped).
+
+        Args:
+        - index (str): The index (or alias) the entries were stored in.
+        - documents (List[Dict[str, Any]]): The stored (redacted) entries.
+
+        Returns:
+        - List[Dict[str, Any]]: The bulk operations.
+        """
+        timeline_index = self.index(index)
+        operations = []
+        for document in documents:
+            identifier = actor_identifier(document)
+            if identifier is None:
+                continue
+            operations.append(
+                {
+                    "_index": timeline_index,
+                    "_op_type": "index",
+                    "_routing": identifier,
+                    "_source": {**document, TIEBREAKER: uuid.uuid4().hex},
+                }
+            )
+        return operations
+
+    def ensure_index(self, client: Elasticsearch, index: str) -> None:
+        """Creates the timeline index (sorted by `timestamp`) if it doesn't exist."""
+        if index in self._created or self.settings is None:
+            return
+        with self._lock:
+            if index in self._created:
+                return
+            try:
+                if not client.indices.exists(index=index):
+                    client.indices.create(
+                        index=index,
+                        settings={
+                            "number_of_shards": self.settings.number_of_shards,
+                            "number_of_replicas": self.settings.number_of_replicas,
+                            "refresh_interval": self.settings.refresh_interval,
+                            "sort.field": ["timestamp", TIEBREAKER],
+                            "sort.order": ["desc", "desc"],
+                        },
+                        mappings=TIMELINE_MAPPINGS,
+                    )
+                    logger.info("[Timeline] Created the timeline index '%s'", index)
+            except BadRequestError as e:
+                # Created concurrently (by another worker).
+                if e.error != "resource_already_exists_exception":
+                    raise
+            self._created.add(index)
+
+    def write(self, index: str, documents: List[Dict[str, Any]]) -> int:
+        """
+        Writes the entries to the timeline index. Blocking, run it from the
+        thread pool.
+
+        Args:
+        - index (str): The index (or alias) the entries were stored in.
+        - documents (List[Dict[str, Any]]): The stored (redacted) entries.
+
+        Returns:
+        - int: The number of written entries.
+        """
+        if not self.enabled or self.client is None:
+            return 0
+        operations = self.operations(index, documents)
+        if not operations:
+            return 0
+        try:
+            self.ensure_index(self.client, self.index(index))
+            success, failed = bulk_index(self.client, operations)
+        except Exception as e:
+            TIMELINE_ENTRIES.labels("failed").inc(len(operations))
+            logger.error(
+                "[Timeline] Failed to write %d entries: %s", len(operations), e
+            )
+            return 0
+        if failed:
+            TIMELINE_ENTRIES.labels("failed").inc(len(failed))
+            logger.error(
+                "[Timeline] %d entries not written: %s", len(failed), failed[0]
+            )
+        TIMELINE_ENTRIES.labels("written").inc(success)
+        return success
+
+    def search(
+        self,
+        index: str,
+        actor: str,
+        size: int,
+        cursor: Optional[str] = None,
+        gte: Optional[str] = None,
+        lte: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Returns a page of an actor's entries, the newest first. Only the shard
+        of the actor is searched and the total isn't counted.
+
+        Args:
+        - index (str): The index (or alias) of the tenant.
+        - actor (str): The `actor.identifier`.
+        - size (int): The number of entries per page.
+        - cursor (Optional[str]): The `next_cursor` of the previous page.
+        - gte (Optional[str]): The oldest `timestamp` (a date or date math).
+        - lte (Optional[str]): The newest `timestamp` (a date or date math).
+
+        Returns:
+        - Dict[str, Any]: The `docs` and the `next_cursor` (none on the last page).
+
+        Raises:
+        - ValueError: If the timeline is disabled or the cursor is invalid.
+        """
+        if not self.enabled or self.search_client is None:
+            raise ValueError("The actor timeline is disabled")
+        filters: List[Dict[str, Any]] = [{"term": {"actor.identifier": actor}}]
+        bounds = {name: value for name, value in (("gte", gte), ("lte", lte)) if value}
+        if bounds:
+            filters.append({"range": {"timestamp": bounds}})
+        options: Dict[str, Any] = {}
+        if cursor:
+            options["search_after"] = decode_cursor(cursor)
+        body = self.search_client.search(
+            index=self.index(index),
+            routing=actor,
+            query={"bool": {"filter": filters}},
+            sort=SORT,
+            size=size,
+            track_total_hits=False,
+            source_excludes=[TIEBREAKER],
+            ignore_unavailable=True,
+            **options,
+        ).body
+        hits = body["hits"]["hits"]
+        return {
+            "docs": [hit["_source"] for hit in hits],
+            "next_cursor": (
+                encode_cursor(hits[-1]["sort"]) if len(hits) == size else None
+            ),
+        }
+
+
+actor_timeline = ActorTimeline()
@@ -0,0 +1,403 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from audit_logger.custom_logger import get_logger
+
+if TYPE_CHECKING:
+    # Only imported for type checking, as the models import this module.
+    from audit_logger.models.config import TracingSettings
+
+logger = get_logger("audit_logger")
+
+# W3C trace context: https://www.w3.org/TR/trace-context/
+TRACEPARENT_HEADER = "traceparent"
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """A single sampled span, exported in the OTLP/JSON format once it ends."""
+
+    __slots__ = (
+        "tracer",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "kind",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+        "_token",
+    )
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        kind: int,
+        attributes: Optional[Dict[str, Any]],
+    ) -> None:
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = 0
+        self.end_ns = 0
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.error: Optional[str] = None
+        self._token: Any = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, _: Any) -> None:
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        processor = self.tracer.processor
+        if processor is not None:
+            processor.on_end(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span: Dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    """Returned whenever a trace isn't sampled; every operation is a no-op."""
+
+    __slots__ = ()
+
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+# OTLP span kinds.
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Parses a W3C `traceparent` header into (trace id, parent span id, sampled)."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 0x01)
+
+
+class SpanExporter:
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends every batch as one OTLP/JSON `resourceSpans` line to a file."""
+
+    def __init__(self, path: str, service_name: str) -> None:
+        self.path = path
+        self.service_name = service_name
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a") as f:
+            f.write(json.dumps(_otlp_payload(self.service_name, spans)) + "\n")
+
+
+class OTLPHttpSpanExporter(SpanExporter):
+    """Sends every batch to an OTLP/HTTP collector (JSON encoding)."""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0) -> None:
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(_otlp_payload(self.service_name, spans)).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def _otlp_payload(service_name: str, spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [_otlp_attribute("service.name", service_name)]
+                },
+                "scopeSpans": [{"scope": {"name": "audit_logger"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+class BatchSpanProcessor:
+    """
+    Buffers ended spans and exports them in batches from a background thread,
+    so that the request path never waits for the exporter.
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        max_queue_size: int = 10000,
+        max_batch_size: int = 512,
+        schedule_delay: float = 2.0,
+    ) -> None:
+        self.exporter = exporter
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.schedule_delay = schedule_delay
+        self.dropped = 0
+        self._queue: List[Span] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="span-exporter", daemon=True
+        )
+        self._thread.start()
+
+    def on_end(self, span: Span) -> None:
+        with self._lock:
+            if len(self._queue) >= self.max_queue_size:
+                self.dropped += 1
+                return
+            self._queue.append(span)
+            if len(self._queue) >= self.max_batch_size:
+                self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.schedule_delay)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        while True:
+            with self._lock:
+                batch = self._queue[: self.max_batch_size]
+                del self._queue[: self.max_batch_size]
+            if not batch:
+                return
+            try:
+                self.exporter.export([span.to_otlp() for span in batch])
+            except Exception as e:
+                logger.error("[Tracing] Failed to export %d spans: %s", len(batch), e)
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        self.exporter.shutdown()
+
+
+class Tracer:
+    """
+    Creates spans for sampled traces.
+
+    The sampling decision is made once per trace, when the root span is started.
+    Any other span is only created while a sampled span is active, so with tracing
+    disabled (or a trace not being sampled) a span costs one context variable lookup.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.sample_ratio = 0.0
+        self.processor: Any = None
+
+    def configure(self, settings: Optional["TracingSettings"]) -> None:
+        self.shutdown()
+        if not settings or not settings.enabled:
+            return
+
+        exporter: SpanExporter
+        if settings.exporter == "otlp":
+            exporter = OTLPHttpSpanExporter(
+                settings.otlp_endpoint, settings.service_name
+            )
+        else:
+            exporter = FileSpanExporter(settings.file_path, settings.service_name)
+
+        self.processor = BatchSpanProcessor(exporter)
+        self.sample_ratio = settings.sample_ratio
+        self.enabled = True
+        logger.info(
+            "[Tracing] Enabled (exporter: %s, sample ratio: %s)",
+            settings.exporter.value,
+            settings.sample_ratio,
+        )
+
+    def shutdown(self) -> None:
+        self.enabled = False
+        if self.processor:
+            self.processor.shutdown()
+            self.processor = None
+
+    def start_trace(
+        self,
+        name: str,
+        traceparent: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """
+        Starts the root span of a trace, continuing the caller's trace if a valid
+        `traceparent` header is given (parent based sampling).
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        remote = parse_traceparent(traceparent)
+        if remote:
+            trace_id, parent_id, sampled = remote
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+            sampled = random.random() < self.sample_ratio
+        if not sampled:
+            return NOOP_SPAN
+        return Span(self, name, trace_id, parent_id, SPAN_KIND_SERVER, attributes)
+
+    def span(
+        self,
+        name: str,
+        attributes: Optional[Dict[str, Any]] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+    ) -> Any:
+        """Starts a child span of the active span (no-op if there isn't one)."""
+        parent = _current_span.get()
+        if parent is None:
+            return NOOP_SPAN
+        return Span(self, name, parent.trace_id, parent.span_id, kind, attributes)
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        return _current_span.get()
+
+    @staticmethod
+    def propagation_headers() -> Optional[Dict[str, str]]:
+        """Trace context headers for outgoing requests, e.g. towards Elasticsearch."""
+        span = _current_span.get()
+        if span is None:
+            return None
+        return {TRACEPARENT_HEADER: span.traceparent}
+
+
+tracer = Tracer()
+
+
+def run_collector(host: str, port: int, output: str) -> None:
+    """
+    Runs a minimal OTLP/HTTP (JSON) collector stand-in that appends every
+    received payload as one line to `output`.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:  # noqa: N802
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            try:
+                json.loads(body)
+            except ValueError:
+                self.send_response(400)
+                self.end_headers()
+                return
+            with open(output, "ab") as f:
+                f.write(body + b"\n")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *_: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    logger.info(
+        "[Tracing] Collector listening on %s:%d, writing to %s", host, port, output
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OTLP/HTTP collector stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--output", default="spans.jsonl")
+    args = parser.parse_args()
+    run_collector(args.host, args.port, args.output)
@@ -1,9 +1,10 @@
 import ipaddress
 import os
-import re
+import threading
+import time
 import traceback
 from datetime import datetime
-from typing import Any, Dict, List, Union
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union, cast
 from zoneinfo import ZoneInfo
 
 from elasticsearch import (
@@ -16,79 +17,80 @@ from elasticsearch import (
     TransportError,
     helpers,
 )
-from faker import Faker
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from pydantic import ValidationError
 
+from audit_logger.admission import admission
+from audit_logger.alerts import AlertEngine
 from audit_logger.custom_logger import get_logger
-from audit_logger.models import (
-    ActorDetails,
-    AuditLogEntry,
-    BulkAuditLogOptions,
-    ResourceDetails,
+from audit_logger.metrics import (
+    BULK_OPERATIONS_DURATION,
+    DEDUP_SKIPPED,
+    ES_BULK_DOCUMENTS,
+    ES_BULK_DURATION,
 )
+from audit_logger.models import AuditLogEntry, BulkAuditLogOptions
 from audit_logger.models.env_vars import EnvVars
-from audit_logger.models.server_details import ServerDetails
+from audit_logger.policies import IngestPolicyEngine
+from audit_logger.predicates import parse_date_math
+from audit_logger.redaction import RedactionEngine, anonymize_ip_address  # noqa: F401
+from audit_logger.synthetic import SyntheticGenerator
+from audit_logger.tail import TailHub, publish_to
+from audit_logger.tracing import SPAN_KIND_CLIENT, tracer
 
-fake = Faker()
+if TYPE_CHECKING:
+    from audit_logger.storage import StorageBackend
+    from audit_logger.timeline import ActorTimeline
 
 logger = get_logger("audit_logger")
 
-# Regular expression to validate date strings in the format "YYYY-MM-DDTHH:MM:SSZ"
-# where everything, except for the year, is optional.
-DATE_FORMAT_REGEX = re.compile(
-    r"""
-    ^(
-        (?P<year>\d{4})  # Year (YYYY)
-        (
-            -(?P<month>\d{2})  # Optional month (MM)
-            (
-                -(?P<day>\d{2})  # Optional day (DD)
-                (
-                    T(?P<hour>\d{2})  # Optional hour (HH)
-                    (
-                        :(?P<minute>\d{2})  # Optional minute (MM)
-                        (
-                            :(?P<second>\d{2})  # Optional second (SS)
-                            (?P<timezone>[+-]\d{2}:\d{2}|Z)?  # Optional Timezone
-                        )?
-                    )?
-                )?
-            )?
-        )?
-    )$
-""",
-    re.VERBOSE,
-)
+# The max. number of operations sent with a single bulk request.
+BULK_CHUNK_SIZE = 500
+
+# Redaction engine used when no engine is passed to `create_bulk_operations`.
+default_redactor = RedactionEngine()
 
 
-def anonymize_ip_address(ip_address: str) -> str:
+class InFlightOperations:
+    """
+    Counts the operations in progress (across threads), so the shutdown can wait
+    for them to complete before the Elasticsearch client is closed.
     """
-    Anonymizes an IP address by replacing the last segments with zeros.
-    For IPv4 addresses, the last two octets are set to zero.
-    For IPv6 addresses, the last four hextets are replaced with zeros,
-    and the address is then compressed to its shortest form.
-    If the input is not a valid IP address, it is returned unchanged.
 
-    Args:
-    - ip_address (str): The IP address to anonymize.
+    def __init__(self) -> None:
+        self._count = 0
+        self._idle = threading.Condition()
 
-    Returns:
-    - str: The anonymized IP address.
-    """
-    try:
-        ip_address = str(ip_address)
-        ip_obj = ipaddress.ip_address(ip_address)
-        if ip_obj.version == 4:
-            octets = ip_address.split(".")
-            return str(".".join(octets[:2] + ["0", "0"]))
-        elif ip_obj.version == 6:
-            hextets = ip_address.split(":")
-            anonymized_ip = ":".join(hextets[:4] + ["0", "0", "0", "0"])
-            return str(ipaddress.ip_address(anonymized_ip).compressed)
-    except ValueError:
-        return str(ip_address)
+    def __enter__(self) -> "InFlightOperations":
+        with self._idle:
+            self._count += 1
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        with self._idle:
+            self._count -= 1
+            if not self._count:
+                self._idle.notify_all()
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until no operation is in progress.
+
+        Returns:
+        - bool: False if the timeout expired with operations still in progress.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._count, timeout)
+
+
+# Bulk requests in progress, drained on shutdown.
+bulk_in_flight = InFlightOperations()
 
 
 def is_valid_ip_v4_address(ip_address: str) -> bool:
@@ -109,64 +111,129 @@ def is_valid_ip_v4_address(ip_address: str) -> bool:
 
 
 def create_bulk_operations(
-    index_name: str, log_entries: List[AuditLogEntry]
+    index_name: str,
+    log_entries: List[Dict],
+    redactor: Optional[RedactionEngine] = None,
+    routing: Optional[str] = None,
 ) -> List[Dict]:
     """
     This bulk helper function prepares a list of operations for the Elasticsearch bulk API
-    based on the provided log entries.
+    based on the provided log entries. Each entry is redacted (incl. the IP address
+    anonymization) in a single pass before it's added to the operations.
 
     Args:
     - index_name (str): The name of the Elasticsearch index
     - log_entries (List[Dict]): A list of log entry dictionaries to be processed.
+    - redactor (Optional[RedactionEngine]): The redaction engine to apply. Defaults to
+      an engine that only anonymizes IP addresses.
+    - routing (Optional[str]): The custom routing key of the entries.
 
     Returns:
     - List[Dict]: A list of dictionaries formatted for the Elasticsearch bulk API.
     """
-    operations: List[Dict] = []
-    for entry in log_entries:
-        for ip_field in ["ip_address", "actor.ip_address", "server.ip_address"]:
-            if ip_field in entry:
-                ip_path = ip_field.split(".")
-                current_level = entry
-                for part in ip_path[:-1]:
-                    if part in current_level:
-                        current_level = current_level[part]
-                    else:
-                        break
-                if ip_path[-1] in current_level:
-                    current_level[ip_path[-1]] = anonymize_ip_address(
-                        current_level[ip_path[-1]]
-                    )
-        operations.append({"_index": index_name, "_op_type": "index", "_source": entry})
-    return operations
+    redact = (redactor or default_redactor).redact
+    if routing:
+        return [
+            {
+                "_index": index_name,
+                "_op_type": "index",
+                "_routing": routing,
+                "_source": redact(entry),
+            }
+            for entry in log_entries
+        ]
+    return [
+        {"_index": index_name, "_op_type": "index", "_source": redact(entry)}
+        for entry in log_entries
+    ]
+
+
+def bulk_index(
+    elastic: Elasticsearch, operations: List[Dict], chunk_size: int = BULK_CHUNK_SIZE
+) -> Tuple[int, List[Dict]]:
+    """
+    Sends the bulk operations to Elasticsearch, one bulk request per chunk.
+
+    Args:
+    - elastic: An instance of the Elasticsearch client.
+    - operations (List[Dict]): The operations created by `create_bulk_operations`.
+    - chunk_size (int): The max. number of operations per bulk request.
+
+    Returns:
+    - Tuple[int, List[Dict]]: The number of indexed documents and the failed items.
+    """
+    success_count = 0
+    failed_items: List[Dict] = []
+    with bulk_in_flight:
+        for offset in range(0, len(operations), chunk_size):
+            chunk = operations[offset : offset + chunk_size]  # noqa: E203
+            with tracer.span(
+                "elasticsearch.bulk",
+                {"db.system": "elasticsearch", "bulk.documents": len(chunk)},
+                kind=SPAN_KIND_CLIENT,
+            ):
+                headers = tracer.propagation_headers()
+                client = elastic.options(headers=headers) if headers else elastic
+                ES_BULK_DOCUMENTS.observe(len(chunk))
+                start = time.perf_counter()
+                success, failed = helpers.bulk(client, chunk, chunk_size=chunk_size)
+                duration = time.perf_counter() - start
+                ES_BULK_DURATION.observe(duration)
+                admission.observe("ingest", duration)
+            success_count += success
+            if isinstance(failed, list):
+                failed_items.extend(failed)
+    return success_count, failed_items
 
 
 def generate_audit_log_entries_with_fake_data(
     settings: BulkAuditLogOptions,
 ) -> List[Dict]:
     """
-    Generates a random audit log entry using the Faker library.
+    Generates random audit log entries with the synthetic data generator.
 
     Returns:
     - List[Dict]: A list of audit log entries with fake data.
     """
-    return [generate_log_entry().dict() for _ in range(settings.bulk_count)]
+    generator = SyntheticGenerator(
+        seed=settings.seed,
+        actor_skew=settings.actor_skew,
+        error_rate=settings.error_rate,
+        burst_ratio=settings.burst_ratio,
+    )
+    return generator.entries(cast(int, settings.bulk_count))
 
 
 # GenericResponse
 async def process_audit_logs(
-    elastic: Elasticsearch,
+    storage: "StorageBackend",
     elastic_index_name: str,
     log_entries: Union[AuditLogEntry, List[Union[Dict, AuditLogEntry]]],
     original_bulk_amount: int = 0,
+    redactor: Optional[RedactionEngine] = None,
+    tail: Optional[TailHub] = None,
+    alerts: Optional[AlertEngine] = None,
+    routing: Optional[str] = None,
+    policies: Optional[IngestPolicyEngine] = None,
+    timeline: Optional["ActorTimeline"] = None,
 ) -> JSONResponse:
     """
-    Processes a list of audit log entries by sending them to Elasticsearch using the bulk API.
+    Processes a list of audit log entries by sending them to the storage backend
+    (Elasticsearch, using the bulk API, by default).
 
     Args:
-    - elastic: An instance of the Elasticsearch client.
+    - storage (StorageBackend): The backend the entries are stored in.
     - elastic_index_name (str): The name of the Elasticsearch index.
     - log_entries (List[AuditLogEntry]): A list of audit log entries to be processed.
+    - original_bulk_amount (int): The number of entries received, before deduplication.
+    - redactor (Optional[RedactionEngine]): The redaction engine applied to the entries.
+    - tail (Optional[TailHub]): The hub the indexed (redacted) entries are published to.
+    - alerts (Optional[AlertEngine]): The alert rules the indexed entries are counted by.
+    - routing (Optional[str]): The custom routing key of the entries.
+    - policies (Optional[IngestPolicyEngine]): The ingest policies deciding which
+      entries are stored, sampled out, stored in the cold index or only counted.
+    - timeline (Optional[ActorTimeline]): The actor timeline the stored entries are
+      also written to.
 
     Returns:
     - GenericResponse
@@ -177,11 +244,33 @@ async def process_audit_logs(
     try:
         is_bulk_operation = isinstance(log_entries, list)
         if not is_bulk_operation:
-            log_entries = [log_entries.dict()]
+            log_entries = [log_entries.model_dump(mode="json")]
 
-        operations = create_bulk_operations(elastic_index_name, log_entries)
-        success_count, failed = helpers.bulk(elastic, operations)
-        failed_items = failed if isinstance(failed, list) else []
+        entries = cast(List[Dict[str, Any]], log_entries)
+        plan = (
+            policies.apply(entries, elastic_index_name)
+            if policies and policies.enabled
+            else None
+        )
+        targets = plan.targets if plan else {elastic_index_name: entries}
+
+        with (
+            BULK_OPERATIONS_DURATION.time(),
+            tracer.span("create_bulk_operations", {"bulk.documents": len(log_entries)}),
+        ):
+            operations = [
+                operation
+                for index, documents in targets.items()
+                for operation in create_bulk_operations(
+                    index, documents, redactor, routing
+                )
+            ]
+        if plan and policies and any(index != elastic_index_name for index in targets):
+            await run_in_threadpool(storage.prepare, list(targets), policies)
+
+        # The bulk requests are blocking, so they're sent from the thread pool
+        # to keep the event loop responsive.
+        success_count, failed_items = await run_in_threadpool(storage.bulk, operations)
 
         if len(failed_items) > 0:
             raise HTTPException(
@@ -189,6 +278,13 @@ async def process_audit_logs(
                 detail=f"Failed to process audit logs: {str(failed_items)}",
             )
 
+        indexed = [operation["_source"] for operation in operations]
+        if timeline and timeline.enabled:
+            await run_in_threadpool(timeline.write, elastic_index_name, indexed)
+        publish_to(tail, indexed, elastic_index_name)
+        if alerts and alerts.enabled:
+            alerts.process(indexed)
+
         if is_bulk_operation:
             skipped_items = (
                 (original_bulk_amount - len(log_entries)) if original_bulk_amount else 0
@@ -199,6 +295,7 @@ async def process_audit_logs(
                     "success_count": success_count,
                     "failed_items": failed_items,
                     "skipped_items": skipped_items,
+                    **(plan.counts() if plan else {}),
                 },
                 status_code=status.HTTP_207_MULTI_STATUS,
             )
@@ -206,6 +303,7 @@ async def process_audit_logs(
         return JSONResponse(
             content={
                 "status": "success",
+                **(plan.counts() if plan else {}),
             },
             status_code=status.HTTP_201_CREATED,
         )
@@ -250,89 +348,23 @@ async def process_audit_logs(
         ) from e
 
 
-def validate_date(date_str: str) -> bool:
+def validate_date(date_str: Union[str, int, float]) -> bool:
     """
-    Validates a date string against various formats
-    including ISO 8601, year-month-day, and year-month.
+    Validates a date in one of the formats accepted by the `timestamp` field:
+    ISO 8601 (everything but the year is optional), epoch milliseconds and ES date
+    math (e.g. `now-1d/d` or `2024-05-01||+1M`).
 
     Args:
-        date_str (str): The date string to validate.
+        date_str (Union[str, int, float]): The date to validate.
 
     Returns:
-        bool: True if the date string is valid, False otherwise.
+        bool: True if the date is valid, False otherwise.
     """
-    if DATE_FORMAT_REGEX.match(date_str):
-        for fmt in (
-            "%Y-%m-%dT%H:%M:%SZ",
-            "%Y-%m-%dT%H:%M:%S",
-            "%Y-%m-%dT%H:%M",
-            "%Y-%m-%d",
-            "%Y-%m",
-            "%Y",
-        ):
-            try:
-                datetime.strptime(date_str, fmt)
-                return True
-            except ValueError:
-                pass
-    return False
-
-
-def generate_log_entry() -> AuditLogEntry:
-    """Create a fake audit log entry using the Faker library."""
-    return AuditLogEntry(
-        timestamp=fake.date_time_this_year().isoformat(),
-        event_name=fake.random_element(
-            ["user_login", "user_logout", "data_backup", "file_access", "role_update"]
-        ),
-        actor=ActorDetails(
-            identifier=fake.random_element(["j.doe", "j.dot", "a.smith", "s.jones"]),
-            type=fake.random_element(["user", "system"]),
-            ip_address=fake.ipv4(),
-            user_agent=fake.user_agent(),
-        ),
-        action=fake.random_element(["create", "update", "delete", "login"]),
-        application_name=fake.random_element(
-            [
-                "user-management-service",
-                "login-frontend",
-                "payment-gateway",
-                "logging-service",
-                "data-backup-service",
-            ]
-        ),
-        module=fake.random_element(
-            [
-                "authentication",
-                "authorization",
-                "database-client",
-                "ui-notifications",
-                "cronjob",
-            ]
-        ),
-        comment=fake.sentence(),
-        context=fake.random_element(
-            ["user_management", "system_backup", "content_delivery", "security"]
-        ),
-        resource=ResourceDetails(
-            type=fake.random_element(
-                ["user_account", "database", "cronjob", "system_file"]
-            ),
-            id=fake.uuid4(),
-        ),
-        operation=fake.random_element(["create", "read", "update", "delete"]),
-        status=fake.random_element(["success", "failure"]),
-        endpoint=fake.uri_path(),
-        server=ServerDetails(
-            hostname=fake.hostname(),
-            vm_name=fake.word(),
-            ip_address=fake.ipv4(),
-        ),
-        meta={
-            "request_size": fake.random_number(digits=5),
-            "response_time_ms": fake.random_int(min=1, max=1000),
-        },
-    )
+    try:
+        parse_date_math(date_str)
+    except (ValueError, OverflowError):
+        return False
+    return True
 
 
 def load_env_vars() -> EnvVars:
@@ -367,10 +399,12 @@ def find_duplicates(audit_logs: List[AuditLogEntry]) -> List[AuditLogEntry]:
     seen_hashes = set()
     unique_entries = []
 
-    for log_entry in audit_logs:
-        entry_hash = log_entry.to_hashable_tuple()
-        if entry_hash not in seen_hashes:
-            seen_hashes.add(entry_hash)
-            unique_entries.append(log_entry)
+    with tracer.span("find_duplicates", {"bulk.documents": len(audit_logs)}):
+        for log_entry in audit_logs:
+            entry_hash = log_entry.to_hashable_tuple()
+            if entry_hash not in seen_hashes:
+                seen_hashes.add(entry_hash)
+                unique_entries.append(log_entry)
 
+    DEDUP_SKIPPED.inc(len(audit_logs) - len(unique_entries))
     return unique_entries
@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict
+
+from audit_logger.server import usable_cpus
+from benchmarks.compare import compare
+from benchmarks.load import LoadOptions, run_load
+from benchmarks.payloads import PayloadShape
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parses a route mix like `create=0.2,create-bulk=0.3,search=0.5`."""
+    mix = {}
+    for part in value.split(","):
+        route, _, weight = part.partition("=")
+        if route not in ("create", "create-bulk", "search"):
+            raise argparse.ArgumentTypeError(f"Unknown route '{route}'")
+        mix[route] = float(weight or 1)
+    return mix
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Ingest and search benchmarks of the audit logger.",
+    )
+    parser.add_argument(
+        "suite",
+        nargs="?",
+        choices=["micro", "load", "compression", "startup", "storage", "all"],
+        default="all",
+        help="The benchmark suite to run ('all' runs micro, compression and load).",
+    )
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="Compare the results against this file.")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Store the results as baseline."
+    )
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--bulk-size", type=int, default=100)
+    parser.add_argument("--meta-keys", type=int, default=2)
+    parser.add_argument("--comment-length", type=int, default=40)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0)
+    parser.add_argument(
+        "--base-url", help="Run the load test against a running API instead."
+    )
+    parser.add_argument("--api-key", default="benchmark")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument(
+        "--mix", type=parse_mix, default="create=0.2,create-bulk=0.3,search=0.5"
+    )
+    parser.add_argument("--search-filters", type=int, default=3)
+    parser.add_argument(
+        "--compress",
+        choices=["gzip", "zstd"],
+        help="Compress the ingest requests and accept compressed responses.",
+    )
+    parser.add_argument(
+        "--workers",
+        default=f"1,{usable_cpus()}",
+        help="Comma-separated worker counts compared by the startup suite.",
+    )
+    parser.add_argument(
+        "--storage-entries",
+        type=int,
+        default=10000,
+        help="Number of entries the storage suite searches.",
+    )
+    parser.add_argument(
+        "--elastic-url",
+        help="Compare the sqlite storage with this (real) Elasticsearch cluster.",
+    )
+    args = parser.parse_args()
+    suites = ["micro", "compression", "load"] if args.suite == "all" else [args.suite]
+
+    shape = PayloadShape(
+        bulk_size=args.bulk_size,
+        meta_keys=args.meta_keys,
+        comment_length=args.comment_length,
+        duplicate_ratio=args.duplicate_ratio,
+    )
+    results: Dict[str, Any] = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "shape": vars(shape),
+        }
+    }
+
+    if "micro" in suites:
+        from benchmarks.micro import run_micro_benchmarks
+
+        results["micro"] = run_micro_benchmarks(shape, args.seed, args.repeat)
+
+    options = LoadOptions(
+        base_url=args.base_url,
+        api_key=args.api_key,
+        concurrency=args.concurrency,
+        requests=args.requests,
+        mix=args.mix,
+        shape=shape,
+        search_filters=args.search_filters,
+        seed=args.seed,
+        compress=args.compress,
+    )
+    if "compression" in suites:
+        from benchmarks.compression import run_compression_benchmarks, summary
+
+        results["compression"] = run_compression_benchmarks(
+            shape, args.seed, args.repeat
+        )
+        print("\n".join(summary(results["compression"])))
+
+    if "load" in suites:
+        results["load"] = asyncio.run(run_load(options))
+
+    if "startup" in suites:
+        from benchmarks.startup import run_startup_benchmarks
+
+        worker_counts = sorted({int(w) for w in args.workers.split(",")})
+        results["startup"] = run_startup_benchmarks(options, worker_counts)
+
+    if "storage" in suites:
+        from benchmarks.storage import run_storage_benchmarks
+
+        results["storage"] = run_storage_benchmarks(
+            args.seed, args.repeat, args.storage_entries, args.elastic_url
+        )
+
+    output = args.baseline if args.save_baseline and args.baseline else args.output
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline and not args.save_baseline:
+        if not os.path.exists(args.baseline):
+            print(f"Baseline {args.baseline} not found", file=sys.stderr)
+            return 2
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        report, regressions = compare(results, baseline, args.tolerance)
+        print("\n".join(report))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.tolerance:.0%}:")
+            print("\n".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+from typing import Any, Dict, List, Tuple
+
+# Metrics where a higher value is better; for all others lower is better.
+HIGHER_IS_BETTER = {"items_per_second", "requests_per_second"}
+
+# The metrics compared per benchmark group.
+COMPARED_METRICS = {
+    "micro": ("median",),
+    "load": ("p95",),
+    "compression": ("median", "bytes"),
+    "startup": ("seconds", "cold_start", "requests_per_second"),
+    "storage": ("median",),
+}
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2
+) -> Tuple[List[str], List[str]]:
+    """
+    Compares benchmark results against a baseline.
+
+    Args:
+    - current: The results of the current run.
+    - baseline: The stored baseline results.
+    - tolerance: The allowed relative slowdown, e.g. 0.2 for 20%.
+
+    Returns:
+    - Tuple[List[str], List[str]]: The report lines and the regressions.
+    """
+    report: List[str] = []
+    regressions: List[str] = []
+
+    for group, metrics in COMPARED_METRICS.items():
+        current_group = _flatten(current.get(group, {}))
+        baseline_group = _flatten(baseline.get(group, {}))
+        for name, values in sorted(current_group.items()):
+            for metric in metrics:
+                if name not in baseline_group or metric not in values:
+                    continue
+                old, new = baseline_group[name].get(metric), values[metric]
+                if not old:
+                    continue
+                change = (new - old) / old
+                if metric in HIGHER_IS_BETTER:
+                    change = -change
+                line = (
+                    f"{group}/{name}/{metric}: {old:.6g} -> {new:.6g} ({change:+.1%})"
+                )
+                report.append(line)
+                if change > tolerance:
+                    regressions.append(line)
+
+    return report, regressions
+
+
+def _flatten(group: Dict[str, Any], prefix: str = "") -> Dict[str, Dict[str, Any]]:
+    """Flattens nested result groups (e.g. load routes) into `name -> metrics`."""
+    result: Dict[str, Dict[str, Any]] = {}
+    for name, values in group.items():
+        if not isinstance(values, dict):
+            continue
+        if any(isinstance(v, (int, float)) for v in values.values()):
+            result[f"{prefix}{name}"] = values
+        else:
+            result.update(_flatten(values, f"{prefix}{name}/"))
+    return result
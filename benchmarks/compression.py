@@ -0,0 +1,95 @@
+import json
+import random
+import zlib
+from functools import partial
+from typing import Any, Callable, Dict, List, Tuple
+
+from audit_logger.synthetic import SyntheticGenerator, to_bulk_ndjson
+from benchmarks.micro import Result, measure
+from benchmarks.payloads import PayloadShape, make_bulk
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # type: ignore[assignment]
+
+Codec = Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]
+
+
+def codecs() -> Dict[str, Codec]:
+    """Returns the compress/decompress functions per codec and level."""
+    result: Dict[str, Codec] = {}
+    for level in (1, 5, 9):
+        result[f"gzip_{level}"] = (
+            partial(_gzip, level=level),
+            _gunzip,
+        )
+    if zstandard:
+        for level in (1, 3, 9):
+            compressor = zstandard.ZstdCompressor(level=level)
+            decompressor = zstandard.ZstdDecompressor()
+            result[f"zstd_{level}"] = (compressor.compress, decompressor.decompress)
+    return result
+
+
+def _gzip(data: bytes, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _gunzip(data: bytes) -> bytes:
+    return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+
+def payloads(shape: PayloadShape, seed: int) -> Dict[str, bytes]:
+    """The payloads sent over the wire: API requests, ES bulk bodies and responses."""
+    rng = random.Random(seed)
+    docs = SyntheticGenerator(seed=seed).entries(1000)
+    return {
+        "create_bulk_request": json.dumps(make_bulk(rng, shape)).encode("utf-8"),
+        "es_bulk_body": to_bulk_ndjson("audit_logs", docs[: shape.bulk_size]),
+        "search_response_1000_docs": json.dumps(
+            {"hits": len(docs), "docs": docs, "aggs": {}}
+        ).encode("utf-8"),
+    }
+
+
+def run_compression_benchmarks(
+    shape: PayloadShape, seed: int = 42, repeat: int = 7
+) -> Dict[str, Any]:
+    """
+    Measures the bytes on the wire and the CPU time of compressing and
+    decompressing the payloads per codec and level.
+    """
+    results: Dict[str, Any] = {}
+    for name, data in payloads(shape, seed).items():
+        group: Dict[str, Result] = {"identity": {"bytes": len(data), "ratio": 1.0}}
+        for codec, (compress, decompress) in codecs().items():
+            compressed = compress(data)
+            timing = measure(lambda: compress(data), repeat=repeat, min_time=0.05)
+            decompress_timing = measure(
+                lambda: decompress(compressed), repeat=repeat, min_time=0.05
+            )
+            group[codec] = {
+                "bytes": len(compressed),
+                "ratio": len(data) / len(compressed),
+                "median": timing["median"],
+                "decompress_median": decompress_timing["median"],
+                "mb_per_second": len(data) / timing["median"] / 1e6,
+            }
+        results[name] = group
+    return results
+
+
+def summary(results: Dict[str, Any]) -> List[str]:
+    lines = []
+    for name, group in results.items():
+        for codec, values in group.items():
+            line = f"{name}/{codec}: {values['bytes']} bytes (x{values['ratio']:.1f})"
+            if "median" in values:
+                line += (
+                    f", {values['median'] * 1e3:.3f} ms compress"
+                    f", {values['decompress_median'] * 1e3:.3f} ms decompress"
+                )
+            lines.append(line)
+    return lines
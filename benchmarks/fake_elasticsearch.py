@@ -0,0 +1,524 @@
+import argparse
+import fnmatch
+import gzip
+import json
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from elastic_transport import ApiResponseMeta, BaseNode, HttpHeaders, NodeConfig
+from elastic_transport._node._base import NodeApiResponse
+
+from audit_logger.elastic import CustomElasticsearch, OrjsonSerializer
+from audit_logger.predicates import getter, parse_date_math
+
+RESPONSE_HEADERS = {
+    "content-type": "application/json",
+    "x-elastic-product": "Elasticsearch",
+}
+
+
+class FakeCluster:
+    """
+    In-memory state shared by all fake nodes: the indexed documents per index
+    (bounded, the oldest documents are discarded) and request statistics.
+    """
+
+    def __init__(self, max_docs_per_index: int = 10000) -> None:
+        self.max_docs_per_index = max_docs_per_index
+        self.latency = 0.0
+        self.indices: Dict[str, Deque[Dict[str, Any]]] = {}
+        self.requests: Dict[str, int] = {}
+        self.bytes_received = 0
+        # Nodes returned to sniffing requests, as `(publish_address, roles)`.
+        self.nodes: List[Tuple[str, List[str]]] = []
+        # Stored async search responses by ID (async searches finish immediately).
+        self.async_searches: Dict[str, Dict[str, Any]] = {}
+        # The remaining documents (and page size) of the open scrolls by ID.
+        self.scrolls: Dict[str, Tuple[List[Dict[str, Any]], int]] = {}
+        # Cluster state reported to the readiness checks.
+        self.health_status = "green"
+        self.write_rejections = 0
+        self.index_blocks: Dict[str, Dict[str, str]] = {}
+        # Indices (or aliases) which don't exist (`HEAD` answers `404`).
+        self.missing_indices: Set[str] = set()
+        # Snapshot repositories and their snapshots (with a copy of the documents),
+        # the state of new snapshots can be set to e.g. `PARTIAL`.
+        self.repositories: Dict[str, Dict[str, Any]] = {}
+        self.snapshots: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.snapshot_state = "SUCCESS"
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.indices.clear()
+            self.requests.clear()
+            self.async_searches.clear()
+            self.scrolls.clear()
+            self.index_blocks.clear()
+            self.missing_indices.clear()
+            self.repositories.clear()
+            self.snapshots.clear()
+            self.snapshot_state = "SUCCESS"
+            self.health_status = "green"
+            self.write_rejections = 0
+            self.bytes_received = 0
+
+    def index(self, name: str, documents: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            docs = self.indices.setdefault(name, deque(maxlen=self.max_docs_per_index))
+            docs.extend(documents)
+
+    def documents(self, name: str) -> List[Dict[str, Any]]:
+        """Returns the documents of an index, or of comma-separated index patterns."""
+        names = self.resolve("*" if name == "_all" else name)
+        with self._lock:
+            return [doc for index in names for doc in self.indices.get(index, [])]
+
+    def resolve(self, patterns: str) -> List[str]:
+        """Returns the indices matching the comma-separated index patterns."""
+        with self._lock:
+            return sorted(
+                name
+                for name in self.indices
+                if any(fnmatch.fnmatchcase(name, p) for p in patterns.split(","))
+            )
+
+    def delete(self, patterns: str) -> List[str]:
+        deleted = self.resolve(patterns)
+        with self._lock:
+            for name in deleted:
+                del self.indices[name]
+        return deleted
+
+    def count_request(self, endpoint: str, body: Optional[bytes]) -> None:
+        """Counts the request and its body size as sent over the wire."""
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.bytes_received += len(body or b"")
+
+
+cluster = FakeCluster()
+
+
+class FakeNode(BaseNode):
+    """
+    An Elasticsearch node that answers the requests of the real client in-memory,
+    so the client serialization path is exercised without a running cluster.
+    """
+
+    _CLIENT_META_HTTP_CLIENT = ("fk", "1.0")
+
+    def perform_request(
+        self,
+        method: str,
+        target: str,
+        body: Optional[bytes] = None,
+        headers: Optional[HttpHeaders] = None,
+        request_timeout: Any = None,
+    ) -> NodeApiResponse:
+        start = time.perf_counter()
+        url = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        wire_body = body
+        if body and headers and headers.get("content-encoding") == "gzip":
+            body = gzip.decompress(body)
+        endpoint, status, payload = self.dispatch(method, parts, query, body)
+        cluster.count_request(endpoint, wire_body)
+
+        if cluster.latency:
+            time.sleep(cluster.latency)
+
+        meta = ApiResponseMeta(
+            status=status,
+            http_version="1.1",
+            headers=HttpHeaders(RESPONSE_HEADERS),
+            duration=time.perf_counter() - start,
+            node=self.config,
+        )
+        data = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        return NodeApiResponse(meta, data)
+
+    def dispatch(
+        self,
+        method: str,
+        parts: List[str],
+        query: Dict[str, str],
+        body: Optional[bytes],
+    ) -> Tuple[str, int, Any]:
+        if method == "HEAD":
+            missing = parts and parts[0] in cluster.missing_indices
+            return "head", 404 if missing else 200, None
+        if not parts:
+            return "info", 200, {"version": {"number": "8.12.0"}, "tagline": "fake"}
+        if parts[-1] == "_bulk":
+            return "bulk", 200, self.bulk(body or b"")
+        if parts[-1] == "_search":
+            index = parts[0] if len(parts) > 1 else "_all"
+            request = json.loads(body or b"{}")
+            request.setdefault("size", int(query.get("size", 10)))
+            if "scroll" in query:
+                return "search", 200, self.scroll(cluster.documents(index), request)
+            return "search", 200, self.search(index, request)
+        if parts == ["_search", "scroll"]:
+            scroll_id = json.loads(body or b"{}").get("scroll_id")
+            if method == "DELETE":
+                cluster.scrolls.pop(scroll_id, None)
+                return "scroll", 200, {"succeeded": True, "num_freed": 1}
+            documents, size = cluster.scrolls.pop(scroll_id, ([], 10))
+            return "scroll", 200, self.scroll(documents, {"size": size})
+        if parts[-1] == "_count":
+            return "count", 200, {"count": len(cluster.documents(parts[0]))}
+        if parts[-1] == "_async_search":
+            response = self.search(parts[0], json.loads(body or b"{}"))
+            return "async_search", 200, self.submit_async_search(response)
+        if parts[0] == "_async_search":
+            stored = cluster.async_searches.get(parts[-1])
+            if stored is None:
+                return "async_search", 404, {"error": {"type": "resource_not_found"}}
+            if method == "DELETE":
+                del cluster.async_searches[parts[-1]]
+                return "async_search", 200, {"acknowledged": True}
+            return "async_search", 200, stored
+        if parts[0] == "_snapshot":
+            return ("snapshot", *self.snapshot_api(method, parts[1:], body))
+        if parts[0] == "_nodes" and "stats" in parts:
+            write = {"rejected": cluster.write_rejections}
+            return (
+                "nodes_stats",
+                200,
+                {"nodes": {"node-0": {"thread_pool": {"write": write}}}},
+            )
+        if parts[0] == "_nodes":
+            return "nodes", 200, self.nodes_info()
+        if parts[0] == "_cluster" and parts[-1] == "health":
+            return (
+                "cluster_health",
+                200,
+                {
+                    "status": cluster.health_status,
+                    "number_of_nodes": 1,
+                },
+            )
+        if parts[-1] == "_settings":
+            return (
+                "settings",
+                200,
+                {
+                    name: {
+                        "settings": {"index": {"blocks": cluster.index_blocks[name]}}
+                    }
+                    for name in parts[0].split(",")
+                    if cluster.index_blocks.get(name)
+                },
+            )
+        if len(parts) == 1 and not parts[0].startswith("_"):
+            if method == "DELETE":
+                cluster.delete(parts[0])
+                return "delete_index", 200, {"acknowledged": True}
+            if method == "GET":
+                return (
+                    "get_index",
+                    200,
+                    {
+                        name: {"aliases": {}, "settings": {}}
+                        for name in cluster.resolve(parts[0])
+                    },
+                )
+        return "other", 200, {"acknowledged": True}
+
+    def snapshot_api(
+        self, method: str, parts: List[str], body: Optional[bytes]
+    ) -> Tuple[int, Any]:
+        """The snapshot API (`_snapshot/<repository>[/<snapshot>[/_restore]]`)."""
+        request = json.loads(body or b"{}")
+        if not parts:
+            return 200, cluster.repositories
+        repository = parts[0]
+        if len(parts) == 1 and method in ("PUT", "POST"):
+            cluster.repositories[repository] = request
+            cluster.snapshots.setdefault(repository, {})
+            return 200, {"acknowledged": True}
+        if repository not in cluster.repositories:
+            return 404, error(404, "repository_missing_exception", repository)
+        snapshots = cluster.snapshots[repository]
+        if len(parts) == 1:
+            return 200, {repository: cluster.repositories[repository]}
+        if parts[1] == "_verify":
+            return 200, {"nodes": {"node-0": {"name": "node-0"}}}
+        if len(parts) == 3 and parts[2] == "_restore":
+            return self.restore_snapshot(snapshots.get(parts[1]), request)
+        names = parts[1].split(",")
+        if method in ("PUT", "POST"):
+            if parts[1] in snapshots:
+                return 400, error(400, "invalid_snapshot_name_exception", parts[1])
+            indices = cluster.resolve(request.get("indices") or "*")
+            now = int(time.time() * 1000)
+            failed = 0 if cluster.snapshot_state == "SUCCESS" else 1
+            info = {
+                "snapshot": parts[1],
+                "uuid": f"fake-{now}",
+                "indices": indices,
+                "state": cluster.snapshot_state,
+                "metadata": request.get("metadata"),
+                "start_time_in_millis": now,
+                "end_time_in_millis": now,
+                "shards": {
+                    "total": len(indices),
+                    "failed": failed,
+                    "successful": len(indices) - failed,
+                },
+            }
+            snapshots[parts[1]] = {
+                "info": info,
+                "documents": {name: cluster.documents(name) for name in indices},
+            }
+            return 200, {"snapshot": info}
+        matched = [
+            name
+            for name in snapshots
+            if any(n == "_all" or fnmatch.fnmatchcase(name, n) for n in names)
+        ]
+        missing = [
+            n for n in names if "*" not in n and n != "_all" and n not in matched
+        ]
+        if missing:
+            return 404, error(404, "snapshot_missing_exception", missing[0])
+        if method == "DELETE":
+            for name in matched:
+                del snapshots[name]
+            return 200, {"acknowledged": True}
+        return 200, {
+            "snapshots": [snapshots[name]["info"] for name in matched],
+            "total": len(matched),
+            "remaining": 0,
+        }
+
+    def restore_snapshot(
+        self, snapshot: Optional[Dict[str, Any]], request: Dict[str, Any]
+    ) -> Tuple[int, Any]:
+        if snapshot is None:
+            return 404, error(404, "snapshot_missing_exception", "snapshot")
+        indices = request.get("indices") or list(snapshot["documents"])
+        if isinstance(indices, str):
+            indices = indices.split(",")
+        pattern = request.get("rename_pattern")
+        replacement = re.sub(r"\$(\d)", r"\\\1", request.get("rename_replacement", ""))
+        restored = {
+            name: re.sub(pattern, replacement, name) if pattern else name
+            for name in snapshot["documents"]
+            if any(fnmatch.fnmatchcase(name, p) for p in indices)
+        }
+        existing = [target for target in restored.values() if target in cluster.indices]
+        if existing:
+            return 500, error(
+                500,
+                "snapshot_restore_exception",
+                f"an open index with same name already exists: [{existing[0]}]",
+            )
+        for name, target in restored.items():
+            cluster.index(target, snapshot["documents"][name])
+        return 200, {
+            "snapshot": {
+                "snapshot": snapshot["info"]["snapshot"],
+                "indices": sorted(restored.values()),
+                "shards": {
+                    "total": len(restored),
+                    "failed": 0,
+                    "successful": len(restored),
+                },
+            }
+        }
+
+    def submit_async_search(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        search_id = f"fake-{len(cluster.async_searches)}-{time.monotonic_ns()}"
+        stored = {
+            "id": search_id,
+            "is_running": False,
+            "is_partial": False,
+            "start_time_in_millis": int(time.time() * 1000),
+            "expiration_time_in_millis": int(time.time() * 1000) + 3600000,
+            "response": response,
+        }
+        cluster.async_searches[search_id] = stored
+        return stored
+
+    def nodes_info(self) -> Dict[str, Any]:
+        nodes = cluster.nodes or [
+            (f"{self.config.host}:{self.config.port}", ["master", "data", "ingest"])
+        ]
+        return {
+            "nodes": {
+                f"node-{i}": {
+                    "name": f"node-{i}",
+                    "roles": roles,
+                    "http": {"publish_address": address},
+                }
+                for i, (address, roles) in enumerate(nodes)
+            }
+        }
+
+    def bulk(self, body: bytes) -> Dict[str, Any]:
+        lines = body.splitlines()
+        items = []
+        documents: Dict[str, List[Dict[str, Any]]] = {}
+        i = 0
+        while i < len(lines):
+            action = json.loads(lines[i])
+            op_type, meta = next(iter(action.items()))
+            if op_type == "delete":
+                i += 1
+            else:
+                documents.setdefault(meta["_index"], []).append(
+                    json.loads(lines[i + 1])
+                )
+                i += 2
+            items.append(
+                {
+                    op_type: {
+                        "_index": meta.get("_index"),
+                        "status": 201,
+                        "result": "created",
+                    }
+                }
+            )
+        for index, docs in documents.items():
+            cluster.index(index, docs)
+        return {"took": 1, "errors": False, "items": items}
+
+    def search(self, index: str, query: Dict[str, Any]) -> Dict[str, Any]:
+        documents = cluster.documents(index)
+        size = query.get("size", 10)
+        hits = [
+            {"_index": index, "_id": str(i), "_score": None, "_source": doc}
+            for i, doc in enumerate(documents[:size])
+        ]
+        response: Dict[str, Any] = {
+            "took": 1,
+            "timed_out": False,
+            "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+            "hits": {
+                "total": {"value": len(documents), "relation": "eq"},
+                "max_score": None,
+                "hits": hits,
+            },
+        }
+        if query.get("aggs"):
+            response["aggregations"] = {
+                name: (
+                    self.metric(documents, agg)
+                    if "max" in agg or "min" in agg
+                    else {"doc_count_error_upper_bound": 0, "buckets": []}
+                )
+                for name, agg in query["aggs"].items()
+            }
+        if query.get("profile"):
+            response["profile"] = {"shards": []}
+        return response
+
+    def scroll(
+        self, documents: List[Dict[str, Any]], request: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Returns the next page of a scroll, the rest is kept under a new ID."""
+        size = request["size"]
+        scroll_id = f"scroll-{time.monotonic_ns()}"
+        cluster.scrolls[scroll_id] = (documents[size:], size)
+        return {
+            "_scroll_id": scroll_id,
+            "took": 1,
+            "timed_out": False,
+            "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+            "hits": {
+                "total": {"value": len(documents), "relation": "eq"},
+                "hits": [
+                    {"_id": str(i), "_source": doc}
+                    for i, doc in enumerate(documents[:size])
+                ],
+            },
+        }
+
+    @staticmethod
+    def metric(documents: List[Dict[str, Any]], agg: Dict[str, Any]) -> Dict[str, Any]:
+        """The `max` and `min` aggregations (of dates, as epoch milliseconds)."""
+        kind = "max" if "max" in agg else "min"
+        field = agg[kind]["field"]
+        get = getter(field)
+        values = []
+        for document in documents:
+            value = get(document)
+            if isinstance(value, str):
+                value = parse_date_math(value).timestamp() * 1000
+            if isinstance(value, (int, float)):
+                values.append(value)
+        return {"value": (max if kind == "max" else min)(values) if values else None}
+
+
+def error(status: int, error_type: str, reason: str) -> Dict[str, Any]:
+    return {"error": {"type": error_type, "reason": reason}, "status": status}
+
+
+def create_fake_client(**kwargs: Any) -> CustomElasticsearch:
+    """Returns a client whose requests are answered by the in-memory fake cluster."""
+    if OrjsonSerializer is not None:
+        kwargs.setdefault("serializer", OrjsonSerializer())
+    return CustomElasticsearch(
+        hosts=[NodeConfig("http", "fake-elasticsearch", 9200)],
+        node_class=FakeNode,
+        **kwargs,
+    )
+
+
+def serve(host: str = "127.0.0.1", port: int = 9200) -> ThreadingHTTPServer:
+    """
+    Returns an HTTP server answering Elasticsearch requests from the in-memory fake,
+    for API instances running in other processes (e.g. multiple workers).
+    """
+    node = FakeNode(NodeConfig("http", host, port))
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def handle_request(self) -> None:
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length) if length else None
+            url = urlsplit(self.path)
+            parts = [p for p in url.path.split("/") if p]
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            wire_body = body
+            if body and self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            endpoint, status, payload = node.dispatch(self.command, parts, query, body)
+            cluster.count_request(endpoint, wire_body)
+            data = b"" if payload is None else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            for name, value in RESPONSE_HEADERS.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(data)
+
+        do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = handle_request
+
+        def log_message(self, *_: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-memory Elasticsearch fake.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    args = parser.parse_args()
+    try:
+        serve(args.host, args.port).serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,172 @@
+import asyncio
+import gzip
+import json
+import os
+import random
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.payloads import PayloadShape, make_bulk, make_entry, make_search
+
+
+@dataclass
+class LoadOptions:
+    """Options of a load test run."""
+
+    base_url: Optional[str] = None
+    api_key: str = "benchmark"
+    concurrency: int = 16
+    requests: int = 2000
+    mix: Dict[str, float] = field(
+        default_factory=lambda: {"create": 0.2, "create-bulk": 0.3, "search": 0.5}
+    )
+    shape: PayloadShape = field(default_factory=PayloadShape)
+    search_filters: int = 3
+    seed: int = 42
+    # Content-Encoding of the ingest request bodies and the accepted response
+    # encoding (e.g. `gzip`), None sends and accepts uncompressed bodies.
+    compress: Optional[str] = None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "requests_per_second": (len(latencies) + errors) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": statistics.fmean(latencies) if latencies else 0.0,
+    }
+
+
+def in_process_app() -> Any:
+    """
+    Imports the API with its Elasticsearch client replaced by the in-memory fake,
+    so the load test runs without a cluster.
+    """
+    os.environ.setdefault("ELASTIC_INDEX_NAME", "audit_logs")
+    os.environ.setdefault("ELASTIC_URL", "http://fake-elasticsearch:9200")
+    os.environ.setdefault(
+        "CONFIG_FILE_PATH",
+        os.path.join(os.path.dirname(__file__), "config-benchmark.yaml"),
+    )
+    from audit_logger import main
+    from audit_logger.storage import ElasticStorage
+    from benchmarks.fake_elasticsearch import create_fake_client
+
+    main.elastic = main.search_elastic = create_fake_client()
+    # The lifespan isn't run by the ASGI transport.
+    main.storage = ElasticStorage(main.elastic, query_cache=main.query_cache)
+    return main.app
+
+
+def encode(content: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=3).compress(content)
+    return gzip.compress(content, compresslevel=5)
+
+
+def build_request(
+    route: str, rng: random.Random, options: LoadOptions
+) -> Tuple[str, Any]:
+    if route == "create":
+        return "/create", make_entry(rng, options.shape)
+    if route == "create-bulk":
+        return "/create-bulk", make_bulk(rng, options.shape)
+    return "/search", make_search(rng, options.search_filters)
+
+
+async def run_load(options: LoadOptions) -> Dict[str, Any]:
+    """
+    Sends `options.requests` requests with the configured route mix and concurrency,
+    either against `options.base_url` or the in-process API with the fake ES.
+    """
+    rng = random.Random(options.seed)
+    routes = list(options.mix)
+    weights = [options.mix[r] for r in routes]
+    plan = [
+        build_request(route, rng, options)
+        for route in rng.choices(routes, weights=weights, k=options.requests)
+    ]
+
+    if options.base_url:
+        transport = None
+        base_url = options.base_url
+    else:
+        transport = httpx.ASGITransport(app=in_process_app())
+        base_url = "http://audit-logger"
+
+    latencies: Dict[str, List[float]] = {
+        route: [] for route in ("/create", "/create-bulk", "/search")
+    }
+    errors: Dict[str, int] = {route: 0 for route in latencies}
+    wire = {"bytes_sent": 0, "bytes_received": 0}
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in plan:
+        queue.put_nowait(item)
+
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        transport=transport,
+        headers={
+            "X-API-Key": options.api_key,
+            "Content-Type": "application/json",
+            "Accept-Encoding": options.compress or "identity",
+        },
+        timeout=30,
+    ) as client:
+
+        async def worker() -> None:
+            while True:
+                try:
+                    path, payload = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                content = json.dumps(payload).encode("utf-8")
+                headers = {}
+                if options.compress and path != "/search":
+                    content = encode(content, options.compress)
+                    headers["Content-Encoding"] = options.compress
+                start = time.perf_counter()
+                try:
+                    response = await client.post(path, content=content, headers=headers)
+                    ok = response.status_code < 400
+                    wire["bytes_received"] += response.num_bytes_downloaded
+                except httpx.HTTPError:
+                    ok = False
+                wire["bytes_sent"] += len(content)
+                if ok:
+                    latencies[path].append(time.perf_counter() - start)
+                else:
+                    errors[path] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(options.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "total": summarize(all_latencies, sum(errors.values()), elapsed),
+        "routes": {
+            path: summarize(values, errors[path], elapsed)
+            for path, values in latencies.items()
+            if values or errors[path]
+        },
+        "elapsed": elapsed,
+        **wire,
+    }
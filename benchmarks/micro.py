@@ -0,0 +1,299 @@
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from functools import partial
+from typing import Any, Callable, Dict, List
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from audit_logger.admission import AdmissionPool
+from audit_logger.alerts import AlertEngine, FileAlertSink
+from audit_logger.decoding import CBOR, MSGPACK, cbor2, decode_binary, msgpack
+from audit_logger.elastic_filters import ElasticSearchQueryBuilder, QueryCache
+from audit_logger.models import (
+    AdmissionPoolSettings,
+    AlertSettings,
+    AuditLogEntry,
+    IngestPolicySettings,
+    SearchFilterParams,
+    SearchParams,
+    SearchResults,
+)
+from audit_logger.policies import IngestPolicyEngine
+from audit_logger.predicates import compile_predicate
+from audit_logger.responses import RawJSONResponse
+from audit_logger.synthetic import SyntheticGenerator, to_bulk_ndjson
+from audit_logger.tail import TailHub
+from audit_logger.utils import create_bulk_operations, find_duplicates
+from benchmarks.fake_elasticsearch import cluster, create_fake_client
+from benchmarks.payloads import PayloadShape, make_bulk, make_search
+
+Result = Dict[str, Any]
+
+
+def measure(
+    func: Callable[[], Any], items: int = 1, repeat: int = 7, min_time: float = 0.2
+) -> Result:
+    """
+    Runs `func` in rounds of at least `min_time` seconds and returns the median and
+    minimum time per item (`items` being the number of items processed per call).
+    """
+    func()  # Warm up.
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    timings: List[float] = [elapsed / (number * items)]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / (number * items))
+
+    median = statistics.median(timings)
+    return {
+        "unit": "s/item",
+        "median": median,
+        "min": min(timings),
+        "items_per_second": 1 / median if median else 0.0,
+        "rounds": repeat,
+        "calls_per_round": number,
+    }
+
+
+def peak_memory(func: Callable[[], Any]) -> int:
+    """Returns the peak of the memory allocated (in bytes) during a call of `func`."""
+    func()  # Warm up (caches, lazy imports).
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def search_response(client: Any, params: SearchParams, raw: bool) -> bytes:
+    """
+    Runs a search and renders the `/search` response body, either through the
+    DSL `Response` and the `SearchResults` model (revalidated and encoded like
+    FastAPI does for a response model) or through the raw path.
+    """
+    builder = ElasticSearchQueryBuilder(using=client, index="audit_logs")
+    result = builder.process_parameters(params, raw=raw)
+    content = {
+        "hits": len(result["docs"]),
+        "docs": result["docs"],
+        "aggs": result["aggs"],
+    }
+    if raw:
+        return RawJSONResponse(content).body
+    model = SearchResults(**content)
+    validated = SearchResults.model_validate(model.model_dump(exclude_unset=True))
+    return JSONResponse(validated.model_dump(mode="json", exclude_unset=True)).body
+
+
+def decode_validate(adapter: TypeAdapter, media: str, body: bytes) -> Any:
+    return adapter.validate_python(decode_binary(media, body))
+
+
+def run_micro_benchmarks(
+    shape: PayloadShape, seed: int = 42, repeat: int = 7
+) -> Dict[str, Result]:
+    """Runs the micro benchmarks of the ingest and search hot paths."""
+    rng = random.Random(seed)
+    raw_entries = make_bulk(rng, shape)
+    entries = [AuditLogEntry(**entry) for entry in raw_entries]
+    dumped = [entry.model_dump(mode="json") for entry in entries]
+    json_body = json.dumps(raw_entries).encode("utf-8")
+    client = create_fake_client()
+
+    results: Dict[str, Result] = {}
+
+    results["validate_audit_log_entry"] = measure(
+        lambda: [AuditLogEntry.model_validate(entry) for entry in raw_entries],
+        items=len(raw_entries),
+        repeat=repeat,
+    )
+    results["find_duplicates"] = measure(
+        lambda: find_duplicates(entries), items=len(entries), repeat=repeat
+    )
+    # Entries are redacted in place, which is fine as IP anonymization is idempotent.
+    results["create_bulk_operations"] = measure(
+        lambda: create_bulk_operations("audit_logs", dumped),
+        items=len(dumped),
+        repeat=repeat,
+    )
+
+    # Decoding and validating a `/create-bulk` body, per ingest format.
+    adapter = TypeAdapter(List[AuditLogEntry])
+    results["decode_validate_json"] = measure(
+        lambda: adapter.validate_json(json_body), items=len(raw_entries), repeat=repeat
+    )
+    bodies: Dict[str, bytes] = {}
+    if msgpack:
+        bodies[MSGPACK] = msgpack.packb(raw_entries)
+    if cbor2:
+        bodies[CBOR] = cbor2.dumps(raw_entries)
+    for media, body in bodies.items():
+        name = media.split("/")[1]
+        results[f"decode_validate_{name}"] = measure(
+            partial(decode_validate, adapter, media, body),
+            items=len(raw_entries),
+            repeat=repeat,
+        )
+
+    generator = SyntheticGenerator(seed=seed)
+    results["synthetic_entries"] = measure(
+        lambda: generator.entries(shape.bulk_size),
+        items=shape.bulk_size,
+        repeat=repeat,
+    )
+    synthetic = generator.entries(shape.bulk_size)
+    results["synthetic_bulk_ndjson"] = measure(
+        lambda: to_bulk_ndjson("audit_logs", synthetic),
+        items=len(synthetic),
+        repeat=repeat,
+    )
+
+    # The `/search` response path for 1000 documents, DSL objects vs. raw body.
+    cluster.reset()
+    cluster.index("audit_logs", SyntheticGenerator(seed=seed).entries(1000))
+    search_params = SearchParams(max_results=1000)
+    for path in ("dsl", "raw"):
+        func = partial(search_response, client, search_params, path == "raw")
+        results[f"search_response_{path}_1000_docs"] = {
+            **measure(func, repeat=repeat),
+            "peak_bytes": peak_memory(func),
+        }
+    cluster.reset()
+
+    # Matching a bulk against 1000 `/tail` subscribers (10 distinct filter sets).
+    hub = TailHub(queue_size=shape.bulk_size, max_subscribers=1000)
+    for i in range(1000):
+        hub.subscribe(
+            [
+                SearchFilterParams(field="status", type="exact", value="failure"),
+                SearchFilterParams(
+                    field="application_name", type="exact", value=f"app-{i % 10}"
+                ),
+            ]
+        )
+    results["tail_publish_1000_subscribers"] = measure(
+        lambda: hub.publish(dumped), items=len(dumped), repeat=repeat
+    )
+
+    # Counting a bulk against 3 alert rules grouped by actor (~100 distinct keys).
+    alerts = AlertEngine()
+    alerts.configure(
+        AlertSettings(
+            enabled=True,
+            rules=[
+                {
+                    "name": "failures_per_actor",
+                    "filters": [
+                        {"field": "status", "type": "exact", "value": "failure"}
+                    ],
+                    "group_by": ["actor.identifier"],
+                    "threshold": 20,
+                },
+                {
+                    "name": "events_per_application",
+                    "group_by": ["application_name", "event_name"],
+                    "threshold": 1000,
+                },
+                {
+                    "name": "deletes_per_actor",
+                    "filters": [
+                        {"field": "event_name", "type": "wildcard", "value": "*delete*"}
+                    ],
+                    "group_by": ["actor.identifier"],
+                    "threshold": 50,
+                    "window": 60,
+                },
+            ],
+        ),
+        sink=FileAlertSink(os.devnull),
+    )
+    results["alert_rules_3_rules"] = measure(
+        lambda: alerts.process(dumped), items=len(dumped), repeat=repeat
+    )
+    alerts.shutdown()
+
+    # The per-request overhead of the admission control (rate limit, slot, latency).
+    pool = AdmissionPool(
+        "ingest", AdmissionPoolSettings(rate=1e9, burst=1e9), max_keys=1000
+    )
+
+    async def admit(requests: int = 1000) -> None:
+        for i in range(requests):
+            pool.check_rate(f"key-{i % 100}")
+            await pool.acquire(1.0)
+            pool.observe(0.01)
+            pool.release()
+
+    loop = asyncio.new_event_loop()
+    results["admission_1000_requests"] = measure(
+        lambda: loop.run_until_complete(admit()), items=1000, repeat=repeat
+    )
+    loop.close()
+
+    # Resolving the ingest policy of every entry of a bulk (3 policies, incl. sampling).
+    policies = IngestPolicyEngine()
+    policies.configure(
+        IngestPolicySettings(
+            rules=[
+                {
+                    "name": "sampled",
+                    "event_name": "file_access",
+                    "action": "sample",
+                    "sample_rate": 0.1,
+                },
+                {"name": "cold", "event_name": "data_backup", "action": "cold"},
+                {"name": "counted", "status": "heartbeat", "action": "aggregate"},
+            ]
+        )
+    )
+    results["ingest_policies_3_rules"] = measure(
+        lambda: policies.apply(dumped, "audit_logs"), items=len(dumped), repeat=repeat
+    )
+
+    for filters in (1, 5, 10):
+        raw_params = make_search(rng, filters)
+        params = SearchParams(**raw_params)
+        results[f"compile_search_{filters}_filters"] = measure(
+            lambda: ElasticSearchQueryBuilder(using=client, index="audit_logs").compile(
+                params
+            ),
+            repeat=repeat,
+        )
+        # A cache hit, incl. the canonical JSON of the parameters as the cache key.
+        query_cache = QueryCache()
+        results[f"compile_search_{filters}_filters_cached"] = measure(
+            lambda: ElasticSearchQueryBuilder(
+                using=client, index="audit_logs", query_cache=query_cache
+            ).compile(params),
+            repeat=repeat,
+        )
+        predicate = compile_predicate(params.filters or [])
+        results[f"predicate_{filters}_filters"] = measure(
+            lambda: [predicate(entry) for entry in dumped],
+            items=len(dumped),
+            repeat=repeat,
+        )
+        results[f"validate_search_params_{filters}_filters"] = measure(
+            lambda: SearchParams.model_validate(raw_params),
+            repeat=repeat,
+        )
+
+    return results
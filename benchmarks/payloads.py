@@ -0,0 +1,92 @@
+import random
+import string
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+EVENT_NAMES = ["user_login", "user_logout", "data_backup", "file_access", "role_update"]
+ACTORS = ["j.doe", "j.dot", "a.smith", "s.jones", "m.miller", "k.lee"]
+APPLICATIONS = [
+    "user-management-service",
+    "login-frontend",
+    "payment-gateway",
+    "logging-service",
+    "data-backup-service",
+]
+MODULES = ["authentication", "authorization", "database-client", "cronjob"]
+
+
+@dataclass
+class PayloadShape:
+    """Describes the shape of the generated audit log payloads."""
+
+    bulk_size: int = 100
+    meta_keys: int = 2
+    comment_length: int = 40
+    duplicate_ratio: float = 0.0
+
+
+def make_entry(rng: random.Random, shape: PayloadShape) -> Dict[str, Any]:
+    """Returns a single audit log entry (as sent by a producer)."""
+    return {
+        "timestamp": f"2024-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T10:00:00",
+        "event_name": rng.choice(EVENT_NAMES),
+        "actor": {
+            "identifier": rng.choice(ACTORS),
+            "type": rng.choice(["user", "system"]),
+            "ip_address": f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.1",
+            "user_agent": "Mozilla/5.0 (X11; Linux x86_64) Firefox/124.0",
+        },
+        "application_name": rng.choice(APPLICATIONS),
+        "module": rng.choice(MODULES),
+        "action": rng.choice(["create", "update", "delete", "login"]),
+        "comment": "".join(
+            rng.choices(string.ascii_lowercase + " ", k=shape.comment_length)
+        ),
+        "status": rng.choice(["success", "failure"]),
+        "server": {
+            "hostname": "server-01",
+            "vm_name": "vm-01",
+            "ip_address": "10.0.0.1",
+        },
+        "meta": {f"key_{i}": rng.randint(0, 10000) for i in range(shape.meta_keys)},
+    }
+
+
+def make_bulk(rng: random.Random, shape: PayloadShape) -> List[Dict[str, Any]]:
+    """Returns a bulk payload, with `duplicate_ratio` of the entries being duplicates."""
+    unique = max(1, round(shape.bulk_size * (1 - shape.duplicate_ratio)))
+    entries = [make_entry(rng, shape) for _ in range(unique)]
+    while len(entries) < shape.bulk_size:
+        entries.append(dict(rng.choice(entries[:unique])))
+    return entries
+
+
+def make_search(rng: random.Random, filters: int = 2) -> Dict[str, Any]:
+    """Returns search parameters with the given number of filters."""
+    candidates = [
+        {"field": "event_name", "type": "exact", "value": rng.choice(EVENT_NAMES)},
+        {
+            "field": "status",
+            "type": "exact",
+            "value": rng.choice(["success", "failure"]),
+        },
+        {"field": "application_name", "type": "wildcard", "value": "payment-*"},
+        {"field": "actor.identifier", "type": "nested", "value": rng.choice(ACTORS)},
+        {"field": "timestamp", "type": "range", "value": "this-week"},
+        {
+            "field": "timestamp",
+            "type": "range",
+            "gte": "2024-01-01",
+            "lte": "2024-12-31",
+        },
+        {"field": "comment", "type": "text_search", "value": "backup"},
+        {"field": "module", "type": "exists"},
+        {"field": "action", "type": "exact", "value": "login"},
+        {"field": "server.hostname", "type": "wildcard", "value": "server-*"},
+    ]
+    return {
+        "max_results": 100,
+        "sort_by": "timestamp",
+        "sort_order": "desc",
+        "filters": [candidates[i % len(candidates)] for i in range(filters)],
+    }
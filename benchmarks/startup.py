@@ -0,0 +1,147 @@
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Any, Dict, Iterator, List
+
+import httpx
+
+from benchmarks.load import LoadOptions, run_load
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_FILE_PATH = os.path.join(ROOT, "benchmarks", "config-benchmark.yaml")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float) -> float:
+    """Polls `url` until it answers with 200 and returns the elapsed seconds."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args!r} exited with {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+@contextmanager
+def fake_elasticsearch() -> Iterator[str]:
+    """Runs the Elasticsearch fake in its own process and yields its URL."""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_elasticsearch", "--port", str(port)],
+        cwd=ROOT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(url, process, timeout=30)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def import_time() -> Dict[str, Any]:
+    """Measures the import of the app in a fresh interpreter (without connecting)."""
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import audit_logger.main\n"
+        "print(time.perf_counter() - start, 'faker' in sys.modules)\n"
+    )
+    env = dict(
+        os.environ,
+        ELASTIC_INDEX_NAME="audit_logs",
+        ELASTIC_URL="http://127.0.0.1:9",
+        CONFIG_FILE_PATH=CONFIG_FILE_PATH,
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+        cwd=ROOT,
+    ).stdout.split()
+    return {"seconds": float(output[0]), "imports_faker": output[1] == "True"}
+
+
+def run_server(
+    workers: int, elastic_url: str, options: LoadOptions, timeout: float = 60
+) -> Dict[str, Any]:
+    """
+    Starts the production server with `workers` workers against the fake and
+    measures the cold start (until `/health` answers), the steady-state load
+    and the graceful shutdown.
+    """
+    port = free_port()
+    env = dict(
+        os.environ,
+        ELASTIC_INDEX_NAME="audit_logs",
+        ELASTIC_URL=elastic_url,
+        CONFIG_FILE_PATH=CONFIG_FILE_PATH,
+    )
+    env.pop("WEB_CONCURRENCY", None)
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "audit_logger.server",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+        cwd=ROOT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(f"{base_url}/health", process, timeout)
+        cold_start = time.perf_counter() - start
+
+        load = asyncio.run(run_load(replace(options, base_url=base_url)))
+    finally:
+        stop = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout)
+        shutdown = time.perf_counter() - stop
+
+    return {
+        "workers": workers,
+        "cold_start": cold_start,
+        "shutdown": shutdown,
+        "requests_per_second": load["total"]["requests_per_second"],
+        "p95": load["total"]["p95"],
+        "errors": load["total"]["errors"],
+    }
+
+
+def run_startup_benchmarks(
+    options: LoadOptions, worker_counts: List[int]
+) -> Dict[str, Any]:
+    """Compares the cold start and steady-state throughput for each worker count."""
+    results: Dict[str, Any] = {"import": import_time()}
+    with fake_elasticsearch() as elastic_url:
+        for workers in worker_counts:
+            results[f"workers_{workers}"] = run_server(workers, elastic_url, options)
+    return results
@@ -0,0 +1,153 @@
+import os
+import tempfile
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from audit_logger.elastic import create_client
+from audit_logger.models import SearchParams, StorageSettings, TimelineSettings
+from audit_logger.storage import ElasticStorage, SQLiteStorage, StorageBackend
+from audit_logger.synthetic import SyntheticGenerator
+from audit_logger.timeline import ActorTimeline
+from audit_logger.utils import create_bulk_operations
+from benchmarks.micro import Result, measure
+
+# The index written and searched by the storage benchmarks (deleted afterwards).
+INDEX = "audit-logs-storage-benchmark"
+
+
+def common_queries(sample: Dict[str, Any]) -> Dict[str, SearchParams]:
+    """Our most common searches, for the actor and comment of a sample entry."""
+    queries: Dict[str, Dict[str, Any]] = {
+        "actor_timeline": {
+            "filters": [
+                {
+                    "field": "actor.identifier",
+                    "type": "nested",
+                    "value": sample["actor"]["identifier"],
+                },
+                {"field": "timestamp", "type": "range", "gte": "now-90d"},
+            ],
+            "sort_order": "desc",
+            "max_results": 100,
+        },
+        "failed_events_this_week": {
+            "filters": [
+                {"field": "status", "type": "exact", "value": "failure"},
+                {"field": "timestamp", "type": "range", "value": "this-week"},
+            ],
+        },
+        "application_wildcard": {
+            "filters": [
+                {"field": "application_name", "type": "wildcard", "value": "payment-*"}
+            ],
+            "max_results": 50,
+        },
+        "comment_text_search": {
+            "filters": [
+                {
+                    "field": "comment",
+                    "type": "text_search",
+                    "value": sample["comment"].split()[0],
+                }
+            ],
+            "max_results": 50,
+        },
+        "event_terms_aggregation": {
+            "aggs": {"events": {"type": "terms", "field": "event_name"}},
+            "max_results": 1,
+        },
+    }
+    return {name: SearchParams(**query) for name, query in queries.items()}
+
+
+def sqlite_storage(directory: str) -> SQLiteStorage:
+    return SQLiteStorage(
+        StorageSettings(
+            backend="sqlite", path=os.path.join(directory, "benchmark.sqlite3")
+        )
+    )
+
+
+def elastic_storage(url: str) -> ElasticStorage:
+    client = create_client([url])
+    if client.indices.exists(index=INDEX):
+        client.indices.delete(index=INDEX)
+    return ElasticStorage(client)
+
+
+def load(storage: StorageBackend, operations: List[Dict[str, Any]]) -> None:
+    for offset in range(0, len(operations), 1000):
+        storage.bulk(operations[offset : offset + 1000])  # noqa: E203
+    if isinstance(storage, ElasticStorage):
+        storage.ingest.indices.refresh(index=INDEX)
+
+
+def timeline_page(
+    storage: ElasticStorage,
+    documents: List[Dict[str, Any]],
+    sample: Dict[str, Any],
+    repeat: int,
+) -> Result:
+    """The first page of an actor's timeline, the timeline index of `INDEX`."""
+    timeline = ActorTimeline()
+    timeline.configure(TimelineSettings(enabled=True, number_of_replicas=0))
+    timeline.start(storage.ingest)
+    index = timeline.index(INDEX)
+    try:
+        for offset in range(0, len(documents), 1000):
+            timeline.write(INDEX, documents[offset : offset + 1000])  # noqa: E203
+        storage.ingest.indices.refresh(index=index)
+        search = partial(
+            timeline.search, INDEX, sample["actor"]["identifier"], 100, gte="now-90d"
+        )
+        return {**measure(search, repeat=repeat), "hits": len(search()["docs"])}
+    finally:
+        storage.ingest.indices.delete(index=index, ignore_unavailable=True)
+
+
+def run_storage_benchmarks(
+    seed: int = 42,
+    repeat: int = 7,
+    entries: int = 10000,
+    elastic_url: Optional[str] = None,
+) -> Dict[str, Result]:
+    """
+    Compares the storage backends: the ingest of a bulk of 100 entries and our
+    common searches over `entries` entries. The `sqlite` backend is always
+    measured, Elasticsearch only against a real cluster (`elastic_url`), as the
+    in-memory fake doesn't evaluate the queries. With Elasticsearch, the actor
+    timeline index is compared with the `actor_timeline` search.
+    """
+    generator = SyntheticGenerator(seed=seed)
+    documents = generator.entries(entries)
+    operations = create_bulk_operations(INDEX, documents)
+    bulk = create_bulk_operations(INDEX, generator.entries(100))
+    queries = common_queries(documents[0])
+
+    results: Dict[str, Result] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        backends: List[StorageBackend] = [sqlite_storage(directory)]
+        if elastic_url:
+            backends.append(elastic_storage(elastic_url))
+        for storage in backends:
+            try:
+                load(storage, operations)
+                for name, params in queries.items():
+                    search = partial(storage.search, params, INDEX)
+                    results[f"{storage.name}_{name}"] = {
+                        **measure(search, repeat=repeat),
+                        "hits": len(search()["docs"]),
+                    }
+                if isinstance(storage, ElasticStorage):
+                    results["elasticsearch_actor_timeline_index"] = timeline_page(
+                        storage, documents, documents[0], repeat
+                    )
+                # Measured last, the bulks grow the index.
+                results[f"{storage.name}_bulk_100"] = measure(
+                    partial(storage.bulk, bulk), items=len(bulk), repeat=repeat
+                )
+            finally:
+                if isinstance(storage, ElasticStorage):
+                    storage.ingest.indices.delete(index=INDEX)
+                storage.close()
+    return results
@@ -1,5 +1,7 @@
 #!/bin/bash
 
+INDEX_MAPPINGS_FILE="/app/audit_logger/index_mappings.json"
+
 curl_with_optional_auth() {
     local url=$1
     shift
@@ -20,64 +22,19 @@ wait_for_elasticsearch() {
 }
 
 create_elasticsearch_index_with_mappings() {
+    # The mapping is shared with the API (`audit_logger/mappings.py`), which creates
+    # the cold indices with it.
+    body=$(jq -n --slurpfile mappings "$INDEX_MAPPINGS_FILE" '{
+        "settings": {
+            "number_of_shards": 1,
+            "number_of_replicas": 0
+        },
+        "mappings": $mappings[0]
+    }')
     curl_output=$(curl_with_optional_auth "$ELASTIC_URL/${ELASTIC_INDEX_NAME}" \
             -X PUT \
             -H 'Content-Type: application/json' \
-            -d @- << EOF
-        {
-            "settings": {
-                "number_of_shards": 1,
-                "number_of_replicas": 0
-            },
-            "mappings": {
-                "properties": {
-                    "timestamp": { "type": "date" },
-                    "event_name": { "type": "keyword" },
-                    "actor": {
-                        "type": "nested",
-                        "properties": {
-                            "identifier": { "type": "keyword" },
-                            "type": { "type": "keyword" },
-                            "ip_address": { "type": "ip" },
-                            "user_agent": { "type": "keyword" }
-                        }
-                    },
-                    "application_name": { "type": "keyword" },
-                    "module": { "type": "keyword" },
-                    "action": { "type": "keyword" },
-                    "comment": { "type": "text" },
-                    "context": { "type": "keyword" },
-                    "resource": {
-                        "type": "nested",
-                        "properties": {
-                            "type": { "type": "keyword" },
-                            "id": { "type": "keyword" }
-                        }
-                    },
-                    "operation": { "type": "keyword" },
-                    "status": { "type": "keyword" },
-                    "endpoint": {
-                        "type": "text",
-                        "fields": {
-                            "keyword": { "type": "keyword", "ignore_above": 256 }
-                        }
-                    },
-                    "server": {
-                        "type": "nested",
-                        "properties": {
-                            "hostname": { "type": "keyword" },
-                            "vm_name": { "type": "keyword" },
-                            "ip_address": { "type": "ip" }
-                        }
-                    },
-                    "meta": {
-                        "type": "nested",
-                        "dynamic": true
-                    }
-                }
-            }
-        }
-EOF
+            -d "$body"
     )
 
     if [[ "$curl_output" =~ "acknowledged" ]]; then
@@ -204,11 +161,14 @@ create_kibana_index_pattern
 create_ilm_policy
 apply_ilm_policy_to_index
 
-# Starting the FastAPI application
-poetry run uvicorn audit_logger.main:app \
-    --host "0.0.0.0" \
-    --log-level "$LOG_LEVEL" \
-    --reload
-
-exec "$@"
+# Starting the FastAPI application: a single reloading process in development,
+# the multi-worker production server otherwise.
+if [[ "$ENVIRONMENT" == "development" ]]; then
+    exec poetry run uvicorn audit_logger.main:app \
+        --host "0.0.0.0" \
+        --log-level "$LOG_LEVEL" \
+        --reload
+else
+    exec python -m audit_logger.server --log-level "$LOG_LEVEL"
+fi
 
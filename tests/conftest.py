@@ -0,0 +1,37 @@
+import os
+from typing import Any, Dict, Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.fake_elasticsearch import cluster
+
+ENTRY: Dict[str, Any] = {
+    "timestamp": "2024-05-01T10:00:00",
+    "event_name": "user_login",
+    "actor": {"identifier": "j.doe", "type": "user", "ip_address": "10.0.0.1"},
+    "application_name": "login-frontend",
+    "module": "authentication",
+    "action": "login",
+    "comment": "Login of j.doe",
+    "status": "success",
+    "server": {"hostname": "server-01", "vm_name": "vm-01", "ip_address": "10.0.0.2"},
+}
+
+
+@pytest.fixture(scope="session")
+def app() -> Any:
+    """The API with the in-memory fake Elasticsearch (and the test config)."""
+    os.environ.setdefault(
+        "CONFIG_FILE_PATH", os.path.join(os.path.dirname(__file__), "config-test.yaml")
+    )
+    from benchmarks.load import in_process_app
+
+    return in_process_app()
+
+
+@pytest.fixture
+def client(app: Any) -> Iterator[TestClient]:
+    cluster.reset()
+    # The lifespan isn't run, so no connections and background tasks are opened.
+    yield TestClient(app)
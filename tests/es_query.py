@@ -0,0 +1,147 @@
+"""
+A reference evaluator of the ES query clauses the search filters compile into,
+over the index mapping (`audit_logger/index_mappings.json`), written
+independently of `audit_logger.predicates`. The fields of `nested` objects are
+only visible within a `nested` query on their path, like in ES.
+"""
+
+import fnmatch
+import ipaddress
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from audit_logger.mappings import INDEX_MAPPINGS, field_types
+
+FIELD_TYPES = field_types(INDEX_MAPPINGS)
+
+_TOKEN = re.compile(r"\w+")
+
+
+class ParseError(ValueError):
+    """The query value can't be parsed by the field type (ES answers `400`)."""
+
+
+def field_type(field: str) -> Optional[str]:
+    return FIELD_TYPES.get(field)
+
+
+def values(document: Dict[str, Any], field: str, scope: Optional[str]) -> List[Any]:
+    parent, _, child = field.partition(".")
+    if FIELD_TYPES.get(parent) == "nested":
+        # Only visible in the nested documents of the `nested` query on `parent`.
+        if scope != parent or not child:
+            return []
+        value = document.get(child)
+    elif scope is not None:
+        return []
+    else:
+        value = document.get(field)
+    items = value if isinstance(value, list) else [value]
+    return [item for item in items if item is not None]
+
+
+def tokens(value: Any) -> List[str]:
+    return _TOKEN.findall(str(value).lower())
+
+
+def keyword(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def epoch(value: Any) -> float:
+    try:
+        moment = datetime.fromisoformat(str(value))
+    except ValueError as e:
+        raise ParseError(str(e)) from e
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def ip(value: Any) -> Any:
+    try:
+        return ipaddress.ip_address(str(value))
+    except ValueError as e:
+        raise ParseError(str(e)) from e
+
+
+def term(kind: Optional[str], indexed: Any, value: Any) -> bool:
+    if kind == "date":
+        return epoch(indexed) == epoch(value)
+    if kind == "ip":
+        if "/" in str(value):
+            return ip(indexed) in ipaddress.ip_network(str(value), strict=False)
+        return ip(indexed) == ip(value)
+    if kind == "text":
+        return keyword(value) in tokens(indexed)
+    return keyword(indexed) == keyword(value)
+
+
+def match(kind: Optional[str], indexed: Any, value: Any) -> bool:
+    if kind == "text":
+        return not set(tokens(value)).isdisjoint(tokens(indexed))
+    return term(kind, indexed, value)
+
+
+def in_range(kind: Optional[str], indexed: Any, bounds: Dict[str, Any]) -> bool:
+    key: Any = {"date": epoch, "ip": ip}.get(kind or "", keyword)
+    low, high = bounds.get("gte"), bounds.get("lte")
+    return (low is None or key(indexed) >= key(low)) and (
+        high is None or key(indexed) <= key(high)
+    )
+
+
+def wildcard(kind: Optional[str], indexed: Any, pattern: str) -> bool:
+    candidates = tokens(indexed) if kind == "text" else [keyword(indexed)]
+    return any(fnmatch.fnmatchcase(candidate, pattern) for candidate in candidates)
+
+
+def matches(
+    query: Dict[str, Any], document: Dict[str, Any], scope: Optional[str] = None
+) -> bool:
+    """Whether the (root or nested) document matches the query clause."""
+    (kind, body), *_ = query.items()
+    if kind == "match_all":
+        return True
+    if kind == "bool":
+        must = body.get("must", []) + body.get("filter", [])
+        should = body.get("should", [])
+        return (
+            all(matches(q, document, scope) for q in must)
+            and not any(matches(q, document, scope) for q in body.get("must_not", []))
+            and (not should or any(matches(q, document, scope) for q in should))
+        )
+    if kind == "nested":
+        path = body["path"]
+        nested = document.get(path) if scope is None else None
+        items = nested if isinstance(nested, list) else [nested]
+        return any(
+            matches(body["query"], item, path)
+            for item in items
+            if isinstance(item, dict)
+        )
+    if kind == "exists":
+        return bool(values(document, body["field"], scope))
+    if kind == "multi_match":
+        for field in body["fields"]:
+            try:
+                if any(
+                    match(field_type(field), v, body["query"])
+                    for v in values(document, field, scope)
+                ):
+                    return True
+            except ParseError:
+                if not body.get("lenient"):
+                    raise
+        return False
+    (field, value), *_ = body.items()
+    checks = {
+        "term": lambda v: term(field_type(field), v, value),
+        "match": lambda v: match(field_type(field), v, value),
+        "range": lambda v: in_range(field_type(field), v, value),
+        "wildcard": lambda v: wildcard(field_type(field), v, value),
+    }
+    return any(checks[kind](v) for v in values(document, field, scope))
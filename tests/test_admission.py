@@ -0,0 +1,206 @@
+import asyncio
+from typing import Any, Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from audit_logger.admission import (
+    QUEUE_FULL,
+    QUEUE_TIMEOUT,
+    AdmissionController,
+    AdmissionPool,
+    GradientLimit,
+    RateLimiter,
+    Rejected,
+    TokenBucket,
+    admission,
+)
+from audit_logger.models import AdmissionPoolSettings, AdmissionSettings
+from tests.conftest import ENTRY
+
+
+def test_token_bucket_refills_at_the_rate() -> None:
+    bucket = TokenBucket(rate=2, burst=2)
+    now = bucket.updated
+    assert bucket.take(now=now) == 0
+    assert bucket.take(now=now) == 0
+    assert bucket.take(now=now) == pytest.approx(0.5)
+    assert bucket.take(now=now + 0.5) == 0
+
+
+def test_amount_over_the_burst_is_taken_once_full() -> None:
+    bucket = TokenBucket(rate=1, burst=2)
+    now = bucket.updated
+    assert bucket.take(5, now=now) == 0
+    assert bucket.take(now=now + 3) == pytest.approx(1)
+
+
+def test_rate_limiter_drops_the_least_recent_keys() -> None:
+    limiter = RateLimiter(rate=1, burst=1, max_keys=2)
+    assert limiter.take("a") == 0
+    assert limiter.take("b") == 0
+    assert limiter.take("a") > 0
+    assert limiter.take("c") == 0
+    # `b` was dropped, so it starts with a full bucket again.
+    assert limiter.take("b") == 0
+
+
+def test_gradient_limit_adapts_to_the_latency() -> None:
+    limit = GradientLimit(initial=20, min_limit=4, max_limit=64)
+    for _ in range(200):
+        limit.update(0.01, in_flight=64)
+    assert limit.limit == 64
+    for _ in range(50):
+        limit.update(0.1, in_flight=64)
+    assert limit.limit < 8
+
+
+def test_gradient_limit_does_not_grow_while_unused() -> None:
+    limit = GradientLimit(initial=20, min_limit=4, max_limit=64)
+    for _ in range(100):
+        limit.update(0.01, in_flight=1)
+    assert limit.limit == 20
+
+
+def pool(**settings: float) -> AdmissionPool:
+    return AdmissionPool(
+        "ingest",
+        AdmissionPoolSettings(
+            adaptive=False, max_concurrency=1, min_concurrency=1, **settings
+        ),
+    )
+
+
+def test_waiting_requests_get_the_released_slots() -> None:
+    async def run() -> None:
+        limited = pool(max_queue=1)
+        await limited.acquire(1.0)
+        waiting = asyncio.ensure_future(limited.acquire(1.0))
+        await asyncio.sleep(0)
+        assert limited.queue_depth == 1
+        limited.release()
+        await waiting
+        assert limited.in_flight == 1
+        assert limited.queue_depth == 0
+
+    asyncio.run(run())
+
+
+def test_full_queue_is_rejected() -> None:
+    async def run() -> None:
+        limited = pool(max_queue=0)
+        await limited.acquire(1.0)
+        with pytest.raises(Rejected) as e:
+            await limited.acquire(3.0)
+        assert (e.value.status_code, e.value.reason) == (503, QUEUE_FULL)
+        assert e.value.retry_after == 3.0
+
+    asyncio.run(run())
+
+
+def test_queue_timeout_is_rejected() -> None:
+    async def run() -> None:
+        limited = pool(max_queue=1, max_queue_time=0.01)
+        await limited.acquire(1.0)
+        with pytest.raises(Rejected) as e:
+            await limited.acquire(1.0)
+        assert (e.value.status_code, e.value.reason) == (503, QUEUE_TIMEOUT)
+        assert limited.queue_depth == 0
+        assert limited.in_flight == 1
+
+    asyncio.run(run())
+
+
+@pytest.fixture
+def rate_limited() -> Iterator[None]:
+    admission.configure(
+        AdmissionSettings(enabled=True, ingest=AdmissionPoolSettings(rate=1))
+    )
+    yield
+    admission.configure(None)
+
+
+def test_requests_over_the_rate_get_a_429(
+    client: TestClient, rate_limited: None
+) -> None:
+    headers = {"X-API-Key": "test"}
+    assert client.post("/create", headers=headers, json=ENTRY).status_code == 201
+    response = client.post("/create", headers=headers, json=ENTRY)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    # The rate is per API key.
+    response = client.post("/create", headers={"X-API-Key": "shop-key"}, json=ENTRY)
+    assert response.status_code == 201
+
+
+def test_rate_limiter_is_resized_in_place() -> None:
+    limited = pool(rate=1, burst=2)
+    limiter = limited.rate_limiter
+    assert limiter is not None
+    assert limited.rate_limiter.take("a", 2) == 0
+    limited.rate_limiter.take("b")
+    limited.configure(
+        AdmissionPoolSettings(
+            adaptive=False, max_concurrency=1, min_concurrency=1, rate=10, burst=5
+        ),
+        max_keys=1,
+    )
+    assert limited.rate_limiter is limiter
+    assert (limiter.rate, limiter.burst, limiter.max_keys) == (10, 5, 1)
+    # `a` was dropped (least recently used), `b` kept its tokens.
+    assert list(limiter._buckets) == ["b"]
+    bucket = limiter._buckets["b"]
+    assert (bucket.rate, bucket.burst) == (10, 5)
+    assert bucket.tokens < 2
+
+
+def test_reload_does_not_refill_the_buckets() -> None:
+    limited = pool(rate=1, burst=1)
+    assert limited.rate_limiter is not None
+    assert limited.rate_limiter.take("a") == 0
+    limited.configure(
+        AdmissionPoolSettings(
+            adaptive=False, max_concurrency=1, min_concurrency=1, rate=1, burst=3
+        )
+    )
+    assert limited.rate_limiter.take("a") > 0
+
+
+def adaptive(**settings: Any) -> AdmissionPoolSettings:
+    return AdmissionPoolSettings(
+        **{"max_concurrency": 64, "min_concurrency": 4, **settings}
+    )
+
+
+def test_gradient_is_kept_by_a_reload() -> None:
+    limited = AdmissionPool("search", adaptive())
+    gradient = limited.gradient
+    assert gradient is not None
+    for _ in range(50):
+        limited.gradient.update(0.1, in_flight=64)
+    long_rtt = gradient.long_rtt
+    limit = limited.limit
+    limited.configure(adaptive())
+    assert limited.gradient is gradient
+    assert (limited.limit, gradient.long_rtt) == (limit, long_rtt)
+
+    # New bounds clamp the limit, the latency averages are kept.
+    limited.configure(adaptive(max_concurrency=16, latency_tolerance=2.0))
+    assert limited.gradient is gradient
+    assert limited.limit == 16
+    assert (gradient.tolerance, gradient.long_rtt) == (2.0, long_rtt)
+
+    limited.configure(adaptive(adaptive=False, max_concurrency=8))
+    assert limited.gradient is None
+    assert limited.limit == 8
+
+
+def test_controller_keeps_its_pools() -> None:
+    settings = AdmissionSettings(enabled=True, ingest=AdmissionPoolSettings(rate=1))
+    controller = AdmissionController()
+    controller.configure(settings)
+    ingest = controller.pool("ingest")
+    controller.configure(
+        AdmissionSettings(enabled=True, ingest=AdmissionPoolSettings(rate=2))
+    )
+    assert controller.pool("ingest") is ingest
@@ -0,0 +1,133 @@
+import os
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from pydantic import ValidationError
+
+from audit_logger import server
+from audit_logger.alerts import AlertEngine, AlertSink, RuleCounter
+from audit_logger.models import AlertRule, AlertSettings, AppConfig
+from tests.conftest import ENTRY
+
+FAILURES = AlertRule(
+    name="login_failures",
+    filters=[{"field": "status", "type": "exact", "value": "failure"}],
+    group_by=["actor.identifier"],
+    threshold=2,
+    window=60,
+)
+
+
+class ListSink(AlertSink):
+    def __init__(self) -> None:
+        self.alerts: List[Dict[str, Any]] = []
+
+    def send(self, alerts: List[Dict[str, Any]]) -> None:
+        self.alerts.extend(alerts)
+
+
+def failure(actor: str = "j.doe") -> Dict[str, Any]:
+    return {
+        **ENTRY,
+        "status": "failure",
+        "actor": {**ENTRY["actor"], "identifier": actor},
+    }
+
+
+@pytest.fixture
+def engine() -> Iterator[AlertEngine]:
+    engine = AlertEngine()
+    engine.configure(AlertSettings(enabled=True, rules=[FAILURES]), sink=ListSink())
+    yield engine
+    engine.shutdown()
+
+
+def test_fires_once_the_threshold_is_crossed(engine: AlertEngine) -> None:
+    assert engine.process([failure(), failure()], now=0) == []
+    (alert,) = engine.process([failure()], now=10)
+    assert alert["rule"] == "login_failures"
+    assert alert["group"] == {"actor.identifier": "j.doe"}
+    assert alert["count"] == 3
+
+
+def test_counts_within_the_window_only(engine: AlertEngine) -> None:
+    engine.process([failure(), failure()], now=0)
+    assert engine.process([failure()], now=61) == []
+    assert len(engine.process([failure()], now=62)) == 0
+    assert len(engine.process([failure()], now=63)) == 1
+
+
+def test_counts_per_key_and_matching_entries_only(engine: AlertEngine) -> None:
+    assert engine.process([failure("a"), failure("b"), failure("a")], now=0) == []
+    assert engine.process([ENTRY, ENTRY, ENTRY], now=1) == []
+    (alert,) = engine.process([failure("a"), failure("b")], now=2)
+    assert alert["group"] == {"actor.identifier": "a"}
+
+
+def test_key_is_silenced_during_the_cooldown(engine: AlertEngine) -> None:
+    assert len(engine.process([failure()] * 3, now=0)) == 1
+    assert engine.process([failure()] * 3, now=59) == []
+    assert len(engine.process([failure()] * 3, now=60)) == 1
+
+
+def test_least_recent_keys_are_evicted() -> None:
+    counter = RuleCounter(FAILURES, max_keys=2)
+    for actor in ("a", "b", "c"):
+        counter.observe(failure(actor), now=0)
+    assert [key for key, in counter.keys] == ["b", "c"]
+
+
+def test_idle_keys_are_evicted() -> None:
+    counter = RuleCounter(FAILURES, max_keys=10)
+    counter.observe(failure("a"), now=0)
+    counter.observe(failure("b"), now=61)
+    assert [key for key, in counter.keys] == ["b"]
+
+
+def test_invalid_rule_filters_are_rejected_by_the_config() -> None:
+    with pytest.raises(ValidationError, match="field"):
+        AlertSettings(
+            enabled=True,
+            rules=[
+                {
+                    "name": "unknown_field",
+                    "filters": [{"field": "unknown", "type": "exact", "value": "x"}],
+                    "threshold": 1,
+                }
+            ],
+        )
+
+
+def alerting_config() -> AppConfig:
+    config = server.ConfigManager.load_config(
+        os.path.join(os.path.dirname(__file__), "config-test.yaml")
+    )
+    return config.model_copy(
+        update={"alerts": AlertSettings(enabled=True, rules=[FAILURES])}
+    )
+
+
+def test_alerts_are_disabled_with_multiple_workers(
+    app: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from audit_logger.main import alert_settings
+
+    config = alerting_config()
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    assert alert_settings(config) == config.alerts
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert alert_settings(config) is None
+
+
+def test_server_refuses_multiple_workers_with_alerts(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    config = alerting_config()
+    monkeypatch.setenv("CONFIG_FILE_PATH", "config.yaml")
+    monkeypatch.setattr(server.ConfigManager, "load_config", lambda path: config)
+    monkeypatch.setattr(server.uvicorn, "run", lambda *args, **kwargs: None)
+    with pytest.raises(SystemExit, match="single worker"):
+        server.main(["--workers", "2"])
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    server.main(["--workers", "1"])
+    assert server.worker_count() == 1
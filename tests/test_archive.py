@@ -0,0 +1,132 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pyarrow as pa
+import pytest
+
+from audit_logger.archive import (
+    NULL_PARTITION,
+    Archiver,
+    ArchiveStore,
+    archive_schema,
+    flatten,
+    unflatten,
+)
+from audit_logger.models import ArchiveSettings, SearchParams
+from benchmarks.fake_elasticsearch import cluster, create_fake_client
+from tests.conftest import ENTRY
+
+UTC_ENTRY = {**ENTRY, "timestamp": "2024-05-01T10:00:00+00:00"}
+
+
+def round_trip(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Writes a row through the archive schema, like the archive files."""
+    table = pa.Table.from_pylist([flatten(document)], schema=archive_schema())
+    return unflatten(table.to_pylist()[0])
+
+
+def test_flatten_maps_the_fields_to_columns() -> None:
+    row = flatten({**ENTRY, "meta": {"attempt": 2}})
+    assert row["actor.identifier"] == "j.doe"
+    assert row["server.hostname"] == "server-01"
+    assert row["meta"] == '{"attempt": 2}'
+    assert row["timestamp"].isoformat() == "2024-05-01T10:00:00+00:00"
+    assert "_extra" not in row
+
+
+def test_round_trip() -> None:
+    document = {**UTC_ENTRY, "meta": {"attempt": 2, "tags": ["a", "b"]}}
+    assert round_trip(document) == document
+
+
+def test_fields_outside_the_mapping_are_kept() -> None:
+    document = {
+        **UTC_ENTRY,
+        "tenant": "billing",
+        "actor": {**ENTRY["actor"], "session": {"id": 7}},
+    }
+    row = flatten(document)
+    assert json.loads(row["_extra"]) == {
+        "tenant": "billing",
+        "actor": {"session": {"id": 7}},
+    }
+    assert round_trip(document) == document
+
+
+def test_invalid_timestamp_is_kept_as_is() -> None:
+    row = flatten({**ENTRY, "timestamp": "yesterday"})
+    assert "timestamp" not in row
+    assert unflatten(row)["timestamp"] == "yesterday"
+
+
+def test_partition_by_day_and_application() -> None:
+    archiver = Archiver(None, ArchiveSettings(), [])  # type: ignore[arg-type]
+    row = flatten({**ENTRY, "application_name": "a/b"})
+    assert (
+        archiver.partition("root", row) == "root/day=2024-05-01/application_name=a%2Fb"
+    )
+    row = flatten({"event_name": "user_login"})
+    assert archiver.partition("root", row) == (
+        f"root/day={NULL_PARTITION}/application_name={NULL_PARTITION}"
+    )
+
+
+def entries() -> List[Dict[str, Any]]:
+    return [
+        {**ENTRY, "timestamp": "2024-05-01T10:00:00", "comment": "first"},
+        {
+            **ENTRY,
+            "timestamp": "2024-05-02T10:00:00",
+            "application_name": "shop",
+            "comment": "second",
+        },
+        {**ENTRY, "timestamp": "2024-05-03T10:00:00", "comment": "third"},
+    ]
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> ArchiveStore:
+    cluster.reset()
+    cluster.index("audit_logs-000001", entries())
+    settings = ArchiveSettings(enabled=True, location=str(tmp_path))
+    archiver = Archiver(create_fake_client(), settings, ["audit_logs"])
+    assert archiver.archive_index("audit_logs", "audit_logs-000001") == 3
+    assert cluster.documents("audit_logs-000001") == []
+    store = ArchiveStore()
+    store.configure(settings)
+    return store
+
+
+def search(store: ArchiveStore, *filters: Dict[str, Any], **params: Any) -> List:
+    range_filter = {"field": "timestamp", "type": "range", "gte": "2024-05-01"}
+    search_params = SearchParams(filters=[range_filter, *filters], **params)
+    return [hit.get("comment") for hit in store.search("audit_logs", search_params)]
+
+
+def test_archived_entries_are_searched(store: ArchiveStore) -> None:
+    assert search(store) == ["first", "second", "third"]
+    assert search(store, sort_order="desc", max_results=2) == ["third", "second"]
+    assert search(store, {"field": "comment", "type": "exact", "value": "second"}) == [
+        "second"
+    ]
+
+
+def test_application_partitions_are_pruned(store: ArchiveStore) -> None:
+    application = {"field": "application_name", "type": "exact", "value": "shop"}
+    assert search(store, application) == ["second"]
+
+
+def test_only_the_selected_fields_are_returned(store: ArchiveStore) -> None:
+    params = SearchParams(
+        filters=[{"field": "timestamp", "type": "range", "gte": "2024-05-03"}],
+        fields=["comment"],
+    )
+    assert store.search("audit_logs", params) == [{"comment": "third"}]
+
+
+def test_searches_without_a_timestamp_range_skip_the_archives(
+    store: ArchiveStore,
+) -> None:
+    params = SearchParams(filters=[{"field": "comment", "type": "exists"}])
+    assert store.search("audit_logs", params) == []
@@ -0,0 +1,39 @@
+from fastapi.testclient import TestClient
+
+BILLING = {"X-API-Key": "billing-key"}
+SHOP = {"X-API-Key": "shop-key"}
+
+
+def submit(client: TestClient) -> str:
+    response = client.post("/search?async=true", headers=BILLING, json={})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_submitting_tenant_polls_and_cancels_the_search(client: TestClient) -> None:
+    search_id = submit(client)
+
+    response = client.get(f"/search/{search_id}", headers=BILLING)
+    assert response.status_code == 200
+    assert response.json()["id"] == search_id
+
+    response = client.delete(f"/search/{search_id}", headers=BILLING)
+    assert response.status_code == 200
+    assert client.get(f"/search/{search_id}", headers=BILLING).status_code == 404
+
+
+def test_other_tenants_cannot_access_the_search(client: TestClient) -> None:
+    search_id = submit(client)
+
+    assert client.get(f"/search/{search_id}", headers=SHOP).status_code == 404
+    assert client.delete(f"/search/{search_id}", headers=SHOP).status_code == 404
+    assert client.get(f"/search/{search_id}", headers=BILLING).status_code == 200
+
+
+def test_unsigned_and_tampered_ids_are_not_found(client: TestClient) -> None:
+    search_id = submit(client)
+    elastic_search_id, _, signature = search_id.rpartition(".")
+
+    for forged in (elastic_search_id, f"{elastic_search_id}.{'0' * len(signature)}"):
+        assert client.get(f"/search/{forged}", headers=BILLING).status_code == 404
+        assert client.delete(f"/search/{forged}", headers=BILLING).status_code == 404
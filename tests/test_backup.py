@@ -0,0 +1,72 @@
+from typing import Any, Dict, List
+from unittest.mock import Mock
+
+import pytest
+
+from audit_logger.backup import SnapshotBackup
+from audit_logger.models import BackupSettings
+
+DAY = 86400
+NOW = 100 * DAY
+
+
+def snapshot(name: str, age_days: float, state: str = "SUCCESS") -> Dict[str, Any]:
+    return {
+        "snapshot": name,
+        "state": state,
+        "start_time_in_millis": int((NOW - age_days * DAY) * 1000),
+    }
+
+
+def expired(snapshots: List[Dict[str, Any]], **retention: Any) -> List[str]:
+    settings = BackupSettings(retention=retention)
+    return SnapshotBackup(Mock(), settings, ["audit_logs*"]).expired(snapshots, NOW)
+
+
+def daily(count: int) -> List[Dict[str, Any]]:
+    """One snapshot per day, the oldest first."""
+    return [snapshot(f"s{age}", age) for age in range(count - 1, -1, -1)]
+
+
+def test_snapshots_older_than_max_age_are_expired() -> None:
+    assert expired(daily(10), max_age_days=7, max_count=None, min_count=1) == [
+        "s9",
+        "s8",
+    ]
+
+
+def test_snapshots_beyond_max_count_are_expired() -> None:
+    assert expired(daily(10), max_age_days=None, max_count=7, min_count=1) == [
+        "s9",
+        "s8",
+        "s7",
+    ]
+
+
+def test_newest_min_count_snapshots_are_kept() -> None:
+    snapshots = daily(3)
+    assert expired(snapshots, max_age_days=1, max_count=1, min_count=2) == ["s2"]
+    assert expired(snapshots, max_age_days=1, max_count=1, min_count=3) == []
+
+
+@pytest.mark.parametrize(
+    "snapshots, names",
+    [
+        (
+            [snapshot("failed", 3, "FAILED"), snapshot("ok", 2)],
+            ["failed"],
+        ),
+        (
+            [snapshot("ok", 3), snapshot("partial", 2, "PARTIAL")],
+            [],
+        ),
+        (
+            [snapshot("running", 3, "IN_PROGRESS"), snapshot("ok", 2)],
+            [],
+        ),
+    ],
+)
+def test_unsuccessful_snapshots_expire_once_a_newer_one_succeeded(
+    snapshots: List[Dict[str, Any]], names: List[str]
+) -> None:
+    assert expired(snapshots, max_age_days=None, max_count=None, min_count=1) == names
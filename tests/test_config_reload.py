@@ -0,0 +1,199 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterator, List, Tuple
+
+import pytest
+import yaml
+from fastapi.testclient import TestClient
+
+from audit_logger.config_manager import ConfigManager
+from audit_logger.models import AppConfig
+from audit_logger.tracing import tracer
+
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), "config-test.yaml")
+
+
+@pytest.fixture
+def config_file(tmp_path: Path) -> Path:
+    path = tmp_path / "config.yaml"
+    path.write_bytes(Path(CONFIG_FILE).read_bytes())
+    return path
+
+
+@pytest.fixture
+def applied(
+    config_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[List[Tuple[AppConfig, AppConfig]]]:
+    """The (previous, new) configs passed to the listeners by the reloads."""
+    calls: List[Tuple[AppConfig, AppConfig]] = []
+    monkeypatch.setattr(ConfigManager, "_snapshot", None)
+    monkeypatch.setattr(
+        ConfigManager, "_listeners", [lambda *configs: calls.append(configs)]
+    )
+    ConfigManager.load_config(str(config_file))
+    yield calls
+
+
+def raw_config() -> Any:
+    with open(CONFIG_FILE) as f:
+        return yaml.safe_load(f)
+
+
+def test_valid_change_is_swapped_in(config_file: Path, applied: List) -> None:
+    raw = raw_config()
+    raw["search"] = {"query_cache_size": 16}
+    config_file.write_text(yaml.safe_dump(raw))
+    assert ConfigManager.reload(str(config_file))
+    snapshot = ConfigManager.snapshot()
+    assert snapshot is not None and snapshot.version == 2
+    assert snapshot.config.search and snapshot.config.search.query_cache_size == 16
+    assert len(applied) == 1
+
+
+def test_unchanged_file_is_not_reloaded(config_file: Path, applied: List) -> None:
+    assert not ConfigManager.reload(str(config_file))
+    assert applied == []
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "api_key: [unclosed",
+        "- not a mapping",
+        "api_key: test\nsearch:\n  query_cache_size: -1\n",
+    ],
+)
+def test_invalid_file_is_rejected(
+    config_file: Path, applied: List, content: str
+) -> None:
+    running = ConfigManager.snapshot()
+    config_file.write_text(content)
+    assert not ConfigManager.reload(str(config_file))
+    assert ConfigManager.snapshot() is running
+    assert applied == []
+
+
+def test_missing_file_is_rejected(config_file: Path, applied: List) -> None:
+    running = ConfigManager.snapshot()
+    config_file.unlink()
+    assert not ConfigManager.reload(str(config_file))
+    assert ConfigManager.snapshot() is running
+
+
+def test_tracing_is_enabled_by_a_reload(client: TestClient, tmp_path: Path) -> None:
+    from audit_logger import main
+
+    spans = tmp_path / "spans.jsonl"
+    previous = main.app_config
+    tracing = {"enabled": True, "sample_ratio": 1.0, "file_path": str(spans)}
+    config = AppConfig(**{**previous.model_dump(), "tracing": tracing})
+    main.apply_config(previous, config)
+    try:
+        assert client.get("/livez").status_code == 200
+        tracer.processor.flush()
+    finally:
+        main.apply_config(config, previous)
+    names = [
+        span["name"]
+        for line in spans.read_text().splitlines()
+        for resource in json.loads(line)["resourceSpans"]
+        for scope in resource["scopeSpans"]
+        for span in scope["spans"]
+    ]
+    assert "GET /livez" in names
+
+
+def test_failed_listener_is_rolled_back(
+    config_file: Path, applied: List, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def failing(previous: AppConfig, config: AppConfig) -> None:
+        raise ValueError("can't apply")
+
+    monkeypatch.setattr(
+        ConfigManager, "_listeners", [*ConfigManager._listeners, failing]
+    )
+    running = ConfigManager.snapshot()
+    assert running is not None
+    raw = raw_config()
+    raw["search"] = {"query_cache_size": 16}
+    config_file.write_text(yaml.safe_dump(raw))
+    assert not ConfigManager.reload(str(config_file))
+    assert ConfigManager.snapshot() is running
+    # Applied by the first listener, then restored.
+    (previous, config), (restored_from, restored) = applied
+    assert previous is restored is running.config
+    assert config is restored_from
+
+
+@pytest.fixture
+def running_app(
+    app: Any, config_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[Any]:
+    """The app, with its config reloaded from `config_file`."""
+    from audit_logger import main
+
+    original = main.app_config
+    monkeypatch.setattr(ConfigManager, "_snapshot", None)
+    monkeypatch.setattr(ConfigManager, "_listeners", [main.apply_config])
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    ConfigManager.load_config(str(config_file))
+    yield main
+    main.apply_config(main.app_config, original)
+
+
+ALERT_RULE = {
+    "name": "failures",
+    "filters": [{"field": "status", "type": "exact", "value": "failure"}],
+    "threshold": 10,
+}
+
+
+@pytest.mark.parametrize(
+    "invalid",
+    [
+        # Compiling the filter fails.
+        {
+            "alerts": {
+                "enabled": True,
+                "file_path": "/dev/null",
+                "rules": [
+                    {
+                        **ALERT_RULE,
+                        "filters": [
+                            {"field": "actor.ip_address", "type": "exact", "value": "x"}
+                        ],
+                    }
+                ],
+            }
+        },
+        # The tenant shares the index of the `default` tenant.
+        {
+            "authentication": {
+                "api_key": "test",
+                "tenants": [
+                    {"name": "billing", "api_keys": ["b"], "index": "audit_logs"}
+                ],
+            }
+        },
+    ],
+)
+def test_config_which_cant_be_applied_is_rejected(
+    config_file: Path, running_app: Any, invalid: Any
+) -> None:
+    main = running_app
+    alerts = {"enabled": True, "file_path": "/dev/null", "rules": [ALERT_RULE]}
+    config_file.write_text(yaml.safe_dump({**raw_config(), "alerts": alerts}))
+    assert ConfigManager.reload(str(config_file))
+    running = ConfigManager.snapshot()
+    counters = main.alert_engine.counters
+    cache_size = main.query_cache.maxsize
+
+    raw = {**raw_config(), "alerts": alerts, "search": {"query_cache_size": 3}}
+    config_file.write_text(yaml.safe_dump({**raw, **invalid}))
+    assert not ConfigManager.reload(str(config_file))
+    assert ConfigManager.snapshot() is running
+    assert main.app_config is running.config
+    assert main.alert_engine.enabled and main.alert_engine.counters is counters
+    assert main.query_cache.maxsize == cache_size
+    assert main.tenants.lookup("billing-key") is not None
@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+import cbor2
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.fake_elasticsearch import cluster
+from tests.conftest import ENTRY
+
+HEADERS = {"X-API-Key": "test"}
+
+FORMATS = [
+    ("application/msgpack", msgpack.packb),
+    ("application/x-msgpack", msgpack.packb),
+    ("application/cbor", cbor2.dumps),
+]
+
+
+def post(client: TestClient, path: str, media: str, body: bytes) -> Any:
+    return client.post(path, content=body, headers={**HEADERS, "content-type": media})
+
+
+@pytest.mark.parametrize("media, encode", FORMATS)
+def test_create(client: TestClient, media: str, encode: Callable) -> None:
+    response = post(client, "/create", media, encode(ENTRY))
+    assert response.status_code == 201
+    (document,) = cluster.documents("audit_logs")
+    assert document["event_name"] == ENTRY["event_name"]
+    assert document["actor"]["identifier"] == ENTRY["actor"]["identifier"]
+
+
+@pytest.mark.parametrize("media, encode", FORMATS)
+def test_create_bulk(client: TestClient, media: str, encode: Callable) -> None:
+    entries = [ENTRY, {**ENTRY, "event_name": "user_logout", "action": "logout"}]
+    response = post(client, "/create-bulk", media, encode(entries))
+    assert response.status_code == 207
+    assert response.json()["success_count"] == 2
+    assert len(cluster.documents("audit_logs")) == 2
+
+
+@pytest.mark.parametrize(
+    "media, encode",
+    [
+        ("application/msgpack", lambda doc: msgpack.packb(doc, datetime=True)),
+        ("application/cbor", cbor2.dumps),
+    ],
+)
+def test_native_timestamps(client: TestClient, media: str, encode: Callable) -> None:
+    timestamp = datetime(2024, 5, 1, 10, 0, tzinfo=timezone.utc)
+    response = post(client, "/create", media, encode({**ENTRY, "timestamp": timestamp}))
+    assert response.status_code == 201
+    (document,) = cluster.documents("audit_logs")
+    assert document["timestamp"].startswith("2024-05-01T10:00:00")
+
+
+@pytest.mark.parametrize(
+    "media, body",
+    [("application/msgpack", b"\xc1"), ("application/cbor", b"\xff\xff")],
+)
+def test_invalid_body_is_rejected(client: TestClient, media: str, body: bytes) -> None:
+    response = post(client, "/create", media, body)
+    assert response.status_code == 422
+    (error,) = response.json()["detail"]
+    assert error["msg"].startswith("Invalid ")
+    assert error["field"] is None
+
+
+@pytest.mark.parametrize("media, encode", FORMATS)
+def test_validation_errors_are_located_in_the_body(
+    client: TestClient, media: str, encode: Callable
+) -> None:
+    invalid = {key: value for key, value in ENTRY.items() if key != "event_name"}
+    response = post(client, "/create", media, encode(invalid))
+    assert response.status_code == 422
+    assert [error["field"] for error in response.json()["detail"]] == ["event_name"]
+
+
+def test_unsupported_media_type_is_rejected(client: TestClient) -> None:
+    response = post(client, "/create", "text/csv", b"a,b")
+    assert response.status_code == 415
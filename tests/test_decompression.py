@@ -0,0 +1,104 @@
+import gzip
+import zlib
+from typing import Iterator
+
+import pytest
+import zstandard
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from audit_logger.middlewares import DecompressionMiddleware, zstd_bound
+from audit_logger.models import CompressionSettings
+
+MAX_SIZE = 64 * 1024
+
+
+@pytest.fixture
+def client() -> TestClient:
+    app = FastAPI()
+
+    @app.post("/create")
+    async def create(request: Request) -> dict:
+        return {"size": len(await request.body())}
+
+    settings = CompressionSettings(request_paths=["/create"], max_request_size=MAX_SIZE)
+    app.add_middleware(DecompressionMiddleware, settings=settings)
+    return TestClient(app)
+
+
+def chunks(data: bytes, size: int = 1024) -> Iterator[bytes]:
+    for start in range(0, len(data), size):
+        end = start + size
+        yield data[start:end]
+
+
+@pytest.mark.parametrize(
+    "encoding, compress",
+    [
+        ("gzip", gzip.compress),
+        ("deflate", zlib.compress),
+        ("zstd", zstandard.ZstdCompressor().compress),
+    ],
+)
+def test_decompresses_body(client: TestClient, encoding, compress) -> None:
+    body = b'{"event_name": "user_login"}' * 1000
+    response = client.post(
+        "/create", content=compress(body), headers={"content-encoding": encoding}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"size": len(body)}
+
+
+def test_body_of_max_size_is_accepted(client: TestClient) -> None:
+    response = client.post(
+        "/create",
+        content=gzip.compress(b"a" * MAX_SIZE),
+        headers={"content-encoding": "gzip"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"size": MAX_SIZE}
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_gzip_bomb_is_rejected(client: TestClient, chunked: bool) -> None:
+    bomb = gzip.compress(b"\0" * (100 * MAX_SIZE))
+    response = client.post(
+        "/create",
+        content=chunks(bomb) if chunked else bomb,
+        headers={"content-encoding": "gzip"},
+    )
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_zstd_bomb_is_rejected(client: TestClient, chunked: bool) -> None:
+    # A streamed frame doesn't declare its content size.
+    compressor = zstandard.ZstdCompressor().compressobj()
+    bomb = compressor.compress(b"\0" * (100 * MAX_SIZE)) + compressor.flush()
+    response = client.post(
+        "/create",
+        content=chunks(bomb) if chunked else bomb,
+        headers={"content-encoding": "zstd"},
+    )
+    assert response.status_code == 413
+
+
+def test_zstd_body_over_the_compressed_bound_is_rejected(client: TestClient) -> None:
+    response = client.post(
+        "/create",
+        content=chunks(b"\0" * (zstd_bound(MAX_SIZE) + 1)),
+        headers={"content-encoding": "zstd"},
+    )
+    assert response.status_code == 413
+
+
+def test_invalid_body_is_rejected(client: TestClient) -> None:
+    response = client.post(
+        "/create", content=b"not gzip", headers={"content-encoding": "gzip"}
+    )
+    assert response.status_code == 400
+
+
+def test_unsupported_encoding_is_rejected(client: TestClient) -> None:
+    response = client.post("/create", content=b"{}", headers={"content-encoding": "br"})
+    assert response.status_code == 415
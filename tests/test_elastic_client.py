@@ -0,0 +1,143 @@
+from typing import Any, Dict, Optional
+from unittest.mock import Mock
+
+import pytest
+from elastic_transport import NodeConfig, RandomSelector, RoundRobinSelector
+
+from audit_logger import elastic
+from audit_logger.elastic import create_client, role_filter
+from audit_logger.models import ElasticNodeSet, ElasticSettings
+
+HOSTS = ["http://es-01:9200", "http://es-02:9200"]
+SNIFFING = [
+    "sniff_on_start",
+    "sniff_on_node_failure",
+    "sniff_before_requests",
+    "min_delay_between_sniffing",
+    "sniff_timeout",
+    "sniffed_node_callback",
+]
+
+
+@pytest.fixture
+def client_class(monkeypatch: pytest.MonkeyPatch) -> Mock:
+    """Records the arguments the client is created with."""
+    client_class = Mock()
+    monkeypatch.setattr(elastic, "CustomElasticsearch", client_class)
+    return client_class
+
+
+def client_kwargs(
+    client_class: Mock,
+    settings: Optional[ElasticSettings] = None,
+    node_set: Optional[ElasticNodeSet] = None,
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    create_client(HOSTS, settings, node_set, **kwargs)
+    return client_class.call_args.kwargs
+
+
+def test_defaults_without_settings(client_class: Mock) -> None:
+    kwargs = client_kwargs(client_class, basic_auth=("elastic", "secret"))
+    assert kwargs["hosts"] == HOSTS
+    assert kwargs["basic_auth"] == ("elastic", "secret")
+    assert "request_timeout" not in kwargs
+    assert not set(SNIFFING) & set(kwargs)
+
+
+def test_pool_and_retry_settings(client_class: Mock) -> None:
+    settings = ElasticSettings(
+        connections_per_node=4,
+        request_timeout=2.5,
+        max_retries=1,
+        retry_on_timeout=True,
+        http_compress=False,
+        dead_node_backoff_factor=2.0,
+        max_dead_node_backoff=60.0,
+    )
+    kwargs = client_kwargs(client_class, settings)
+    assert {key: kwargs[key] for key in settings.model_dump() if key in kwargs} == {
+        "connections_per_node": 4,
+        "request_timeout": 2.5,
+        "max_retries": 1,
+        "retry_on_timeout": True,
+        "http_compress": False,
+        "dead_node_backoff_factor": 2.0,
+        "max_dead_node_backoff": 60.0,
+    }
+    assert kwargs["node_selector_class"] is RoundRobinSelector
+    assert not set(SNIFFING) & set(kwargs)
+
+
+def test_random_node_selector(client_class: Mock) -> None:
+    kwargs = client_kwargs(client_class, ElasticSettings(node_selector="random"))
+    assert kwargs["node_selector_class"] is RandomSelector
+
+
+def test_node_set_hosts_replace_the_hosts(client_class: Mock) -> None:
+    node_set = ElasticNodeSet(hosts=["http://ingest-01:9200"])
+    assert client_kwargs(client_class, None, node_set)["hosts"] == [
+        "http://ingest-01:9200"
+    ]
+    # Without hosts, the node set is made of all hosts.
+    assert client_kwargs(client_class, None, ElasticNodeSet())["hosts"] == HOSTS
+
+
+@pytest.mark.parametrize(
+    "sniff",
+    [
+        {"sniff_on_start": True},
+        {"sniff_on_node_failure": True},
+        {"sniff_interval": 30.0},
+    ],
+)
+def test_sniffing(client_class: Mock, sniff: Dict[str, Any]) -> None:
+    kwargs = client_kwargs(client_class, ElasticSettings(**sniff))
+    assert set(SNIFFING) <= set(kwargs)
+    assert kwargs["sniff_on_start"] == sniff.get("sniff_on_start", False)
+    assert kwargs["sniff_before_requests"] == ("sniff_interval" in sniff)
+    assert kwargs["min_delay_between_sniffing"] == sniff.get("sniff_interval", 10.0)
+
+
+@pytest.mark.parametrize(
+    "node_set, sniffing",
+    [
+        # Fixed hosts without roles are never extended by sniffing.
+        (ElasticNodeSet(hosts=["http://ingest-01:9200"]), False),
+        (ElasticNodeSet(hosts=["http://ingest-01:9200"], roles=["ingest"]), True),
+        (ElasticNodeSet(roles=["data_hot"]), True),
+        (ElasticNodeSet(), True),
+    ],
+)
+def test_sniffing_of_node_sets(
+    client_class: Mock, node_set: ElasticNodeSet, sniffing: bool
+) -> None:
+    kwargs = client_kwargs(client_class, ElasticSettings(sniff_on_start=True), node_set)
+    assert ("sniff_on_start" in kwargs) == sniffing
+
+
+def test_extra_kwargs_win(client_class: Mock) -> None:
+    kwargs = client_kwargs(
+        client_class, ElasticSettings(request_timeout=2.5), request_timeout=30
+    )
+    assert kwargs["request_timeout"] == 30
+
+
+def test_sniffed_nodes_are_filtered_by_role() -> None:
+    config = NodeConfig("http", "es-03", 9200)
+    keep = role_filter(["ingest"])
+    assert keep({"roles": ["ingest", "data_hot"]}, config) is config
+    assert keep({"roles": ["data_hot"]}, config) is None
+    assert keep({}, config) is None
+    # Without roles, every sniffed node is kept.
+    assert role_filter(None)({"roles": ["master"]}, config) is config
+
+
+def test_sniffed_nodes_of_a_node_set(client_class: Mock) -> None:
+    kwargs = client_kwargs(
+        client_class,
+        ElasticSettings(sniff_on_start=True),
+        ElasticNodeSet(roles=["ingest"]),
+    )
+    config = NodeConfig("http", "es-03", 9200)
+    assert kwargs["sniffed_node_callback"]({"roles": ["data_hot"]}, config) is None
@@ -0,0 +1,193 @@
+from typing import Any, Dict, List
+
+import pytest
+
+from audit_logger.elastic_filters import ElasticSearchQueryBuilder
+from audit_logger.models import SearchFilterParams, SearchParams, StorageSettings
+from audit_logger.predicates import compile_predicate
+from audit_logger.storage import SQLiteStorage
+from tests.es_query import matches
+
+
+def entry(timestamp: str, **fields: Any) -> Dict[str, Any]:
+    document = {
+        "timestamp": timestamp,
+        "event_name": "user_login",
+        "actor": {"identifier": "j.doe", "type": "user", "ip_address": "10.0.0.1"},
+        "application_name": "login-frontend",
+        "module": "authentication",
+        "action": "login",
+        "comment": "Login of j.doe",
+        "status": "success",
+        "server": {
+            "hostname": "server-01",
+            "vm_name": "vm-01",
+            "ip_address": "10.0.1.1",
+        },
+    }
+    document.update(fields)
+    return {key: value for key, value in document.items() if value is not None}
+
+
+CORPUS = [
+    entry("2024-05-01T10:00:00"),
+    entry(
+        "2024-05-01T11:00:00",
+        event_name="user_logout",
+        actor={"identifier": "a.smith", "type": "user", "user_agent": "Firefox/124"},
+        comment="Logout after the session expired",
+        context="web",
+    ),
+    entry(
+        "2024-05-02T09:30:00",
+        event_name="data_backup",
+        actor={"identifier": "backup-bot", "type": "system", "ip_address": "10.0.0.7"},
+        application_name="data-backup-service",
+        module="cronjob",
+        action="create",
+        comment="Nightly backup of the billing database",
+        resource={"type": "database", "id": "billing"},
+        endpoint="/backups/billing",
+        server={"hostname": "server-02", "vm_name": "vm-02", "ip_address": "10.0.2.1"},
+    ),
+    entry(
+        "2024-05-03T15:45:00",
+        event_name="role_update",
+        actor={"identifier": "j.dot", "type": "user", "ip_address": "192.168.1.5"},
+        application_name="user-management-service",
+        module="authorization",
+        action="update",
+        comment="Granted the admin role to k.lee",
+        status="failure",
+        resource={"type": "role", "id": "admin"},
+        endpoint="/users/k.lee/roles",
+    ),
+    entry(
+        "2024-05-04T08:00:00",
+        actor={"identifier": "k.lee", "type": "user", "ip_address": "10.0.0.9"},
+        comment=None,
+        status="failure",
+        server=None,
+    ),
+]
+
+FILTERS: List[Dict[str, Any]] = [
+    {"field": "event_name", "type": "exact", "value": "user_login"},
+    {"field": "actor.identifier", "type": "exact", "value": "j.doe"},
+    {"field": "actor.type", "type": "exact", "value": "system"},
+    {"field": "actor.ip_address", "type": "exact", "value": "10.0.0.7"},
+    {"field": "actor.ip_address", "type": "exact", "value": "10.0.0.0/24"},
+    {"field": "server.ip_address", "type": "exact", "value": "10.0.2.1"},
+    {"field": "resource.id", "type": "exact", "value": "billing"},
+    {"field": "comment", "type": "exact", "value": "backup"},
+    {"field": "comment", "type": "exact", "value": "Backup"},
+    {"field": "actor.identifier", "type": "nested", "value": "a.smith"},
+    {"field": "server.hostname", "type": "nested", "value": "server-02"},
+    {"field": "context", "type": "exists"},
+    {"field": "context", "type": "missing"},
+    {"field": "comment", "type": "missing"},
+    {"field": "actor.user_agent", "type": "exists"},
+    {"field": "actor.ip_address", "type": "missing"},
+    {"field": "resource.id", "type": "exists"},
+    {"field": "resource", "type": "exists"},
+    {"field": "server", "type": "missing"},
+    {
+        "field": "timestamp",
+        "type": "range",
+        "gte": "2024-05-01T10:30:00",
+        "lte": "2024-05-03T15:45:00",
+    },
+    {"field": "timestamp", "type": "range", "gte": "2024-05-03T00:00:00"},
+    {"field": "actor.identifier", "type": "range", "gte": "j", "lte": "k"},
+    {"field": "application_name", "type": "wildcard", "value": "*-service"},
+    {"field": "actor.identifier", "type": "wildcard", "value": "j.d?*"},
+    {"field": "comment", "type": "wildcard", "value": "back*"},
+    {"field": "comment", "type": "text_search", "value": "BACKUP database"},
+    {
+        "field": "comment",
+        "type": "text_search",
+        "value": "k.lee",
+        "fields": ["comment", "actor.identifier"],
+    },
+    {
+        "field": "event_name",
+        "type": "text_search",
+        "value": "10.0.0.1",
+        "fields": ["event_name", "actor.ip_address", "server.ip_address"],
+    },
+    {
+        "field": "event_name",
+        "type": "text_search",
+        "value": "server-01",
+        "fields": ["event_name", "actor.ip_address", "server.hostname"],
+    },
+]
+
+
+def es_matches(filters: List[SearchFilterParams]) -> List[str]:
+    builder = ElasticSearchQueryBuilder(using=None, index="audit_logs")  # type: ignore
+    body = builder.compile_query(SearchParams(filters=filters)).render()
+    query = body.get("query", {"match_all": {}})
+    return [doc["timestamp"] for doc in CORPUS if matches(query, doc)]
+
+
+def predicate_matches(filters: List[SearchFilterParams]) -> List[str]:
+    predicate = compile_predicate(filters)
+    return [doc["timestamp"] for doc in CORPUS if predicate(doc)]
+
+
+@pytest.fixture(scope="module")
+def sqlite(tmp_path_factory: pytest.TempPathFactory) -> SQLiteStorage:
+    path = tmp_path_factory.mktemp("sqlite") / "audit_logs.sqlite3"
+    storage = SQLiteStorage(StorageSettings(backend="sqlite", path=str(path)))
+    storage.insert([{"_index": "audit_logs", "_source": doc} for doc in CORPUS])
+    yield storage
+    storage.close()
+
+
+def sql_matches(storage: SQLiteStorage, filters: List[SearchFilterParams]) -> List[str]:
+    params = SearchParams(filters=filters, sort_by="timestamp", sort_order="asc")
+    docs = storage.search(params, "audit_logs")["docs"]
+    return [doc["timestamp"] for doc in docs]
+
+
+@pytest.mark.parametrize(
+    "raw", FILTERS, ids=lambda f: f"{f['type']}-{f['field']}-{f.get('value', '')}"
+)
+def test_filter_parity(raw: Dict[str, Any], sqlite: SQLiteStorage) -> None:
+    filters = [SearchFilterParams(**raw)]
+    expected = es_matches(filters)
+    assert predicate_matches(filters) == expected
+    assert sql_matches(sqlite, filters) == expected
+
+
+def test_combined_filters_parity(sqlite: SQLiteStorage) -> None:
+    filters = [
+        SearchFilterParams(**raw)
+        for raw in (
+            {"field": "status", "type": "exact", "value": "failure"},
+            {"field": "actor.identifier", "type": "wildcard", "value": "*.*"},
+            {"field": "timestamp", "type": "range", "gte": "2024-05-02T00:00:00"},
+        )
+    ]
+    expected = es_matches(filters)
+    assert expected == ["2024-05-03T15:45:00", "2024-05-04T08:00:00"]
+    assert predicate_matches(filters) == expected
+    assert sql_matches(sqlite, filters) == expected
+
+
+def test_nested_fields_are_wrapped_into_nested_queries() -> None:
+    builder = ElasticSearchQueryBuilder(using=None, index="audit_logs")  # type: ignore
+    clause = builder.filter_clause(
+        SearchFilterParams(field="actor.identifier", type="exact", value="j.doe")
+    )
+    assert clause == {
+        "nested": {"path": "actor", "query": {"term": {"actor.identifier": "j.doe"}}}
+    }
+
+
+def test_missing_is_the_negated_exists_clause() -> None:
+    builder = ElasticSearchQueryBuilder(using=None, index="audit_logs")  # type: ignore
+    assert builder.filter_clause(
+        SearchFilterParams(field="context", type="missing")
+    ) == {"bool": {"must_not": [{"exists": {"field": "context"}}]}}
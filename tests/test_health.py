@@ -0,0 +1,165 @@
+import time
+from typing import Any, Iterator
+from unittest.mock import Mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from audit_logger.health import HealthMonitor, health_monitor
+from audit_logger.models import HealthSettings
+from benchmarks.fake_elasticsearch import cluster, create_fake_client
+
+INDICES = ["audit_logs", "audit_logs_billing", "audit_logs_shop"]
+
+
+@pytest.fixture
+def monitor(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> HealthMonitor:
+    """The monitor of `/readyz`, checking the fake cluster (refreshed by the tests)."""
+    monkeypatch.setattr(health_monitor, "settings", HealthSettings())
+    monkeypatch.setattr(health_monitor, "clients", {"ingest": create_fake_client()})
+    monkeypatch.setattr(health_monitor, "indices", lambda: INDICES)
+    monkeypatch.setattr(health_monitor, "buffer_depth", lambda: 0)
+    monkeypatch.setattr(health_monitor, "checks", {})
+    monkeypatch.setattr(health_monitor, "checked_at", None)
+    monkeypatch.setattr(health_monitor, "_rejections", None)
+    return health_monitor
+
+
+def readyz(client: TestClient, status_code: int) -> Any:
+    response = client.get("/readyz")
+    assert response.status_code == status_code
+    return response.json()
+
+
+def failing(state: Any) -> Any:
+    return sorted(name for name, check in state["checks"].items() if not check["ok"])
+
+
+def test_livez(client: TestClient) -> None:
+    assert client.get("/livez").json() == {"status": "alive"}
+
+
+def test_ready_once_the_cluster_state_was_checked(
+    client: TestClient, monitor: HealthMonitor
+) -> None:
+    state = readyz(client, 503)
+    assert state["checks"]["state"]["error"] == "Cluster state not checked yet"
+    assert state["checked_at"] is None
+
+    monitor.refresh()
+    state = readyz(client, 200)
+    assert state["status"] == "ready"
+    assert sorted(state["checks"]) == [
+        "buffer",
+        "bulk_rejections",
+        "cluster",
+        "elasticsearch",
+        "indices",
+        "write_blocks",
+    ]
+
+
+def test_missing_indices_are_reported(
+    client: TestClient, monitor: HealthMonitor
+) -> None:
+    cluster.missing_indices.add("audit_logs_shop")
+    monitor.refresh()
+    state = readyz(client, 503)
+    assert failing(state) == ["indices"]
+    assert state["checks"]["indices"]["missing"] == ["audit_logs_shop"]
+
+
+def test_write_blocked_indices_are_reported(
+    client: TestClient, monitor: HealthMonitor
+) -> None:
+    cluster.index_blocks["audit_logs_billing"] = {"read_only_allow_delete": "true"}
+    cluster.index_blocks["audit_logs_shop"] = {"read": "true"}
+    monitor.refresh()
+    state = readyz(client, 503)
+    assert failing(state) == ["write_blocks"]
+    assert state["checks"]["write_blocks"]["write_blocked"] == ["audit_logs_billing"]
+
+
+def test_cluster_status_below_the_minimum(
+    client: TestClient, monitor: HealthMonitor
+) -> None:
+    cluster.health_status = "yellow"
+    monitor.refresh()
+    readyz(client, 200)
+    cluster.health_status = "red"
+    monitor.refresh()
+    assert failing(readyz(client, 503)) == ["cluster"]
+
+
+def test_bulk_rejection_rate(client: TestClient, monitor: HealthMonitor) -> None:
+    cluster.write_rejections = 100
+    monitor.refresh()
+    # The first refresh only records the counter.
+    readyz(client, 200)
+    cluster.write_rejections = 200
+    monitor.refresh()
+    state = readyz(client, 503)
+    assert failing(state) == ["bulk_rejections"]
+    assert state["checks"]["bulk_rejections"]["rejected"] == 200
+
+
+def test_buffer_depth(
+    client: TestClient, monitor: HealthMonitor, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monitor.refresh()
+    monkeypatch.setattr(monitor, "buffer_depth", lambda: 1001)
+    state = readyz(client, 503)
+    assert state["checks"]["buffer"] == {"ok": False, "depth": 1001}
+
+
+def test_stale_cluster_state(client: TestClient, monitor: HealthMonitor) -> None:
+    monitor.refresh()
+    assert monitor.checked_at is not None
+    monitor.checked_at -= HealthSettings().max_age + 1
+    state = readyz(client, 503)
+    assert state["checks"]["state"]["error"] == "Stale"
+
+
+def test_unreachable_cluster(client: TestClient, monitor: HealthMonitor) -> None:
+    unreachable = Mock()
+    unreachable.options.return_value.ping.return_value = False
+    monitor.clients = {"ingest": unreachable}
+    monitor.refresh()
+    state = readyz(client, 503)
+    assert failing(state) == [
+        "bulk_rejections",
+        "cluster",
+        "elasticsearch",
+        "indices",
+        "write_blocks",
+    ]
+    assert state["checks"]["elasticsearch"]["nodes"] == {"ingest": "not reachable"}
+
+
+def test_without_clients_only_the_local_checks_apply(
+    client: TestClient, monitor: HealthMonitor
+) -> None:
+    monitor.clients = {}
+    monitor.refresh()
+    state = readyz(client, 200)
+    assert list(state["checks"]) == ["buffer"]
+
+
+@pytest.fixture
+def started() -> Iterator[HealthMonitor]:
+    monitor = HealthMonitor()
+    monitor.start(
+        HealthSettings(refresh_interval=0.01),
+        {"ingest": create_fake_client()},
+        indices=lambda: INDICES,
+        buffer_depth=lambda: 0,
+    )
+    yield monitor
+    monitor.shutdown()
+
+
+def test_state_is_refreshed_in_the_background(started: HealthMonitor) -> None:
+    deadline = time.monotonic() + 5
+    while started.checked_at is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert started.readiness()[0]
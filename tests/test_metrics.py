@@ -0,0 +1,92 @@
+import json
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from audit_logger.metrics import MetricsRegistry
+
+DEAD_PID = 2**22 + 1
+
+
+@pytest.fixture
+def registry() -> Iterator[MetricsRegistry]:
+    registry = MetricsRegistry()
+    yield registry
+    registry._stop.set()
+
+
+def test_counter_and_gauge(registry: MetricsRegistry) -> None:
+    requests = registry.counter("requests_total", "Requests.", ("route",))
+    in_flight = registry.gauge("in_flight", "In flight.")
+    requests.labels("/search").inc()
+    requests.labels("/search").inc(2)
+    requests.labels("/create").inc(0.5)
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    assert registry.render() == (
+        "# HELP requests_total Requests.\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{route="/search"} 3\n'
+        'requests_total{route="/create"} 0.5\n'
+        "# HELP in_flight In flight.\n"
+        "# TYPE in_flight gauge\n"
+        "in_flight 1\n"
+    )
+
+
+def test_histogram_buckets_are_cumulative(registry: MetricsRegistry) -> None:
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        latency.observe(value)
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 6.05",
+        "latency_seconds_count 4",
+    ]
+
+
+def test_label_values_are_escaped(registry: MetricsRegistry) -> None:
+    registry.counter("errors_total", "Errors.", ("message",)).labels(
+        'a "b"\\c\nd'
+    ).inc()
+    assert 'errors_total{message="a \\"b\\"\\\\c\\nd"} 1' in registry.render()
+
+
+def test_collectors_are_rendered(registry: MetricsRegistry) -> None:
+    registry.register_collector(
+        lambda: [("rule_calls", "counter", "Calls.", ("rule",), {("drop",): 2})]
+    )
+    assert 'rule_calls{rule="drop"} 2' in registry.render()
+
+
+def test_failing_collectors_are_skipped(registry: MetricsRegistry) -> None:
+    registry.counter("requests_total", "Requests.").inc()
+
+    def failing() -> list:
+        raise RuntimeError("boom")
+
+    registry.register_collector(failing)
+    assert "requests_total 1" in registry.render()
+
+
+def test_multiprocess_snapshots_are_merged(
+    registry: MetricsRegistry, tmp_path: Path
+) -> None:
+    registry.configure_multiprocess(str(tmp_path), flush_interval=3600)
+    registry.counter("requests_total", "Requests.").inc(2)
+    registry.gauge("in_flight", "In flight.").inc(3)
+    # The snapshot of a worker that exited.
+    worker = MetricsRegistry()
+    worker.counter("requests_total", "Requests.").inc(5)
+    worker.gauge("in_flight", "In flight.").inc(7)
+    (tmp_path / f"metrics_{DEAD_PID}.json").write_text(
+        json.dumps({"pid": DEAD_PID, "metrics": worker.snapshot()})
+    )
+    rendered = registry.render()
+    assert "requests_total 7" in rendered.splitlines()
+    # The gauges of dead workers are ignored.
+    assert "in_flight 3" in rendered.splitlines()
@@ -0,0 +1,88 @@
+from typing import Iterator
+from unittest.mock import Mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from audit_logger.mappings import INDEX_MAPPINGS
+from audit_logger.models import IngestPolicy, IngestPolicySettings
+from audit_logger.policies import CompiledPolicy, IngestPolicyEngine, ingest_policies
+from benchmarks.fake_elasticsearch import cluster
+from tests.conftest import ENTRY
+
+COLD = IngestPolicySettings(
+    rules=[IngestPolicy(name="backups", event_name="data_backup", action="cold")]
+)
+
+
+def entries(count: int) -> list:
+    return [
+        {**ENTRY, "timestamp": f"2024-05-01T10:00:{i % 60:02d}", "comment": str(i)}
+        for i in range(count)
+    ]
+
+
+def sample(rate: float) -> CompiledPolicy:
+    return CompiledPolicy(
+        IngestPolicy(
+            name="sample",
+            action="sample",
+            sample_rate=rate,
+            sample_by=["timestamp", "comment"],
+        )
+    )
+
+
+def test_sampling_is_deterministic() -> None:
+    corpus = entries(1000)
+    kept = [sample(0.1).keep(entry) for entry in corpus]
+    assert kept == [sample(0.1).keep(entry) for entry in corpus]
+    assert 50 < sum(kept) < 150
+
+
+def test_sampling_keeps_the_entries_of_a_lower_rate() -> None:
+    corpus = entries(1000)
+    low, high = sample(0.1), sample(0.5)
+    assert all(high.keep(entry) for entry in corpus if low.keep(entry))
+    assert not any(sample(0.0).keep(entry) for entry in corpus)
+    assert all(sample(1.0).keep(entry) for entry in corpus)
+
+
+def test_cold_index_is_created_with_the_index_mapping() -> None:
+    engine = IngestPolicyEngine()
+    engine.configure(COLD)
+    client = Mock()
+    client.indices.exists.return_value = False
+    engine.ensure_indices(client, ["audit_logs", "audit_logs-cold"])
+
+    client.indices.create.assert_called_once()
+    options = client.indices.create.call_args.kwargs
+    assert options["index"] == "audit_logs-cold"
+    assert options["mappings"] == INDEX_MAPPINGS
+    assert options["settings"]["number_of_replicas"] == COLD.cold_number_of_replicas
+
+
+def test_search_indices_include_the_cold_index() -> None:
+    engine = IngestPolicyEngine()
+    assert engine.search_indices("audit_logs") == "audit_logs"
+    engine.configure(COLD)
+    assert engine.search_indices("audit_logs") == "audit_logs,audit_logs-cold"
+
+
+@pytest.fixture
+def cold_policy() -> Iterator[None]:
+    ingest_policies.configure(COLD)
+    yield
+    ingest_policies.configure(None)
+
+
+def test_cold_entries_are_searched(client: TestClient, cold_policy: None) -> None:
+    headers = {"X-API-Key": "billing-key"}
+    response = client.post(
+        "/create", headers=headers, json={**ENTRY, "event_name": "data_backup"}
+    )
+    assert response.status_code == 201
+    assert len(cluster.documents("audit_logs_billing-cold")) == 1
+
+    docs = client.post("/search", headers=headers, json={}).json()["docs"]
+    assert [doc["event_name"] for doc in docs] == ["data_backup"]
@@ -0,0 +1,166 @@
+from datetime import datetime
+from typing import Any, Dict, List
+from unittest.mock import Mock
+
+import pytest
+
+from audit_logger import elastic_filters
+from audit_logger.elastic_filters import (
+    CompiledQuery,
+    ElasticSearchQueryBuilder,
+    QueryCache,
+)
+from audit_logger.models import AppConfig, SearchParams
+from audit_logger.predicates import RELATIVE_BOUNDS_TTL
+
+
+def builder(cache: QueryCache) -> ElasticSearchQueryBuilder:
+    return ElasticSearchQueryBuilder(Mock(), "audit_logs", query_cache=cache)
+
+
+def params(*filters: Dict[str, Any], **kwargs: Any) -> SearchParams:
+    return SearchParams(filters=list(filters), **kwargs)
+
+
+EXACT = {"field": "event_name", "type": "exact", "value": "user_login"}
+
+
+def test_same_parameters_are_compiled_once() -> None:
+    cache = QueryCache()
+    body = builder(cache).compile(params(EXACT))
+    # The filter given in another key order has the same canonical JSON.
+    reordered = {"value": "user_login", "type": "exact", "field": "event_name"}
+    assert builder(cache).compile(params(reordered)) is body
+    assert len(cache) == 1
+
+
+def test_different_parameters_are_cached_apart() -> None:
+    cache = QueryCache()
+    compiler = builder(cache)
+    first = compiler.compile(params(EXACT))
+    second = compiler.compile(params(EXACT, max_results=5))
+    assert first["size"] != second["size"]
+    assert len(cache) == 2
+
+
+def test_cache_key_is_the_canonical_json() -> None:
+    cache = QueryCache()
+    search_params = params(EXACT)
+    builder(cache).compile(search_params)
+    assert cache.get(search_params.model_dump_json(warnings=False)) is not None
+
+
+def test_zero_size_disables_the_cache() -> None:
+    cache = QueryCache(0)
+    builder(cache).compile(params(EXACT))
+    assert len(cache) == 0
+
+
+def compiled(name: str) -> CompiledQuery:
+    return CompiledQuery({"name": name}, [])
+
+
+def keys(cache: QueryCache) -> List[str]:
+    return list(cache._entries)
+
+
+def test_least_recently_used_entries_are_evicted() -> None:
+    cache = QueryCache(2)
+    cache.put("a", compiled("a"))
+    cache.put("b", compiled("b"))
+    assert cache.get("a") is not None
+    cache.put("c", compiled("c"))
+    assert keys(cache) == ["a", "c"]
+    assert cache.get("b") is None
+
+
+def test_resize_keeps_the_most_recent_entries() -> None:
+    cache = QueryCache(3)
+    for key in "abc":
+        cache.put(key, compiled(key))
+    cache.get("a")
+    cache.resize(2)
+    assert keys(cache) == ["c", "a"]
+    cache.resize(4)
+    cache.put("d", compiled("d"))
+    assert keys(cache) == ["c", "a", "d"]
+    cache.resize(0)
+    assert len(cache) == 0
+
+
+def test_reload_resizes_the_running_cache(app: Any) -> None:
+    from audit_logger import main
+
+    cache = main.query_cache
+    cache.clear()
+    for key in "abc":
+        cache.put(key, compiled(key))
+    previous = main.app_config
+    config = AppConfig(**{**previous.model_dump(), "search": {"query_cache_size": 2}})
+    main.apply_config(previous, config)
+    try:
+        assert main.query_cache is cache
+        assert cache.maxsize == 2
+        assert keys(cache) == ["b", "c"]
+    finally:
+        main.apply_config(config, previous)
+        cache.clear()
+    assert cache.maxsize == previous.search.query_cache_size  # type: ignore[union-attr]
+
+
+class Clock:
+    """The monotonic clock and the wall clock of the relative date ranges."""
+
+    def __init__(self, now: datetime) -> None:
+        self.now = now
+        self.monotonic = 1000.0
+
+    def advance(self, seconds: float, now: datetime) -> None:
+        self.monotonic += seconds
+        self.now = now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock(datetime(2024, 5, 1, 23, 59, 59))
+    monkeypatch.setattr(elastic_filters, "current_time", lambda: clock.now)
+    monkeypatch.setattr(
+        elastic_filters,
+        "time",
+        Mock(monotonic=lambda: clock.monotonic, perf_counter=lambda: 0.0),
+    )
+    monkeypatch.setattr(elastic_filters, "_relative_bounds", {})
+    return clock
+
+
+def today_range(body: Dict[str, Any]) -> Dict[str, Any]:
+    clause = body["query"]["bool"]["must"][1]
+    return clause["range"]["timestamp"]
+
+
+def test_relative_ranges_are_resolved_when_used(clock: Clock) -> None:
+    cache = QueryCache()
+    search_params = params(
+        EXACT, {"field": "timestamp", "type": "range", "value": "today"}
+    )
+    first = builder(cache).compile(search_params)
+    assert today_range(first) == {
+        "gte": "2024-05-01T00:00:00",
+        "lte": "2024-05-01T23:59:59",
+    }
+
+    # Within the TTL, the resolved bounds are reused.
+    clock.advance(RELATIVE_BOUNDS_TTL / 2, datetime(2024, 5, 2, 0, 0, 0))
+    assert today_range(builder(cache).compile(search_params)) == today_range(first)
+
+    # Then the cached request is rendered with the new bounds.
+    clock.advance(RELATIVE_BOUNDS_TTL, datetime(2024, 5, 2, 0, 0, 1))
+    second = builder(cache).compile(search_params)
+    assert today_range(second) == {
+        "gte": "2024-05-02T00:00:00",
+        "lte": "2024-05-02T23:59:59",
+    }
+    assert len(cache) == 1
+    # The other clauses of the cached request are shared, not copied.
+    assert second["query"]["bool"]["must"][0] is first["query"]["bool"]["must"][0]
+    assert second["sort"] is first["sort"]
@@ -0,0 +1,111 @@
+import copy
+import hashlib
+import hmac
+
+import pytest
+
+from audit_logger.models import RedactionSettings
+from audit_logger.redaction import RedactionEngine, anonymize_ip_address
+from tests.conftest import ENTRY
+
+
+def redact(settings: dict, document: dict) -> dict:
+    engine = RedactionEngine(RedactionSettings(**settings))
+    return engine.redact(copy.deepcopy(document))
+
+
+def keyed_hash(value: str) -> str:
+    return hmac.new(b"secret", value.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+@pytest.mark.parametrize(
+    "address, anonymized",
+    [
+        ("10.1.2.3", "10.1.0.0"),
+        ("2001:db8:85a3:8d3:1319:8a2e:370:7348", "2001:db8:85a3:8d3::"),
+        ("not an address", "not an address"),
+    ],
+)
+def test_anonymize_ip_address(address: str, anonymized: str) -> None:
+    assert anonymize_ip_address(address) == anonymized
+
+
+def test_ip_addresses_are_always_anonymized() -> None:
+    document = RedactionEngine().redact(copy.deepcopy(ENTRY))
+    assert document["actor"]["ip_address"] == "10.0.0.0"
+    assert document["server"]["ip_address"] == "10.0.0.0"
+
+
+@pytest.mark.parametrize(
+    "rule, redacted",
+    [
+        ({"mode": "hash"}, keyed_hash("j.doe")),
+        ({"mode": "mask", "length": 2}, "***oe"),
+        ({"mode": "mask", "length": 4, "mask_char": "#"}, "###oe"),
+        ({"mode": "truncate", "length": 3}, "j.d"),
+    ],
+)
+def test_field_rules(rule: dict, redacted: str) -> None:
+    settings = {
+        "hash_key": "secret",
+        "rules": [{"field": "actor.identifier", **rule}],
+    }
+    assert redact(settings, ENTRY)["actor"]["identifier"] == redacted
+
+
+def test_drop_removes_the_field() -> None:
+    document = redact({"rules": [{"field": "comment", "mode": "drop"}]}, ENTRY)
+    assert "comment" not in document
+    assert document["event_name"] == ENTRY["event_name"]
+
+
+def test_rules_keep_the_shape_of_containers() -> None:
+    meta = {"token": {"value": "abcdef", "scopes": ["read", "write"]}, "empty": None}
+    settings = {
+        "hash_key": "secret",
+        "rules": [{"field": "meta.*", "mode": "hash"}],
+    }
+    assert redact(settings, {**ENTRY, "meta": meta})["meta"] == {
+        "token": {
+            "value": keyed_hash("abcdef"),
+            "scopes": [keyed_hash("read"), keyed_hash("write")],
+        },
+        "empty": None,
+    }
+
+
+def test_wildcard_rules_match_every_key() -> None:
+    settings = {"rules": [{"field": "*.type", "mode": "truncate", "length": 1}]}
+    document = redact(settings, {**ENTRY, "resource": {"type": "database"}})
+    assert document["actor"]["type"] == "u"
+    assert document["resource"]["type"] == "d"
+
+
+def test_detectors_scrub_free_text_before_the_rules() -> None:
+    settings = {
+        "detectors": [{"name": "email", "pattern": r"[\w.]+@[\w.]+"}],
+        "rules": [{"field": "comment", "mode": "truncate", "length": 12}],
+    }
+    document = redact(settings, {**ENTRY, "comment": "Mail j.doe@example.com"})
+    assert document["comment"] == "Mail *******"
+
+
+def test_missing_fields_are_skipped() -> None:
+    settings = {"rules": [{"field": "resource.id", "mode": "drop"}]}
+    assert redact(settings, ENTRY)["event_name"] == ENTRY["event_name"]
+
+
+def test_hash_mode_requires_a_hash_key() -> None:
+    with pytest.raises(ValueError, match="hash_key"):
+        RedactionSettings(rules=[{"field": "comment", "mode": "hash"}])
+
+
+def test_stats_count_the_calls_per_rule() -> None:
+    engine = RedactionEngine(
+        RedactionSettings(rules=[{"field": "comment", "mode": "drop"}])
+    )
+    engine.redact(copy.deepcopy(ENTRY))
+    engine.redact(copy.deepcopy(ENTRY))
+    assert engine.stats()["drop:comment"]["calls"] == 2
+    assert engine.stats()["anonymize_ip:actor.ip_address"]["calls"] == 2
+    assert engine.stats()["anonymize_ip:ip_address"]["calls"] == 0
@@ -0,0 +1,108 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+import pytest
+from fastapi.testclient import TestClient
+
+from audit_logger.elastic_filters import ElasticSearchQueryBuilder
+from audit_logger.models import AppConfig, SearchParams
+from benchmarks.fake_elasticsearch import cluster, create_fake_client
+from tests.conftest import ENTRY
+
+HEADERS = {"X-API-Key": "test"}
+REPORT = ["hits", "phases_ms", "query_hash", "took_ms", "total_hits", "total_ms"]
+PARAMS = {"filters": [{"field": "event_name", "type": "exact", "value": "user_login"}]}
+
+
+def slow_queries(caplog: pytest.LogCaptureFixture) -> List[Dict[str, Any]]:
+    return [
+        json.loads(record.getMessage()[len("[SlowQuery] ") :])  # noqa: E203
+        for record in caplog.records
+        if record.getMessage().startswith("[SlowQuery] ")
+    ]
+
+
+def search(
+    threshold_ms: Optional[float], raw: bool = True, **params: Any
+) -> Dict[str, Any]:
+    cluster.reset()
+    cluster.index("audit_logs", [ENTRY])
+    builder = ElasticSearchQueryBuilder(
+        create_fake_client(), "audit_logs", slow_query_threshold_ms=threshold_ms
+    )
+    return builder.process_parameters(SearchParams(**{**PARAMS, **params}), raw=raw)
+
+
+@pytest.mark.parametrize("raw", [True, False])
+def test_queries_over_the_threshold_are_logged(
+    caplog: pytest.LogCaptureFixture, raw: bool
+) -> None:
+    with caplog.at_level(logging.WARNING, "audit_logger"):
+        result = search(0, raw=raw)
+    (report,) = slow_queries(caplog)
+    assert sorted(report) == sorted([*REPORT, "index", "query"])
+    assert report["index"] == "audit_logs"
+    assert report["query"]["query"] == {"term": {"event_name": "user_login"}}
+    assert report["hits"] == report["total_hits"] == 1
+    assert sorted(report["phases_ms"]) == ["build", "execute", "serialize"]
+    assert report["total_ms"] >= 0
+    assert report["query_hash"] == ElasticSearchQueryBuilder.query_hash(report["query"])
+    # The report is only returned with `profile`.
+    assert "profile" not in result
+
+
+@pytest.mark.parametrize("threshold_ms", [None, 60000])
+def test_queries_under_the_threshold_are_not_logged(
+    caplog: pytest.LogCaptureFixture, threshold_ms: Optional[float]
+) -> None:
+    with caplog.at_level(logging.WARNING, "audit_logger"):
+        search(threshold_ms)
+    assert slow_queries(caplog) == []
+
+
+def test_profile_has_the_hash_of_the_logged_query(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    profile = search(None, profile=True)["profile"]
+    with caplog.at_level(logging.WARNING, "audit_logger"):
+        search(0)
+    (report,) = slow_queries(caplog)
+    # The `profile` flag isn't part of the query identity.
+    assert profile["query_hash"] == report["query_hash"]
+
+
+def test_profile_report(client: TestClient) -> None:
+    assert client.post("/create", headers=HEADERS, json=ENTRY).status_code == 201
+    response = client.post("/search", headers=HEADERS, json={**PARAMS, "profile": True})
+    assert response.status_code == 200
+    profile = response.json()["profile"]
+    assert sorted(profile) == sorted([*REPORT, "es"])
+    assert profile["hits"] == profile["total_hits"] == 1
+    assert sorted(profile["phases_ms"]) == ["build", "execute", "serialize"]
+    assert profile["total_ms"] == pytest.approx(
+        sum(profile["phases_ms"].values()), abs=0.01
+    )
+
+
+def test_search_without_profile_has_no_report(client: TestClient) -> None:
+    response = client.post("/search", headers=HEADERS, json=PARAMS)
+    assert response.status_code == 200
+    assert "profile" not in response.json()
+
+
+def test_search_threshold_is_read_from_the_config(
+    client: TestClient,
+    caplog: pytest.LogCaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    from audit_logger import main
+
+    config = main.app_config.model_dump()
+    config["search"] = {**(config["search"] or {}), "slow_query_threshold_ms": 0}
+    monkeypatch.setattr(main, "app_config", AppConfig(**config))
+    with caplog.at_level(logging.WARNING, "audit_logger"):
+        response = client.post("/search", headers={"X-API-Key": "shop-key"}, json={})
+    assert response.status_code == 200
+    (report,) = slow_queries(caplog)
+    assert report["index"].split(",")[0] == "audit_logs_shop"
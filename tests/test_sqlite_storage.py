@@ -0,0 +1,204 @@
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import pytest
+
+from audit_logger.metrics import registry
+from audit_logger.models import SearchParams, StorageForwardSettings, StorageSettings
+from audit_logger.storage import SQLiteStorage
+from audit_logger.storage.sqlite import TABLE, Forwarder
+from benchmarks.fake_elasticsearch import cluster, create_fake_client
+from tests.conftest import ENTRY
+
+
+@pytest.fixture
+def storage(tmp_path: Path) -> Iterator[SQLiteStorage]:
+    storage = SQLiteStorage(
+        StorageSettings(
+            backend="sqlite", path=str(tmp_path / "audit_logs.sqlite3"), batch_size=2
+        )
+    )
+    yield storage
+    storage.close()
+
+
+def operation(routing: Any = None, **fields: Any) -> Dict[str, Any]:
+    return {"_index": "audit_logs", "_routing": routing, "_source": {**ENTRY, **fields}}
+
+
+def comments(storage: SQLiteStorage) -> List[str]:
+    params = SearchParams(sort_by="timestamp", sort_order="asc")
+    return [doc["comment"] for doc in storage.search(params, "audit_logs")["docs"]]
+
+
+def test_entries_are_inserted_in_batches(storage: SQLiteStorage) -> None:
+    operations = [operation(comment=str(i)) for i in range(5)]
+    assert storage.insert(operations) == (5, [])
+    assert comments(storage) == ["0", "1", "2", "3", "4"]
+
+
+def test_failed_batch_is_rolled_back(storage: SQLiteStorage) -> None:
+    storage.connection().execute(
+        f"CREATE TRIGGER reject BEFORE INSERT ON {TABLE} "
+        "WHEN NEW.document LIKE '%\"reject\"%' "
+        "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+    )
+    success, failed = storage.insert(
+        [operation(comment="0"), operation(comment="reject"), operation(comment="2")]
+    )
+    # The whole first batch (of 2 entries) failed, the second one was inserted.
+    assert success == 1
+    assert [item["index"]["error"] for item in failed] == ["rejected", "rejected"]
+    assert comments(storage) == ["2"]
+    assert not storage.connection().in_transaction
+
+
+def test_unforwarded_entries_oldest_first(storage: SQLiteStorage) -> None:
+    storage.insert([operation("shop", comment=str(i)) for i in range(3)])
+    assert storage.pending() == 3
+    rows = storage.unforwarded(2)
+    assert [(index, routing) for _, _, index, routing, _ in rows] == [
+        ("audit_logs", "shop"),
+        ("audit_logs", "shop"),
+    ]
+    storage.mark_forwarded([row_id for row_id, *_ in rows])
+    assert storage.pending() == 1
+    ((_, _, _, _, document),) = storage.unforwarded(2)
+    assert '"comment": "2"' in document
+    # The forwarded entries are kept (and searched).
+    assert comments(storage) == ["0", "1", "2"]
+
+
+@pytest.fixture
+def forwarding_settings() -> StorageForwardSettings:
+    cluster.reset()
+    return StorageForwardSettings(enabled=True, interval=60, batch_size=2)
+
+
+def test_entries_are_forwarded_once(
+    storage: SQLiteStorage, forwarding_settings: StorageForwardSettings
+) -> None:
+    storage.insert([operation("shop", comment=str(i)) for i in range(3)])
+    forwarder = Forwarder(storage, create_fake_client(), forwarding_settings)
+    assert forwarder.forward() == 3
+    assert storage.pending() == 0
+    assert forwarder.forward() == 0
+    documents = cluster.documents("audit_logs")
+    assert sorted(doc["comment"] for doc in documents) == ["0", "1", "2"]
+
+
+def test_nothing_is_forwarded_while_unreachable(
+    storage: SQLiteStorage, forwarding_settings: StorageForwardSettings
+) -> None:
+    storage.insert([operation()])
+
+    class Unreachable:
+        def ping(self) -> bool:
+            raise ConnectionError("unreachable")
+
+    forwarder = Forwarder(storage, Unreachable(), forwarding_settings)  # type: ignore
+    assert forwarder.forward() == 0
+    assert forwarder.reachable is False
+    assert storage.pending() == 1
+
+
+def test_start_forwarding_exports_the_backlog(
+    storage: SQLiteStorage,
+    forwarding_settings: StorageForwardSettings,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(registry, "_collectors", [])
+    storage.insert([operation(), operation()])
+    storage.start_forwarding(create_fake_client(), forwarding_settings)
+    assert storage.forwarder is not None
+    ((name, *_, samples),) = list(storage.collect())
+    assert name == "audit_storage_unforwarded_entries"
+    assert samples == {(): 2.0}
+    assert registry._collectors == [storage.collect]
+
+
+def search_aggs(storage: SQLiteStorage, aggs: Dict[str, Any]) -> List[Any]:
+    return storage.search(SearchParams(aggs=aggs), "audit_logs")["aggs"]
+
+
+def test_aggregations_are_translated(storage: SQLiteStorage) -> None:
+    storage.insert(
+        [
+            operation(event_name="user_login"),
+            operation(event_name="user_login"),
+            operation(event_name="user_logout", actor={"type": "system"}),
+        ]
+    )
+    terms, count, nested = search_aggs(
+        storage,
+        {
+            "events": {"type": "terms", "field": "event_name"},
+            "count": {"type": "value_count", "field": "event_name"},
+            "actors": {
+                "type": "nested",
+                "path": "actor",
+                "sub_aggregations": [
+                    {"type": "terms", "field": "actor.identifier", "max_result": 5}
+                ],
+            },
+        },
+    )
+    assert terms == {
+        "doc_count_error_upper_bound": 0,
+        "sum_other_doc_count": 0,
+        "buckets": [
+            {"key": "user_login", "doc_count": 2},
+            {"key": "user_logout", "doc_count": 1},
+        ],
+    }
+    assert count == {"value": 3}
+    assert nested["doc_count"] == 3
+    assert nested["terms"]["buckets"] == [{"key": "j.doe", "doc_count": 2}]
+
+
+def test_terms_size_counts_the_other_entries(storage: SQLiteStorage) -> None:
+    storage.insert(
+        [
+            operation(actor={**ENTRY["actor"], "identifier": identifier})
+            for identifier in ["a", "a", "b", "c"]
+        ]
+    )
+    (nested,) = search_aggs(
+        storage,
+        {
+            "actors": {
+                "type": "nested",
+                "path": "actor",
+                "sub_aggregations": [
+                    {"type": "terms", "field": "actor.identifier", "max_result": 1}
+                ],
+            }
+        },
+    )
+    assert nested["terms"]["buckets"] == [{"key": "a", "doc_count": 2}]
+    assert nested["terms"]["sum_other_doc_count"] == 2
+
+
+def test_timestamp_buckets_have_the_es_keys(storage: SQLiteStorage) -> None:
+    storage.insert([operation(timestamp="2024-05-01T10:00:00+00:00")])
+    (terms,) = search_aggs(storage, {"at": {"type": "terms", "field": "timestamp"}})
+    assert terms["buckets"] == [
+        {
+            "key": 1714557600000,
+            "key_as_string": "2024-05-01T10:00:00.000Z",
+            "doc_count": 1,
+        }
+    ]
+
+
+def test_text_fields_cannot_be_aggregated(storage: SQLiteStorage) -> None:
+    with pytest.raises(ValueError, match="Can't aggregate"):
+        search_aggs(storage, {"comments": {"type": "terms", "field": "comment"}})
+
+
+def test_aggregations_must_be_named(storage: SQLiteStorage) -> None:
+    with pytest.raises(ValueError, match="by name"):
+        storage.search(
+            SearchParams(aggs=[{"type": "terms", "field": "event_name"}]),
+            "audit_logs",
+        )
@@ -0,0 +1,92 @@
+import gzip
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+from audit_logger.models import AuditLogEntry
+from audit_logger.synthetic import SyntheticGenerator, main, to_bulk_ndjson
+
+START = datetime(2024, 5, 1, tzinfo=timezone.utc)
+END = datetime(2024, 5, 8, tzinfo=timezone.utc)
+
+
+def generator(seed: int = 7, **options: Any) -> SyntheticGenerator:
+    return SyntheticGenerator(seed=seed, start=START, end=END, **options)
+
+
+def test_same_seed_same_entries() -> None:
+    assert generator().entries(50) == generator().entries(50)
+    assert generator().entries(50) != generator(seed=8).entries(50)
+
+
+def test_entries_are_valid_audit_log_entries() -> None:
+    for entry in generator().entries(200):
+        AuditLogEntry(**entry)
+
+
+def test_timestamps_are_sorted_within_the_window() -> None:
+    timestamps = [entry["timestamp"] for entry in generator().entries(200)]
+    assert timestamps == sorted(timestamps)
+    parsed = [datetime.fromisoformat(timestamp) for timestamp in timestamps]
+    assert START <= parsed[0] and parsed[-1] <= END
+
+
+@pytest.mark.parametrize("error_rate, status", [(0.0, "success"), (1.0, "failure")])
+def test_error_rate(error_rate: float, status: str) -> None:
+    entries = generator(error_rate=error_rate).entries(50)
+    assert {entry["status"] for entry in entries} == {status}
+
+
+def test_empty_time_window_is_rejected() -> None:
+    with pytest.raises(ValueError, match="time window"):
+        SyntheticGenerator(start=END, end=START)
+
+
+def test_bulk_body() -> None:
+    entries = generator().entries(3)
+    lines = to_bulk_ndjson("audit_logs", entries).decode("utf-8").split("\n")
+    assert lines[-1] == ""
+    assert lines[0:-1:2] == ['{"index":{"_index":"audit_logs"}}'] * 3
+    assert [json.loads(line) for line in lines[1:-1:2]] == entries
+
+
+def run(path: Path, *args: str) -> bytes:
+    main(
+        [
+            "--count",
+            "20",
+            "--batch-size",
+            "7",
+            "--seed",
+            "3",
+            "--end",
+            END.isoformat(),
+            "--output",
+            str(path),
+            *args,
+        ]
+    )
+    return path.read_bytes()
+
+
+def test_corpus_is_reproducible(tmp_path: Path) -> None:
+    assert run(tmp_path / "a.ndjson") == run(tmp_path / "b.ndjson")
+
+
+def test_corpus_of_documents(tmp_path: Path) -> None:
+    lines = run(tmp_path / "corpus.ndjson").decode("utf-8").splitlines()
+    assert len(lines) == 20
+    for line in lines:
+        AuditLogEntry(**json.loads(line))
+
+
+def test_corpus_of_bulk_bodies(tmp_path: Path) -> None:
+    corpus = run(tmp_path / "corpus.ndjson.gz", "--index", "audit_logs")
+    lines: List[str] = gzip.decompress(corpus).decode("utf-8").splitlines()
+    # One action line per document, across the batches.
+    assert len(lines) == 40
+    assert set(lines[::2]) == {'{"index":{"_index":"audit_logs"}}'}
+    assert all("_index" not in json.loads(line) for line in lines[1::2])
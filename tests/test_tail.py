@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from audit_logger.models import SearchFilterParams
+from audit_logger.tail import TailHub
+from tests.conftest import ENTRY
+
+FAILURES = [SearchFilterParams(field="status", type="exact", value="failure")]
+
+
+def test_matching_entries_are_pushed_to_the_subscribers() -> None:
+    hub = TailHub()
+    failures = hub.subscribe(FAILURES)
+    everything = hub.subscribe([])
+    failure = {**ENTRY, "status": "failure"}
+    hub.publish([ENTRY, failure])
+    assert list(failures.queue) == [failure]
+    assert list(everything.queue) == [ENTRY, failure]
+
+
+def test_subscribers_only_see_the_entries_of_their_index() -> None:
+    hub = TailHub()
+    billing = hub.subscribe([], index="audit_logs_billing")
+    hub.publish([ENTRY], index="audit_logs_shop")
+    assert not billing.queue
+    hub.publish([ENTRY], index="audit_logs_billing")
+    assert list(billing.queue) == [ENTRY]
+
+
+def test_oldest_entries_are_dropped() -> None:
+    hub = TailHub(queue_size=2)
+    subscription = hub.subscribe([])
+    hub.publish([{"n": n} for n in range(5)])
+    documents, dropped = asyncio.run(subscription.get(timeout=0))
+    assert documents == [{"n": 3}, {"n": 4}]
+    assert dropped == 3
+
+
+def test_max_subscribers() -> None:
+    hub = TailHub(max_subscribers=1)
+    subscription = hub.subscribe([])
+    with pytest.raises(OverflowError):
+        hub.subscribe([])
+    hub.unsubscribe(subscription)
+    hub.subscribe([])
+
+
+def test_tail_is_disabled_with_multiple_workers(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    response = client.post("/tail", headers={"X-API-KEY": "test"})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "The tail is disabled with multiple workers"
@@ -0,0 +1,171 @@
+from typing import Any
+from unittest.mock import Mock
+
+import pytest
+from elasticsearch import BadRequestError
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from audit_logger.elastic import CustomElasticsearch
+from audit_logger.mappings import INDEX_MAPPINGS
+from audit_logger.models import Authentication
+from audit_logger.tenants import DEFAULT_TENANT, TenantRegistry, hash_api_key
+from tests.conftest import ENTRY
+
+
+def search(client: TestClient, api_key: str) -> list:
+    response = client.post("/search", headers={"X-API-Key": api_key}, json={})
+    assert response.status_code == 200
+    return response.json()["docs"]
+
+
+def test_tenants_only_see_their_own_entries(client: TestClient) -> None:
+    response = client.post("/create", headers={"X-API-Key": "billing-key"}, json=ENTRY)
+    assert response.status_code == 201
+
+    assert [doc["event_name"] for doc in search(client, "billing-key")] == [
+        "user_login"
+    ]
+    assert search(client, "shop-key") == []
+    assert search(client, "test") == []
+
+
+def test_unknown_api_key_is_rejected(client: TestClient) -> None:
+    response = client.post("/search", headers={"X-API-Key": "unknown"}, json={})
+    assert response.status_code == 401
+
+
+def test_tenant_index_is_required() -> None:
+    with pytest.raises(ValidationError, match="index"):
+        Authentication(tenants=[{"name": "billing", "api_keys": ["key"]}])
+
+
+def test_tenants_cannot_share_an_index() -> None:
+    with pytest.raises(ValidationError, match="share the index 'audit_logs'"):
+        Authentication(
+            tenants=[
+                {"name": "billing", "api_keys": ["a"], "index": "audit_logs"},
+                {"name": "shop", "api_keys": ["b"], "index": "audit_logs"},
+            ]
+        )
+
+
+def test_tenant_cannot_share_the_default_index() -> None:
+    authentication = Authentication(
+        api_key="key",
+        tenants=[{"name": "billing", "api_keys": ["b"], "index": "audit_logs"}],
+    )
+    with pytest.raises(ValueError, match=f"'{DEFAULT_TENANT}' tenant"):
+        TenantRegistry().configure(authentication, "audit_logs")
+
+
+def test_lookup_by_plain_and_hashed_keys() -> None:
+    registry = TenantRegistry()
+    registry.configure(
+        Authentication(
+            api_key="key",
+            tenants=[
+                {
+                    "name": "billing",
+                    "api_keys": ["b"],
+                    "api_key_hashes": [hash_api_key("c").upper()],
+                    "index": "audit_logs_billing",
+                }
+            ],
+        ),
+        "audit_logs",
+    )
+    assert registry.lookup("key").index == "audit_logs"
+    assert registry.lookup("b").index == "audit_logs_billing"
+    assert registry.lookup("c").name == "billing"
+    assert registry.lookup("d") is None
+
+
+def test_reconfigure_keeps_the_quota_state() -> None:
+    registry = TenantRegistry()
+    settings = {"name": "billing", "api_keys": ["b"], "index": "audit_logs_billing"}
+    registry.configure(
+        Authentication(tenants=[{**settings, "docs_per_second": 10}]), "audit_logs"
+    )
+    tenant = registry.lookup("b")
+    tenant.take_documents(10)
+    registry.configure(
+        Authentication(tenants=[{**settings, "docs_per_second": 20}]), "audit_logs"
+    )
+    assert registry.lookup("b") is tenant
+    assert tenant.quota.rate == 20
+    assert tenant.quota.tokens < 1
+
+
+def test_missing_index_is_created_with_the_mapping() -> None:
+    client = CustomElasticsearch("http://localhost:9200")
+    client.indices = Mock()
+    client.indices.exists.return_value = False
+    client.ensure_index("audit_logs_billing")
+    client.indices.create.assert_called_once_with(
+        index="audit_logs_billing", mappings=INDEX_MAPPINGS
+    )
+
+    client.indices.create.reset_mock()
+    client.indices.exists.return_value = True
+    client.ensure_index("audit_logs_billing")
+    client.indices.create.assert_not_called()
+
+
+def test_index_created_concurrently_is_ignored() -> None:
+    client = CustomElasticsearch("http://localhost:9200")
+    client.indices = Mock()
+    client.indices.exists.return_value = False
+    client.indices.create.side_effect = BadRequestError(
+        "resource_already_exists_exception", Mock(), {}
+    )
+    client.ensure_index("audit_logs_billing")
+
+
+def test_missing_alias_is_not_created() -> None:
+    client = CustomElasticsearch("http://localhost:9200")
+    client.indices = Mock()
+    client.indices.exists_alias.return_value = False
+    with pytest.raises(ValueError, match="alias 'audit_logs_billing'"):
+        client.ensure_index("audit_logs_billing", alias=True)
+    client.indices.create.assert_not_called()
+
+
+def test_tenant_indices_are_ensured_once(
+    app: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from audit_logger import main
+
+    client = Mock()
+    monkeypatch.setattr(main, "elastic", client)
+    monkeypatch.setattr(main, "ensured_indices", set())
+    main.ensure_tenant_indices(main.app_config.authentication)
+    main.ensure_tenant_indices(main.app_config.authentication)
+    assert [call.args for call in client.ensure_index.call_args_list] == [
+        ("audit_logs_billing",),
+        ("audit_logs_shop",),
+    ]
+
+
+def test_reload_with_a_missing_alias_is_rejected(
+    app: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from audit_logger import main
+
+    client = CustomElasticsearch("http://localhost:9200")
+    client.indices = Mock()
+    client.indices.exists_alias.return_value = False
+    monkeypatch.setattr(main, "elastic", client)
+    monkeypatch.setattr(main, "ensured_indices", set())
+    previous = main.app_config
+    authentication = previous.authentication.model_dump()
+    authentication["tenants"].append(
+        {"name": "hr", "api_keys": ["hr-key"], "index": "audit_logs_hr", "alias": True}
+    )
+    config = previous.model_copy(
+        update={"authentication": Authentication(**authentication)}
+    )
+    with pytest.raises(ValueError, match="alias 'audit_logs_hr'"):
+        main.apply_config(previous, config)
+    assert main.app_config is previous
+    assert main.tenants.lookup("hr-key") is None
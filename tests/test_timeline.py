@@ -0,0 +1,114 @@
+from typing import Any, Dict, List
+from unittest.mock import Mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from audit_logger.models import TimelineSettings
+from audit_logger.timeline import (
+    SORT,
+    TIEBREAKER,
+    ActorTimeline,
+    actor_timeline,
+    decode_cursor,
+    encode_cursor,
+)
+from tests.conftest import ENTRY
+
+HEADERS = {"X-API-Key": "test"}
+
+
+def test_cursor_round_trip() -> None:
+    sort = [1714557600000, "0f3c9a1e2b7d4c5e8f6a9b0c1d2e3f4a"]
+    cursor = encode_cursor(sort)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == sort
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor!",
+        encode_cursor([1714557600000]),
+        encode_cursor({"timestamp": 1}),  # type: ignore[arg-type]
+        "bm90IGpzb24",
+    ],
+)
+def test_invalid_cursor_is_rejected(cursor: str) -> None:
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+def timeline(client: Any = None) -> ActorTimeline:
+    timeline = ActorTimeline()
+    timeline.configure(TimelineSettings(enabled=True))
+    timeline.start(client or Mock())
+    return timeline
+
+
+def test_operations_are_routed_by_the_actor() -> None:
+    documents = [ENTRY, {**ENTRY, "actor": {"type": "system"}}]
+    (operation,) = timeline().operations("audit_logs", documents)
+    assert operation["_index"] == "audit_logs" + TimelineSettings().index_suffix
+    assert operation["_routing"] == "j.doe"
+    assert operation["_source"][TIEBREAKER]
+    assert TIEBREAKER not in ENTRY
+
+
+def hits(count: int) -> List[Dict[str, Any]]:
+    return [
+        {"_source": {**ENTRY, "comment": str(i)}, "sort": [1714557600000 - i, str(i)]}
+        for i in range(count)
+    ]
+
+
+def test_pages_are_read_with_search_after() -> None:
+    client = Mock()
+    client.search.return_value.body = {"hits": {"hits": hits(2)}}
+    page = timeline(client).search("audit_logs", "j.doe", size=2, gte="now-90d")
+    assert [doc["comment"] for doc in page["docs"]] == ["0", "1"]
+    assert decode_cursor(page["next_cursor"]) == [1714557600000 - 1, "1"]
+
+    request = client.search.call_args.kwargs
+    assert request["routing"] == "j.doe"
+    assert request["sort"] == SORT
+    assert request["query"] == {
+        "bool": {
+            "filter": [
+                {"term": {"actor.identifier": "j.doe"}},
+                {"range": {"timestamp": {"gte": "now-90d"}}},
+            ]
+        }
+    }
+    assert "search_after" not in request
+
+    timeline(client).search("audit_logs", "j.doe", size=2, cursor=page["next_cursor"])
+    assert client.search.call_args.kwargs["search_after"] == [1714557600000 - 1, "1"]
+
+
+def test_last_page_has_no_cursor() -> None:
+    client = Mock()
+    client.search.return_value.body = {"hits": {"hits": hits(1)}}
+    page = timeline(client).search("audit_logs", "j.doe", size=2)
+    assert page["next_cursor"] is None
+
+
+def test_endpoint_is_disabled_without_the_timeline(client: TestClient) -> None:
+    response = client.get("/actors/j.doe/timeline", headers=HEADERS)
+    assert response.status_code == 404
+
+
+def test_endpoint_rejects_invalid_cursors(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(actor_timeline, "settings", TimelineSettings(enabled=True))
+    monkeypatch.setattr(actor_timeline, "client", Mock())
+    monkeypatch.setattr(actor_timeline, "search_client", Mock())
+    response = client.get(
+        "/actors/j.doe/timeline", headers=HEADERS, params={"cursor": "garbage"}
+    )
+    assert response.status_code == 400
+    response = client.get(
+        "/actors/j.doe/timeline", headers=HEADERS, params={"size": 100000}
+    )
+    assert response.status_code == 400
@@ -0,0 +1,282 @@
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import pytest
+from fastapi.testclient import TestClient
+
+from audit_logger.models import TracingSettings
+from audit_logger.tracing import (
+    NOOP_SPAN,
+    TRACEPARENT_HEADER,
+    BatchSpanProcessor,
+    Span,
+    SpanExporter,
+    Tracer,
+    parse_traceparent,
+    tracer,
+)
+from benchmarks.fake_elasticsearch import FakeNode
+from tests.conftest import ENTRY
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.mark.parametrize(
+    "header, parsed",
+    [
+        (f"00-{TRACE_ID}-{PARENT_ID}-01", (TRACE_ID, PARENT_ID, True)),
+        (f"00-{TRACE_ID}-{PARENT_ID}-00", (TRACE_ID, PARENT_ID, False)),
+        # Only the sampled bit of the flags is used.
+        (f"00-{TRACE_ID}-{PARENT_ID}-03", (TRACE_ID, PARENT_ID, True)),
+        (f"00-{TRACE_ID}-{PARENT_ID}-02", (TRACE_ID, PARENT_ID, False)),
+        (f" 00-{TRACE_ID}-{PARENT_ID}-01 ", (TRACE_ID, PARENT_ID, True)),
+        (f"00-{'0' * 32}-{PARENT_ID}-01", None),
+        (f"00-{TRACE_ID}-{'0' * 16}-01", None),
+        (f"00-{'g' * 32}-{PARENT_ID}-01", None),
+        (f"00-{TRACE_ID}-{'x' * 16}-01", None),
+        (f"00-{TRACE_ID}-{PARENT_ID}-zz", None),
+        (f"00-{TRACE_ID[:-1]}-{PARENT_ID}-01", None),
+        (f"00-{TRACE_ID}-{PARENT_ID}", None),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_parse_traceparent(header: Optional[str], parsed: Any) -> None:
+    assert parse_traceparent(header) == parsed
+
+
+class ListExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.batches: List[List[Dict[str, Any]]] = []
+        self.stopped = False
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        self.batches.append(spans)
+
+    def shutdown(self) -> None:
+        self.stopped = True
+
+
+def enabled_tracer(tmp_path: Path, sample_ratio: float) -> Tracer:
+    traced = Tracer()
+    traced.configure(
+        TracingSettings(
+            enabled=True,
+            sample_ratio=sample_ratio,
+            file_path=str(tmp_path / "spans.jsonl"),
+        )
+    )
+    return traced
+
+
+@pytest.mark.parametrize(
+    "sample_ratio, traceparent, sampled",
+    [
+        (1.0, None, True),
+        (0.0, None, False),
+        # The caller's sampling decision wins over the sample ratio.
+        (0.0, f"00-{TRACE_ID}-{PARENT_ID}-01", True),
+        (1.0, f"00-{TRACE_ID}-{PARENT_ID}-00", False),
+        # An invalid header starts a new trace.
+        (1.0, f"00-{'0' * 32}-{PARENT_ID}-01", True),
+    ],
+)
+def test_sampling_decision(
+    tmp_path: Path, sample_ratio: float, traceparent: Optional[str], sampled: bool
+) -> None:
+    traced = enabled_tracer(tmp_path, sample_ratio)
+    try:
+        span = traced.start_trace("GET /", traceparent)
+    finally:
+        traced.shutdown()
+    assert (span is not NOOP_SPAN) == sampled
+
+
+def test_remote_trace_is_continued(tmp_path: Path) -> None:
+    traced = enabled_tracer(tmp_path, 0.0)
+    try:
+        span = traced.start_trace("GET /", f"00-{TRACE_ID}-{PARENT_ID}-01")
+    finally:
+        traced.shutdown()
+    assert (span.trace_id, span.parent_id) == (TRACE_ID, PARENT_ID)
+
+
+def test_disabled_tracer_does_not_sample() -> None:
+    assert Tracer().start_trace("GET /", f"00-{TRACE_ID}-{PARENT_ID}-01") is NOOP_SPAN
+
+
+def test_child_spans_only_inside_a_sampled_span(tmp_path: Path) -> None:
+    traced = enabled_tracer(tmp_path, 1.0)
+    try:
+        assert traced.span("validate") is NOOP_SPAN
+        assert traced.propagation_headers() is None
+        with traced.start_trace("POST /create") as root:
+            with traced.span("validate") as child:
+                assert child.trace_id == root.trace_id
+                assert child.parent_id == root.span_id
+                assert traced.propagation_headers() == {
+                    TRACEPARENT_HEADER: f"00-{root.trace_id}-{child.span_id}-01"
+                }
+            assert traced.current_span() is root
+        assert traced.current_span() is None
+    finally:
+        traced.shutdown()
+
+
+def ended_span(name: str) -> Span:
+    span = Span(Tracer(), name, TRACE_ID, None, 1, {"count": 1})
+    with span:
+        pass
+    return span
+
+
+def test_batches_are_exported_on_flush() -> None:
+    exporter = ListExporter()
+    processor = BatchSpanProcessor(exporter, max_batch_size=2, schedule_delay=60)
+    try:
+        for name in "abc":
+            processor.on_end(ended_span(name))
+        processor.flush()
+        assert [[span["name"] for span in batch] for batch in exporter.batches] == [
+            ["a", "b"],
+            ["c"],
+        ]
+    finally:
+        processor.shutdown()
+
+
+def test_full_queue_drops_spans() -> None:
+    exporter = ListExporter()
+    processor = BatchSpanProcessor(
+        exporter, max_queue_size=2, max_batch_size=10, schedule_delay=60
+    )
+    try:
+        for name in "abc":
+            processor.on_end(ended_span(name))
+        assert processor.dropped == 1
+    finally:
+        processor.shutdown()
+    assert [span["name"] for span in exporter.batches[0]] == ["a", "b"]
+
+
+def test_full_batch_wakes_the_exporter() -> None:
+    exported = threading.Event()
+
+    class WaitingExporter(ListExporter):
+        def export(self, spans: List[Dict[str, Any]]) -> None:
+            super().export(spans)
+            exported.set()
+
+    processor = BatchSpanProcessor(
+        WaitingExporter(), max_batch_size=2, schedule_delay=60
+    )
+    try:
+        processor.on_end(ended_span("a"))
+        processor.on_end(ended_span("b"))
+        assert exported.wait(5)
+    finally:
+        processor.shutdown()
+
+
+def test_shutdown_exports_the_queued_spans() -> None:
+    exporter = ListExporter()
+    processor = BatchSpanProcessor(exporter, schedule_delay=60)
+    processor.on_end(ended_span("a"))
+    processor.shutdown()
+    assert [span["name"] for span in exporter.batches[0]] == ["a"]
+    assert exporter.stopped
+
+
+def test_failed_export_is_not_raised() -> None:
+    class FailingExporter(SpanExporter):
+        def export(self, spans: List[Dict[str, Any]]) -> None:
+            raise OSError("collector down")
+
+    processor = BatchSpanProcessor(FailingExporter(), schedule_delay=60)
+    processor.on_end(ended_span("a"))
+    processor.shutdown()
+
+
+@pytest.fixture
+def spans_file(client: TestClient, tmp_path: Path) -> Iterator[Path]:
+    """The file the spans of the API are exported to, every request sampled."""
+    path = tmp_path / "spans.jsonl"
+    tracer.configure(
+        TracingSettings(enabled=True, sample_ratio=1.0, file_path=str(path))
+    )
+    yield path
+    tracer.configure(None)
+
+
+def exported_spans(path: Path) -> List[Dict[str, Any]]:
+    tracer.processor.flush()
+    if not path.exists():
+        return []
+    return [
+        span
+        for line in path.read_text().splitlines()
+        for resource in json.loads(line)["resourceSpans"]
+        for scope in resource["scopeSpans"]
+        for span in scope["spans"]
+    ]
+
+
+@pytest.fixture
+def sent_headers(monkeypatch: pytest.MonkeyPatch) -> List[Dict[str, str]]:
+    """The headers of the requests sent to the fake Elasticsearch nodes."""
+    sent: List[Dict[str, str]] = []
+    perform_request = FakeNode.perform_request
+
+    def recording(
+        self: FakeNode,
+        method: str,
+        target: str,
+        body: Any = None,
+        headers: Any = None,
+        **kwargs: Any,
+    ) -> Any:
+        sent.append(dict(headers or {}))
+        return perform_request(self, method, target, body, headers, **kwargs)
+
+    monkeypatch.setattr(FakeNode, "perform_request", recording)
+    return sent
+
+
+def test_trace_context_is_sent_to_elasticsearch(
+    client: TestClient, spans_file: Path, sent_headers: List[Dict[str, str]]
+) -> None:
+    response = client.post(
+        "/create",
+        headers={
+            "X-API-Key": "test",
+            TRACEPARENT_HEADER: f"00-{TRACE_ID}-{PARENT_ID}-01",
+        },
+        json=ENTRY,
+    )
+    assert response.status_code == 201
+    spans = {span["name"]: span for span in exported_spans(spans_file)}
+    bulk = spans["elasticsearch.bulk"]
+    assert spans["POST /create"]["parentSpanId"] == PARENT_ID
+    assert {span["traceId"] for span in spans.values()} == {TRACE_ID}
+    assert [headers[TRACEPARENT_HEADER] for headers in sent_headers] == [
+        f"00-{TRACE_ID}-{bulk['spanId']}-01"
+    ]
+
+
+def test_unsampled_request_is_not_traced(
+    client: TestClient, spans_file: Path, sent_headers: List[Dict[str, str]]
+) -> None:
+    response = client.post(
+        "/create",
+        headers={
+            "X-API-Key": "test",
+            TRACEPARENT_HEADER: f"00-{TRACE_ID}-{PARENT_ID}-00",
+        },
+        json=ENTRY,
+    )
+    assert response.status_code == 201
+    assert exported_spans(spans_file) == []
+    assert sent_headers and not any(TRACEPARENT_HEADER in h for h in sent_headers)